@@ -15,6 +15,7 @@ import ast
 import cpp_extension # noqa
 
 import cpp_extension # noqa
+import benchmark_regression
 import benchmark_utils
 from collections import namedtuple
 
@@ -183,6 +184,10 @@ class BenchmarkRunner(object):
         # to match the tag anymore
         if self.args.test_name is not None:
             self.args.tag_filter = None
+        # results of all the tests that ran, used for --output_json,
+        # --output_csv and --baseline
+        self.results = []
+        self.regressions = []
 
     def _print_header(self):
         DASH_LINE = '-' * 40
@@ -399,3 +404,27 @@ class BenchmarkRunner(object):
                                  for _ in range(self.num_runs)]
 
                 self._print_perf_result(reported_time, test_case)
+                self.results.append(benchmark_regression.make_result(
+                    test_case, "JIT" if self.use_jit else "Eager", reported_time))
+
+        self._report_results()
+
+    def _report_results(self):
+        if self.args.list_tests or self.args.list_ops:
+            return
+        output_json = getattr(self.args, 'output_json', None)
+        output_csv = getattr(self.args, 'output_csv', None)
+        baseline = getattr(self.args, 'baseline', None)
+        if not (output_json or output_csv or baseline):
+            return
+        fingerprint = benchmark_regression.environment_fingerprint()
+        if output_json:
+            benchmark_regression.write_json(output_json, self.results, fingerprint)
+        if output_csv:
+            benchmark_regression.write_csv(output_csv, self.results)
+        if baseline:
+            baseline_data = benchmark_regression.load_json(baseline)
+            comparisons = benchmark_regression.compare(
+                baseline_data['results'], self.results, self.args.regression_threshold)
+            self.regressions = benchmark_regression.print_summary(
+                comparisons, baseline_data['environment'], fingerprint)
@@ -0,0 +1,180 @@
+"""Regression tracking for the operator microbenchmarks.
+
+This module stores the results of a benchmark run together with a fingerprint
+of the environment it ran in, and compares them against a baseline produced by
+an earlier run.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import csv
+import json
+import math
+import os
+import platform
+import socket
+import time
+
+import torch
+
+# Two-sided 95% critical values of Student's t distribution indexed by the
+# degrees of freedom. Larger degrees of freedom use the normal approximation.
+_T_CRITICAL_95 = [
+    float('inf'), 12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306,
+    2.262, 2.228, 2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101,
+    2.093, 2.086, 2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048,
+    2.045, 2.042,
+]
+
+
+def environment_fingerprint():
+    """Describe the machine and build the benchmarks ran on. Results from
+    different fingerprints are not directly comparable."""
+    return {
+        'torch_version': torch.__version__,
+        'git_version': getattr(torch.version, 'git_version', None),
+        'debug_build': torch.version.debug,
+        'python_version': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'hostname': socket.gethostname(),
+        'cpu_count': os.cpu_count(),
+        'num_threads': torch.get_num_threads(),
+        'mkl_available': torch.backends.mkl.is_available(),
+        'mkldnn_available': torch.backends.mkldnn.is_available(),
+        'omp_num_threads': os.environ.get('OMP_NUM_THREADS'),
+        'mkl_num_threads': os.environ.get('MKL_NUM_THREADS'),
+        'cuda_available': torch.cuda.is_available(),
+        'timestamp': time.time(),
+    }
+
+
+def summarize(run_times_us):
+    """Mean, sample standard deviation and 95% confidence interval half width."""
+    n = len(run_times_us)
+    mean = sum(run_times_us) / n
+    if n < 2:
+        return mean, 0.0, float('inf')
+    std = math.sqrt(sum((t - mean) ** 2 for t in run_times_us) / (n - 1))
+    return mean, std, _t_critical(n - 1) * std / math.sqrt(n)
+
+
+def _t_critical(df):
+    df = int(math.floor(df))
+    if df < len(_T_CRITICAL_95):
+        return _T_CRITICAL_95[max(df, 1)]
+    return 1.96
+
+
+def result_key(result):
+    return '{}|{}|{}|{}'.format(result['framework'], result['mode'],
+                                result['direction'], result['test_name'])
+
+
+def make_result(test_case, mode, run_times_us):
+    mean, std, ci = summarize(run_times_us)
+    return {
+        'framework': test_case.framework,
+        'mode': mode,
+        'direction': 'Backward' if test_case.test_config.run_backward else 'Forward',
+        'test_name': test_case.test_config.test_name,
+        'input_config': test_case.test_config.input_config,
+        'tag': test_case.test_config.tag,
+        'run_times_us': list(run_times_us),
+        'mean_us': mean,
+        'std_us': std,
+        'ci95_us': ci,
+    }
+
+
+def write_json(path, results, fingerprint):
+    with open(path, 'w') as f:
+        json.dump({'environment': fingerprint, 'results': results}, f, indent=2, sort_keys=True)
+
+
+def write_csv(path, results):
+    fields = ['framework', 'mode', 'direction', 'test_name', 'input_config', 'tag',
+              'mean_us', 'std_us', 'ci95_us', 'run_times_us']
+    with open(path, 'w') as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for result in results:
+            row = dict((k, result[k]) for k in fields)
+            row['run_times_us'] = ' '.join('{:.3f}'.format(t) for t in result['run_times_us'])
+            writer.writerow(row)
+
+
+def load_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(baseline_results, results, threshold):
+    """Compare results against a baseline with Welch's t-test.
+
+    A test is reported as a regression when the lower bound of the 95%
+    confidence interval of its slowdown relative to the baseline mean is larger
+    than threshold (e.g. 0.05 for 5%). With a single run on either side no
+    interval can be estimated, and the observed slowdown is used instead.
+
+    Returns a list of comparison dicts sorted from the worst slowdown.
+    """
+    baseline = dict((result_key(r), r) for r in baseline_results)
+    comparisons = []
+    for result in results:
+        base = baseline.get(result_key(result))
+        if base is None:
+            continue
+        cur_times, base_times = result['run_times_us'], base['run_times_us']
+        cur_mean, cur_std, _ = summarize(cur_times)
+        base_mean, base_std, _ = summarize(base_times)
+        diff = cur_mean - base_mean
+        if len(cur_times) > 1 and len(base_times) > 1:
+            cur_var = cur_std ** 2 / len(cur_times)
+            base_var = base_std ** 2 / len(base_times)
+            se = math.sqrt(cur_var + base_var)
+            if se > 0:
+                # Welch-Satterthwaite degrees of freedom
+                df = (cur_var + base_var) ** 2 / (
+                    cur_var ** 2 / (len(cur_times) - 1) + base_var ** 2 / (len(base_times) - 1))
+                margin = _t_critical(df) * se
+            else:
+                margin = 0.0
+        else:
+            margin = 0.0
+        slowdown = diff / base_mean
+        slowdown_lower = (diff - margin) / base_mean
+        comparisons.append({
+            'key': result_key(result),
+            'baseline_mean_us': base_mean,
+            'mean_us': cur_mean,
+            'slowdown': slowdown,
+            'slowdown_ci95': (slowdown_lower, (diff + margin) / base_mean),
+            'regression': slowdown_lower > threshold,
+        })
+    comparisons.sort(key=lambda c: c['slowdown'], reverse=True)
+    return comparisons
+
+
+def print_summary(comparisons, baseline_fingerprint, fingerprint, topk=10):
+    DASH_LINE = '-' * 40
+    print("# {}\n"
+          "# Comparison against baseline\n"
+          "# {}".format(DASH_LINE, DASH_LINE))
+    for field in ['torch_version', 'git_version', 'hostname', 'processor', 'num_threads']:
+        if baseline_fingerprint.get(field) != fingerprint.get(field):
+            print("# Warning: {} differs from the baseline ({} vs {})".format(
+                field, baseline_fingerprint.get(field), fingerprint.get(field)))
+    regressions = [c for c in comparisons if c['regression']]
+    print("# Compared {} tests, {} significant regressions".format(
+        len(comparisons), len(regressions)))
+    print("# Worst offenders:")
+    for c in comparisons[:topk]:
+        print("{}{} : {:.3f} us -> {:.3f} us ({:+.2f}%, 95% CI [{:+.2f}%, {:+.2f}%])".format(
+            '* ' if c['regression'] else '  ',
+            c['key'], c['baseline_mean_us'], c['mean_us'], 100 * c['slowdown'],
+            100 * c['slowdown_ci95'][0], 100 * c['slowdown_ci95'][1]))
+    return regressions
@@ -4,6 +4,7 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import argparse
+import sys
 
 import torch
 
@@ -132,6 +133,31 @@ def main():
         help='Run tests on the provided architecture (cpu, cuda)',
         default='None')
 
+    parser.add_argument(
+        '--output_json',
+        help='Write the results of all tests and the environment fingerprint to this JSON file. '
+             'The file can be used as a --baseline in later runs',
+        default=None)
+
+    parser.add_argument(
+        '--output_csv',
+        help='Write the results of all tests to this CSV file',
+        default=None)
+
+    parser.add_argument(
+        '--baseline',
+        help='Compare the results against a JSON file written with --output_json and exit '
+             'with a non-zero status if a significant regression is found. Use --num_runs '
+             'to get enough repeats for confidence intervals',
+        default=None)
+
+    parser.add_argument(
+        '--regression_threshold',
+        help='Minimum relative slowdown (e.g. 0.05 for 5%%) that the lower bound of the '
+             '95%% confidence interval must exceed to be reported as a regression',
+        type=float,
+        default=0.05)
+
     args, _ = parser.parse_known_args()
 
     if args.omp_num_threads:
@@ -150,7 +176,10 @@ def main():
     if args.mkl_num_threads:
         benchmark_utils.set_mkl_threads(args.mkl_num_threads)
 
-    benchmark_core.BenchmarkRunner(args).run()
+    runner = benchmark_core.BenchmarkRunner(args)
+    runner.run()
+    if runner.regressions:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,119 @@
+"""Compare the memory taken by the optimizer state, the peak memory of a step
+and the step time of the memory-light optimizers against Adam.
+
+The parameters mimic an embedding table and a few dense layers, e.g.
+
+    python optimizer_bench.py --num_embeddings 1000000 --embedding_dim 64
+
+The peak step memory is the memory in use at the peak of the first step on
+top of the parameters and their gradients, i.e. the state allocated by the
+step and its temporaries. On CUDA, it is read from the caching allocator. On
+CPU, it is the growth of the maximum resident set size of the process, so
+each optimizer runs in its own process and small allocations are missed.
+"""
+import argparse
+import multiprocessing
+import resource
+import timeit
+
+import torch
+
+
+OPTIMIZERS = {
+    'Adam': lambda params: torch.optim.Adam(params, lr=1e-3),
+    'Adafactor': lambda params: torch.optim.Adafactor(params),
+    'Adafactor (beta1=0.9)': lambda params: torch.optim.Adafactor(params, beta1=0.9),
+    'Adam8bit': lambda params: torch.optim.Adam8bit(params, lr=1e-3),
+}
+
+
+def make_params(args):
+    shapes = [(args.num_embeddings, args.embedding_dim)]
+    shapes += [(args.hidden_size, args.hidden_size), (args.hidden_size,)] * args.num_layers
+    params = []
+    for shape in shapes:
+        p = torch.randn(shape, device=args.device, requires_grad=True)
+        p.grad = torch.randn(shape, device=args.device)
+        params.append(p)
+    return params
+
+
+def max_rss_bytes():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def first_step_peak_bytes(optimizer, device):
+    if device.type == 'cuda':
+        torch.cuda.synchronize(device)
+        torch.cuda.reset_peak_memory_stats(device)
+        before = torch.cuda.memory_allocated(device)
+        optimizer.step()
+        torch.cuda.synchronize(device)
+        return torch.cuda.max_memory_allocated(device) - before
+    before = max_rss_bytes()
+    optimizer.step()
+    return max_rss_bytes() - before
+
+
+def state_bytes(optimizer):
+    total = 0
+    for state in optimizer.state.values():
+        for value in state.values():
+            if torch.is_tensor(value):
+                total += value.numel() * value.element_size()
+    return total
+
+
+def run_benchmark(name, args):
+    if args.num_threads is not None:
+        torch.set_num_threads(args.num_threads)
+    params = make_params(args)
+    optimizer = OPTIMIZERS[name](params)
+    # The state is allocated on the first step
+    peak_bytes = first_step_peak_bytes(optimizer, args.device)
+    param_bytes = sum(p.numel() * p.element_size() for p in params)
+
+    def step():
+        optimizer.step()
+        if args.device.type == 'cuda':
+            torch.cuda.synchronize(args.device)
+    times = timeit.repeat(step, repeat=args.repeat, number=1)
+    times.sort()
+    return {
+        'name': name,
+        'state_mb': state_bytes(optimizer) / 2 ** 20,
+        'state_ratio': state_bytes(optimizer) / param_bytes,
+        'peak_mb': peak_bytes / 2 ** 20,
+        'step_ms': 1e3 * times[len(times) // 2],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--num_embeddings', type=int, default=100000)
+    parser.add_argument('--embedding_dim', type=int, default=64)
+    parser.add_argument('--hidden_size', type=int, default=1024)
+    parser.add_argument('--num_layers', type=int, default=2)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--num_threads', type=int, default=None)
+    parser.add_argument('--device', type=torch.device, default=torch.device('cpu'))
+    parser.add_argument('--optimizers', nargs='+', default=list(OPTIMIZERS.keys()),
+                        choices=list(OPTIMIZERS.keys()))
+    args = parser.parse_args()
+
+    print('{:<24}{:>16}{:>20}{:>20}{:>16}'.format(
+        'optimizer', 'state (MB)', 'state / params', 'peak step (MB)', 'step (ms)'))
+    # A fresh process per optimizer, so that the peak memory of one doesn't
+    # hide that of the next
+    context = multiprocessing.get_context('spawn')
+    for name in args.optimizers:
+        with context.Pool(1) as pool:
+            result = pool.apply(run_benchmark, (name, args))
+        print('{:<24}{:>16.2f}{:>20.3f}{:>20.2f}{:>16.3f}'.format(
+            result['name'], result['state_mb'], result['state_ratio'], result['peak_mb'],
+            result['step_ms']))
+
+
+if __name__ == '__main__':
+    main()
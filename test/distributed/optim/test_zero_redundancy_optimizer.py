@@ -0,0 +1,163 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import copy
+import os
+import sys
+
+import torch
+import torch.distributed as dist
+from torch import nn, optim
+
+from torch.testing._internal.common_distributed import MultiProcessTestCase, requires_gloo
+from torch.testing._internal.common_utils import load_tests, run_tests
+
+# load_tests from common_utils is used to automatically filter tests for
+# sharding on sandcastle. This line silences flake warnings
+load_tests = load_tests
+
+if not dist.is_available():
+    print('c10d not available, skipping tests')
+    sys.exit(0)
+
+from torch.distributed.optim import ZeroRedundancyOptimizer
+
+
+class TestZeroRedundancyOptimizer(MultiProcessTestCase):
+    def setUp(self):
+        super(TestZeroRedundancyOptimizer, self).setUp()
+        self._fork_processes()
+
+    def tearDown(self):
+        try:
+            os.remove(self.file_name)
+        except OSError:
+            pass
+
+    @property
+    def world_size(self):
+        return 2
+
+    def _process_group(self):
+        store = dist.FileStore(self.file_name, self.world_size)
+        return dist.ProcessGroupGloo(store, self.rank, self.world_size)
+
+    def _model(self):
+        # Identical in all the processes
+        torch.manual_seed(1337)
+        return nn.Sequential(nn.Linear(8, 16), nn.ReLU(), nn.Linear(16, 8), nn.ReLU(), nn.Linear(8, 2))
+
+    def _step(self, model, optimizer, iteration):
+        # The gradients are the same in all the processes, as after DDP
+        torch.manual_seed(iteration)
+        optimizer.zero_grad()
+        model(torch.randn(4, 8)).sum().backward()
+        optimizer.step()
+
+    def _check_step(self, broadcast_buffer_size):
+        process_group = self._process_group()
+        model = self._model()
+        sharded_model = copy.deepcopy(model)
+        optimizer = optim.Adam(model.parameters(), lr=0.1)
+        sharded_optimizer = ZeroRedundancyOptimizer(
+            sharded_model.parameters(), optim.Adam, process_group=process_group,
+            broadcast_buffer_size=broadcast_buffer_size, lr=0.1)
+        for iteration in range(3):
+            self._step(model, optimizer, iteration)
+            self._step(sharded_model, sharded_optimizer, iteration)
+            for p, sharded_p in zip(model.parameters(), sharded_model.parameters()):
+                self.assertEqual(p, sharded_p)
+
+    @requires_gloo()
+    def test_step(self):
+        self._check_step(broadcast_buffer_size=2 ** 23)
+
+    @requires_gloo()
+    def test_step_without_buckets(self):
+        self._check_step(broadcast_buffer_size=0)
+
+    @requires_gloo()
+    def test_sharded_state(self):
+        process_group = self._process_group()
+        params = [nn.Parameter(torch.randn(10, 10)) for _ in range(4)]
+        optimizer = ZeroRedundancyOptimizer(params, optim.Adam, process_group=process_group, lr=0.1)
+        for p in params:
+            p.grad = torch.ones_like(p)
+        optimizer.step()
+        # exp_avg and exp_avg_sq of half of the parameters
+        state_numel = sum(t.numel() for state in optimizer.state.values()
+                          for t in state.values() if torch.is_tensor(t))
+        self.assertEqual(state_numel, 2 * 2 * 100)
+
+    @requires_gloo()
+    def test_param_groups(self):
+        process_group = self._process_group()
+        model = self._model()
+        sharded_model = copy.deepcopy(model)
+        optimizer = optim.SGD([{'params': model[0].parameters()},
+                               {'params': model[2].parameters(), 'lr': 0.01}], lr=0.1, momentum=0.9)
+        sharded_optimizer = ZeroRedundancyOptimizer(
+            [{'params': sharded_model[0].parameters()},
+             {'params': sharded_model[2].parameters(), 'lr': 0.01}],
+            optim.SGD, process_group=process_group, lr=0.1, momentum=0.9)
+        optimizer.add_param_group({'params': model[4].parameters()})
+        sharded_optimizer.add_param_group({'params': sharded_model[4].parameters()})
+        self.assertEqual([g['lr'] for g in sharded_optimizer.param_groups], [0.1, 0.01, 0.1])
+        for iteration in range(3):
+            for opt in (optimizer, sharded_optimizer):
+                opt.param_groups[0]['lr'] *= 0.5
+            self._step(model, optimizer, iteration)
+            self._step(sharded_model, sharded_optimizer, iteration)
+            for p, sharded_p in zip(model.parameters(), sharded_model.parameters()):
+                self.assertEqual(p, sharded_p)
+
+    @requires_gloo()
+    def test_state_dict(self):
+        process_group = self._process_group()
+        model = self._model()
+        reference_model = copy.deepcopy(model)
+        reference_optimizer = optim.Adam(reference_model.parameters(), lr=0.1)
+        sharded_optimizer = ZeroRedundancyOptimizer(
+            model.parameters(), optim.Adam, process_group=process_group, lr=0.1)
+        self._step(reference_model, reference_optimizer, 0)
+        self._step(model, sharded_optimizer, 0)
+        with self.assertRaisesRegex(RuntimeError, "consolidate_state_dict"):
+            sharded_optimizer.state_dict()
+
+        sharded_optimizer.consolidate_state_dict(to=0)
+        if self.rank != 0:
+            with self.assertRaisesRegex(RuntimeError, "consolidate_state_dict"):
+                sharded_optimizer.state_dict()
+            return
+
+        # The consolidated state is the state of a non-sharded optimizer
+        optimizer = optim.Adam(copy.deepcopy(model).parameters(), lr=0.1)
+        optimizer.load_state_dict(sharded_optimizer.state_dict())
+        for p, reference_p in zip(optimizer.param_groups[0]['params'], reference_model.parameters()):
+            state, reference_state = optimizer.state[p], reference_optimizer.state[reference_p]
+            self.assertEqual(state['step'], reference_state['step'])
+            self.assertEqual(state['exp_avg'], reference_state['exp_avg'])
+            self.assertEqual(state['exp_avg_sq'], reference_state['exp_avg_sq'])
+
+    @requires_gloo()
+    def test_load_state_dict(self):
+        process_group = self._process_group()
+        model = self._model()
+        optimizer = optim.Adam(model.parameters(), lr=0.1)
+        self._step(model, optimizer, 0)
+        sharded_model = copy.deepcopy(model)
+        sharded_optimizer = ZeroRedundancyOptimizer(
+            sharded_model.parameters(), optim.Adam, process_group=process_group, lr=0.5)
+
+        # Loads the state of a non-sharded optimizer, options included
+        sharded_optimizer.load_state_dict(optimizer.state_dict())
+        self.assertEqual(sharded_optimizer.param_groups[0]['lr'], 0.1)
+        self.assertEqual(len(sharded_optimizer.state), len(sharded_optimizer.optim.param_groups[0]['params']))
+        for iteration in range(1, 3):
+            self._step(model, optimizer, iteration)
+            self._step(sharded_model, sharded_optimizer, iteration)
+            for p, sharded_p in zip(model.parameters(), sharded_model.parameters()):
+                self.assertEqual(p, sharded_p)
+
+
+if __name__ == '__main__':
+    run_tests()
@@ -2933,6 +2933,202 @@ class DistributedDataParallelTest(MultiProcessTestCase):
         ddp_parameter = next(ddp_model.parameters())
         self.assertEqual(vanilla_parameter.grad, ddp_parameter.grad)
 
+    @requires_gloo()
+    def test_static_graph(self):
+        store = c10d.FileStore(self.file_name, self.world_size)
+        process_group = c10d.ProcessGroupGloo(store, self.rank, self.world_size)
+
+        class BranchModule(nn.Module):
+            def __init__(self):
+                super(BranchModule, self).__init__()
+                self.fc1 = nn.Linear(2, 10, bias=False)
+                self.fc2 = nn.Linear(10, 4, bias=False)
+                self.fc3 = nn.Linear(10, 4, bias=False)
+                self.use_fc3 = False
+
+            def forward(self, x):
+                x = F.relu(self.fc1(x))
+                return self.fc3(x) if self.use_fc3 else self.fc2(x)
+
+        # Ensure initialized weights and inputs are identical across processes
+        torch.manual_seed(1337)
+
+        vanilla_model = BranchModule()
+        ddp_model = DistributedDataParallel(
+            copy.deepcopy(vanilla_model),
+            process_group=process_group,
+            find_unused_parameters=True,
+            static_graph=True)
+
+        batch_size = 2 * self.world_size
+        input = torch.randn(batch_size, 2)
+        target = torch.randn(batch_size, 4)
+
+        def step():
+            for model, x, y in [(vanilla_model, input, target),
+                                (ddp_model, input.chunk(self.world_size)[self.rank],
+                                 target.chunk(self.world_size)[self.rank])]:
+                F.mse_loss(model(x), y).backward()
+            for i, j in zip(vanilla_model.parameters(), ddp_model.parameters()):
+                if i.grad is None:
+                    self.assertTrue(j.grad is None or j.grad.eq(0).all())
+                    j.grad = None
+                    continue
+                self.assertEqual(i.grad, j.grad)
+                with torch.no_grad():
+                    i -= i.grad
+                    j -= i.grad
+                i.grad = j.grad = None
+
+        for _ in range(4):
+            step()
+        # fc3 is left out of the reduction
+        self.assertIsNotNone(ddp_model._static_reducer)
+        self.assertEqual(ddp_model._static_reducer.unused, [2])
+        self.assertIsNone(ddp_model.module.fc3.weight.grad)
+        grad_ready_hooks = ddp_model._grad_ready_hooks
+        self.assertEqual(grad_ready_hooks.targets, [ddp_model._static_reducer])
+
+        # The graph changes in the process of rank 1 only
+        ddp_model.module.use_fc3 = self.rank == 1
+        F.mse_loss(ddp_model(input.chunk(self.world_size)[self.rank]),
+                   target.chunk(self.world_size)[self.rank]).backward()
+        self.assertTrue(ddp_model._static_reducer.graph_changed)
+        # the gradient of fc3 is all-reduced anyway
+        self.assertGreater(ddp_model.module.fc3.weight.grad.abs().sum().item(), 0)
+        for param in ddp_model.parameters():
+            param.grad = None
+
+        # The graph is recorded again, with both branches
+        ddp_model.module.use_fc3 = vanilla_model.use_fc3 = True
+        for _ in range(4):
+            step()
+        self.assertEqual(ddp_model._static_reducer.unused, [1])
+        # the hooks on the gradient accumulators were registered once, and
+        # are routed to the reducer built for the new graph
+        self.assertIs(ddp_model._grad_ready_hooks, grad_ready_hooks)
+        self.assertEqual(grad_ready_hooks.targets, [ddp_model._static_reducer])
+
+    def _test_ddp_comm_hook(self, state, hook, prec=None, bucket_cap_mb=0.001, model=None):
+        store = c10d.FileStore(self.file_name, self.world_size)
+        process_group = c10d.ProcessGroupGloo(store, self.rank, self.world_size)
+
+        # Ensure initialized weights and inputs are identical across processes
+        torch.manual_seed(1337)
+
+        vanilla_model = Net() if model is None else model
+        ddp_model = DistributedDataParallel(
+            copy.deepcopy(vanilla_model),
+            process_group=process_group,
+            bucket_cap_mb=bucket_cap_mb)
+        ddp_model.register_comm_hook(state(process_group), hook)
+
+        batch_size = 2 * self.world_size
+        input = torch.randn(batch_size, 2)
+        target = torch.randn(batch_size, 4)
+        for _ in range(3):
+            for model, x, y in [(vanilla_model, input, target),
+                                (ddp_model, input.chunk(self.world_size)[self.rank],
+                                 target.chunk(self.world_size)[self.rank])]:
+                F.mse_loss(model(x), y).backward()
+            for i, j in zip(vanilla_model.parameters(), ddp_model.parameters()):
+                self.assertEqual(i.grad, j.grad, prec)
+                with torch.no_grad():
+                    i -= i.grad
+                    j -= i.grad
+                i.grad = j.grad = None
+            input = input.flip(0)
+
+    @requires_gloo()
+    def test_ddp_comm_hook_allreduce_hook(self):
+        from torch.distributed.algorithms.ddp_comm_hooks import allreduce_hook
+        self._test_ddp_comm_hook(lambda process_group: process_group, allreduce_hook)
+
+    @requires_gloo()
+    def test_ddp_comm_hook_fp16_compress_hook(self):
+        from torch.distributed.algorithms.ddp_comm_hooks import fp16_compress_hook
+        self._test_ddp_comm_hook(lambda process_group: process_group, fp16_compress_hook, prec=1e-3)
+
+    @requires_gloo()
+    def test_ddp_comm_hook_topk_hook(self):
+        from torch.distributed.algorithms.ddp_comm_hooks import TopKState, topk_hook
+        # all the elements are communicated
+        self._test_ddp_comm_hook(lambda process_group: TopKState(process_group, compress_ratio=1.0),
+                                 topk_hook)
+
+    @requires_gloo()
+    def test_ddp_comm_hook_custom_hook(self):
+        from torch.distributed.algorithms.ddp_comm_hooks import Future
+
+        buckets = []
+
+        def hook(process_group, bucket):
+            buckets.append(bucket.get_index())
+            tensor = bucket.get_tensor().div_(process_group.size())
+            return Future(tensor, [process_group.allreduce([tensor])]).then(lambda fut: fut.value() * 1)
+
+        # identical initial weights across processes
+        torch.manual_seed(1337)
+        # The first bucket holds up to 1MB of gradients, the others 1KB
+        # (bucket_cap_mb): the parameters of the first layers fill the
+        # first bucket, and the other parameters get a bucket each
+        model = nn.Sequential(nn.Linear(2, 512), nn.ReLU(), nn.Linear(512, 512), nn.ReLU(), nn.Linear(512, 4))
+        self._test_ddp_comm_hook(lambda process_group: process_group, hook, model=model)
+        # the buckets are launched in order in every iteration, the last
+        # layers first
+        self.assertEqual(buckets, [0, 1, 2, 3] * 3)
+
+    def _test_ddp_compression_hook(self, state, hook):
+        store = c10d.FileStore(self.file_name, self.world_size)
+        process_group = c10d.ProcessGroupGloo(store, self.rank, self.world_size)
+
+        torch.manual_seed(1337 + self.rank)
+        model = nn.Sequential(nn.Linear(2, 10), nn.ReLU(), nn.Linear(10, 4))
+        ddp_model = DistributedDataParallel(model, process_group=process_group)
+        state = state(process_group)
+        ddp_model.register_comm_hook(state, hook)
+        for _ in range(3):
+            ddp_model(torch.randn(4, 2)).sum().backward()
+            grads = torch.cat([p.grad.view(-1) for p in ddp_model.parameters()])
+            self.assertTrue(torch.isfinite(grads).all())
+            # all processes get the same gradients
+            all_grads = [torch.empty_like(grads) for _ in range(self.world_size)]
+            process_group.allgather([all_grads], [grads]).wait()
+            for g in all_grads:
+                self.assertEqual(g, grads)
+            ddp_model.zero_grad()
+        return state
+
+    @requires_gloo()
+    def test_ddp_comm_hook_powerSGD_hook(self):
+        from torch.distributed.algorithms.ddp_comm_hooks import PowerSGDState, powerSGD_hook
+        state = self._test_ddp_compression_hook(
+            lambda process_group: PowerSGDState(process_group, start_powerSGD_iter=1),
+            powerSGD_hook)
+        self.assertEqual(state.iter, 3)
+        # the weights are compressed, with error feedback
+        self.assertEqual([e.size() for e in state.error_dict[0]], [torch.Size([10, 2]), torch.Size([4, 10])])
+
+    @requires_gloo()
+    def test_ddp_comm_hook_topk_hook_error_feedback(self):
+        from torch.distributed.algorithms.ddp_comm_hooks import TopKState, topk_hook
+        state = self._test_ddp_compression_hook(
+            lambda process_group: TopKState(process_group, compress_ratio=0.1),
+            topk_hook)
+        residual = state.residual_dict[0]
+        self.assertEqual(residual.numel(), 74)
+        self.assertGreaterEqual(int((residual == 0).sum()), 8)
+
+    @requires_gloo()
+    def test_ddp_comm_hook_register_once(self):
+        from torch.distributed.algorithms.ddp_comm_hooks import allreduce_hook
+        store = c10d.FileStore(self.file_name, self.world_size)
+        process_group = c10d.ProcessGroupGloo(store, self.rank, self.world_size)
+        ddp_model = DistributedDataParallel(Net(), process_group=process_group)
+        ddp_model.register_comm_hook(process_group, allreduce_hook)
+        with self.assertRaisesRegex(RuntimeError, "only be called once"):
+            ddp_model.register_comm_hook(process_group, allreduce_hook)
+
 
 class ReducerModule(nn.Module):
     def __init__(self):
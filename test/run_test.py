@@ -29,6 +29,7 @@ TESTS = [
     'test_cpp_extensions_jit',
     'distributed/test_c10d',
     'distributed/test_c10d_spawn',
+    'distributed/optim/test_zero_redundancy_optimizer',
     'test_cuda',
     'test_cuda_primary_ctx',
     'test_dataloader',
@@ -82,6 +83,7 @@ if PY33:
         'distributed/rpc/jit/test_dist_autograd_spawn',
         'distributed/rpc/test_dist_autograd_spawn',
         'distributed/rpc/test_dist_optimizer_spawn',
+        'distributed/rpc/test_pipe_spawn',
         'distributed/rpc/test_rpc_spawn',
     ])
 
@@ -101,6 +103,7 @@ WINDOWS_BLACKLIST = [
     'distributed/rpc/jit/test_rpc_spawn',
     'distributed/rpc/test_dist_autograd_spawn',
     'distributed/rpc/test_dist_optimizer_spawn',
+    'distributed/rpc/test_pipe_spawn',
     'distributed/rpc/test_rpc_spawn',
     'distributed/test_distributed',
 ]
@@ -112,6 +115,7 @@ ROCM_BLACKLIST = [
     'distributed/rpc/jit/test_rpc_spawn',
     'distributed/rpc/test_dist_autograd_spawn',
     'distributed/rpc/test_dist_optimizer_spawn',
+    'distributed/rpc/test_pipe_spawn',
     'distributed/rpc/test_rpc_spawn',
     'test_cpp_extensions_aot_ninja',
     'test_cpp_extensions_jit',
@@ -2730,6 +2730,38 @@ class TestAutograd(TestCase):
         print(prof.table())
         print(prof.key_averages(group_by_input_shape=True).table())
 
+    def test_profiler_flops(self):
+        layer = torch.nn.Linear(20, 30)
+        input = torch.randn(128, 20)
+        with profile(record_shapes=True) as prof:
+            torch.relu(layer(input))
+
+        addmm = [evt for evt in prof.function_events if evt.name == 'addmm'][0]
+        self.assertEqual(addmm.flops, 2 * 128 * 20 * 30 + 128 * 30)
+        self.assertEqual(addmm.bytes_moved, 4 * (30 + 128 * 20 + 20 * 30 + 128 * 30))
+        relu = [evt for evt in prof.function_events if evt.name == 'relu'][0]
+        self.assertEqual(relu.flops, 128 * 30)
+
+        averages = {evt.key: evt for evt in prof.key_averages()}
+        self.assertEqual(averages['addmm'].flops, addmm.flops)
+        self.assertGreater(averages['addmm'].gflops_per_second, 0)
+        self.assertIn('GFLOP/s', prof.key_averages().table(sort_by='flops'))
+
+        # no shapes, no estimates
+        with profile() as prof:
+            layer(input)
+        self.assertTrue(all(evt.flops == 0 for evt in prof.function_events))
+        self.assertNotIn('GFLOP/s', prof.table())
+
+    def test_profiler_register_op_cost(self):
+        from torch.autograd.profiler import register_op_cost, numel, _op_cost_formulas
+        register_op_cost('custom_op_cost_range', lambda shapes: (7, numel(shapes[0])))
+        try:
+            self.assertEqual(torch.autograd.profiler.estimate_op_cost('custom_op_cost_range', [[2, 3]]),
+                             (7, 24))
+        finally:
+            del _op_cost_formulas['custom_op_cost_range']
+
     def test_profiler_no_cuda(self):
         print("")
         layer = torch.nn.Linear(20, 30)
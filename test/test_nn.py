@@ -13,6 +13,7 @@ except ImportError:
 import itertools
 import warnings
 import pickle
+import threading
 import contextlib
 from copy import deepcopy
 from itertools import repeat, product
@@ -569,6 +570,214 @@ class TestNN(NNTestCase):
         expected_grad = -torch.ones(5, 5).mm(module.weight.data) * 2 * mask
         self.assertEqual(input.grad, expected_grad)
 
+    def test_hooks_after_fast_path(self):
+        module = nn.Linear(5, 5)
+        input = torch.randn(2, 5)
+        output = module(input)
+        handle = module.register_forward_hook(lambda m, input, output: output * 2)
+        self.assertEqual(module(input), output * 2)
+        handle.remove()
+        self.assertEqual(module(input), output)
+
+    def test_global_hooks(self):
+        from torch.nn.modules.module import (register_module_forward_pre_hook, register_module_forward_hook,
+                                             register_module_backward_hook)
+        model = nn.Sequential(nn.Linear(5, 5), nn.ReLU(), nn.Linear(5, 2))
+        input = torch.randn(3, 5, requires_grad=True)
+        expected = model(input)
+
+        pre_calls, calls, backward_calls = [], [], []
+        handles = [
+            register_module_forward_pre_hook(lambda m, input: pre_calls.append(m)),
+            register_module_forward_hook(lambda m, input, output: calls.append(m), nn.Linear),
+            register_module_forward_hook(lambda m, input, output: output * 2, nn.ReLU),
+            register_module_backward_hook(lambda m, grad_input, grad_output: backward_calls.append(m),
+                                          (nn.ReLU, nn.Tanh)),
+        ]
+        # the hooks are process-wide, don't leave them behind if the test fails
+        for handle in handles:
+            self.addCleanup(handle.remove)
+        # global hooks run before the hooks of the module
+        model[2].register_forward_hook(lambda m, input, output: calls.append(None))
+        output = model(input)
+        self.assertEqual(output, 2 * expected - model[2].bias)
+        self.assertEqual(pre_calls, [model, model[0], model[1], model[2]])
+        self.assertEqual(calls, [model[0], model[2], None])
+        output.sum().backward()
+        self.assertEqual(backward_calls, [model[1]])
+
+        # removed hooks are not run anymore
+        handles[2].remove()
+        del calls[:]
+        self.assertEqual(model(input), expected)
+        self.assertEqual(calls, [model[0], model[2], None])
+        for handle in handles:
+            handle.remove()
+        del calls[:], pre_calls[:]
+        model(input)
+        self.assertEqual(pre_calls, [])
+        self.assertEqual(calls, [None])
+
+    def test_freeze_call_plan(self):
+        class Block(nn.Module):
+            def __init__(self):
+                super(Block, self).__init__()
+                self.fc = nn.Linear(4, 4)
+                self.register_buffer('scale', torch.tensor(2.))
+
+            def forward(self, input):
+                return self.fc(input) * self.scale
+
+        calls = []
+
+        class Counted(nn.Sequential):
+            def __call__(self, *args):
+                calls.append(self)
+                return super(Counted, self).__call__(*args)
+
+        inner = Counted(nn.Linear(4, 4), nn.Tanh())
+        model = nn.Sequential(Block(), nn.ReLU(), inner)
+        input = torch.randn(3, 4)
+        expected = model(input)
+        self.assertEqual(len(calls), 1)
+
+        self.assertIs(nn.utils.freeze_call_plan(model), model)
+        self.assertIs(model[0].__dict__['fc'], model[0].fc)
+        self.assertEqual(model(input), expected)
+        # the nested Sequential overrides __call__, so it is still called
+        self.assertEqual(len(calls), 2)
+        self.assertNotIn('forward', inner.__dict__)
+        plain = nn.Sequential(nn.Linear(4, 4), nn.Sequential(nn.Tanh(), nn.ReLU()))
+        nn.utils.freeze_call_plan(plain)
+        # a plain nested Sequential is flattened into the plan of the root
+        self.assertEqual(len(plain.__dict__['forward'].forwards), 3)
+
+        # the forwards held by the plans can't be replaced
+        with self.assertRaisesRegex(RuntimeError, "frozen"):
+            model[0].forward = lambda input: input
+        with self.assertRaisesRegex(RuntimeError, "frozen"):
+            del model.forward
+
+        # parameters and buffers stay in sync
+        model[0].scale = torch.tensor(3.)
+        model[0].fc.bias = nn.Parameter(model[0].fc.bias + 1)
+        self.assertIs(model[0].__dict__['scale'], model[0]._buffers['scale'])
+        self.assertIs(model[0].fc.__dict__['bias'], model[0].fc._parameters['bias'])
+        model.double()
+        self.assertIs(model[0].__dict__['scale'], model[0]._buffers['scale'])
+        self.assertEqual(model(input.double()).dtype, torch.float64)
+        model.float()
+
+        with self.assertRaisesRegex(RuntimeError, "frozen"):
+            model[1].register_forward_hook(lambda *args: None)
+        with self.assertRaisesRegex(RuntimeError, "frozen"):
+            model[1] = nn.Tanh()
+
+        self.assertIs(nn.utils.unfreeze_call_plan(model), model)
+        self.assertNotIn('fc', model[0].__dict__)
+        self.assertNotIn('forward', model.__dict__)
+        model(input)
+        self.assertEqual(len(calls), 3)
+        model[1].register_forward_hook(lambda *args: None)
+        with self.assertRaisesRegex(ValueError, "hooks"):
+            nn.utils.freeze_call_plan(model)
+
+    def _deferred_model(self):
+        return nn.Sequential(nn.Embedding(10, 4), nn.Linear(4, 3), nn.PReLU(3), nn.BatchNorm1d(3))
+
+    def test_deferred_init(self):
+        source = self._deferred_model()
+        class Factories(nn.Module):
+            def __init__(self):
+                super(Factories, self).__init__()
+                self.tensor = torch.Tensor(1000, 1000)
+                self.empty = torch.empty(1000, 1000)
+                self.register_buffer('buffer', torch.empty(3, 2))
+
+            def reset_parameters(self):
+                pass
+
+        empty = torch.empty
+        with nn.utils.deferred_init():
+            model = self._deferred_model()
+            self.assertTrue(nn.Linear(5, 5).weight.storage().size() == 1)
+            # the constructors don't allocate the tensors they create
+            factories = Factories()
+            self.assertEqual(factories.tensor.shape, (1000, 1000))
+            self.assertEqual(factories.tensor.storage().size(), 1)
+            self.assertEqual(factories.empty.storage().size(), 1)
+            self.assertEqual(factories.buffer.storage().size(), 6)
+            self.assertFalse(nn.utils.is_deferred(factories.buffer))
+            # but other code does
+            self.assertEqual(torch.Tensor(3, 2).storage().size(), 6)
+            self.assertEqual(torch.empty(3, 2).storage().size(), 6)
+            # nor do the modules constructed by other threads
+            modules = []
+            thread = threading.Thread(target=lambda: modules.extend([nn.Linear(5, 5), Factories()]))
+            thread.start()
+            thread.join()
+            self.assertFalse(nn.utils.is_deferred(modules[0].weight))
+            self.assertNotEqual(modules[0].weight.std(), 0)
+            self.assertEqual(modules[1].tensor.storage().size(), 10 ** 6)
+        self.assertIs(nn.Linear.reset_parameters, nn.Linear.__dict__['reset_parameters'])
+        self.assertIs(torch.empty, empty)
+        self.assertNotIn('__new__', torch.Tensor.__dict__)
+        self.assertFalse(nn.utils.is_deferred(nn.Linear(5, 5).weight))
+        self.assertEqual(Factories().tensor.storage().size(), 10 ** 6)
+
+        for name in ['0.weight', '1.weight', '1.bias', '3.weight', '3.bias']:
+            param = model.state_dict(keep_vars=True)[name]
+            self.assertTrue(nn.utils.is_deferred(param))
+            self.assertIsInstance(param, nn.Parameter)
+            self.assertEqual(param.shape, source.state_dict()[name].shape)
+            self.assertEqual(param.storage().size(), 1)
+        # PReLU has no reset_parameters, so its weight is kept
+        self.assertFalse(nn.utils.is_deferred(model[2].weight))
+
+        model.double()
+        self.assertEqual(model[0].weight.dtype, torch.float64)
+        self.assertTrue(nn.utils.is_deferred(model[0].weight))
+        model.float()
+
+        weight = model[1].weight
+        model.load_state_dict(source.state_dict())
+        self.assertIs(model[1].weight, weight)
+        for name, param in model.named_parameters():
+            self.assertFalse(nn.utils.is_deferred(param))
+            self.assertEqual(param, source.state_dict()[name])
+
+    def test_deferred_init_materialize(self):
+        source = self._deferred_model()
+        with nn.utils.deferred_init():
+            model = self._deferred_model()
+        state_dict = {k: v for k, v in source.state_dict().items() if not k.startswith('1.')}
+        nn.utils.materialize_(model, state_dict)
+        self.assertEqual(model[0].weight, source[0].weight)
+        self.assertEqual(model[3].bias, source[3].bias)
+        # initialized by reset_parameters
+        self.assertFalse(nn.utils.is_deferred(model[1].weight))
+        self.assertTrue(model[1].weight.abs().max() <= 0.5)
+        self.assertNotEqual(model[1].weight.std(), 0)
+
+        for shard in ({'0.weight'}, lambda name: name.startswith('0.')):
+            shards = []
+            for rank in range(3):
+                with nn.utils.deferred_init():
+                    model = self._deferred_model()
+                nn.utils.materialize_(model, source.state_dict(), rank=rank, world_size=3, shard=shard)
+                shards.append(model[0].weight)
+                # the other parameters are not sharded
+                self.assertEqual(model[1].weight, source[1].weight)
+                self.assertEqual(model[3].weight, source[3].weight)
+            self.assertEqual([s.size(0) for s in shards], [4, 4, 2])
+            self.assertEqual(torch.cat(shards), source[0].weight)
+        with self.assertRaisesRegex(ValueError, "together"):
+            nn.utils.materialize_(model, rank=0, world_size=3)
+        with nn.utils.deferred_init():
+            model = self._deferred_model()
+        with self.assertRaisesRegex(ValueError, "2.weight"):
+            nn.utils.materialize_(model, rank=0, world_size=3, shard={'0.weight', '2.weight'})
+
 
 
     def test_to(self):
@@ -617,6 +826,13 @@ class TestNN(NNTestCase):
         self.assertEqual(module.weight.grad.data, module.weight.data.clone().zero_())
         self.assertEqual(module.bias.grad.data, module.bias.data.clone().zero_())
 
+        module.zero_grad(set_to_none=True)
+        self.assertIsNone(module.weight.grad)
+        self.assertIsNone(module.bias.grad)
+        module(i).sum().backward()
+        self.assertEqual(module.weight.grad, i.detach().sum(0).expand(5, 5))
+        self.assertEqual(module.bias.grad, torch.full((5,), 2.))
+
     def test_no_grad(self):
         for dtype in [torch.bfloat16, torch.float, torch.double]:
             module = nn.Conv2d(2, 5, kernel_size=3, padding=1).to(dtype)
@@ -3556,6 +3772,72 @@ class TestNN(NNTestCase):
         for k, v, in old_state_dict.items():
             self.assertTrue(v.equal(new_state_dict[k]))
 
+    def test_load_state_dict_assign(self):
+        source = nn.Sequential(nn.Linear(4, 3), nn.BatchNorm1d(3))
+        model = nn.Sequential(nn.Linear(4, 3), nn.BatchNorm1d(3))
+        model[0].bias.requires_grad_(False)
+        state_dict = source.state_dict()
+        state_dict['0.weight'] = state_dict['0.weight'].double()
+        model.load_state_dict(state_dict, assign=True)
+        for name, tensor in model.state_dict(keep_vars=True).items():
+            # no copy
+            self.assertEqual(tensor.data_ptr(), state_dict[name].data_ptr())
+        self.assertIsInstance(model[0].weight, nn.Parameter)
+        self.assertEqual(model[0].weight.dtype, torch.float64)
+        self.assertTrue(model[0].weight.requires_grad)
+        self.assertFalse(model[0].bias.requires_grad)
+        self.assertIsInstance(model[1].running_mean, torch.Tensor)
+        self.assertNotIsInstance(model[1].running_mean, nn.Parameter)
+        self.assertEqual(list(model.parameters())[0], source[0].weight.double())
+
+        # parameters are used as they are
+        weight = nn.Parameter(torch.randn(3, 4))
+        model.load_state_dict({'0.weight': weight}, strict=False, assign=True)
+        self.assertIs(model[0].weight, weight)
+        with self.assertRaisesRegex(RuntimeError, "size mismatch"):
+            model.load_state_dict({'0.weight': torch.randn(4, 4)}, strict=False, assign=True)
+
+    def test_pipe(self):
+        torch.manual_seed(0)
+        model = nn.Sequential(nn.Linear(4, 8), nn.ReLU(), nn.Linear(8, 8), nn.Tanh(), nn.Linear(8, 2))
+        input = torch.randn(6, 4)
+        output = model(input)
+        output.sum().backward()
+        for checkpoint in ['always', 'except_last', 'never']:
+            pipe = nn.parallel.Pipe(deepcopy(model), devices=['cpu', 'cpu', 'cpu'], chunks=4,
+                                    checkpoint=checkpoint, measure=True)
+            pipe.zero_grad()
+            self.assertEqual(len(pipe.partitions), 3)
+            self.assertEqual(sum(pipe.balance), len(model))
+            pipe_input = input.clone().requires_grad_()
+            pipe_output = pipe(pipe_input)
+            self.assertEqual(pipe_output, output)
+            pipe_output.sum().backward()
+            self.assertTrue(pipe_input.grad is not None)
+            for p, pipe_p in zip(model.parameters(), pipe.parameters()):
+                self.assertEqual(p.grad, pipe_p.grad)
+
+            # chunk(4) splits the 6 samples into 3 micro-batches of 2
+            stats = pipe.bubble_stats
+            self.assertEqual(len(stats['busy']), 3)
+            self.assertEqual(stats['ideal_bubble_overhead'], 2. / 5)
+            self.assertTrue(0 <= stats['bubble_overhead'] <= 1)
+
+        pipe = nn.parallel.Pipe(deepcopy(model), devices=['cpu', 'cpu'], balance=[1, 4])
+        self.assertEqual([len(p) for p in pipe.partitions], [1, 4])
+        self.assertIsNone(pipe.bubble_stats)
+        with torch.no_grad():
+            self.assertEqual(pipe(input), output)
+
+        with self.assertRaisesRegex(ValueError, "balance"):
+            nn.parallel.Pipe(deepcopy(model), devices=['cpu', 'cpu'], balance=[2, 2])
+        with self.assertRaisesRegex(ValueError, "checkpoint"):
+            nn.parallel.Pipe(deepcopy(model), devices=['cpu'], checkpoint='sometimes')
+        with self.assertRaisesRegex(ValueError, "RPC workers"):
+            nn.parallel.Pipe(deepcopy(model), devices=['cpu', 'worker1/cpu'])
+        with self.assertRaisesRegex(TypeError, "Sequential"):
+            nn.parallel.Pipe(nn.Linear(2, 2), devices=['cpu'])
+
     def test_load_state_dict_BC(self):
         # BatchNormNd
         # Added num_batches_tracked buffer at version 2. For state dict with
@@ -2,6 +2,7 @@ import warnings
 import math
 import unittest
 import functools
+from itertools import product
 from copy import deepcopy
 import torch
 from torch._six import inf
@@ -10,9 +11,10 @@ import torch.nn.functional as F
 from torch.optim import SGD
 from torch.autograd import Variable
 from torch import sparse
+from torch.optim.swa_utils import AveragedModel, update_bn
 from torch.optim.lr_scheduler import LambdaLR, MultiplicativeLR, StepLR, \
     MultiStepLR, ExponentialLR, CosineAnnealingLR, ReduceLROnPlateau, \
-    _LRScheduler, CyclicLR, CosineAnnealingWarmRestarts, OneCycleLR
+    _LRScheduler, CyclicLR, CosineAnnealingWarmRestarts, OneCycleLR, LRScheduleTable
 from torch.testing._internal.common_utils import TestCase, run_tests, TEST_WITH_UBSAN, load_tests, \
     skipIfRocm
 
@@ -351,6 +353,103 @@ class TestOptim(TestCase):
         with self.assertRaisesRegex(ValueError, "Invalid beta parameter at index 0: 1.0"):
             optim.SparseAdam(None, lr=1e-2, betas=(1.0, 0.0))
 
+    def test_adafactor(self):
+        self._test_basic_cases(
+            lambda weight, bias: optim.Adafactor([weight, bias])
+        )
+        self._test_basic_cases(
+            lambda weight, bias: optim.Adafactor([weight, bias], lr=1e-2, relative_step=False,
+                                                 beta1=0.9, weight_decay=1e-3)
+        )
+        self._test_basic_cases(
+            lambda weight, bias: optim.Adafactor(
+                self._build_params_dict(weight, bias, warmup_init=True),
+                scale_parameter=False)
+        )
+        # only the row and column statistics are kept for matrices
+        weight = torch.randn(10, 5, requires_grad=True)
+        optimizer = optim.Adafactor([weight])
+        weight.grad = torch.randn(10, 5)
+        optimizer.step()
+        state = optimizer.state[weight]
+        self.assertEqual(state['exp_avg_sq_row'].size(), torch.Size([10]))
+        self.assertEqual(state['exp_avg_sq_col'].size(), torch.Size([5]))
+        self.assertNotIn('exp_avg_sq', state)
+        self.assertNotIn('exp_avg', state)
+        with self.assertRaisesRegex(ValueError, "lr must be None when relative_step is True"):
+            optim.Adafactor(None, lr=1e-2)
+
+    def test_adam8bit(self):
+        self._test_basic_cases(
+            lambda weight, bias: optim.Adam8bit([weight, bias], lr=1e-3, block_size=16, min_8bit_size=0)
+        )
+        self._test_basic_cases(
+            lambda weight, bias: optim.Adam8bit(
+                self._build_params_dict(weight, bias, lr=1e-2),
+                lr=1e-3, weight_decay=1e-2, block_size=7, min_8bit_size=20)
+        )
+        with self.assertRaisesRegex(ValueError, "Invalid block_size value: 0"):
+            optim.Adam8bit(None, lr=1e-2, block_size=0)
+
+    def test_adam8bit_matches_adam(self):
+        torch.manual_seed(0)
+        weight = torch.randn(100, 50)
+        weight_8bit = weight.clone().requires_grad_()
+        weight = weight.requires_grad_()
+        optimizer = optim.Adam([weight], lr=1e-3)
+        optimizer_8bit = optim.Adam8bit([weight_8bit], lr=1e-3, block_size=256)
+        for _ in range(20):
+            grad = torch.randn(100, 50)
+            weight.grad = grad.clone()
+            weight_8bit.grad = grad.clone()
+            optimizer.step()
+            optimizer_8bit.step()
+        # the quantization error of the moments only slightly perturbs the updates
+        update = (weight - weight_8bit).detach()
+        self.assertLess(update.abs().max().item(), 2e-3)
+
+        state = optimizer.state[weight]
+        state_8bit = optimizer_8bit.state[weight_8bit]
+        self.assertEqual(state_8bit['exp_avg_int8'].dtype, torch.int8)
+        self.assertEqual(state_8bit['exp_avg_sq_uint8'].dtype, torch.uint8)
+
+        def state_bytes(s):
+            return sum(v.numel() * v.element_size() for v in s.values() if torch.is_tensor(v))
+        self.assertLess(state_bytes(state_8bit), state_bytes(state) / 3)
+
+        # the quantized state keeps its type through load_state_dict
+        optimizer_c = optim.Adam8bit([weight_8bit.detach().clone().requires_grad_()], lr=1e-3, block_size=256)
+        optimizer_c.load_state_dict(optimizer_8bit.state_dict())
+        state_c = next(iter(optimizer_c.state.values()))
+        self.assertEqual(state_c['exp_avg_int8'], state_8bit['exp_avg_int8'])
+
+    def test_adam8bit_chunks(self):
+        # the moments of a parameter are updated a chunk of blocks at a time,
+        # with the same result as all the blocks at once
+        from torch.optim import adam8bit
+        torch.manual_seed(0)
+        weights = [torch.randn(100, 50), torch.randn(50, 100).t()]
+        chunk_size = adam8bit._CHUNK_SIZE
+        results = []
+        for chunk in [chunk_size, 512]:
+            adam8bit._CHUNK_SIZE = chunk
+            try:
+                params = [w.clone().requires_grad_() for w in weights]
+                self.assertFalse(params[1].is_contiguous())
+                optimizer = optim.Adam8bit(params, lr=1e-3, weight_decay=1e-2, block_size=256)
+                torch.manual_seed(1)
+                for _ in range(5):
+                    for p in params:
+                        p.grad = torch.randn_like(p)
+                    optimizer.step()
+            finally:
+                adam8bit._CHUNK_SIZE = chunk_size
+            results.append((params, [optimizer.state[p]['exp_avg_int8'] for p in params]))
+        (params, states), (chunked_params, chunked_states) = results
+        for p, chunked_p, state, chunked_state in zip(params, chunked_params, states, chunked_states):
+            self.assertEqual(p, chunked_p)
+            self.assertEqual(state, chunked_state)
+
     # ROCm precision is too low to pass this test
     @skipIfRocm
     def test_adadelta(self):
@@ -409,6 +508,92 @@ class TestOptim(TestCase):
              lambda opt: ReduceLROnPlateau(opt, threshold=1e-4)]
         )
 
+    def _test_row_sparse(self, constructor):
+        # Only the rows present in the sparse gradient of an embedding table
+        # are updated, and the result matches the one with a dense gradient
+        embedding = torch.nn.Embedding(20, 4, sparse=True)
+        embedding_dense = torch.nn.Embedding(20, 4)
+        embedding_dense.weight.data.copy_(embedding.weight.data)
+        optimizer = constructor([embedding.weight])
+        optimizer_dense = constructor([embedding_dense.weight])
+        for _ in range(5):
+            indices = torch.tensor([1, 3, 3, 7])
+            before = embedding.weight.detach().clone()
+            for m, opt in ((embedding, optimizer), (embedding_dense, optimizer_dense)):
+                opt.zero_grad()
+                m(indices).pow(2).sum().backward()
+                opt.step()
+            self.assertEqual(embedding.weight, embedding_dense.weight)
+            untouched = torch.ones(20, dtype=torch.bool)
+            untouched[indices] = False
+            self.assertEqual(embedding.weight[untouched], before[untouched])
+            self.assertNotEqual(embedding.weight[indices], before[indices])
+
+    def test_rowwise_adagrad(self):
+        self._test_basic_cases(
+            lambda weight, bias: optim.RowWiseAdagrad([weight, bias], lr=1e-1)
+        )
+        self._test_basic_cases(
+            lambda weight, bias: optim.RowWiseAdagrad(
+                self._build_params_dict(weight, bias, lr=1e-2),
+                lr=1e-1, weight_decay=1e-2, initial_accumulator_value=0.1)
+        )
+        self._test_rosenbrock_sparse(
+            lambda params: optim.RowWiseAdagrad(params, lr=1e-1)
+        )
+        self._test_row_sparse(lambda params: optim.RowWiseAdagrad(params, lr=1e-1))
+        # one accumulator per row
+        optimizer = optim.RowWiseAdagrad([torch.randn(20, 4, requires_grad=True)])
+        self.assertEqual(next(iter(optimizer.state.values()))['sum'].size(), torch.Size([20]))
+        with self.assertRaisesRegex(ValueError, "Invalid initial_accumulator_value value: -1"):
+            optim.RowWiseAdagrad(None, lr=1e-2, initial_accumulator_value=-1)
+
+    def test_lazy_adam(self):
+        self._test_basic_cases(
+            lambda weight, bias: optim.LazyAdam([weight, bias], lr=1e-3)
+        )
+        self._test_basic_cases(
+            lambda weight, bias: optim.LazyAdam(
+                self._build_params_dict(weight, bias, lr=1e-2),
+                lr=1e-3, weight_decay=1e-2)
+        )
+        self._test_rosenbrock_sparse(
+            lambda params: optim.LazyAdam(params, lr=4e-2)
+        )
+        self._test_row_sparse(lambda params: optim.LazyAdam(params, lr=1e-2))
+        with self.assertRaisesRegex(ValueError, "Invalid beta parameter at index 0: 1.0"):
+            optim.LazyAdam(None, lr=1e-2, betas=(1.0, 0.0))
+
+    def test_lazy_adam_per_row_step(self):
+        # When all the rows are present, LazyAdam matches Adam
+        weight = torch.randn(10, 3, requires_grad=True)
+        weight_lazy = weight.detach().clone().requires_grad_()
+        optimizer = optim.Adam([weight], lr=1e-2)
+        optimizer_lazy = optim.LazyAdam([weight_lazy], lr=1e-2)
+        for _ in range(5):
+            grad = torch.randn(10, 3)
+            weight.grad = grad.clone()
+            weight_lazy.grad = grad.to_sparse(1)
+            optimizer.step()
+            optimizer_lazy.step()
+            self.assertEqual(weight, weight_lazy)
+
+        # rows seen for the first time get the bias correction of a first step
+        weight_lazy.grad = torch.sparse_coo_tensor([[2]], torch.ones(1, 3), (10, 3))
+        optimizer_lazy.step()
+        row_step = optimizer_lazy.state[weight_lazy]['row_step']
+        self.assertEqual(row_step[2].item(), 6)
+        self.assertEqual(row_step[0].item(), 5)
+        weight = torch.zeros(4, 3, requires_grad=True)
+        optimizer_lazy = optim.LazyAdam([weight], lr=1e-2)
+        weight.grad = torch.sparse_coo_tensor([[0]], torch.ones(1, 3), (4, 3))
+        optimizer_lazy.step()
+        weight.grad = torch.sparse_coo_tensor([[1]], torch.ones(1, 3), (4, 3))
+        optimizer_lazy.step()
+        # both rows moved by exactly lr on their first update
+        self.assertEqual(weight[:2], torch.full((2, 3), -1e-2), prec=1e-6)
+        self.assertEqual(weight[2:], torch.zeros(2, 3))
+
     def test_adamax(self):
         self._test_basic_cases(
             lambda weight, bias: optim.Adamax([weight, bias], lr=1e-1)
@@ -467,6 +652,88 @@ class TestOptim(TestCase):
             ignore_multidevice=True
         )
 
+    def test_lbfgs_two_loop_direction(self):
+        from torch.optim.lbfgs import _two_loop_direction
+        history_size, numel = 4, 7
+        for history_len, history_index in ((0, 0), (2, 2), (4, 0), (4, 3)):
+            old_dirs = torch.randn(history_size, numel, dtype=torch.double)
+            old_stps = old_dirs + 0.1 * torch.randn(history_size, numel, dtype=torch.double)
+            stps_dot_dirs = torch.mm(old_stps, old_dirs.t())
+            flat_grad = torch.randn(numel, dtype=torch.double)
+            H_diag = 0.7
+
+            # reference two-loop recursion over the history in chronological order
+            order = [(history_index - history_len + i) % history_size for i in range(history_len)]
+            dirs = [old_dirs[i] for i in order]
+            stps = [old_stps[i] for i in order]
+            ro = [1. / y.dot(s) for y, s in zip(dirs, stps)]
+            al = [None] * history_len
+            q = flat_grad.neg()
+            for i in range(history_len - 1, -1, -1):
+                al[i] = stps[i].dot(q) * ro[i]
+                q.add_(dirs[i], alpha=-al[i])
+            r = q * H_diag
+            for i in range(history_len):
+                be_i = dirs[i].dot(r) * ro[i]
+                r.add_(stps[i], alpha=al[i] - be_i)
+
+            d = _two_loop_direction(flat_grad, old_dirs, old_stps, stps_dot_dirs,
+                                    history_len, history_index, H_diag)
+            self.assertEqual(d, r, prec=1e-10)
+
+    def test_lbfgs_history_ring_buffer(self):
+        def run(flatten, line_search_fn):
+            torch.manual_seed(0)
+            model = torch.nn.Sequential(torch.nn.Linear(6, 4), torch.nn.Tanh(), torch.nn.Linear(4, 1))
+            model = model.double()
+            input, target = torch.randn(32, 6).double(), torch.randn(32, 1).double()
+            optimizer = optim.LBFGS(model.parameters(), history_size=3, max_iter=10,
+                                    line_search_fn=line_search_fn)
+            if flatten:
+                optimizer.flatten_parameters()
+
+            def closure():
+                optimizer.zero_grad()
+                loss = F.mse_loss(model(input), target)
+                loss.backward()
+                return loss
+            for _ in range(3):
+                optimizer.step(closure)
+            return model, optimizer
+
+        for line_search_fn in (None, "strong_wolfe"):
+            model_ref, optimizer_ref = run(False, line_search_fn)
+            model, optimizer = run(True, line_search_fn)
+            for p_ref, p in zip(model_ref.parameters(), model.parameters()):
+                self.assertEqual(p_ref, p)
+            numel = sum(p.numel() for p in model.parameters())
+            state = optimizer.state[next(model.parameters())]
+            self.assertEqual(state['old_dirs'].size(), (3, numel))
+            self.assertEqual(state['stps_dot_dirs'].size(), (3, 3))
+            self.assertEqual(state['history_len'], 3)
+            # the parameters were updated in their flat buffer
+            params = list(model.parameters())
+            storage_ptr = params[0].storage().data_ptr()
+            for p in params:
+                self.assertEqual(p.storage().data_ptr(), storage_ptr)
+
+    def test_lbfgs_load_list_history(self):
+        params = [torch.randn(3, 2, requires_grad=True)]
+        optimizer = optim.LBFGS(params, history_size=2)
+        dirs = [torch.randn(6) for _ in range(3)]
+        stps = [torch.randn(6) for _ in range(3)]
+        optimizer.state[params[0]].update(
+            func_evals=1, n_iter=3, d=torch.randn(6), t=1., old_dirs=list(dirs), old_stps=list(stps),
+            ro=[1. / y.dot(s) for y, s in zip(dirs, stps)], H_diag=1., prev_flat_grad=torch.randn(6),
+            prev_loss=1.)
+        state = optimizer.state[params[0]]
+        optimizer._history_from_lists(state, 2)
+        self.assertEqual(state['history_len'], 2)
+        self.assertEqual(state['history_index'], 0)
+        self.assertEqual(state['old_dirs'], torch.stack(dirs[1:]))
+        self.assertEqual(state['stps_dot_dirs'], torch.mm(torch.stack(stps[1:]), torch.stack(dirs[1:]).t()))
+        self.assertNotIn('ro', state)
+
     @unittest.skipIf(TEST_WITH_UBSAN, "division-by-zero error with UBSAN")
     def test_lbfgs_return_type(self):
         params = [torch.randn(10, 5), torch.randn(10)]
@@ -484,6 +751,284 @@ class TestOptim(TestCase):
         with self.assertRaises(TypeError):
             optim.SGD(Variable(torch.randn(5, 5)), lr=3)
 
+    def _test_foreach_matches_per_param(self, constructor, steps=10):
+        params = [torch.randn(10, 5), torch.randn(10), torch.randn(4, 3, 2)[..., 0], torch.randn(7)]
+        params_ref = [p.clone().requires_grad_() for p in params]
+        params_foreach = [p.clone().requires_grad_() for p in params]
+        optimizer_ref = constructor(params_ref, False)
+        optimizer_foreach = constructor(params_foreach, True)
+        multi_tensor_steps = []
+        multi_tensor_step = optimizer_foreach._multi_tensor_step
+
+        def record_multi_tensor_step(group):
+            multi_tensor_steps.append(multi_tensor_step(group))
+            return multi_tensor_steps[-1]
+        optimizer_foreach._multi_tensor_step = record_multi_tensor_step
+        flat_states = None
+        for i in range(steps):
+            grads = [torch.randn_like(p) for p in params]
+            for p_ref, p_foreach, grad in zip(params_ref, params_foreach, grads):
+                # the last param only gets a gradient every other step
+                if p_ref is params_ref[-1] and i % 2 == 1:
+                    p_ref.grad = p_foreach.grad = None
+                    continue
+                p_ref.grad = grad.clone()
+                p_foreach.grad = grad.clone()
+            optimizer_ref.step()
+            optimizer_foreach.step()
+            for p_ref, p_foreach in zip(params_ref, params_foreach):
+                self.assertEqual(p_ref, p_foreach)
+            if flat_states is None:
+                flat_states = dict(optimizer_foreach._flat_states)
+        # the steps of the parameters diverged, but the flat buffers were still
+        # used, and not rebuilt when the last parameter had no gradient
+        self.assertEqual(multi_tensor_steps, [True] * steps)
+        self.assertEqual(len(optimizer_foreach._flat_states), len(flat_states))
+        for key, flat_state in flat_states.items():
+            self.assertIs(optimizer_foreach._flat_states[key], flat_state)
+
+        state_ref = optimizer_ref.state_dict()['state']
+        state_foreach = optimizer_foreach.state_dict()['state']
+        self.assertEqual(sorted(state_ref.keys()), sorted(state_foreach.keys()))
+        for k in state_ref:
+            self.assertEqual(state_ref[k], state_foreach[k])
+
+        # a state dict saved with foreach=True can be loaded by both implementations
+        for foreach in (False, True):
+            params_c = [p.detach().clone().requires_grad_() for p in params_foreach]
+            optimizer_c = constructor(params_c, foreach)
+            optimizer_c.load_state_dict(deepcopy(optimizer_foreach.state_dict()))
+            for p in params_foreach + params_c:
+                p.grad = torch.ones_like(p)
+            optimizer_foreach.step()
+            optimizer_c.step()
+            for p, p_c in zip(params_foreach, params_c):
+                self.assertEqual(p, p_c)
+
+    def test_foreach_matches_per_param(self):
+        constructors = [
+            lambda params, foreach: optim.SGD(params, lr=1e-2, foreach=foreach),
+            lambda params, foreach: optim.SGD(params, lr=1e-2, momentum=0.9, dampening=0.1,
+                                              weight_decay=1e-2, foreach=foreach),
+            lambda params, foreach: optim.SGD(params, lr=1e-2, momentum=0.9, nesterov=True, foreach=foreach),
+            lambda params, foreach: optim.Adam(params, lr=1e-2, weight_decay=1e-2, foreach=foreach),
+            lambda params, foreach: optim.Adam(params, lr=1e-2, amsgrad=True, foreach=foreach),
+            lambda params, foreach: optim.AdamW(params, lr=1e-2, foreach=foreach),
+            lambda params, foreach: optim.AdamW(params, lr=1e-2, amsgrad=True, foreach=foreach),
+            lambda params, foreach: optim.RMSprop(params, lr=1e-2, weight_decay=1e-2, foreach=foreach),
+            lambda params, foreach: optim.RMSprop(params, lr=1e-2, momentum=0.9, centered=True, foreach=foreach),
+            lambda params, foreach: optim.Adagrad(params, lr=1e-1, lr_decay=1e-3, foreach=foreach),
+            lambda params, foreach: optim.Adadelta(params, weight_decay=1e-2, foreach=foreach),
+            lambda params, foreach: optim.Adamax(params, lr=1e-2, weight_decay=1e-2, foreach=foreach),
+        ]
+        for constructor in constructors:
+            self._test_foreach_matches_per_param(constructor)
+
+    def test_flatten_parameters(self):
+        constructors = [
+            lambda params, foreach: optim.SGD(params, lr=1e-2, momentum=0.9, weight_decay=1e-2, foreach=foreach),
+            lambda params, foreach: optim.SGD(params, lr=1e-2, momentum=0.9, nesterov=True, foreach=foreach),
+            lambda params, foreach: optim.Adam(params, lr=1e-2, weight_decay=1e-2, foreach=foreach),
+            lambda params, foreach: optim.AdamW(params, lr=1e-2, foreach=foreach),
+            lambda params, foreach: optim.RMSprop(params, lr=1e-2, momentum=0.9, foreach=foreach),
+            lambda params, foreach: optim.Adagrad(params, lr=1e-1, foreach=foreach),
+            lambda params, foreach: optim.Adadelta(params, foreach=foreach),
+            lambda params, foreach: optim.Adamax(params, lr=1e-2, foreach=foreach),
+        ]
+        for constructor in constructors:
+            model_ref = torch.nn.Sequential(torch.nn.Linear(5, 4), torch.nn.ReLU(), torch.nn.Linear(4, 3))
+            model = deepcopy(model_ref)
+            optimizer_ref = constructor(model_ref.parameters(), False)
+            optimizer = constructor(model.parameters(), True)
+            optimizer.flatten_parameters()
+            params = list(model.parameters())
+            storage_ptr = params[0].storage().data_ptr()
+            grad_storage_ptr = params[0].grad.storage().data_ptr()
+            for p in params:
+                self.assertEqual(p.storage().data_ptr(), storage_ptr)
+                self.assertEqual(p.grad.storage().data_ptr(), grad_storage_ptr)
+
+            for _ in range(5):
+                input = torch.randn(6, 5)
+                for m, opt in ((model_ref, optimizer_ref), (model, optimizer)):
+                    opt.zero_grad()
+                    m(input).pow(2).sum().backward()
+                for p_ref, p in zip(model_ref.parameters(), params):
+                    self.assertEqual(p_ref.grad, p.grad)
+                optimizer_ref.step()
+                optimizer.step()
+                for p_ref, p in zip(model_ref.parameters(), params):
+                    self.assertEqual(p_ref, p)
+                    # weight decay must not leak into the gradients
+                    self.assertEqual(p_ref.grad, p.grad)
+            # the parameters and their gradients still live in the flat buffers
+            model.zero_grad()
+            for p in params:
+                self.assertEqual(p.storage().data_ptr(), storage_ptr)
+                self.assertEqual(p.grad.storage().data_ptr(), grad_storage_ptr)
+                self.assertEqual(p.grad, torch.zeros_like(p))
+
+            # the state dict uses the usual format and can be loaded without flattening
+            state_dict = optimizer.state_dict()
+            state_dict_ref = optimizer_ref.state_dict()
+            for k in state_dict_ref['state']:
+                self.assertEqual(state_dict_ref['state'][k], state_dict['state'][k])
+            optimizer_ref.load_state_dict(deepcopy(state_dict))
+            optimizer.load_state_dict(deepcopy(state_dict_ref))
+            input = torch.randn(6, 5)
+            for m, opt in ((model_ref, optimizer_ref), (model, optimizer)):
+                opt.zero_grad()
+                m(input).pow(2).sum().backward()
+                opt.step()
+            for p_ref, p in zip(model_ref.parameters(), model.parameters()):
+                self.assertEqual(p_ref, p)
+
+        with self.assertRaisesRegex(ValueError, "requires foreach=True"):
+            optim.Adam([torch.randn(3, requires_grad=True)]).flatten_parameters()
+
+    def test_zero_grad_set_to_none(self):
+        params = [torch.randn(3, 2, requires_grad=True), torch.randn(4, requires_grad=True)]
+        optimizer = optim.SGD(params, lr=1)
+        for p in params:
+            p.grad = torch.ones_like(p)
+        optimizer.zero_grad(set_to_none=True)
+        for p in params:
+            self.assertIsNone(p.grad)
+        # the parameters without a gradient are not updated
+        params[0].grad = torch.ones_like(params[0])
+        expected = [params[0].detach() - 1, params[1].detach().clone()]
+        optimizer.step()
+        for p, e in zip(params, expected):
+            self.assertEqual(p, e)
+
+    def test_zero_grad_set_to_none_flat_parameters(self):
+        model_ref = torch.nn.Sequential(torch.nn.Linear(5, 4), torch.nn.ReLU(), torch.nn.Linear(4, 3))
+        model = deepcopy(model_ref)
+        optimizer_ref = optim.Adam(model_ref.parameters(), lr=1e-2)
+        optimizer = optim.Adam(model.parameters(), lr=1e-2, foreach=True)
+        optimizer.flatten_parameters()
+        params = list(model.parameters())
+        grad_storage_ptr = params[0].grad.storage().data_ptr()
+        for _ in range(3):
+            input = torch.randn(6, 5)
+            optimizer_ref.zero_grad()
+            optimizer.zero_grad(set_to_none=True)
+            for p in params:
+                self.assertIsNone(p.grad)
+            model_ref(input).pow(2).sum().backward()
+            model(input).pow(2).sum().backward()
+            optimizer_ref.step()
+            optimizer.step()
+            # the gradients were copied back into the flat buffer
+            for p_ref, p in zip(model_ref.parameters(), params):
+                self.assertEqual(p.grad.storage().data_ptr(), grad_storage_ptr)
+                self.assertEqual(p_ref.grad, p.grad)
+                self.assertEqual(p_ref, p)
+
+    def test_flatten_parameters_unused_parameter(self):
+        model_ref = torch.nn.ModuleList([torch.nn.Linear(5, 4), torch.nn.Linear(4, 3), torch.nn.Linear(3, 2)])
+        model = deepcopy(model_ref)
+        optimizer_ref = optim.Adam(model_ref.parameters(), lr=1e-2)
+        optimizer = optim.Adam(model.parameters(), lr=1e-2, foreach=True)
+        optimizer.flatten_parameters()
+        params = list(model.parameters())
+        unused = model[2].weight.detach().clone()
+        flat_parameters = flat_states = None
+        for i in range(4):
+            input = torch.randn(6, 5)
+            optimizer_ref.zero_grad(set_to_none=True)
+            optimizer.zero_grad(set_to_none=True)
+            # the bias of the second layer only gets a gradient every other step
+            for m in (model_ref, model):
+                output = m[0](input)
+                if i % 2 == 0:
+                    output = m[1](output)
+                else:
+                    output = torch.nn.functional.linear(output, m[1].weight)
+                output.pow(2).sum().backward()
+            optimizer_ref.step()
+            optimizer.step()
+            for p_ref, p in zip(model_ref.parameters(), params):
+                self.assertEqual(p_ref, p)
+            if flat_parameters is None:
+                flat_parameters = dict(optimizer._flat_parameters)
+                flat_states = dict(optimizer._flat_states)
+            # the flat buffers are reused, although the parameters with a
+            # gradient change from one step to the next
+            for key, value in flat_parameters.items():
+                self.assertIs(optimizer._flat_parameters[key], value)
+            for key, value in flat_states.items():
+                self.assertIs(optimizer._flat_states[key], value)
+        # the unused layer is neither updated nor given a state
+        self.assertEqual(model[2].weight, unused)
+        self.assertNotIn(model[2].weight, optimizer.state)
+        self.assertEqual(sorted(optimizer_ref.state_dict()['state'].keys()),
+                         sorted(optimizer.state_dict()['state'].keys()))
+
+    def test_clip_grad_norm(self):
+        constructors = [
+            lambda params, foreach: optim.SGD(params, lr=1e-1, momentum=0.9, weight_decay=1e-2, foreach=foreach),
+            lambda params, foreach: optim.Adam(params, lr=1e-2, foreach=foreach),
+            lambda params, foreach: optim.AdamW(params, lr=1e-2, foreach=foreach),
+            lambda params, foreach: optim.Adagrad(params, lr=1e-1, weight_decay=1e-2, foreach=foreach),
+        ]
+        for constructor, flatten, per_group in product(constructors, (False, True), (False, True)):
+            model_ref = torch.nn.Sequential(torch.nn.Linear(5, 4), torch.nn.ReLU(), torch.nn.Linear(4, 3))
+            model = deepcopy(model_ref)
+
+            def param_groups(m):
+                return [{'params': m[0].parameters()}, {'params': m[2].parameters()}]
+            optimizer_ref = constructor(param_groups(model_ref), False)
+            optimizer = constructor(param_groups(model), True)
+            if flatten:
+                optimizer.flatten_parameters()
+            for _ in range(3):
+                input = torch.randn(6, 5)
+                for m, opt in ((model_ref, optimizer_ref), (model, optimizer)):
+                    opt.zero_grad()
+                    m(input).pow(2).sum().mul(10).backward()
+                if per_group:
+                    norms_ref = [torch.nn.utils.clip_grad_norm_(m.parameters(), 0.5)
+                                 for m in (model_ref[0], model_ref[2])]
+                else:
+                    norms_ref = torch.nn.utils.clip_grad_norm_(model_ref.parameters(), 0.5)
+                grads = [p.grad.clone() for p in model.parameters()]
+                norms = optimizer.clip_grad_norm_(0.5, per_group=per_group)
+                self.assertEqual(norms, norms_ref)
+                # the clipping is deferred to the step of the optimizer
+                for p, grad in zip(model.parameters(), grads):
+                    self.assertEqual(p.grad, grad)
+                optimizer_ref.step()
+                optimizer.step()
+                for p_ref, p in zip(model_ref.parameters(), model.parameters()):
+                    self.assertEqual(p_ref, p)
+
+        # the gradients of groups without foreach are clipped in place
+        param = torch.randn(4, 3, requires_grad=True)
+        param.grad = torch.full_like(param, 2)
+        norm = optim.SGD([param], lr=1e-1).clip_grad_norm_(1)
+        self.assertEqual(norm.item(), 2 * math.sqrt(12))
+        self.assertEqual(param.grad.norm().item(), 1, prec=1e-5)
+
+        # a deferred clipping is dropped by zero_grad
+        param = torch.randn(4, 3, requires_grad=True)
+        optimizer = optim.SGD([param], lr=1, foreach=True)
+        param.grad = torch.full_like(param, 2)
+        optimizer.clip_grad_norm_(1)
+        optimizer.zero_grad()
+        param.grad.fill_(1)
+        expected = param.detach() - 1
+        optimizer.step()
+        self.assertEqual(param, expected)
+
+    def test_foreach_sparse_grad(self):
+        param = torch.randn(10, 5, requires_grad=True)
+        param.grad = torch.sparse_coo_tensor([[0, 3]], torch.randn(2, 5), (10, 5))
+        with self.assertRaisesRegex(RuntimeError, "does not support sparse gradients"):
+            optim.Adam([param], foreach=True).step()
+        # Adagrad falls back to the per-parameter implementation
+        optim.Adagrad([param], foreach=True).step()
+
 
 class SchedulerTestNet(torch.nn.Module):
     def __init__(self):
@@ -813,6 +1358,91 @@ class TestLRScheduler(TestCase):
         closed_form_scheduler = CosineAnnealingLR(self.opt, T_max=T_max, eta_min=eta_min)
         self._test_against_closed_form(scheduler, closed_form_scheduler, epochs)
 
+    def test_schedule_table_matches_closed_form(self):
+        epochs = 20
+        constructors = [
+            lambda opt: StepLR(opt, gamma=0.1, step_size=3),
+            lambda opt: MultiStepLR(opt, gamma=0.1, milestones=[2, 5, 5, 9]),
+            lambda opt: ExponentialLR(opt, gamma=0.9),
+            lambda opt: CosineAnnealingLR(opt, T_max=5, eta_min=1e-3),
+            lambda opt: LambdaLR(opt, lr_lambda=[lambda x: 0.95 ** x, lambda x: x + 1]),
+        ]
+        for constructor in constructors:
+            self.setUp()
+            closed_form_scheduler = constructor(self.opt)
+            targets = [[], []]
+            for epoch in range(epochs):
+                closed_form_scheduler.step(epoch)
+                for target, group in zip(targets, self.opt.param_groups):
+                    target.append(group['lr'])
+            self.setUp()
+            schedule = LRScheduleTable(constructor(self.opt), total_steps=epochs)
+            self._test([schedule], targets, epochs)
+
+    def test_schedule_table_chained(self):
+        epochs = 10
+        single_targets = [0.05 * min(1., (x + 1) / 4) * 0.1 ** (x // 3) * 0.9 ** x for x in range(epochs)]
+        targets = [single_targets, [x * 10 for x in single_targets]]
+        schedulers = [LambdaLR(self.opt, lr_lambda=lambda x: min(1., (x + 1) / 4)),
+                      StepLR(self.opt, gamma=0.1, step_size=3),
+                      ExponentialLR(self.opt, gamma=0.9)]
+        schedule = LRScheduleTable(schedulers, total_steps=epochs)
+        self.assertEqual(schedule.table.size(), (epochs + 1, 2))
+        self._test([schedule], targets, epochs)
+
+    def test_schedule_table_matches_chained_schedulers(self):
+        epochs = 12
+        schedulers = [StepLR(self.opt, gamma=0.1, step_size=3),
+                      MultiStepLR(self.opt, gamma=0.5, milestones=[4, 7])]
+        targets = [[], []]
+        for _ in range(epochs):
+            for target, group in zip(targets, self.opt.param_groups):
+                target.append(group['lr'])
+            [scheduler.step() for scheduler in schedulers]
+        self.setUp()
+        schedulers = [StepLR(self.opt, gamma=0.1, step_size=3),
+                      MultiStepLR(self.opt, gamma=0.5, milestones=[4, 7])]
+        self._test([LRScheduleTable(schedulers, total_steps=epochs)], targets, epochs)
+
+    def test_schedule_table_as_tensor(self):
+        epochs = 10
+        single_targets = [0.05 * 0.9 ** min(x, 5) for x in range(epochs)]
+        targets = [single_targets, [x * 10 for x in single_targets]]
+        schedule = LRScheduleTable(ExponentialLR(self.opt, gamma=0.9), total_steps=5, as_tensor=True)
+        for group in self.opt.param_groups:
+            self.assertTrue(torch.is_tensor(group['lr']))
+            self.assertEqual(group['lr'].dim(), 0)
+        self._test([schedule], targets, epochs)
+        self.assertEqual(schedule.get_last_lr(), [targets[0][-1], targets[1][-1]], prec=1e-10)
+
+        # The optimizer accepts the 0-dim learning rates
+        param = self.net.conv1.weight
+        param.grad = torch.ones_like(param)
+        expected = param.detach() - schedule.lrs[0].item()
+        self.opt.step()
+        self.assertEqual(param.detach(), expected)
+
+    def test_schedule_table_state_dict(self):
+        schedule = LRScheduleTable(StepLR(self.opt, gamma=0.1, step_size=2), total_steps=10, as_tensor=True)
+        for _ in range(3):
+            schedule.step()
+        state_dict = deepcopy(schedule.state_dict())
+        self.setUp()
+        schedule2 = LRScheduleTable(StepLR(self.opt, gamma=0.1, step_size=2), total_steps=10, as_tensor=True)
+        schedule2.load_state_dict(state_dict)
+        self.assertEqual(schedule2.last_epoch, 3)
+        self.assertEqual(self.opt.param_groups[0]['lr'].item(), 0.005, prec=1e-10)
+        schedule2.step()
+        self.assertEqual(self.opt.param_groups[0]['lr'].item(), 0.0005, prec=1e-10)
+        self.assertEqual(state_dict['lrs'], torch.tensor([0.005, 0.05], dtype=torch.float64), prec=1e-10)
+
+    def test_schedule_table_errors(self):
+        with self.assertRaisesRegex(ValueError, "has no closed form"):
+            LRScheduleTable(MultiplicativeLR(self.opt, lr_lambda=lambda x: 0.9), total_steps=10)
+        other_opt = SGD(self.net.parameters(), lr=0.1)
+        with self.assertRaisesRegex(ValueError, "same optimizer"):
+            LRScheduleTable([StepLR(self.opt, step_size=2), StepLR(other_opt, step_size=2)], total_steps=10)
+
     def test_reduce_lr_on_plateau1(self):
         epochs = 10
         for param_group in self.opt.param_groups:
@@ -1547,5 +2177,146 @@ class TestLRScheduler(TestCase):
 
         self.assertLessEqual(last_lr, max_lr)
 
+
+class TestSWAUtils(TestCase):
+
+    def _make_model(self):
+        return torch.nn.Sequential(
+            torch.nn.Conv2d(1, 5, kernel_size=3),
+            torch.nn.BatchNorm2d(5, momentum=0.3),
+            torch.nn.Conv2d(5, 2, kernel_size=3),
+            torch.nn.ReLU(),
+            torch.nn.Linear(5, 2)
+        )
+
+    def _train_steps(self, model, steps):
+        # yields after changing the weights of the model, like an optimizer step
+        for _ in range(steps):
+            with torch.no_grad():
+                for p in model.parameters():
+                    p.add_(torch.randn_like(p))
+            model(torch.randn(2, 1, 9, 9))
+            yield
+
+    def test_averaged_model_swa(self):
+        model = self._make_model()
+        averaged_model = AveragedModel(model)
+        averaged_params = [torch.zeros_like(p) for p in model.parameters()]
+        steps = 10
+        for _ in self._train_steps(model, steps):
+            for p, p_avg in zip(model.parameters(), averaged_params):
+                p_avg.add_(p.detach() / steps)
+            averaged_model.update_parameters(model)
+
+        for p_avg, p_swa in zip(averaged_params, averaged_model.parameters()):
+            self.assertEqual(p_avg, p_swa)
+        self.assertEqual(averaged_model.n_averaged.item(), steps)
+        # the floating point buffers are copied from the model
+        for b, b_avg in zip(model.buffers(), averaged_model.module.buffers()):
+            self.assertEqual(b, b_avg)
+        # the averaged parameters live in a single flat buffer
+        storage_ptrs = set(p.storage().data_ptr() for p in averaged_model.parameters())
+        self.assertEqual(len(storage_ptrs), 1)
+
+    def test_averaged_model_ema(self):
+        model = self._make_model()
+        decay = 0.9
+        averaged_model = AveragedModel(model, decay=decay, update_every=2, average_buffers=True)
+        averaged = None
+        for i, _ in enumerate(self._train_steps(model, 10)):
+            if i % 2 == 1:
+                tensors = list(model.parameters()) + [b for b in model.buffers() if b.is_floating_point()]
+                if averaged is None:
+                    averaged = [t.detach().clone() for t in tensors]
+                else:
+                    for t, t_avg in zip(tensors, averaged):
+                        t_avg.mul_(decay).add_(t.detach(), alpha=1 - decay)
+            averaged_model.update_parameters(model)
+
+        self.assertEqual(averaged_model.n_averaged.item(), 5)
+        tensors = list(averaged_model.module.parameters())
+        tensors += [b for b in averaged_model.module.buffers() if b.is_floating_point()]
+        for t_avg, t_ema in zip(averaged, tensors):
+            self.assertEqual(t_avg, t_ema)
+        # num_batches_tracked is copied
+        self.assertEqual(averaged_model.module[1].num_batches_tracked, model[1].num_batches_tracked)
+
+    def test_averaged_model_avg_fn(self):
+        model = self._make_model()
+
+        def avg_fn(p_avg, p, n_averaged):
+            return torch.max(p_avg, p)
+        averaged_model = AveragedModel(model, avg_fn=avg_fn)
+        maximums = [p.detach().clone() for p in model.parameters()]
+        averaged_model.update_parameters(model)
+        for _ in self._train_steps(model, 5):
+            for p, p_max in zip(model.parameters(), maximums):
+                torch.max(p_max, p.detach(), out=p_max)
+            averaged_model.update_parameters(model)
+        for p_max, p_avg in zip(maximums, averaged_model.parameters()):
+            self.assertEqual(p_max, p_avg)
+
+    def test_averaged_model_flat_model_parameters(self):
+        model = self._make_model()
+        optimizer = optim.SGD(model.parameters(), lr=1e-2, foreach=True)
+        optimizer.flatten_parameters()
+        averaged_model = AveragedModel(model, decay=0.5)
+        for _ in range(3):
+            optimizer.zero_grad()
+            model(torch.randn(2, 1, 9, 9)).sum().backward()
+            optimizer.step()
+            if averaged_model.n_averaged.item() == 0:
+                expected = [p.detach().clone() for p in model.parameters()]
+            else:
+                expected = [p_avg * 0.5 + p.detach() * 0.5
+                            for p_avg, p in zip(averaged_model.parameters(), model.parameters())]
+            averaged_model.update_parameters(model)
+            for e, p_avg in zip(expected, averaged_model.parameters()):
+                self.assertEqual(e, p_avg)
+
+    def test_averaged_model_swap_parameters(self):
+        model = self._make_model()
+        averaged_model = AveragedModel(model)
+        for _ in self._train_steps(model, 3):
+            averaged_model.update_parameters(model)
+        model_ptrs = [p.data_ptr() for p in model.parameters()]
+        averaged_ptrs = [p.data_ptr() for p in averaged_model.parameters()]
+        averaged_values = [p.detach().clone() for p in averaged_model.parameters()]
+        input = torch.randn(2, 1, 9, 9)
+        averaged_model.eval()
+        output = averaged_model(input)
+
+        averaged_model.swap_parameters(model)
+        self.assertEqual([p.data_ptr() for p in model.parameters()], averaged_ptrs)
+        for p, value in zip(model.parameters(), averaged_values):
+            self.assertEqual(p, value)
+        model.eval()
+        self.assertEqual(model(input), output)
+        with self.assertRaisesRegex(RuntimeError, "swapped"):
+            averaged_model.update_parameters(model)
+
+        averaged_model.swap_parameters(model)
+        self.assertEqual([p.data_ptr() for p in model.parameters()], model_ptrs)
+        self.assertEqual([p.data_ptr() for p in averaged_model.parameters()], averaged_ptrs)
+        averaged_model.update_parameters(model)
+
+    def test_update_bn(self):
+        model = torch.nn.Sequential(torch.nn.Linear(5, 5), torch.nn.BatchNorm1d(5))
+        inputs = [torch.randn(16, 5) * 4 + 3 for _ in range(4)]
+        loader = [(input, torch.zeros(16)) for input in inputs]
+        model.eval()
+        update_bn(loader, model)
+        self.assertFalse(model.training)
+
+        # cumulative moving average of the statistics of the batches
+        with torch.no_grad():
+            preactivations = [model[0](input) for input in inputs]
+        mean = torch.stack([x.mean(0) for x in preactivations]).mean(0)
+        var = torch.stack([x.var(0) for x in preactivations]).mean(0)
+        self.assertEqual(model[1].running_mean, mean, prec=1e-4)
+        self.assertEqual(model[1].running_var, var, prec=1e-3)
+        self.assertEqual(model[1].momentum, 0.1)
+
+
 if __name__ == '__main__':
     run_tests()
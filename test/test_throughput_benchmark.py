@@ -1,5 +1,7 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import json
+
 import torch
 from torch.utils import ThroughputBenchmark
 from torch.testing import assert_allclose
@@ -66,7 +68,46 @@ class TestThroughputBenchmark(TestCase):
         )
 
         print(stats)
+        self.assertEqual(len(stats.thread_latencies_ms), 4)
+        self.assertEqual(sum(len(l) for l in stats.thread_latencies_ms), 1000)
+        self.assertLessEqual(stats.latency_p50_ms, stats.latency_p99_ms)
+        self.assertEqual(sum(count for _, _, count in stats.latency_histogram(10)), 1000)
+
+    def open_loop_test(self, Module):
+        module = Module(10, 5, 15)
+        bench = ThroughputBenchmark(module)
+        bench.add_input(torch.randn(8, 10), torch.randn(8, 10))
 
+        stats = bench.benchmark(
+            num_calling_threads=2,
+            num_warmup_iters=10,
+            num_iters=50,
+            target_qps=500,
+        )
+        # 50 requests scheduled 2ms apart
+        self.assertGreaterEqual(stats.total_time_seconds, 49 / 500.0)
+        self.assertEqual(len(stats.latencies_ms), 50)
+
+    def test_open_loop(self):
+        self.open_loop_test(TwoLayerNet)
+        self.open_loop_test(TwoLayerNetModule)
+
+    def test_sweep(self):
+        bench = ThroughputBenchmark(TwoLayerNet(10, 5, 15))
+        bench.add_input(torch.randn(8, 10), torch.randn(8, 10))
+        num_threads = torch.get_num_threads()
+
+        report = bench.sweep(num_calling_threads=[1, 2], num_intra_op_threads=[1, 2],
+                             num_warmup_iters=10, num_iters=100)
+        self.assertEqual(torch.get_num_threads(), num_threads)
+        self.assertEqual(len(report.entries), 4)
+        num_intra_op_threads, stats = report.best('iters_per_second', maximize=True)
+        self.assertIn(num_intra_op_threads, [1, 2])
+
+        results = json.loads(report.to_json())['results']
+        self.assertEqual(len(results), 4)
+        self.assertEqual(results[0]['num_iters'], 100)
+        self.assertIn('latency_p99_ms', results[0])
 
     def test_script_module(self):
         self.linear_test(TwoLayerNet)
@@ -5,17 +5,19 @@ import re
 import shutil
 import random
 import tempfile
+import threading
 import unittest
+from collections import OrderedDict
 import torch
 import torch.nn as nn
 import torch.utils.data
 import torch.cuda
 from torch._six import PY2
-from torch.utils.checkpoint import checkpoint, checkpoint_sequential
+from torch.utils.checkpoint import checkpoint, checkpoint_sequential, offload_checkpoints, plan_checkpoints
 import torch.hub as hub
 from torch.autograd._functions.utils import check_onnx_broadcast
 from torch.onnx.symbolic_opset9 import _prepare_onnx_paddings
-from torch.testing._internal.common_utils import skipIfRocm, load_tests, retry, IS_SANDCASTLE
+from torch.testing._internal.common_utils import skipIfRocm, load_tests, retry, IS_SANDCASTLE, TEST_NUMPY
 if PY2:
     from urllib2 import HTTPError
 else:
@@ -271,6 +273,142 @@ class TestCheckpoint(TestCase):
         out = checkpoint(run_fn, input_var, None)
         out.sum().backward()
 
+    def _check_offload_checkpoints(self, device, **kwargs):
+        model = nn.Sequential(*[nn.Linear(50, 50) for _ in range(6)]).to(device)
+        input = torch.randn(4, 50, device=device, requires_grad=True)
+        checkpoint_sequential(model, 3, input * 2).sum().backward()
+        grads = [p.grad.clone() for p in model.parameters()]
+        input_grad = input.grad.clone()
+
+        model.zero_grad()
+        input.grad = None
+        with offload_checkpoints(prefetch=1, **kwargs) as offload:
+            out = checkpoint_sequential(model, 3, input * 2)
+        # the inputs of the first two segments, the last one isn't checkpointed
+        self.assertEqual(offload.num_offloaded, 2)
+        self.assertEqual(offload.bytes_offloaded, 2 * input.numel() * input.element_size())
+        self.assertEqual(offload.bytes_prefetched, 0)
+        out.sum().backward()
+        self.assertEqual(offload.bytes_prefetched, offload.bytes_offloaded)
+        for p, grad in zip(model.parameters(), grads):
+            self.assertEqual(p.grad, grad)
+        self.assertEqual(input.grad, input_grad)
+        return offload
+
+    def test_offload_checkpoints_mmap(self):
+        spill_dir = tempfile.mkdtemp()
+        try:
+            offload = self._check_offload_checkpoints('cpu', storage='mmap', spill_dir=spill_dir)
+            self.assertEqual(offload.bytes_stored, offload.bytes_offloaded)
+            self.assertEqual(os.listdir(spill_dir), [])
+        finally:
+            shutil.rmtree(spill_dir)
+
+    @unittest.skipIf(not TEST_NUMPY, "No numpy")
+    def test_offload_checkpoints_compressed(self):
+        self._check_offload_checkpoints('cpu', storage='compressed', compress_level=6)
+
+    @unittest.skipIf(not HAS_CUDA, 'No CUDA')
+    def test_offload_checkpoints_pinned(self):
+        self._check_offload_checkpoints('cuda', storage='pinned')
+
+    def test_offload_checkpoints_backward_twice(self):
+        input = torch.randn(4, 5, requires_grad=True)
+        with offload_checkpoints(storage='mmap'):
+            out = checkpoint(torch.exp, input * 2)
+        out.sum().backward(retain_graph=True)
+        with self.assertRaisesRegex(RuntimeError, "second time"):
+            out.sum().backward()
+        with self.assertRaisesRegex(ValueError, "Invalid storage"):
+            offload_checkpoints(storage='disk')
+
+    def test_offload_checkpoints_threads(self):
+        # like the replicas of DataParallel, several threads checkpoint within
+        # the same context, and get back their own inputs
+        inputs = [torch.full((4, 5), i / 10., requires_grad=True) for i in range(8)]
+        outputs = [None] * len(inputs)
+
+        def run(i):
+            outputs[i] = checkpoint(torch.exp, inputs[i] * 2)
+
+        with offload_checkpoints(storage='mmap', prefetch=0) as offload:
+            threads = [threading.Thread(target=run, args=(i,)) for i in range(len(inputs))]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(offload.num_offloaded, len(inputs))
+        for input, output in zip(inputs, outputs):
+            output.sum().backward()
+            self.assertEqual(input.grad, 2 * torch.exp(input * 2))
+
+    def _planner_model(self):
+        class Block(nn.Module):
+            def __init__(self):
+                super(Block, self).__init__()
+                self.fc1 = nn.Linear(200, 200)
+                self.tanh = nn.Tanh()
+                self.fc2 = nn.Linear(200, 200)
+                self.relu = nn.ReLU()
+
+            def forward(self, input):
+                return self.relu(self.fc2(self.tanh(self.fc1(input))))
+
+        return nn.Sequential(
+            nn.Linear(20, 200),
+            nn.Sequential(Block(), Block()),
+            nn.Linear(200, 5)
+        )
+
+    def test_checkpoint_plan_gradients(self):
+        torch.manual_seed(0)
+        model = self._planner_model()
+        input = torch.randn(8, 20, requires_grad=True)
+        model(input).sum().backward()
+        grads = [p.grad.clone() for p in model.parameters()]
+        input_grad = input.grad.clone()
+
+        plan = plan_checkpoints(model, input, memory_budget=plan_checkpoints(model, input, 0).baseline_peak_bytes - 1)
+        self.assertEqual(plan.candidates, ['0', '1.0', '1.1', '2'])
+        self.assertEqual(plan.checkpointed, ['1.0', '1.1'])
+        plan.apply(model)
+        model.zero_grad()
+        input.grad = None
+        model(input).sum().backward()
+        for p, grad in zip(model.parameters(), grads):
+            self.assertEqual(p.grad, grad)
+        self.assertEqual(input.grad, input_grad)
+
+    def test_checkpoint_plan_budget(self):
+        model = self._planner_model()
+        input = torch.randn(8, 20, requires_grad=True)
+        baseline = plan_checkpoints(model, input, memory_budget=2 ** 30)
+        self.assertEqual(baseline.checkpointed, [])
+        self.assertEqual(baseline.predicted_peak_bytes, baseline.baseline_peak_bytes)
+
+        budget = baseline.baseline_peak_bytes * 9 // 10
+        plan = plan_checkpoints(model, input, memory_budget=budget)
+        self.assertTrue(len(plan.checkpointed) > 0)
+        self.assertLessEqual(plan.predicted_peak_bytes, budget)
+        self.assertEqual(plan.measure(model, input), plan.predicted_peak_bytes)
+        self.assertIn('achieved peak activation memory', plan.report())
+
+        self.assertWarnsRegex(lambda: plan_checkpoints(model, input, memory_budget=1), "memory budget")
+        with self.assertRaisesRegex(ValueError, "contain one another"):
+            plan_checkpoints(model, input, 0, candidates=['2', '2.0'])
+
+    def test_checkpoint_plan_remove(self):
+        model = self._planner_model()
+        input = torch.randn(8, 20, requires_grad=True)
+        plan = plan_checkpoints(model, input, memory_budget=2 ** 30, candidates=['0', '1'])
+        plan.checkpointed = ['0', '1']
+        plan.apply(model)
+        self.assertIn('forward', model[0].__dict__)
+        self.assertIn('forward', model[1].__dict__)
+        plan.remove()
+        self.assertNotIn('forward', model[0].__dict__)
+        self.assertNotIn('forward', model[1].__dict__)
+
 
 class TestDataLoader(TestCase):
     def setUp(self):
@@ -325,6 +463,83 @@ class TestDataLoader(TestCase):
         self.assertEqual(len(list(dataiter)), 1)
 
 
+class TestModuleProfiler(TestCase):
+    def _model(self):
+        return nn.Sequential(
+            nn.Linear(8, 8),
+            nn.ReLU(),
+            nn.Sequential(nn.Linear(8, 8), nn.ReLU()),
+        )
+
+    def test_forward_backward(self):
+        from torch.utils.module_profiler import profile_modules
+        model = self._model()
+        x = torch.randn(4, 8, requires_grad=True)
+        with profile_modules(model) as prof:
+            for _ in range(3):
+                model(x).sum().backward()
+        stats = {s.name: s for s in prof.key_averages()}
+        self.assertEqual(set(stats.keys()), {'Sequential', '0', '1', '2', '2.0', '2.1'})
+        for s in stats.values():
+            self.assertEqual(s.count, 3)
+            self.assertEqual(s.backward_count, 3)
+            self.assertGreaterEqual(s.self_forward_time_total, 0)
+        self.assertGreaterEqual(stats['Sequential'].forward_time_total,
+                                stats['2'].forward_time_total)
+        self.assertGreaterEqual(stats['2'].backward_time_total, 0)
+        self.assertIn('2.1', prof.table())
+        self.assertNotIn('2.1', prof.table(max_depth=1))
+
+        # hooks are removed on exit
+        for m in model.modules():
+            self.assertEqual(len(m._forward_hooks), 0)
+            self.assertEqual(len(m._forward_pre_hooks), 0)
+
+    def test_group_by_type(self):
+        from torch.utils.module_profiler import profile_modules
+        model = self._model()
+        with profile_modules(model, record_backward=False) as prof:
+            model(torch.randn(4, 8))
+        grouped = {s.name: s for s in prof.key_averages(group_by_type=True)}
+        self.assertEqual(grouped['Linear'].instances, 2)
+        self.assertEqual(grouped['Linear'].count, 2)
+        self.assertEqual(grouped['Sequential'].instances, 2)
+        self.assertEqual(grouped['ReLU'].backward_count, 0)
+        self.assertIn('Linear', prof.table(group_by_type=True, sort_by='time_total'))
+
+    def test_record_function_ranges(self):
+        from torch.utils.module_profiler import profile_modules
+        model = self._model()
+        with torch.autograd.profiler.profile() as autograd_prof:
+            with profile_modules(model):
+                model(torch.randn(4, 8))
+        names = [evt.name for evt in autograd_prof.function_events]
+        self.assertIn('module::2.0', names)
+
+
+    def test_record_flops(self):
+        from torch.utils.module_profiler import profile_modules
+        model = self._model()
+        with profile_modules(model, record_backward=False, record_flops=True) as prof:
+            model(torch.randn(4, 8))
+        stats = {s.name: s for s in prof.key_averages()}
+        linear_flops = 2 * 4 * 8 * 8 + 4 * 8
+        self.assertEqual(stats['0'].flops, linear_flops)
+        self.assertEqual(stats['2.0'].flops, linear_flops)
+        self.assertEqual(stats['2'].self_flops, 0)
+        self.assertEqual(stats['2'].flops, linear_flops + 4 * 8)
+        self.assertEqual(stats['Sequential'].flops, 2 * (linear_flops + 4 * 8))
+        self.assertIn('GFLOP/s', prof.table())
+
+        # submodules named like ops don't capture the events of these ops
+        model = nn.Sequential(OrderedDict([('addmm', nn.Linear(8, 8)), ('relu', nn.ReLU())]))
+        with profile_modules(model, record_backward=False, record_flops=True) as prof:
+            model(torch.randn(4, 8))
+        stats = {s.name: s for s in prof.key_averages()}
+        self.assertEqual(stats['addmm'].flops, linear_flops)
+        self.assertEqual(stats['relu'].flops, 4 * 8)
+        self.assertEqual(stats['Sequential'].flops, linear_flops + 4 * 8)
+
 test_dir = os.path.abspath(os.path.dirname(str(__file__)))
 
 
@@ -350,13 +565,15 @@ class TestBottleneck(TestCase):
             err = err.decode("ascii")
         return (rc, output, err)
 
-    def _run_bottleneck(self, test_file, scriptargs=''):
+    def _run_bottleneck(self, test_file, scriptargs='', options=''):
         curdir = os.path.dirname(os.path.abspath(__file__))
         filepath = '{}/{}'.format(curdir, test_file)
         if scriptargs != '':
             scriptargs = ' {}'.format(scriptargs)
+        if options != '':
+            options = '{} '.format(options)
         rc, out, err = self._run(
-            '{} -m torch.utils.bottleneck {}{}'.format(sys.executable, filepath, scriptargs))
+            '{} -m torch.utils.bottleneck {}{}{}'.format(sys.executable, options, filepath, scriptargs))
         return rc, out, err
 
     def _check_run_args(self):
@@ -418,6 +635,53 @@ class TestBottleneck(TestCase):
         self._check_cprof_summary(out)
         self._check_cuda(out)
 
+    @unittest.skipIf(HAS_CUDA, 'CPU-only test')
+    def test_bottleneck_sampling(self):
+        with tempfile.NamedTemporaryFile(suffix='.txt') as folded:
+            rc, out, err = self._run_bottleneck(
+                'bottleneck_test/test.py',
+                options='--mode sampling --sampling-interval 1 --folded-output {}'.format(folded.name))
+            self.assertEqual(rc, 0, 'Run failed with\n{}'.format(err))
+            self.assertTrue(os.path.exists(folded.name))
+
+        self._check_environment_summary(out)
+        self._check_autograd_summary(out)
+        self.assertIsNotNone(re.search('sampling profiler output', out),
+                             self._fail_msg('Should have sampling profiler output', out))
+        self.assertIsNone(re.search('cProfile output', out),
+                          self._fail_msg('Should not run cProfile', out))
+
+    def test_bottleneck_sampling_op_frames(self):
+        from torch.autograd.profiler import FunctionEvent
+        from torch.utils.bottleneck.__main__ import StackSampler, _SAMPLING_START
+
+        # the marker at 1000us lines up with the sampling start at 10s
+        events = [
+            FunctionEvent(0, _SAMPLING_START, 1, 1000, 1001),
+            FunctionEvent(1, 'aten::linear', 1, 2000, 5000),
+            FunctionEvent(2, 'aten::addmm', 1, 2500, 4000),
+            FunctionEvent(3, 'aten::relu', 1, 6000, 7000),
+            # ops of other threads aren't attributed
+            FunctionEvent(4, 'aten::mul', 2, 7000, 9000),
+        ]
+        sampler = StackSampler()
+        stack = ('<module> (script.py:1)', 'forward (script.py:5)')
+        # at 1500us, 3000us, 4500us, 6500us and 8000us in the profiler
+        sampler.samples = [(10 + t * 1e-6, stack) for t in [500, 2000, 3500, 5500, 7000]]
+        sampler.num_samples = len(sampler.samples)
+        sampler.add_op_frames(events, 10)
+
+        self.assertEqual(sampler.num_op_samples, 3)
+        self.assertEqual(dict(sampler.stacks), {
+            stack: 2,
+            stack + ('aten::linear',): 1,
+            stack + ('aten::linear', 'aten::addmm'): 1,
+            stack + ('aten::relu',): 1,
+        })
+        self_counts, inclusive_counts = sampler.function_counts()
+        self.assertEqual(self_counts['aten::addmm'], 1)
+        self.assertEqual(inclusive_counts['aten::linear'], 2)
+
     @unittest.skipIf(not HAS_CUDA, 'No CUDA')
     @skipIfRocm
     def test_bottleneck_cuda(self):
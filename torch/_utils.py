@@ -1,5 +1,6 @@
 import torch
 import warnings
+from torch._six import inf
 from collections import defaultdict
 import sys
 import traceback
@@ -292,6 +293,72 @@ def _unflatten_sparse_tensors(flat, tensors):
     return tuple(outputs)
 
 
+def _merge_adjacent_tensors(tensors):
+    """Merge the dense tensors that are laid out one after the other in the same
+    storage, e.g. views of a buffer given by _flatten_dense_tensors, into 1D
+    tensors covering them. Reductions and element-wise operations over the
+    inputs can then be done with one operation per returned tensor.
+
+    Arguments:
+        tensors (Iterable[Tensor]): tensors to merge. Sparse and non-contiguous
+          tensors are returned as is.
+
+    Returns:
+        A list of tensors sharing the memory of the inputs, which together
+        cover all of them.
+    """
+    merged = []
+    start, end = None, None
+
+    def flush():
+        if start is not None:
+            offset = start.storage_offset()
+            merged.append(start.new_empty(0).set_(start.storage(), offset, (end - offset,)))
+
+    for tensor in tensors:
+        if tensor.is_sparse or not tensor.is_contiguous():
+            flush()
+            start = None
+            merged.append(tensor)
+            continue
+        if (start is not None and tensor.dtype == start.dtype and tensor.device == start.device and
+                tensor.storage().data_ptr() == start.storage().data_ptr() and
+                tensor.storage_offset() == end):
+            end += tensor.numel()
+            continue
+        flush()
+        start, end = tensor, tensor.storage_offset() + tensor.numel()
+    flush()
+    return merged
+
+
+def _total_norm(tensors, norm_type):
+    r"""Returns the ``norm_type``-norm of ``tensors`` viewed as a single vector.
+
+    Tensors laid out one after the other in the same storage, e.g. gradients
+    packed in a flat buffer, are reduced with a single op.
+    """
+    tensors = _merge_adjacent_tensors(tensors)
+    if len(tensors) == 0:
+        return torch.tensor(0.)
+    if norm_type == inf:
+        norms = [t.abs().max() for t in tensors]
+    else:
+        norms = [torch.norm(t, norm_type) for t in tensors]
+    if len(norms) == 1:
+        return norms[0]
+    device = norms[0].device
+    norms = torch.stack([norm.to(device) for norm in norms])
+    return norms.max() if norm_type == inf else torch.norm(norms, norm_type)
+
+
+def _scale_(tensors, scale):
+    r"""Multiplies ``tensors`` in-place by the 0-dim tensor ``scale``, with a
+    single op for tensors laid out one after the other in the same storage."""
+    for t in _merge_adjacent_tensors(tensors):
+        t.mul_(scale.to(t.device))
+
+
 def _reorder_tensors_as(tensors, ordered_tensors):
     """Assume that tensors are of same order as ordered_tensors within their
     types, e.g., from _take_tensors. Reorder them to be of same order as
@@ -2,7 +2,8 @@ import itertools
 import torch
 
 from collections import defaultdict, namedtuple
-from operator import attrgetter
+from functools import reduce
+from operator import attrgetter, mul
 
 try:
     # Available in Python >= 3.2
@@ -228,7 +229,9 @@ class profile(object):
             Most likely the skew will be negligible for bottom most events (in a case
             of nested function calls). But for higher level functions the total
             self cpu time might be artificially increased because of the shape
-            collection.
+            collection. Recorded shapes are also used to estimate the FLOPs and
+            bytes moved by common ops (see :func:`register_op_cost`), in which
+            case tables report the achieved GFLOP/s and GB/s.
 
     .. warning:
         This context managers should not be called recursively, i.e. at most one
@@ -522,7 +525,8 @@ def attr_formatter(name):
 class FormattedTimesMixin(object):
     """Helpers for FunctionEvent and FunctionEventAvg.
 
-    The subclass should define `*_time_total` and `count` attributes.
+    The subclass should define `*_time_total`, `flops`, `bytes_moved` and
+    `count` attributes.
     """
     cpu_time_str = attr_formatter('cpu_time')
     cuda_time_str = attr_formatter('cuda_time')
@@ -538,6 +542,15 @@ class FormattedTimesMixin(object):
     def cuda_time(self):
         return 0.0 if self.count == 0 else 1.0 * self.cuda_time_total / self.count
 
+    @property
+    def gflops_per_second(self):
+        # flops / us == MFLOP/s
+        return 0.0 if self.cpu_time_total == 0 else self.flops / (1e3 * self.cpu_time_total)
+
+    @property
+    def gbytes_per_second(self):
+        return 0.0 if self.cpu_time_total == 0 else self.bytes_moved / (1e3 * self.cpu_time_total)
+
 
 class Interval(object):
     def __init__(self, start, end):
@@ -594,6 +607,20 @@ class FunctionEvent(FormattedTimesMixin):
     def key(self):
         return self.name
 
+    @property
+    def flops(self):
+        return self._op_cost[0]
+
+    @property
+    def bytes_moved(self):
+        return self._op_cost[1]
+
+    @property
+    def _op_cost(self):
+        if not hasattr(self, '_cached_op_cost'):
+            self._cached_op_cost = estimate_op_cost(self.name, self.input_shapes)
+        return self._cached_op_cost
+
     def __repr__(self):
         return (
             '<FunctionEvent id={} cpu_time={} cpu_start={} cpu_end={} '
@@ -619,6 +646,8 @@ class FunctionEventAvg(FormattedTimesMixin):
         self.cpu_time_total = 0
         self.cuda_time_total = 0
         self.self_cpu_time_total = 0
+        self.flops = 0
+        self.bytes_moved = 0
         self.input_shapes = None
 
     def add(self, other, group_by_input_shapes=False):
@@ -636,6 +665,8 @@ class FunctionEventAvg(FormattedTimesMixin):
         self.cpu_time_total += other.cpu_time_total
         self.cuda_time_total += other.cuda_time_total
         self.self_cpu_time_total += other.self_cpu_time_total
+        self.flops += other.flops
+        self.bytes_moved += other.bytes_moved
         self.count += other.count
         return self
 
@@ -655,6 +686,138 @@ class FunctionEventAvg(FormattedTimesMixin):
         )
 
 
+################################################################################
+# FLOP and memory traffic estimates
+
+# Input shapes are all the profiler records about an op, dtypes are not known.
+# Memory traffic is therefore estimated assuming 4-byte (float32) elements.
+_ASSUMED_ELEMENT_SIZE = 4
+
+_op_cost_formulas = {}
+
+
+def register_op_cost(name, formula):
+    """Registers a FLOP and memory traffic estimate for the op called ``name``.
+
+    When the profiler is run with ``record_shapes=True``, every event whose name
+    has a registered formula reports ``flops`` and ``bytes_moved``, and the
+    tables produced by :meth:`EventList.table` show the achieved GFLOP/s and GB/s.
+
+    Arguments:
+        name (str): name of the op as it appears in the profiler output, e.g.
+            ``"addmm"`` or the label passed to :class:`record_function`.
+        formula (callable): takes the list of input shapes recorded for the op
+            (non-tensor arguments are represented by ``[]``) and returns a
+            ``(flops, elements)`` tuple, where ``elements`` is the number of
+            tensor elements read and written by the op.
+
+    Example:
+        >>> def my_op_cost(input_shapes):
+        >>>     n = numel(input_shapes[0])
+        >>>     return 3 * n, 2 * n
+        >>> torch.autograd.profiler.register_op_cost("my_op", my_op_cost)
+    """
+    _op_cost_formulas[name] = formula
+
+
+def estimate_op_cost(name, input_shapes):
+    """Returns the ``(flops, bytes_moved)`` estimate for an op, ``(0, 0)`` if unknown."""
+    formula = _op_cost_formulas.get(name)
+    if formula is None or not input_shapes:
+        return 0, 0
+    try:
+        flops, elements = formula(input_shapes)
+    except (IndexError, ValueError, ZeroDivisionError):
+        # the op was called with an overload the formula does not understand
+        return 0, 0
+    return int(flops), int(elements) * _ASSUMED_ELEMENT_SIZE
+
+
+def numel(shape):
+    return reduce(mul, shape, 1)
+
+
+def _tensor_shapes(input_shapes):
+    # scalars and other non-tensor arguments are recorded as []
+    return [shape for shape in input_shapes if len(shape) > 0]
+
+
+def _broadcast_numel(shapes):
+    ndim = max(len(shape) for shape in shapes)
+    out = [1] * ndim
+    for shape in shapes:
+        for i, size in enumerate(shape, ndim - len(shape)):
+            out[i] = max(out[i], size)
+    return numel(out)
+
+
+def _elementwise_cost(flops_per_element=1):
+    def formula(input_shapes):
+        shapes = _tensor_shapes(input_shapes)
+        out = _broadcast_numel(shapes)
+        return flops_per_element * out, sum(numel(shape) for shape in shapes) + out
+    return formula
+
+
+def _reduction_cost(input_shapes):
+    n = numel(input_shapes[0])
+    return n, n
+
+
+def _mm_cost(input_shapes):
+    (m, k), (_, n) = input_shapes[0], input_shapes[1]
+    return 2 * m * k * n, m * k + k * n + m * n
+
+
+def _addmm_cost(input_shapes):
+    bias, (m, k), (_, n) = input_shapes[0], input_shapes[1], input_shapes[2]
+    return 2 * m * k * n + m * n, numel(bias) + m * k + k * n + m * n
+
+
+def _bmm_cost(input_shapes):
+    (b, m, k), (_, _, n) = input_shapes[0], input_shapes[1]
+    return 2 * b * m * k * n, b * (m * k + k * n + m * n)
+
+
+def _baddbmm_cost(input_shapes):
+    bias, (b, m, k), (_, _, n) = input_shapes[0], input_shapes[1], input_shapes[2]
+    return 2 * b * m * k * n + b * m * n, numel(bias) + b * (m * k + k * n + m * n)
+
+
+def _conv_cost(input_shapes):
+    # The output size depends on stride / padding, which are not recorded, so
+    # the output is assumed to have the spatial size of the input. For strided
+    # convolutions this is an upper bound.
+    input, weight = input_shapes[0], input_shapes[1]
+    out_channels, in_channels_per_group = weight[0], weight[1]
+    out_elements = input[0] * out_channels * numel(input[2:])
+    flops = 2 * out_elements * in_channels_per_group * numel(weight[2:])
+    elements = numel(input) + numel(weight) + out_elements
+    if len(input_shapes) > 2 and len(input_shapes[2]) > 0:
+        flops += out_elements
+        elements += numel(input_shapes[2])
+    return flops, elements
+
+
+register_op_cost('mm', _mm_cost)
+register_op_cost('addmm', _addmm_cost)
+register_op_cost('bmm', _bmm_cost)
+register_op_cost('baddbmm', _baddbmm_cost)
+for _name in ['conv1d', 'conv2d', 'conv3d']:
+    register_op_cost(_name, _conv_cost)
+for _name in ['add', 'add_', 'sub', 'sub_', 'mul', 'mul_', 'div', 'div_',
+              'relu', 'relu_', 'threshold', 'threshold_', 'neg', 'abs',
+              'clamp', 'clamp_', 'addcmul', 'addcmul_', 'addcdiv', 'addcdiv_',
+              'lerp_', 'sqrt', 'rsqrt', 'reciprocal', 'pow', 'where']:
+    register_op_cost(_name, _elementwise_cost())
+for _name in ['sigmoid', 'tanh', 'exp', 'log', 'gelu', 'erf']:
+    register_op_cost(_name, _elementwise_cost(flops_per_element=4))
+for _name in ['softmax', 'log_softmax', '_softmax', '_log_softmax']:
+    register_op_cost(_name, _elementwise_cost(flops_per_element=5))
+for _name in ['sum', 'mean', 'norm', 'max', 'min', 'prod', 'var', 'std']:
+    register_op_cost(_name, _reduction_cost)
+
+
 ################################################################################
 # Utilities
 
@@ -815,6 +978,7 @@ def build_table(events, sort_by=None, header=None, row_limit=100, use_cuda=True)
 
     has_input_shapes = any(
         [event.input_shapes is not None for event in events])
+    has_flops = any([event.flops > 0 or event.bytes_moved > 0 for event in events])
     name_column_width = max([len(evt.key) for evt in events]) + 4
     DEFAULT_COLUMN_WIDTH = 15
     SHAPES_COLUMN_WIDTH = 35
@@ -836,6 +1000,12 @@ def build_table(events, sort_by=None, header=None, row_limit=100, use_cuda=True)
     headers.append(
         'Number of Calls'
     )
+    if has_flops:
+        headers.extend([
+            'Total GFLOPs',
+            'GFLOP/s',
+            'GB/s',
+        ])
 
     # Have to use a list because nonlocal is Py3 only...
     SPACING_SIZE = 2
@@ -900,6 +1070,12 @@ def build_table(events, sort_by=None, header=None, row_limit=100, use_cuda=True)
         row_values.append(
             evt.count,  # Number of calls
         )
+        if has_flops:
+            row_values.extend([
+                '{:.3f}'.format(evt.flops / 1e9),
+                '{:.2f}'.format(evt.gflops_per_second),
+                '{:.2f}'.format(evt.gbytes_per_second),
+            ])
         if has_input_shapes:
             row_values.append(str(evt.input_shapes)[:SHAPES_COLUMN_WIDTH])
         append(row_format.format(*row_values))
@@ -16,11 +16,15 @@ void initThroughputBenchmarkBindings(PyObject* module) {
           "num_calling_threads", &BenchmarkConfig::num_calling_threads)
       .def_readwrite("num_worker_threads", &BenchmarkConfig::num_worker_threads)
       .def_readwrite("num_warmup_iters", &BenchmarkConfig::num_warmup_iters)
-      .def_readwrite("num_iters", &BenchmarkConfig::num_iters);
+      .def_readwrite("num_iters", &BenchmarkConfig::num_iters)
+      .def_readwrite("target_qps", &BenchmarkConfig::target_qps);
 
   py::class_<BenchmarkExecutionStats>(m, "BenchmarkExecutionStats")
       .def_readonly("latency_avg_ms", &BenchmarkExecutionStats::latency_avg_ms)
-      .def_readonly("num_iters", &BenchmarkExecutionStats::num_iters);
+      .def_readonly("num_iters", &BenchmarkExecutionStats::num_iters)
+      .def_readonly("total_time_ms", &BenchmarkExecutionStats::total_time_ms)
+      .def_readonly(
+          "thread_latencies_ms", &BenchmarkExecutionStats::thread_latencies_ms);
 
   py::class_<ThroughputBenchmark>(m, "ThroughputBenchmark", py::dynamic_attr())
       .def(py::init<jit::Module>())
@@ -52,6 +52,12 @@ BenchmarkExecutionStats BenchmarkHelper<Input, Output, Model>::benchmark(
   bool start{false};
   std::atomic<int64_t> num_attempted_iters{0};
   std::vector<std::thread> callers;
+  std::vector<std::vector<float>> thread_latencies_ms(
+      config.num_calling_threads);
+
+  using Clock = std::chrono::high_resolution_clock;
+  using TimePoint = std::chrono::time_point<Clock>;
+  TimePoint start_time;
 
   for (auto thread_id = 0; thread_id < config.num_calling_threads;
        ++thread_id) {
@@ -71,8 +77,27 @@ BenchmarkExecutionStats BenchmarkHelper<Input, Output, Model>::benchmark(
         }
       }
       LOG(INFO) << "Starting forward thread " << thread_id;
-      while (num_attempted_iters.fetch_add(1) < config.num_iters) {
+      auto& latencies_ms = thread_latencies_ms[thread_id];
+      int64_t iter;
+      while ((iter = num_attempted_iters.fetch_add(1)) < config.num_iters) {
+        TimePoint request_start;
+        if (config.target_qps > 0) {
+          // Open loop: request number iter is due at a fixed point in time
+          // no matter how long the previous requests took
+          request_start = start_time +
+              std::chrono::duration_cast<Clock::duration>(
+                  std::chrono::duration<double>(iter / config.target_qps));
+          std::this_thread::sleep_until(request_start);
+        } else {
+          request_start = Clock::now();
+        }
         runOnce(std::move(thread_inputs[thread_id][input_iters[thread_id]]));
+        auto request_end = Clock::now();
+        latencies_ms.push_back(
+            std::chrono::duration_cast<std::chrono::nanoseconds>(
+                request_end - request_start)
+                .count() /
+            1000.0 / 1000.0);
         ++input_iters[thread_id];
       }
 
@@ -87,10 +112,6 @@ BenchmarkExecutionStats BenchmarkHelper<Input, Output, Model>::benchmark(
     });
   }
 
-  using Clock = std::chrono::high_resolution_clock;
-  using TimePoint = std::chrono::time_point<Clock>;
-  TimePoint start_time;
-
   {
     std::unique_lock<std::mutex> lock(m);
     while (initialized != config.num_calling_threads) {
@@ -110,21 +131,35 @@ BenchmarkExecutionStats BenchmarkHelper<Input, Output, Model>::benchmark(
   auto end_time = std::chrono::high_resolution_clock::now();
   LOG(INFO) << "Finished benchmark";
 
+  for (auto& t : callers) {
+    t.join();
+  }
+
   BenchmarkExecutionStats stats;
   float total_time_ms = std::chrono::duration_cast<std::chrono::nanoseconds>(
                             end_time - start_time)
                             .count() /
       1000.0 / 1000.0;
-  // We use config.num_iters instead of num_attempted_iters as it is
-  // repsesatative of the real work done. Last attempted iteration on each
-  // calling threads doesn't represent the real work (i.e. running the model)
-  stats.latency_avg_ms =
-      total_time_ms * config.num_calling_threads / config.num_iters;
   stats.num_iters = config.num_iters;
-
-  for (auto& t : callers) {
-    t.join();
+  stats.total_time_ms = total_time_ms;
+  if (config.target_qps > 0) {
+    // Wall clock time is dictated by the schedule in the open-loop mode, so
+    // the average comes from the per-request measurements
+    double latency_sum_ms = 0;
+    for (const auto& latencies_ms : thread_latencies_ms) {
+      for (auto latency_ms : latencies_ms) {
+        latency_sum_ms += latency_ms;
+      }
+    }
+    stats.latency_avg_ms = latency_sum_ms / config.num_iters;
+  } else {
+    // We use config.num_iters instead of num_attempted_iters as it is
+    // repsesatative of the real work done. Last attempted iteration on each
+    // calling threads doesn't represent the real work (i.e. running the model)
+    stats.latency_avg_ms =
+        total_time_ms * config.num_calling_threads / config.num_iters;
   }
+  stats.thread_latencies_ms = std::move(thread_latencies_ms);
   return stats;
 }
 
@@ -21,6 +21,13 @@ namespace throughput_benchmark {
 struct BenchmarkExecutionStats {
   float latency_avg_ms{-1};
   int64_t num_iters{-1};
+  // Wall clock time between the start of the first and the end of the last
+  // measured iteration across all the calling threads
+  float total_time_ms{-1};
+  // Latency of every measured request, one vector per calling thread. In the
+  // open-loop mode latency is measured from the time the request was
+  // scheduled, so that it includes queueing delay.
+  std::vector<std::vector<float>> thread_latencies_ms;
 };
 
 /**
@@ -49,6 +56,11 @@ struct BenchmarkConfig {
   // Number of iterations the benchmark should run with. This number is separate
   // from the warmup iterations
   int64_t num_iters{100};
+  // When positive, requests are issued on a fixed schedule of target_qps
+  // requests per second across all calling threads (open loop) instead of
+  // back to back (closed loop). Calling threads then act as a pool serving the
+  // scheduled requests.
+  double target_qps{0};
 };
 
 namespace detail {
@@ -0,0 +1,10 @@
+"""
+:mod:`torch.distributed.algorithms.ddp_comm_hooks` provides communication
+hooks for :class:`~torch.nn.parallel.DistributedDataParallel`, which replace
+the all-reduce of the gradient buckets, e.g. to compress the gradients. See
+:meth:`~torch.nn.parallel.DistributedDataParallel.register_comm_hook`.
+"""
+from .grad_bucket import Future, GradBucket
+from .default_hooks import allreduce_hook, fp16_compress_hook
+from .powerSGD_hook import PowerSGDState, powerSGD_hook
+from .topk_hook import TopKState, topk_hook
@@ -0,0 +1,55 @@
+import torch
+from torch.distributed.distributed_c10d import _get_default_group
+from .grad_bucket import Future
+
+
+def _group_or_default(process_group):
+    return process_group if process_group is not None else _get_default_group()
+
+
+def _allreduce_fut(process_group, tensor):
+    # Averages tensor across the processes of the group, in place
+    tensor.div_(process_group.size())
+    return Future(tensor, [process_group.allreduce([tensor])])
+
+
+def allreduce_hook(process_group, bucket):
+    r"""Averages the gradients of the bucket with an all-reduce, like
+    :class:`~torch.nn.parallel.DistributedDataParallel` without a hook.
+
+    Arguments:
+        process_group: the process group to average across, or ``None`` for
+            the default process group; the state passed to
+            :meth:`~torch.nn.parallel.DistributedDataParallel.register_comm_hook`
+        bucket (GradBucket): the bucket of gradients
+
+    Example::
+
+        >>> ddp_model.register_comm_hook(process_group, allreduce_hook)
+    """
+    return _allreduce_fut(_group_or_default(process_group), bucket.get_tensor())
+
+
+def fp16_compress_hook(process_group, bucket):
+    r"""Averages the gradients of the bucket with an all-reduce in half
+    precision, halving the communicated bytes of float gradients, and casts
+    the result back to the dtype of the gradients.
+
+    Arguments:
+        process_group: the process group to average across, or ``None`` for
+            the default process group
+        bucket (GradBucket): the bucket of gradients
+
+    Example::
+
+        >>> ddp_model.register_comm_hook(process_group, fp16_compress_hook)
+    """
+    process_group = _group_or_default(process_group)
+    buffer = bucket.get_tensor()
+    compressed = buffer.to(torch.float16).div_(process_group.size())
+    future = Future(compressed, [process_group.allreduce([compressed])])
+
+    def decompress(future):
+        return buffer.copy_(future.value())
+
+    return future.then(decompress)
@@ -0,0 +1,91 @@
+class Future(object):
+    r"""Result of the asynchronous communication of a bucket, returned by a
+    communication hook.
+
+    A future holds a value and the c10d works (returned by the
+    ``async_op=True`` collectives or by the methods of a process group) that
+    must complete before the value can be read. :meth:`then` chains a
+    callback, e.g. to decompress the reduced tensor, which runs when the
+    chained future is waited on, and may itself return a future.
+
+    Arguments:
+        value: the value of the future, e.g. the tensor being all-reduced
+        works (list, optional): the works to wait on before returning
+            :attr:`value` (default: empty)
+    """
+    def __init__(self, value=None, works=()):
+        self._value = value
+        self._works = list(works)
+        self._parent = None
+        self._callback = None
+        self._done = False
+
+    def then(self, callback):
+        r"""Returns a future whose value is ``callback(self)``, called once
+        this future is completed."""
+        future = Future()
+        future._parent = self
+        future._callback = callback
+        return future
+
+    def wait(self):
+        r"""Blocks until the future is completed and returns its value."""
+        if not self._done:
+            if self._parent is not None:
+                self._parent.wait()
+                value = self._callback(self._parent)
+                if isinstance(value, Future):
+                    value = value.wait()
+                self._value = value
+                self._parent = self._callback = None
+            for work in self._works:
+                work.wait()
+            self._works = []
+            self._done = True
+        return self._value
+
+    def value(self):
+        r"""Returns the value of the future, waiting for it to complete."""
+        return self.wait()
+
+
+class GradBucket(object):
+    r"""A bucket of gradients passed to a communication hook.
+
+    The gradients of the parameters of the bucket are copied, one after the
+    other, into a single flat tensor. The hook reduces it across processes
+    and returns a :class:`Future` of a flat tensor of the same size, the
+    averaged gradients, which are copied back into the ``.grad`` of the
+    parameters.
+
+    Arguments:
+        index (int): index of the bucket, buckets are communicated in order
+            of index in each iteration, starting from 0
+        tensor (Tensor): flat tensor of the gradients
+        shapes (list of torch.Size): shapes of the gradients in the bucket
+    """
+    def __init__(self, index, tensor, shapes):
+        self._index = index
+        self._tensor = tensor
+        self._shapes = list(shapes)
+
+    def get_index(self):
+        r"""Returns the index of the bucket."""
+        return self._index
+
+    def get_tensor(self):
+        r"""Returns the flat tensor of the gradients."""
+        return self._tensor
+
+    def get_per_parameter_tensors(self):
+        r"""Returns the gradients of the parameters of the bucket, as views of
+        the flat tensor."""
+        tensors = []
+        offset = 0
+        for shape in self._shapes:
+            numel = 1
+            for size in shape:
+                numel *= size
+            tensors.append(self._tensor[offset:offset + numel].view(shape))
+            offset += numel
+        return tensors
@@ -0,0 +1,180 @@
+import torch
+from .default_hooks import _allreduce_fut, _group_or_default
+from .grad_bucket import Future
+
+
+def _orthogonalize(matrix, eps=1e-8):
+    # Gram-Schmidt orthogonalization of the columns of matrix, in place
+    num_cols = matrix.size(1)
+    for i in range(num_cols):
+        col = matrix[:, i:i + 1]
+        col.div_(col.norm().add_(eps))
+        if i + 1 < num_cols:
+            rest = matrix[:, i + 1:]
+            rest.sub_(torch.mm(col, torch.mm(col.t(), rest)))
+
+
+class PowerSGDState(object):
+    r"""State of :func:`powerSGD_hook`, passed to
+    :meth:`~torch.nn.parallel.DistributedDataParallel.register_comm_hook`.
+
+    Arguments:
+        process_group: the process group to average across, or ``None`` for
+            the default process group
+        matrix_approximation_rank (int, optional): rank of the approximation
+            of the gradients; higher ranks are more accurate but communicate
+            more (default: 1)
+        start_powerSGD_iter (int, optional): number of iterations whose
+            gradients are all-reduced without compression, which usually helps
+            the convergence at the beginning of training (default: 10)
+        use_error_feedback (bool, optional): whether to add the compression
+            error of each gradient to the gradient of the next iteration
+            (default: ``True``)
+        warm_start (bool, optional): whether to start the power iteration of
+            each iteration from the result of the previous one, instead of a
+            random matrix (default: ``True``)
+        random_seed (int, optional): seed of the random matrices, which must
+            be the same in all the processes (default: 0)
+    """
+    def __init__(self, process_group, matrix_approximation_rank=1, start_powerSGD_iter=10,
+                 use_error_feedback=True, warm_start=True, random_seed=0):
+        if matrix_approximation_rank < 1:
+            raise ValueError("Invalid matrix_approximation_rank value: {}".format(matrix_approximation_rank))
+        self.process_group = process_group
+        self.matrix_approximation_rank = matrix_approximation_rank
+        self.start_powerSGD_iter = start_powerSGD_iter
+        self.use_error_feedback = use_error_feedback
+        self.warm_start = warm_start
+        self.generator = torch.Generator()
+        self.generator.manual_seed(random_seed)
+        # Compression errors, and P and Q matrices of the last iteration,
+        # per bucket index
+        self.error_dict = {}
+        self.p_memory_dict = {}
+        self.q_memory_dict = {}
+        self.iter = 0
+
+
+def powerSGD_hook(state, bucket):
+    r"""Averages the gradients of the bucket compressed by PowerSGD, as
+    described in `PowerSGD: Practical Low-Rank Gradient Compression for
+    Distributed Optimization`_.
+
+    Each gradient of the bucket is viewed as a matrix ``M`` of shape
+    ``(n, m)`` (its first dimension by the others), which is approximated by
+    ``P Q^T``, ``P`` and ``Q`` being of shapes ``(n, r)`` and ``(m, r)`` for
+    the rank ``r`` of the approximation, with one step of power iteration:
+
+    1. ``P = M Q`` is computed from the ``Q`` of the previous iteration (or a
+       random one) and all-reduced, then orthogonalized;
+    2. ``Q = M^T P`` is computed and all-reduced, then averaged;
+    3. ``M`` is replaced by ``P Q^T``, an approximation of the average of the
+       gradients.
+
+    Only ``(n + m) r`` elements are communicated instead of ``n m``. The
+    gradients that aren't smaller once compressed, e.g. biases, are averaged
+    uncompressed, with a single all-reduce per bucket. With
+    :attr:`~PowerSGDState.use_error_feedback`, the difference between each
+    local gradient and its approximation is added to its next gradient.
+
+    Arguments:
+        state (PowerSGDState): state of the hook
+        bucket (GradBucket): the bucket of gradients
+
+    Example::
+
+        >>> state = PowerSGDState(process_group=None, matrix_approximation_rank=2)
+        >>> ddp_model.register_comm_hook(state, powerSGD_hook)
+
+    .. _PowerSGD\: Practical Low-Rank Gradient Compression for Distributed Optimization:
+        https://arxiv.org/abs/1905.13727
+    """
+    process_group = _group_or_default(state.process_group)
+    world_size = process_group.size()
+    index = bucket.get_index()
+    if index == 0:
+        state.iter += 1
+    if state.iter <= state.start_powerSGD_iter:
+        return _allreduce_fut(process_group, bucket.get_tensor())
+
+    rank = state.matrix_approximation_rank
+    uncompressed, matrices = [], []
+    for tensor in bucket.get_per_parameter_tensors():
+        if tensor.dim() > 1:
+            matrix = tensor.view(tensor.size(0), -1)
+            n, m = matrix.size()
+            if (n + m) * min(rank, n, m) < n * m:
+                matrices.append(matrix)
+                continue
+        uncompressed.append(tensor)
+
+    # The small gradients are all-reduced together, with the first collective
+    if uncompressed:
+        flat = torch.cat([t.reshape(-1) for t in uncompressed])
+        uncompressed_fut = _allreduce_fut(process_group, flat)
+    if not matrices:
+        def copy_uncompressed(future):
+            offset = 0
+            for t in uncompressed:
+                t.copy_(future.value()[offset:offset + t.numel()].view_as(t))
+                offset += t.numel()
+            return bucket.get_tensor()
+        return uncompressed_fut.then(copy_uncompressed)
+
+    if state.use_error_feedback:
+        if index in state.error_dict:
+            for matrix, error in zip(matrices, state.error_dict[index]):
+                matrix.add_(error)
+        originals = [matrix.clone() for matrix in matrices]
+
+    ranks = [min(rank, *matrix.size()) for matrix in matrices]
+    p_numel = sum(matrix.size(0) * r for matrix, r in zip(matrices, ranks))
+    q_numel = sum(matrix.size(1) * r for matrix, r in zip(matrices, ranks))
+    p_memory = state.p_memory_dict.get(index)
+    q_memory = state.q_memory_dict.get(index)
+    need_randomize = (q_memory is None or q_memory.numel() != q_numel or not state.warm_start)
+    if p_memory is None or p_memory.numel() != p_numel:
+        p_memory = state.p_memory_dict[index] = matrices[0].new_empty(p_numel)
+    if need_randomize:
+        # Drawn from the same generator in all the processes
+        q_memory = torch.randn(q_numel, generator=state.generator).to(matrices[0])
+        state.q_memory_dict[index] = q_memory
+
+    ps, qs = [], []
+    p_offset = q_offset = 0
+    for matrix, r in zip(matrices, ranks):
+        n, m = matrix.size()
+        ps.append(p_memory[p_offset:p_offset + n * r].view(n, r))
+        qs.append(q_memory[q_offset:q_offset + m * r].view(m, r))
+        p_offset += n * r
+        q_offset += m * r
+    if need_randomize:
+        for q in qs:
+            _orthogonalize(q)
+
+    for matrix, p, q in zip(matrices, ps, qs):
+        torch.mm(matrix, q, out=p)
+    p_fut = Future(p_memory, [process_group.allreduce([p_memory])])
+
+    def compute_q(future):
+        future.value()
+        for matrix, p, q in zip(matrices, ps, qs):
+            _orthogonalize(p)
+            torch.mm(matrix.t(), p, out=q)
+        return Future(q_memory, [process_group.allreduce([q_memory])])
+
+    def decompress(future):
+        future.value().div_(world_size)
+        for matrix, p, q in zip(matrices, ps, qs):
+            torch.mm(p, q.t(), out=matrix)
+        if state.use_error_feedback:
+            state.error_dict[index] = [original.sub_(matrix) for original, matrix in zip(originals, matrices)]
+        if uncompressed:
+            uncompressed_fut.wait()
+            offset = 0
+            for t in uncompressed:
+                t.copy_(flat[offset:offset + t.numel()].view_as(t))
+                offset += t.numel()
+        return bucket.get_tensor()
+
+    return p_fut.then(compute_q).then(decompress)
@@ -0,0 +1,76 @@
+import math
+
+import torch
+from .default_hooks import _group_or_default
+from .grad_bucket import Future
+
+
+class TopKState(object):
+    r"""State of :func:`topk_hook`, passed to
+    :meth:`~torch.nn.parallel.DistributedDataParallel.register_comm_hook`.
+
+    Arguments:
+        process_group: the process group to average across, or ``None`` for
+            the default process group
+        compress_ratio (float, optional): fraction of the elements of each
+            bucket communicated by each process (default: 0.01)
+        use_error_feedback (bool, optional): whether to add the elements that
+            weren't communicated to the gradient of the next iteration
+            (default: ``True``)
+    """
+    def __init__(self, process_group, compress_ratio=0.01, use_error_feedback=True):
+        if not 0.0 < compress_ratio <= 1.0:
+            raise ValueError("Invalid compress_ratio value: {}".format(compress_ratio))
+        self.process_group = process_group
+        self.compress_ratio = compress_ratio
+        self.use_error_feedback = use_error_feedback
+        # Residuals of the last iteration, per bucket index
+        self.residual_dict = {}
+
+
+def topk_hook(state, bucket):
+    r"""Averages the gradients of the bucket sparsified to their elements of
+    largest magnitude.
+
+    Each process only communicates the values and indices of the
+    ``ceil(compress_ratio * numel)`` elements of largest magnitude of its
+    bucket, which are all-gathered and summed; the other elements are
+    treated as zeros. With :attr:`~TopKState.use_error_feedback`, the elements
+    that weren't communicated (the residual) are added to the next gradients
+    of the bucket, so that every element is eventually applied.
+
+    Arguments:
+        state (TopKState): state of the hook
+        bucket (GradBucket): the bucket of gradients
+
+    Example::
+
+        >>> state = TopKState(process_group=None, compress_ratio=0.001)
+        >>> ddp_model.register_comm_hook(state, topk_hook)
+    """
+    process_group = _group_or_default(state.process_group)
+    world_size = process_group.size()
+    index = bucket.get_index()
+    tensor = bucket.get_tensor()
+    if state.use_error_feedback and index in state.residual_dict:
+        tensor.add_(state.residual_dict[index])
+
+    k = max(1, int(math.ceil(tensor.numel() * state.compress_ratio)))
+    _, indices = tensor.abs().topk(k, sorted=False)
+    values = tensor.index_select(0, indices)
+    if state.use_error_feedback:
+        state.residual_dict[index] = tensor.index_fill(0, indices, 0)
+
+    all_values = [torch.empty_like(values) for _ in range(world_size)]
+    all_indices = [torch.empty_like(indices) for _ in range(world_size)]
+    works = [process_group.allgather([all_values], [values]),
+             process_group.allgather([all_indices], [indices])]
+    future = Future((all_values, all_indices), works)
+
+    def decompress(future):
+        all_values, all_indices = future.value()
+        tensor.zero_()
+        tensor.index_add_(0, torch.cat(all_indices), torch.cat(all_values))
+        return tensor.div_(world_size)
+
+    return future.then(decompress)
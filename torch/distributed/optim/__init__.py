@@ -3,6 +3,9 @@
 of remote parameters (:class:`~torch.distributed.rpc.RRef`) and runs the
 optimizer locally on the workers where the parameters live.  The distributed
 optimizer can use any of the local optimizer :ref:`optimizer-algorithms` to
-apply the gradients on each worker.
+apply the gradients on each worker. It also exposes ZeroRedundancyOptimizer,
+which shards the state of a local optimizer across the processes of a data
+parallel group.
 """
 from .optimizer import DistributedOptimizer
+from .zero_redundancy_optimizer import ZeroRedundancyOptimizer
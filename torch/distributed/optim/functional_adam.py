@@ -0,0 +1,76 @@
+from typing import List, Dict, Optional, Tuple
+import math
+
+import torch
+from torch import Tensor
+
+# TorchScript compatible functional Adam optimizer, used by the distributed
+# optimizer to run its local steps in TorchScript, without holding the GIL.
+# Instead of reading ``param.grad``, ``step`` takes the gradients explicitly,
+# e.g. those of a distributed autograd context, so that concurrent trainers
+# don't race on accumulating into the same ``.grad``.
+# NOTE: this is an internal of the distributed optimizer, not a public API.
+@torch.jit.script
+class _FunctionalAdam(object):
+    def __init__(
+        self,
+        params: List[Tensor],
+        lr: float = 1e-3,
+        betas: Tuple[float, float] = (0.9, 0.999),
+        eps: float = 1e-8,
+        weight_decay: float = 0.0,
+        amsgrad: bool = False
+    ):
+        self.lr = lr
+        self.beta1 = betas[0]
+        self.beta2 = betas[1]
+        self.eps = eps
+        self.weight_decay = weight_decay
+        self.amsgrad = amsgrad
+        self.params = params
+        self.step_count = torch.jit.annotate(Dict[int, int], {})
+        self.exp_avg = torch.jit.annotate(Dict[int, Tensor], {})
+        self.exp_avg_sq = torch.jit.annotate(Dict[int, Tensor], {})
+        self.max_exp_avg_sq = torch.jit.annotate(Dict[int, Tensor], {})
+
+    def step(self, gradients: List[Optional[Tensor]]):
+        if len(self.params) != len(gradients):
+            raise ValueError(
+                "the number of gradients ({}) does not match the number of parameters ({})".format(
+                    len(gradients), len(self.params))
+            )
+
+        for i in range(len(self.params)):
+            grad = gradients[i]
+            if grad is not None:
+                # The parameters are leaves that require grad, update them
+                # through a detached alias instead of under no_grad
+                param = self.params[i].detach()
+                if i not in self.step_count:
+                    self.step_count[i] = 0
+                    self.exp_avg[i] = torch.zeros_like(param, memory_format=torch.preserve_format)
+                    self.exp_avg_sq[i] = torch.zeros_like(param, memory_format=torch.preserve_format)
+                    if self.amsgrad:
+                        self.max_exp_avg_sq[i] = torch.zeros_like(param, memory_format=torch.preserve_format)
+
+                step = self.step_count[i] + 1
+                self.step_count[i] = step
+                exp_avg = self.exp_avg[i]
+                exp_avg_sq = self.exp_avg_sq[i]
+                bias_correction1 = 1 - self.beta1 ** step
+                bias_correction2 = 1 - self.beta2 ** step
+
+                if self.weight_decay != 0:
+                    grad = grad.add(param, alpha=self.weight_decay)
+
+                exp_avg.mul_(self.beta1).add_(grad, alpha=1 - self.beta1)
+                exp_avg_sq.mul_(self.beta2).addcmul_(grad, grad, value=1 - self.beta2)
+                if self.amsgrad:
+                    max_exp_avg_sq = self.max_exp_avg_sq[i]
+                    torch.max(max_exp_avg_sq, exp_avg_sq, out=max_exp_avg_sq)
+                    denom = (max_exp_avg_sq.sqrt() / math.sqrt(bias_correction2)).add_(self.eps)
+                else:
+                    denom = (exp_avg_sq.sqrt() / math.sqrt(bias_correction2)).add_(self.eps)
+
+                step_size = self.lr / bias_correction1
+                param.addcdiv_(exp_avg, denom, value=-step_size)
@@ -0,0 +1,57 @@
+from typing import List, Dict, Optional
+
+import torch
+from torch import Tensor
+
+# TorchScript compatible functional SGD optimizer, used by the distributed
+# optimizer to run its local steps in TorchScript, without holding the GIL.
+# Instead of reading ``param.grad``, ``step`` takes the gradients explicitly,
+# e.g. those of a distributed autograd context, so that concurrent trainers
+# don't race on accumulating into the same ``.grad``.
+# NOTE: this is an internal of the distributed optimizer, not a public API.
+@torch.jit.script
+class _FunctionalSGD(object):
+    def __init__(
+        self,
+        params: List[Tensor],
+        lr: float,
+        momentum: float = 0.0,
+        dampening: float = 0.0,
+        weight_decay: float = 0.0,
+        nesterov: bool = False
+    ):
+        self.lr = lr
+        self.momentum = momentum
+        self.dampening = dampening
+        self.weight_decay = weight_decay
+        self.nesterov = nesterov
+        self.params = params
+        self.momentum_buffers = torch.jit.annotate(Dict[int, Tensor], {})
+
+    def step(self, gradients: List[Optional[Tensor]]):
+        if len(self.params) != len(gradients):
+            raise ValueError(
+                "the number of gradients ({}) does not match the number of parameters ({})".format(
+                    len(gradients), len(self.params))
+            )
+
+        for i in range(len(self.params)):
+            grad = gradients[i]
+            if grad is not None:
+                # The parameters are leaves that require grad, update them
+                # through a detached alias instead of under no_grad
+                param = self.params[i].detach()
+                if self.weight_decay != 0:
+                    grad = grad.add(param, alpha=self.weight_decay)
+                if self.momentum != 0:
+                    if i not in self.momentum_buffers:
+                        buf = torch.clone(grad).detach()
+                        self.momentum_buffers[i] = buf
+                    else:
+                        buf = self.momentum_buffers[i]
+                        buf.mul_(self.momentum).add_(grad, alpha=1 - self.dampening)
+                    if self.nesterov:
+                        grad = grad.add(buf, alpha=self.momentum)
+                    else:
+                        grad = buf
+                param.add_(grad, alpha=-self.lr)
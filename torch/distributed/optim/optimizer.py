@@ -1,33 +1,109 @@
+from typing import List, Optional
+
 import torch.distributed.rpc as rpc
 import torch.distributed.autograd as dist_autograd
+import torch.jit as jit
+import torch.nn as nn
+from torch import Tensor
+from torch import optim
 
 from collections import defaultdict
-from threading import Lock
+from threading import Lock, RLock
+
+from .functional_adam import _FunctionalAdam
+from .functional_sgd import _FunctionalSGD
+
+
+# Local optimizers that have a TorchScript compatible functional counterpart
+# run their steps in TorchScript, which doesn't hold the GIL.
+_functional_optim_map = {
+    optim.SGD: _FunctionalSGD,
+    optim.Adam: _FunctionalAdam,
+}
+
+
+class _ScriptLocalOptimizer(nn.Module):
+    def __init__(self, functional_optim_cls, local_params, *args, **kwargs):
+        super(_ScriptLocalOptimizer, self).__init__()
+        self._local_params = local_params
+        self.optim = functional_optim_cls(local_params, *args, **kwargs)
+
+    @jit.export
+    def step(self, autograd_ctx_id: int):
+        all_local_grads = dist_autograd.get_gradients(autograd_ctx_id)
+        # Parameters that did not take part in the backward pass of this
+        # context have no gradient and are not updated
+        grads = jit.annotate(List[Optional[Tensor]], [])
+        for p in self._local_params:
+            if p in all_local_grads:
+                grads.append(all_local_grads[p])
+            else:
+                grads.append(None)
+        self.optim.step(grads)
 
 
 class _LocalOptimizer:
-    # Ideally we would only need to share a lock for instances of
-    # _LocalOptimizer that deal with the same parameters. We are
-    # making a simplifying assumption here that if there is more
-    # than one instance of _LocalOptimizer per worker, they will
-    # be optimizing the same parameters (e.g. each data parallel
-    # trainer will create its own instance of _LocalOptimizer but
-    # they will all optimize the same parameters on each worker)
-    global_lock = Lock()
+    # Each parameter is guarded by its own lock, so that the steps of the
+    # instances of _LocalOptimizer on a worker (e.g. one per data parallel
+    # trainer) are serialized when they optimize the same parameters, but can
+    # proceed in parallel when their parameters are disjoint. The locks are
+    # keyed by the id of their parameter, with the number of instances
+    # optimizing it: the entry is dropped with the last of them, which keeps
+    # the parameter, and so its id, alive until then.
+    _param_locks = {}
+    # Reentrant, since __del__ may run from a garbage collection triggered
+    # while the lock is held
+    _param_locks_lock = RLock()
+    # TorchScript compilation is not thread-safe
+    _compile_lock = Lock()
 
     def __init__(self, optim_cls, local_params_rref, *args, **kwargs):
-        self.optim = optim_cls(
-            [rref.local_value() for rref in local_params_rref],
-            *args,
-            **kwargs)
+        self._local_params = [rref.local_value() for rref in local_params_rref]
+        functional_optim_cls = _functional_optim_map.get(optim_cls)
+        if functional_optim_cls is not None and jit._enabled:
+            with _LocalOptimizer._compile_lock:
+                self.optim = jit.script(_ScriptLocalOptimizer(
+                    functional_optim_cls, self._local_params, *args, **kwargs))
+            self.is_script = True
+        else:
+            self.optim = optim_cls(self._local_params, *args, **kwargs)
+            self.is_script = False
+
+        with _LocalOptimizer._param_locks_lock:
+            locks = {}
+            param_ids = set(id(param) for param in self._local_params)
+            for param_id in param_ids:
+                entry = _LocalOptimizer._param_locks.setdefault(param_id, [Lock(), 0])
+                entry[1] += 1
+                locks[id(entry[0])] = entry[0]
+            self._param_ids = param_ids
+        # Always acquire the locks in the same order to avoid deadlocks
+        self._locks = [locks[k] for k in sorted(locks)]
+
+    def __del__(self):
+        with _LocalOptimizer._param_locks_lock:
+            for param_id in getattr(self, '_param_ids', ()):
+                entry = _LocalOptimizer._param_locks[param_id]
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del _LocalOptimizer._param_locks[param_id]
 
     def step(self, autograd_ctx_id):
-        all_local_grads = dist_autograd.get_gradients(autograd_ctx_id)
-
-        with _LocalOptimizer.global_lock:
-            for param, grad in all_local_grads.items():
-                param.grad = grad
-            self.optim.step()
+        for lock in self._locks:
+            lock.acquire()
+        try:
+            if self.is_script:
+                self.optim.step(autograd_ctx_id)
+            else:
+                all_local_grads = dist_autograd.get_gradients(autograd_ctx_id)
+                for param in self._local_params:
+                    # Parameters that did not take part in the backward pass
+                    # of this context are not updated
+                    param.grad = all_local_grads.get(param)
+                self.optim.step()
+        finally:
+            for lock in reversed(self._locks):
+                lock.release()
 
 
 def _new_local_optimizer(optim_cls, local_params_rref, *args, **kwargs):
@@ -66,13 +142,24 @@ class DistributedOptimizer:
     Concurrent calls to
     :meth:`~torch.distributed.optim.DistributedOptimizer.step`,
     either from the same or different clients, will
-    be serialized on each worker -- as each worker's optimizer can only work
-    on one set of gradients at a time. However, there is no guarantee that
+    be serialized on each worker for the parameters they share -- as each
+    parameter can only be updated with one set of gradients at a time. Steps
+    of distributed optimizers optimizing disjoint sets of parameters of a
+    worker run in parallel. However, there is no guarantee that
     the full forward-backward-optimizer sequence will execute for one client
     at a time. This means that the gradients being applied may not correspond
     to the latest forward pass executed on a given worker. Also, there is no
     guaranteed ordering across workers.
 
+    Only the parameters that have a gradient in the distributed autograd
+    context are updated by a step.
+
+    When ``optimizer_class`` is :class:`torch.optim.SGD` or
+    :class:`torch.optim.Adam`, the local optimizers are compiled with
+    TorchScript, so that the steps run on the workers without holding the GIL
+    and don't contend with the other RPC threads. Compilation is skipped when
+    TorchScript is disabled (``PYTORCH_JIT=0``).
+
     Args:
         optimizer_class (optim.Optimizer): the class of optimizer to
             instantiate on each worker.
@@ -135,6 +222,28 @@ class DistributedOptimizer:
             context_id: the autograd context id for which we should run the
                 optimizer step.
         """
+        _wait_for_all(self.step_async(context_id))
+
+    def step_async(self, context_id):
+        """
+        Non-blocking version of
+        :meth:`~torch.distributed.optim.DistributedOptimizer.step`.
+
+        The steps are started on all the workers at once, and each worker
+        applies its update as soon as it receives the request, independently
+        of the others. This lets the caller overlap the optimizer step with its
+        own work, e.g. loading the next batch, as long as it doesn't use the
+        parameters before the step completes.
+
+        Args:
+            context_id: the autograd context id for which we should run the
+                optimizer step.
+
+        Returns:
+            A list of futures, one per worker, that complete when the step of
+            the worker is done. The caller must wait on all of them, e.g. before
+            the distributed autograd context is released.
+        """
         dist_autograd._is_valid_context(context_id)
         rpc_futs = []
         for optim in self.remote_optimizers:
@@ -143,4 +252,4 @@ class DistributedOptimizer:
                 _local_optimizer_step,
                 args=(optim, context_id),
             ))
-        _wait_for_all(rpc_futs)
+        return rpc_futs
@@ -0,0 +1,276 @@
+from collections import deque
+from itertools import chain
+import ctypes
+import io
+
+import torch
+from torch.optim import Optimizer
+from torch.distributed.distributed_c10d import _get_default_group
+
+# Number of bucket broadcasts in flight at once, which bounds the memory of
+# the buckets being received
+_MAX_IN_FLIGHT = 2
+
+
+def _tensor_to_bytes(tensor):
+    tensor = tensor.cpu()
+    return ctypes.string_at(tensor.data_ptr(), tensor.numel())
+
+
+class ZeroRedundancyOptimizer(Optimizer):
+    r"""Wraps an optimizer, and shards its state across the processes of a
+    data parallel group, as the optimizer state partitioning of `ZeRO\:
+    Memory Optimizations Toward Training Trillion Parameter Models`_.
+
+    The parameters are partitioned across the ranks of :attr:`process_group`,
+    balancing the number of elements of each rank, and each rank runs a
+    local instance of :attr:`optimizer_class` on its partition only: the
+    optimizer state, e.g. the moments of :class:`~torch.optim.Adam`, of each
+    rank is about ``world_size`` times smaller than with a replicated
+    optimizer. Since the gradients are the same on all ranks, e.g. reduced
+    by :class:`~torch.nn.parallel.DistributedDataParallel`, each rank updates
+    its partition in :meth:`step`, then broadcasts the updated parameters to
+    the other ranks. The parameters of each rank are packed into buckets of
+    up to :attr:`broadcast_buffer_size` bytes, so that many small parameters
+    are broadcast with a few collectives.
+
+    The param groups of this optimizer span all the parameters, and their
+    options (e.g. the learning rate changed by a
+    :class:`~torch.optim.lr_scheduler`) are passed on to the local optimizer
+    at each step. :meth:`state_dict` returns the state of all the
+    parameters, gathered by :meth:`consolidate_state_dict`, in the format of
+    :attr:`optimizer_class`: it can be loaded by this optimizer with any
+    world size, or by a non-sharded :attr:`optimizer_class`.
+
+    Arguments:
+        params (iterable): iterable of parameters to optimize or dicts defining
+            parameter groups, the same in all the ranks
+        optimizer_class (type): class of the local optimizer
+        process_group (optional): the data parallel process group, or ``None``
+            for the default process group
+        broadcast_buffer_size (int, optional): maximum size in bytes of the
+            buckets of parameters broadcast after each step; 0 broadcasts
+            each parameter separately, in-place (default: 8MB)
+        **defaults: options of the local optimizer, e.g. ``lr``
+
+    Example::
+
+        >>> ddp = DistributedDataParallel(model, device_ids=[rank])
+        >>> optimizer = ZeroRedundancyOptimizer(ddp.parameters(), optim.Adam, lr=1e-3)
+        >>> loss_fn(ddp(input), target).backward()
+        >>> optimizer.step()
+        >>> # gathers the state of all the ranks into rank 0 to save it
+        >>> optimizer.consolidate_state_dict(to=0)
+        >>> if rank == 0:
+        >>>     torch.save(optimizer.state_dict(), 'optimizer.pt')
+
+    .. _ZeRO\: Memory Optimizations Toward Training Trillion Parameter Models:
+        https://arxiv.org/abs/1910.02054
+    """
+
+    def __init__(self, params, optimizer_class, process_group=None, broadcast_buffer_size=2 ** 23,
+                 **defaults):
+        if broadcast_buffer_size < 0:
+            raise ValueError("Invalid broadcast_buffer_size value: {}".format(broadcast_buffer_size))
+        self.process_group = process_group if process_group is not None else _get_default_group()
+        self.world_size = self.process_group.size()
+        self.rank = self.process_group.rank()
+        self.broadcast_buffer_size = broadcast_buffer_size
+        self._owners = {}
+        self._numel_per_rank = [0] * self.world_size
+        self._local_param_groups = []
+        self._consolidated_state = None
+        self.optim = None
+        super(ZeroRedundancyOptimizer, self).__init__(params, defaults)
+
+        self.optim = optimizer_class(self._local_param_groups, **defaults)
+        self._copy_missing_options()
+        self.state = self.optim.state
+        self._build_buckets()
+
+    def _partition(self, params):
+        # Assigns the largest parameters first, each to the rank with the
+        # fewest elements so far. Returns the parameters of this rank, in
+        # order.
+        for param in sorted(params, key=lambda p: p.numel(), reverse=True):
+            if param in self._owners:
+                raise ValueError("some parameters appear in more than one parameter group")
+            rank = min(range(self.world_size), key=lambda r: self._numel_per_rank[r])
+            self._owners[param] = rank
+            self._numel_per_rank[rank] += param.numel()
+        return [p for p in params if self._owners[p] == self.rank]
+
+    def _copy_missing_options(self):
+        # The default options of the local optimizer, e.g. its default
+        # learning rate, become the options of the groups of this optimizer
+        for group, local_group in zip(self.param_groups, self.optim.param_groups):
+            for key, value in local_group.items():
+                group.setdefault(key, value)
+
+    def _build_buckets(self):
+        # The parameters of each rank, packed into buckets of consecutive
+        # parameters of the same device and dtype
+        self._buckets = [[] for _ in range(self.world_size)]
+        bucket_sizes = [0] * self.world_size
+        for param in chain(*(group['params'] for group in self.param_groups)):
+            rank = self._owners[param]
+            buckets = self._buckets[rank]
+            size = param.numel() * param.element_size()
+            if (buckets and bucket_sizes[rank] + size <= self.broadcast_buffer_size and
+                    buckets[-1][0].device == param.device and buckets[-1][0].dtype == param.dtype):
+                buckets[-1].append(param)
+                bucket_sizes[rank] += size
+            else:
+                buckets.append([param])
+                bucket_sizes[rank] = size
+
+    def add_param_group(self, param_group):
+        r"""Add a param group to the :class:`Optimizer` s `param_groups`.
+
+        The parameters of the group are partitioned across the ranks, and
+        those of this rank are added to the local optimizer.
+
+        Arguments:
+            param_group (dict): Specifies what Tensors should be optimized along with group
+            specific optimization options.
+        """
+        super(ZeroRedundancyOptimizer, self).add_param_group(param_group)
+        group = self.param_groups[-1]
+        local_group = {key: value for key, value in group.items() if key != 'params'}
+        local_group['params'] = self._partition(group['params'])
+        if self.optim is None:
+            self._local_param_groups.append(local_group)
+        else:
+            self.optim.add_param_group(local_group)
+            self._copy_missing_options()
+            self._build_buckets()
+
+    def step(self, closure=None):
+        """Updates the parameters of this rank, and broadcasts them to the
+        other ranks.
+
+        Arguments:
+            closure (callable, optional): A closure that reevaluates the model
+                and returns the loss.
+        """
+        for group, local_group in zip(self.param_groups, self.optim.param_groups):
+            for key, value in group.items():
+                if key != 'params':
+                    local_group[key] = value
+            # a clipping deferred by clip_grad_norm_ applies to the local group
+            grad_scale = self._take_grad_scale(group)
+            if grad_scale is not None:
+                self.optim._grad_scales[id(local_group)] = grad_scale
+        loss = self.optim.step(closure)
+        self._broadcast_params()
+        return loss
+
+    def _broadcast_params(self):
+        def finish(work, rank, params, flat):
+            work.wait()
+            if flat is not None and rank != self.rank:
+                offset = 0
+                for param in params:
+                    param.copy_(flat[offset:offset + param.numel()].view_as(param))
+                    offset += param.numel()
+
+        in_flight = deque()
+        with torch.no_grad():
+            for rank, buckets in enumerate(self._buckets):
+                for params in buckets:
+                    if len(params) == 1:
+                        flat = None
+                        tensor = params[0].detach()
+                    elif rank == self.rank:
+                        flat = tensor = torch.cat([p.detach().reshape(-1) for p in params])
+                    else:
+                        flat = tensor = params[0].new_empty(sum(p.numel() for p in params))
+                    in_flight.append((self.process_group.broadcast(tensor, rank), rank, params, flat))
+                    if len(in_flight) > _MAX_IN_FLIGHT:
+                        finish(*in_flight.popleft())
+            while in_flight:
+                finish(*in_flight.popleft())
+
+    def _global_indices(self):
+        params = chain(*(group['params'] for group in self.param_groups))
+        return {param: index for index, param in enumerate(params)}
+
+    def consolidate_state_dict(self, to=0):
+        r"""Gathers the state of the local optimizers of all the ranks into the
+        rank :attr:`to`, for its :meth:`state_dict`. Must be called by all the
+        ranks.
+
+        Arguments:
+            to (int, optional): the rank receiving the state (default: 0)
+        """
+        indices = self._global_indices()
+        local_state = {indices[param]: state for param, state in self.optim.state.items()}
+        buffer = io.BytesIO()
+        torch.save(local_state, buffer)
+        device = next(iter(self._owners)).device
+        data = torch.ByteTensor(torch.ByteStorage.from_buffer(buffer.getvalue())).to(device)
+
+        sizes = [data.new_zeros(1, dtype=torch.long) for _ in range(self.world_size)]
+        self.process_group.allgather([sizes], [data.new_full((1,), data.numel(), dtype=torch.long)]).wait()
+        state = {}
+        for rank, size in enumerate(sizes):
+            tensor = data if rank == self.rank else data.new_empty(int(size))
+            self.process_group.broadcast(tensor, rank).wait()
+            if self.rank == to:
+                if rank == self.rank:
+                    state.update(local_state)
+                else:
+                    state.update(torch.load(io.BytesIO(_tensor_to_bytes(tensor)), map_location=device))
+        self._consolidated_state = state if self.rank == to else None
+
+    def state_dict(self):
+        r"""Returns the state of the optimizer as a :class:`dict`, with the
+        state of all the parameters, in the format of the local optimizer.
+
+        Only available in the rank the state was gathered into by the last
+        :meth:`consolidate_state_dict`.
+        """
+        if self._consolidated_state is None:
+            raise RuntimeError("The state of the optimizer is sharded across the ranks, call "
+                               "consolidate_state_dict() in all the ranks before state_dict() "
+                               "in the rank the state is gathered into")
+        indices = self._global_indices()
+
+        def pack_group(group):
+            packed = {k: v for k, v in group.items() if k != 'params'}
+            packed['params'] = [indices[p] for p in group['params']]
+            return packed
+        return {
+            'state': self._consolidated_state,
+            'param_groups': [pack_group(g) for g in self.param_groups],
+        }
+
+    def load_state_dict(self, state_dict):
+        r"""Loads the optimizer state. Every rank loads the state of its own
+        parameters.
+
+        Arguments:
+            state_dict (dict): optimizer state. Should be an object returned
+                from a call to :meth:`state_dict`, or by the :meth:`state_dict`
+                of a non-sharded optimizer with the same parameters.
+        """
+        # the options of the param groups, validated against this optimizer
+        super(ZeroRedundancyOptimizer, self).load_state_dict(
+            {'state': {}, 'param_groups': state_dict['param_groups']})
+        saved_ids = chain(*(g['params'] for g in state_dict['param_groups']))
+        params = chain(*(g['params'] for g in self.param_groups))
+        local_state = {}
+        for saved_id, param in zip(saved_ids, params):
+            if self._owners[param] == self.rank and saved_id in state_dict['state']:
+                local_state[id(param)] = state_dict['state'][saved_id]
+
+        def pack_group(group, local_group):
+            packed = {k: v for k, v in group.items() if k != 'params'}
+            packed['params'] = [id(p) for p in local_group['params']]
+            return packed
+        self.optim.load_state_dict({
+            'state': local_state,
+            'param_groups': [pack_group(g, local_g) for g, local_g in
+                             zip(self.param_groups, self.optim.param_groups)],
+        })
+        self.state = self.optim.state
@@ -37,6 +37,132 @@ def _addindent(s_, numSpaces):
     return s
 
 
+class _GlobalHooks(OrderedDict):
+    # Hooks registered for all modules, by handle id, with the module types
+    # they are restricted to. The hooks applying to each module type are
+    # cached, so that calling a module looks them up once.
+    def __init__(self):
+        super(_GlobalHooks, self).__init__()
+        self.module_types = {}
+        self._by_type = {}
+
+    def __setitem__(self, key, value):
+        super(_GlobalHooks, self).__setitem__(key, value)
+        self._by_type.clear()
+
+    def __delitem__(self, key):
+        super(_GlobalHooks, self).__delitem__(key)
+        self.module_types.pop(key, None)
+        self._by_type.clear()
+
+    def for_type(self, module_type):
+        hooks = self._by_type.get(module_type)
+        if hooks is None:
+            hooks = tuple(hook for key, hook in self.items()
+                          if self.module_types.get(key) is None or issubclass(module_type, self.module_types[key]))
+            self._by_type[module_type] = hooks
+        return hooks
+
+    def register(self, hook, module_types):
+        if isinstance(module_types, type):
+            module_types = (module_types,)
+        elif module_types is not None:
+            module_types = tuple(module_types)
+        handle = hooks.RemovableHandle(self)
+        self.module_types[handle.id] = module_types
+        self[handle.id] = hook
+        return handle
+
+
+_global_backward_hooks = _GlobalHooks()
+_global_forward_pre_hooks = _GlobalHooks()
+_global_forward_hooks = _GlobalHooks()
+
+
+def register_module_forward_pre_hook(hook, module_types=None):
+    r"""Registers a forward pre-hook common to all modules.
+
+    The hook is called before the :func:`forward` of every module, or of the
+    modules of :attr:`module_types` only, before the forward pre-hooks
+    registered on the module itself. It has the same signature as the hooks
+    of :meth:`Module.register_forward_pre_hook`.
+
+    Instrumenting a whole model this way takes a single registration instead
+    of one per module, and modules called while no global hook is registered
+    only pay for checking that the registry is empty.
+
+    .. warning ::
+
+        This adds global state to the `nn.module` module, and it is only
+        intended for debugging/profiling purposes.
+
+    Args:
+        hook (Callable): the hook, called as ``hook(module, input)``
+        module_types (type or tuple of types, optional): if given, the hook
+            is only called for instances of these types
+
+    Returns:
+        :class:`torch.utils.hooks.RemovableHandle`:
+            a handle that can be used to remove the added hook by calling
+            ``handle.remove()``
+    """
+    return _global_forward_pre_hooks.register(hook, module_types)
+
+
+def register_module_forward_hook(hook, module_types=None):
+    r"""Registers a forward hook common to all modules.
+
+    The hook is called after the :func:`forward` of every module, or of the
+    modules of :attr:`module_types` only, before the forward hooks registered
+    on the module itself. It has the same signature as the hooks of
+    :meth:`Module.register_forward_hook`.
+
+    .. warning ::
+
+        This adds global state to the `nn.module` module, and it is only
+        intended for debugging/profiling purposes.
+
+    Args:
+        hook (Callable): the hook, called as ``hook(module, input, output)``
+        module_types (type or tuple of types, optional): if given, the hook
+            is only called for instances of these types
+
+    Returns:
+        :class:`torch.utils.hooks.RemovableHandle`:
+            a handle that can be used to remove the added hook by calling
+            ``handle.remove()``
+    """
+    return _global_forward_hooks.register(hook, module_types)
+
+
+def register_module_backward_hook(hook, module_types=None):
+    r"""Registers a backward hook common to all modules.
+
+    The hook is called when the gradients with respect to the inputs of
+    every module, or of the modules of :attr:`module_types` only, are
+    computed, before the backward hooks registered on the module itself. It
+    has the same signature and limitations as the hooks of
+    :meth:`Module.register_backward_hook`.
+
+    .. warning ::
+
+        This adds global state to the `nn.module` module, and it is only
+        intended for debugging/profiling purposes.
+
+    Args:
+        hook (Callable): the hook, called as
+            ``hook(module, grad_input, grad_output)``
+        module_types (type or tuple of types, optional): if given, the hook
+            is only called for instances of these types
+
+    Returns:
+        :class:`torch.utils.hooks.RemovableHandle`:
+            a handle that can be used to remove the added hook by calling
+            ``handle.remove()``
+    """
+    return _global_backward_hooks.register(hook, module_types)
+
+
 class Module(object):
     r"""Base class for all neural network modules.
 
@@ -142,6 +268,7 @@ class Module(object):
                             .format(torch.typename(tensor), name))
         else:
             self._buffers[name] = tensor
+            self._sync_frozen_slot(name)
 
     def register_parameter(self, name, param):
         r"""Adds a parameter to the module.
@@ -181,6 +308,7 @@ class Module(object):
                 "the forward() method.".format(name))
         else:
             self._parameters[name] = param
+        self._sync_frozen_slot(name)
 
     def add_module(self, name, module):
         r"""Adds a child module to the current module.
@@ -204,6 +332,7 @@ class Module(object):
             raise KeyError("module name can't contain \".\"")
         elif name == '':
             raise KeyError("module name can't be empty string \"\"")
+        self._check_not_frozen()
         self._modules[name] = module
 
     def _apply(self, fn):
@@ -225,7 +354,12 @@ class Module(object):
                 return False
 
         for key, param in self._parameters.items():
-            if param is not None:
+            if param is not None and getattr(param, '_deferred_init', False):
+                # placeholders of torch.nn.utils.deferred_init only carry a
+                # shape, convert their single element
+                with torch.no_grad():
+                    param.data = fn(param.as_strided((1,), (1,))).expand(param.size())
+            elif param is not None:
                 # Tensors stored in modules are graph leaves, and we don't want to
                 # track autograd history of `param_applied`, so we have to use
                 # `with torch.no_grad():`
@@ -253,6 +387,8 @@ class Module(object):
             if buf is not None:
                 self._buffers[key] = fn(buf)
 
+        for name in list(self.__dict__.get('_frozen_slots', ())):
+            self._sync_frozen_slot(name)
         return self
 
     def apply(self, fn):
@@ -479,6 +615,7 @@ class Module(object):
             directly on a specific input or output to get the required gradients.
 
         """
+        self._check_not_frozen()
         handle = hooks.RemovableHandle(self._backward_hooks)
         self._backward_hooks[handle.id] = hook
         return handle
@@ -500,6 +637,7 @@ class Module(object):
                 a handle that can be used to remove the added hook by calling
                 ``handle.remove()``
         """
+        self._check_not_frozen()
         handle = hooks.RemovableHandle(self._forward_pre_hooks)
         self._forward_pre_hooks[handle.id] = hook
         return handle
@@ -521,6 +659,7 @@ class Module(object):
                 a handle that can be used to remove the added hook by calling
                 ``handle.remove()``
         """
+        self._check_not_frozen()
         handle = hooks.RemovableHandle(self._forward_hooks)
         self._forward_hooks[handle.id] = hook
         return handle
@@ -546,7 +685,15 @@ class Module(object):
         return result
 
     def __call__(self, *input, **kwargs):
-        for hook in self._forward_pre_hooks.values():
+        if not (self._forward_pre_hooks or self._forward_hooks or self._backward_hooks or
+                _global_forward_pre_hooks or _global_forward_hooks or _global_backward_hooks or
+                torch._C._get_tracing_state()):
+            # Fast path for the common case of a module without hooks
+            return self.forward(*input, **kwargs)
+        forward_pre_hooks = self._forward_pre_hooks.values()
+        if _global_forward_pre_hooks:
+            forward_pre_hooks = _global_forward_pre_hooks.for_type(type(self)) + tuple(forward_pre_hooks)
+        for hook in forward_pre_hooks:
             result = hook(self, input)
             if result is not None:
                 if not isinstance(result, tuple):
@@ -556,11 +703,17 @@ class Module(object):
             result = self._slow_forward(*input, **kwargs)
         else:
             result = self.forward(*input, **kwargs)
-        for hook in self._forward_hooks.values():
+        forward_hooks = self._forward_hooks.values()
+        if _global_forward_hooks:
+            forward_hooks = _global_forward_hooks.for_type(type(self)) + tuple(forward_hooks)
+        for hook in forward_hooks:
             hook_result = hook(self, input, result)
             if hook_result is not None:
                 result = hook_result
-        if len(self._backward_hooks) > 0:
+        backward_hooks = self._backward_hooks.values()
+        if _global_backward_hooks:
+            backward_hooks = _global_backward_hooks.for_type(type(self)) + tuple(backward_hooks)
+        if len(backward_hooks) > 0:
             var = result
             while not isinstance(var, torch.Tensor):
                 if isinstance(var, dict):
@@ -569,7 +722,7 @@ class Module(object):
                     var = var[0]
             grad_fn = var.grad_fn
             if grad_fn is not None:
-                for hook in self._backward_hooks.values():
+                for hook in backward_hooks:
                     wrapper = functools.partial(hook, self)
                     functools.update_wrapper(wrapper, hook)
                     grad_fn.register_hook(wrapper)
@@ -626,6 +779,7 @@ class Module(object):
                 if modules is None:
                     raise AttributeError(
                         "cannot assign module before Module.__init__() call")
+                self._check_not_frozen()
                 remove_from(self.__dict__, self._parameters, self._buffers)
                 modules[name] = value
             elif modules is not None and name in modules:
@@ -633,6 +787,7 @@ class Module(object):
                     raise TypeError("cannot assign '{}' as child module '{}' "
                                     "(torch.nn.Module or None expected)"
                                     .format(torch.typename(value), name))
+                self._check_not_frozen()
                 modules[name] = value
             else:
                 buffers = self.__dict__.get('_buffers')
@@ -642,19 +797,49 @@ class Module(object):
                                         "(torch.Tensor or None expected)"
                                         .format(torch.typename(value), name))
                     buffers[name] = value
+                    self._sync_frozen_slot(name)
                 else:
+                    if name == 'forward':
+                        # the call plans of frozen modules hold the forwards
+                        self._check_not_frozen()
                     object.__setattr__(self, name, value)
 
     def __delattr__(self, name):
         if name in self._parameters:
             del self._parameters[name]
+            self._sync_frozen_slot(name)
         elif name in self._buffers:
             del self._buffers[name]
+            self._sync_frozen_slot(name)
         elif name in self._modules:
+            self._check_not_frozen()
             del self._modules[name]
         else:
+            if name == 'forward':
+                self._check_not_frozen()
             object.__delattr__(self, name)
 
+    def _check_not_frozen(self):
+        if '_frozen_slots' in self.__dict__:
+            raise RuntimeError("cannot change the submodules, hooks or forward of a module frozen by "
+                               "torch.nn.utils.freeze_call_plan(), call unfreeze_call_plan() first")
+
+    def _sync_frozen_slot(self, name):
+        # Keeps the attributes of a module frozen by freeze_call_plan(), which
+        # hold its parameters, buffers and submodules, in sync with them
+        slots = self.__dict__.get('_frozen_slots')
+        if slots is None or name not in slots:
+            return
+        if name in self._parameters:
+            self.__dict__[name] = self._parameters[name]
+        elif name in self._buffers:
+            self.__dict__[name] = self._buffers[name]
+        elif name in self._modules:
+            self.__dict__[name] = self._modules[name]
+        else:
+            self.__dict__.pop(name, None)
+            slots.remove(name)
+
     def _register_state_dict_hook(self, hook):
         r"""These hooks will be called with arguments: `self`, `state_dict`,
         `prefix`, `local_metadata`, after the `state_dict` of `self` is set.
@@ -762,6 +947,7 @@ class Module(object):
         for hook in self._load_state_dict_pre_hooks.values():
             hook(state_dict, prefix, local_metadata, strict, missing_keys, unexpected_keys, error_msgs)
 
+        assign = local_metadata.get('assign_to_params_buffers', False)
         local_name_params = itertools.chain(self._parameters.items(), self._buffers.items())
         local_state = {k: v for k, v in local_name_params if v is not None}
 
@@ -783,7 +969,19 @@ class Module(object):
 
                 try:
                     with torch.no_grad():
-                        param.copy_(input_param)
+                        if assign:
+                            if isinstance(param, Parameter) and (not isinstance(input_param, Parameter) or
+                                                                 input_param.requires_grad != param.requires_grad):
+                                input_param = Parameter(input_param, requires_grad=param.requires_grad)
+                            setattr(self, name, input_param)
+                        elif getattr(param, '_deferred_init', False):
+                            # placeholder of torch.nn.utils.deferred_init, whose
+                            # storage is only allocated now
+                            param.data = torch.empty(param.size(), dtype=param.dtype,
+                                                     device=param.device).copy_(input_param)
+                            del param._deferred_init
+                        else:
+                            param.copy_(input_param)
                 except Exception as ex:
                     error_msgs.append('While copying the parameter named "{}", '
                                       'whose dimensions in the model are {} and '
@@ -801,18 +999,30 @@ class Module(object):
                     if input_name not in self._modules and input_name not in local_state:
                         unexpected_keys.append(key)
 
-    def load_state_dict(self, state_dict, strict=True):
+    def load_state_dict(self, state_dict, strict=True, assign=False):
         r"""Copies parameters and buffers from :attr:`state_dict` into
         this module and its descendants. If :attr:`strict` is ``True``, then
         the keys of :attr:`state_dict` must exactly match the keys returned
         by this module's :meth:`~torch.nn.Module.state_dict` function.
 
+        If :attr:`assign` is ``True``, the tensors of :attr:`state_dict` are
+        not copied but become the parameters and buffers of the module, the
+        ones for parameters being wrapped in :class:`~torch.nn.Parameter` with
+        the ``requires_grad`` of the parameter they replace if needed. They
+        keep their dtype, device and storage, so loading takes no extra memory
+        and no copy, e.g. for tensors backed by a memory-mapped file. The
+        previous parameters are not updated, so optimizers should be created
+        after loading.
+
         Arguments:
             state_dict (dict): a dict containing parameters and
                 persistent buffers.
             strict (bool, optional): whether to strictly enforce that the keys
                 in :attr:`state_dict` match the keys returned by this module's
                 :meth:`~torch.nn.Module.state_dict` function. Default: ``True``
+            assign (bool, optional): whether to assign the tensors of
+                :attr:`state_dict` to the module instead of copying them into
+                its parameters and buffers. Default: ``False``
 
         Returns:
             ``NamedTuple`` with ``missing_keys`` and ``unexpected_keys`` fields:
@@ -831,6 +1041,8 @@ class Module(object):
 
         def load(module, prefix=''):
             local_metadata = {} if metadata is None else metadata.get(prefix[:-1], {})
+            if assign:
+                local_metadata = dict(local_metadata, assign_to_params_buffers=True)
             module._load_from_state_dict(
                 state_dict, prefix, local_metadata, True, missing_keys, unexpected_keys, error_msgs)
             for name, child in module._modules.items():
@@ -1116,12 +1328,25 @@ class Module(object):
             p.requires_grad_(requires_grad)
         return self
 
-    def zero_grad(self):
-        r"""Sets gradients of all model parameters to zero."""
+    def zero_grad(self, set_to_none=False):
+        r"""Sets gradients of all model parameters to zero.
+
+        Arguments:
+            set_to_none (bool): instead of zeroing the gradients, set them to
+                ``None``. The next backward then stores the gradients it
+                computes into freshly allocated tensors, skipping both the
+                write of zeros and the read of the old gradient when
+                accumulating. Note that parameters that don't get a gradient
+                keep a ``None`` gradient, and that optimizers skip them instead
+                of doing a step with a zero gradient. Default: ``False``.
+        """
         for p in self.parameters():
             if p.grad is not None:
-                p.grad.detach_()
-                p.grad.zero_()
+                if set_to_none:
+                    p.grad = None
+                else:
+                    p.grad.detach_()
+                    p.grad.zero_()
 
     def share_memory(self):
         return self._apply(lambda t: t.share_memory_())
@@ -1182,12 +1407,17 @@ class Module(object):
         replica._parameters = replica._parameters.copy()
         replica._buffers = replica._buffers.copy()
         replica._modules = replica._modules.copy()
+        if '_frozen_slots' in replica.__dict__:
+            # the members of the replica are replaced without going through
+            # __setattr__, so its attributes can't be kept in sync
+            from torch.nn.utils.call_plan import _unfreeze_module
+            _unfreeze_module(replica)
 
         # Warn users that gradients don't behave as expected on replica modules
         old_zero_grad = replica.__class__.zero_grad
         weak_self = weakref.ref(replica)
 
-        def zero_grad():
+        def zero_grad(set_to_none=False):
             warnings.warn(
                 "Calling .zero_grad() from a module that was passed to a nn.DataParallel() has no effect. "
                 "The parameters are copied (in a differentiable manner) from the original module. "
@@ -1195,7 +1425,7 @@ class Module(object):
                 "If you need gradients in your forward method, consider using autograd.grad instead.")
             replica = weak_self()
             if replica:
-                old_zero_grad(replica)
+                old_zero_grad(replica, set_to_none)
 
         replica.zero_grad = zero_grad
 
@@ -3,9 +3,10 @@ from .replicate import replicate
 from .data_parallel import DataParallel, data_parallel
 from .scatter_gather import scatter, gather
 from .distributed import DistributedDataParallel
+from .pipeline import Pipe
 
 __all__ = ['replicate', 'scatter', 'parallel_apply', 'gather', 'data_parallel',
-           'DataParallel', 'DistributedDataParallel']
+           'DataParallel', 'DistributedDataParallel', 'Pipe']
 
 def DistributedDataParallelCPU(*args, **kwargs):
     import warnings
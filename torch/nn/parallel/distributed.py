@@ -1,6 +1,7 @@
 from contextlib import contextmanager
 import copy
 import itertools
+import weakref
 
 import torch
 
@@ -9,6 +10,8 @@ import torch.distributed as dist
 
 if dist.is_available():
     from torch.distributed.distributed_c10d import _get_default_group
+    from torch.distributed.algorithms.ddp_comm_hooks.default_hooks import allreduce_hook
+    from torch.distributed.algorithms.ddp_comm_hooks.grad_bucket import GradBucket
 
 from ..modules import Module
 from .replicate import replicate
@@ -30,6 +33,194 @@ def _find_tensors(obj):
     return []
 
 
+# Number of iterations whose graph is recorded in the static graph mode
+_STATIC_GRAPH_RECORD_ITERS = 2
+
+
+def _register_grad_acc_hooks(obj, parameters, method):
+    # Calls obj.<method>(index) after the gradient of parameters[index] is
+    # accumulated. The hooks only hold a weak reference to obj, which would
+    # otherwise be kept alive by the autograd graph of the parameters.
+    obj_ref = weakref.ref(obj)
+
+    def make_hook(index):
+        def hook(*unused):
+            target = obj_ref()
+            if target is not None:
+                getattr(target, method)(index)
+        return hook
+
+    grad_accs = []
+    with torch.enable_grad():
+        for index, param in enumerate(parameters):
+            grad_acc = param.expand_as(param).grad_fn.next_functions[0][0]
+            grad_acc.register_hook(make_hook(index))
+            grad_accs.append(grad_acc)
+    return grad_accs
+
+
+class _GradReadyHooks(object):
+    r"""
+    Hooks on the gradient accumulators of :attr:`parameters`, registered once
+    for the lifetime of a DDP module. When the gradient of ``parameters[index]``
+    is accumulated, ``_mark_ready(index)`` is called on each of
+    :attr:`targets`, the recorder and reducer of the current iteration, so that
+    replacing them doesn't register more hooks.
+    """
+    def __init__(self, parameters):
+        self.targets = []
+        self.grad_accs = _register_grad_acc_hooks(self, parameters, '_mark_ready')
+
+    def _mark_ready(self, index):
+        for target in self.targets:
+            target._mark_ready(index)
+
+
+class _ReadyOrderRecorder(object):
+    r"""
+    Records which parameters get a gradient in the backward passes following
+    :meth:`prepare_for_backward`, and the order of the last one.
+    """
+    def __init__(self, parameters):
+        self.used = [False] * len(parameters)
+        self.ready = [False] * len(parameters)
+        self.order = []
+        self.last_order = []
+        self.expect_hooks = False
+
+    def prepare_for_backward(self):
+        if self.order:
+            self.last_order = self.order
+        self.expect_hooks = True
+        self.ready = [False] * len(self.ready)
+        self.order = []
+
+    def _mark_ready(self, index):
+        if self.expect_hooks and not self.ready[index]:
+            self.used[index] = self.ready[index] = True
+            self.order.append(index)
+
+
+class _CommHookReducer(object):
+    r"""
+    Reduces the gradients of a single-device module bucket by bucket, passing
+    each bucket to a communication hook instead of all-reducing it.
+
+    The hooks registered on the gradient accumulators of the parameters mark
+    them as ready, and the buckets whose gradients are all ready are handed to
+    the communication hook strictly in bucket order, so that all processes
+    issue their collectives in the same order. At the end of the backward
+    pass, the remaining buckets (e.g. of unused parameters, whose gradients
+    are zeros) are handed to the hook, and the results of all buckets are
+    waited on and copied into the ``.grad`` of the parameters.
+
+    For the static graph mode, :attr:`unused` are the parameters expected to
+    get no gradient, which are in no bucket and whose ``.grad`` is left
+    untouched. A small all-reduce over :attr:`process_group` at the end of
+    each backward pass checks that the parameters used by all processes are
+    the expected ones: if not, the gradients of the unused parameters are
+    all-reduced as well and :attr:`graph_changed` is set.
+    """
+    def __init__(self, parameters, bucket_indices, state, hook, process_group=None, unused=()):
+        self.parameters = parameters
+        self.buckets = [list(indices) for indices in bucket_indices]
+        self.bucket_of = {}
+        for bucket, indices in enumerate(self.buckets):
+            for index in indices:
+                self.bucket_of[index] = bucket
+        self.state = state
+        self.hook = hook
+        self.process_group = process_group
+        self.unused = list(unused)
+        self.graph_changed = False
+        self.buffers = [None] * len(self.buckets)
+        self.expect_hooks = False
+
+    def prepare_for_backward(self):
+        self.expect_hooks = True
+        self.callback_queued = False
+        self.ready = [False] * len(self.parameters)
+        self.pending = [len(indices) for indices in self.buckets]
+        self.next_bucket = 0
+        self.futures = []
+
+    def _mark_ready(self, index):
+        if not self.expect_hooks or self.ready[index]:
+            return
+        if not self.callback_queued:
+            torch.autograd.Variable._execution_engine.queue_callback(self._finalize)
+            self.callback_queued = True
+        self.ready[index] = True
+        if index not in self.bucket_of:
+            return
+        self.pending[self.bucket_of[index]] -= 1
+        while self.next_bucket < len(self.buckets) and self.pending[self.next_bucket] == 0:
+            self._launch(self.next_bucket)
+
+    def _launch(self, bucket):
+        params = [self.parameters[index] for index in self.buckets[bucket]]
+        buffer = self.buffers[bucket]
+        if buffer is None:
+            buffer = self.buffers[bucket] = params[0].new_empty(sum(p.numel() for p in params))
+        offset = 0
+        with torch.no_grad():
+            for param in params:
+                view = buffer[offset:offset + param.numel()]
+                if param.grad is None:
+                    view.zero_()
+                else:
+                    view.copy_(param.grad.reshape(-1))
+                offset += param.numel()
+            self.futures.append(self.hook(self.state, GradBucket(bucket, buffer, [p.size() for p in params])))
+        self.next_bucket = bucket + 1
+
+    def _check_graph(self):
+        # Counts the processes in which unused parameters got a gradient, and
+        # those in which used parameters didn't
+        control = self.parameters[0].new_tensor(
+            [any(self.ready[index] for index in self.unused),
+             not all(self.ready[index] for index in self.bucket_of)], dtype=torch.float)
+        return control, self.process_group.allreduce([control])
+
+    def _reduce_unused(self):
+        world_size = self.process_group.size()
+        for index in self.unused:
+            param = self.parameters[index]
+            grad = param.grad if param.grad is not None else torch.zeros_like(param)
+            self.process_group.allreduce([grad]).wait()
+            param.grad = grad.div_(world_size)
+
+    def _finalize(self):
+        self.expect_hooks = False
+        with torch.no_grad():
+            while self.next_bucket < len(self.buckets):
+                self._launch(self.next_bucket)
+            if self.process_group is not None:
+                control, control_work = self._check_graph()
+            for bucket, future in enumerate(self.futures):
+                result = future.wait()
+                if result.numel() != self.buffers[bucket].numel():
+                    raise RuntimeError(
+                        "The communication hook must return a future of a tensor of {} elements "
+                        "for bucket {}, but got {} elements".format(
+                            self.buffers[bucket].numel(), bucket, result.numel()))
+                offset = 0
+                for index in self.buckets[bucket]:
+                    param = self.parameters[index]
+                    value = result[offset:offset + param.numel()].view_as(param)
+                    if param.grad is None:
+                        param.grad = value.to(param.dtype, copy=True)
+                    else:
+                        param.grad.copy_(value)
+                    offset += param.numel()
+            if self.process_group is not None:
+                control_work.wait()
+                if control[0] > 0:
+                    self._reduce_unused()
+                self.graph_changed = bool(control.sum() > 0)
+        self.futures = []
+
+
 class DistributedDataParallel(Module):
     r"""Implements distributed data parallelism that is based on
     ``torch.distributed`` package at the module level.
@@ -217,6 +408,20 @@ class DistributedDataParallel(Module):
                          are getting different gradients, which should not
                          happen if DistributedDataParallel is correctly used.
                          (default: ``False``)
+        static_graph (bool): when set to ``True``, DistributedDataParallel
+                             records which parameters get a gradient, and in
+                             which order, during the first iterations. It
+                             then skips the traversal of the autograd graph
+                             of ``find_unused_parameters``, leaves the
+                             parameters unused by all processes out of the
+                             reduction, and rebuckets the others in the
+                             order their gradients are ready, so that the
+                             first buckets are reduced earlier. If the used
+                             parameters change in any process, the gradients
+                             of that iteration are still correctly reduced,
+                             and the graph is recorded again. Only supported
+                             for single-device modules without sparse
+                             gradients. (default: ``False``)
 
     Attributes:
         module (Module): the module to be parallelized
@@ -230,7 +435,8 @@ class DistributedDataParallel(Module):
                  output_device=None, dim=0, broadcast_buffers=True,
                  process_group=None, bucket_cap_mb=25,
                  find_unused_parameters=False,
-                 check_reduction=False):
+                 check_reduction=False,
+                 static_graph=False):
 
         super(DistributedDataParallel, self).__init__()
 
@@ -278,6 +484,13 @@ class DistributedDataParallel(Module):
         self.module = module
         self.broadcast_buffers = broadcast_buffers
         self.find_unused_parameters = find_unused_parameters
+        self._comm_hook = None
+        self._comm_hook_reducer = None
+        self.static_graph = static_graph
+        self._static_reducer = None
+        self._graph_recorder = None
+        self._static_graph_iters = 0
+        self._grad_ready_hooks = None
         self.require_backward_grad_sync = True
         self.require_forward_param_sync = True
 
@@ -304,6 +517,14 @@ class DistributedDataParallel(Module):
 
         self._ddp_init_helper()
 
+        if static_graph:
+            assert not (self.device_ids and len(self.device_ids) > 1), (
+                "DistributedDataParallel static_graph only works with single-device modules"
+            )
+            assert not self._expect_sparse_gradient, (
+                "DistributedDataParallel static_graph doesn't support sparse gradients"
+            )
+
     def _ddp_init_helper(self):
         """
         Initialization helper function that does the following:
@@ -381,6 +602,11 @@ class DistributedDataParallel(Module):
             self.process_group,
             expect_sparse_gradient)
 
+        # kept for the reducer of a communication hook
+        self._reducer_parameters = parameters[0]
+        self._bucket_indices = list(reversed(bucket_indices))
+        self._expect_sparse_gradient = any(expect_sparse_gradient[0])
+
         # passing a handle to torch.nn.SyncBatchNorm layer
         self._passing_sync_batchnorm_handle(self._module_copies)
 
@@ -389,6 +615,15 @@ class DistributedDataParallel(Module):
         attrs = copy.copy(self.__dict__)
         del attrs['process_group']
         del attrs['reducer']
+        # Communication hooks must be registered again after unpickling, and
+        # the static graph is recorded again
+        attrs['_comm_hook'] = None
+        attrs['_comm_hook_reducer'] = None
+        attrs['_static_reducer'] = None
+        attrs['_graph_recorder'] = None
+        attrs['_static_graph_iters'] = 0
+        attrs['_grad_ready_hooks'] = None
+        del attrs['_reducer_parameters']
         return attrs
 
     def __setstate__(self, state):
@@ -397,6 +632,13 @@ class DistributedDataParallel(Module):
         super(DistributedDataParallel, self).__setstate__(state)
         self.__dict__.setdefault('require_forward_param_sync', True)
         self.__dict__.setdefault('require_backward_grad_sync', True)
+        self.__dict__.setdefault('_comm_hook', None)
+        self.__dict__.setdefault('_comm_hook_reducer', None)
+        self.__dict__.setdefault('static_graph', False)
+        self.__dict__.setdefault('_static_reducer', None)
+        self.__dict__.setdefault('_graph_recorder', None)
+        self.__dict__.setdefault('_static_graph_iters', 0)
+        self.__dict__.setdefault('_grad_ready_hooks', None)
         self._ddp_init_helper()
 
     def _check_default_group(self):
@@ -437,6 +679,55 @@ class DistributedDataParallel(Module):
         finally:
             self.require_backward_grad_sync = old_require_backward_grad_sync
 
+    def register_comm_hook(self, state, hook):
+        r"""
+        Registers a communication hook, which replaces the all-reduce of the
+        gradient buckets by a user-defined communication, e.g. to compress
+        the gradients.
+
+        The hook is called as ``hook(state, bucket)`` for each
+        :class:`~torch.distributed.algorithms.ddp_comm_hooks.GradBucket` of
+        gradients, as soon as all the gradients of the bucket are computed,
+        and in the same order in all processes. It must return a
+        :class:`~torch.distributed.algorithms.ddp_comm_hooks.Future` of a flat
+        tensor of the same size as ``bucket.get_tensor()``, the averaged
+        gradients, which are copied into the ``.grad`` of the parameters
+        once the backward pass is done. :attr:`state` holds whatever the hook
+        needs across iterations, e.g. its process group or compression
+        errors. :mod:`torch.distributed.algorithms.ddp_comm_hooks` provides
+        hooks for all-reduce in half precision, PowerSGD and top-k
+        sparsification.
+
+        .. warning::
+            The hook can only be registered once, before the first forward
+            pass, and is only supported for single-device modules without
+            sparse gradients.
+
+        Args:
+            state (object): state passed to every call of the hook
+            hook (callable): ``hook(state, bucket) -> Future``
+
+        Example::
+
+            >>> from torch.distributed.algorithms.ddp_comm_hooks import PowerSGDState, powerSGD_hook
+            >>> ddp = torch.nn.parallel.DistributedDataParallel(model)
+            >>> ddp.register_comm_hook(PowerSGDState(process_group=None), powerSGD_hook)
+        """
+        if not callable(hook):
+            raise TypeError("hook must be callable, but got {}".format(type(hook).__name__))
+        if self._comm_hook_reducer is not None:
+            raise RuntimeError("register_comm_hook can only be called once")
+        if self.device_ids and len(self.device_ids) > 1:
+            raise RuntimeError("Communication hooks are only supported for single-device modules")
+        if self._expect_sparse_gradient:
+            raise RuntimeError("Communication hooks don't support sparse gradients")
+        self._comm_hook = (state, hook)
+        self._comm_hook_reducer = _CommHookReducer(
+            self._reducer_parameters, self._bucket_indices, state, hook)
+        # the static graph reducer is rebuilt with the hook
+        self._static_reducer = None
+        self._static_graph_iters = 0
+
     def forward(self, *inputs, **kwargs):
         if self.require_forward_param_sync:
             self._sync_params()
@@ -458,15 +749,85 @@ class DistributedDataParallel(Module):
             # because we need to figure out which parameters were used during
             # this forward pass, to ensure we short circuit reduction for any
             # unused parameters. Only if `find_unused_parameters` is set.
-            if self.find_unused_parameters:
+            if self.static_graph:
+                self._prepare_static_graph()
+            self._route_grad_ready_hooks(self._graph_recorder, self._static_reducer or self._comm_hook_reducer)
+            if self._static_reducer is not None:
+                # The C++ reducer is left unprepared, so it ignores this
+                # backward pass, and the graph isn't traversed
+                self._static_reducer.prepare_for_backward()
+            elif self._comm_hook_reducer is not None:
+                # The C++ reducer is left unprepared, so it ignores this
+                # backward pass
+                self._comm_hook_reducer.prepare_for_backward()
+            elif self.find_unused_parameters:
                 self.reducer.prepare_for_backward(list(_find_tensors(output)))
             else:
                 self.reducer.prepare_for_backward([])
         else:
             self.require_forward_param_sync = False
+            self._route_grad_ready_hooks()
 
         return output
 
+    def _route_grad_ready_hooks(self, *targets):
+        # Passes the gradients ready in the next backward pass to the given
+        # recorder and reducer, registering the hooks on the first use
+        targets = [target for target in targets if target is not None]
+        if targets and self._grad_ready_hooks is None:
+            self._grad_ready_hooks = _GradReadyHooks(self._reducer_parameters)
+        if self._grad_ready_hooks is not None:
+            self._grad_ready_hooks.targets = targets
+
+    def _prepare_static_graph(self):
+        # Records the graph during the first iterations, then switches to the
+        # static graph reducer until the used parameters change
+        if self._static_reducer is not None:
+            if not self._static_reducer.graph_changed:
+                return
+            self._static_reducer = None
+            self._static_graph_iters = 0
+        if self._static_graph_iters == _STATIC_GRAPH_RECORD_ITERS:
+            self._build_static_reducer()
+            return
+        if self._static_graph_iters == 0:
+            self._graph_recorder = _ReadyOrderRecorder(self._reducer_parameters)
+        self._graph_recorder.prepare_for_backward()
+        self._static_graph_iters += 1
+
+    def _build_static_reducer(self):
+        recorder = self._graph_recorder
+        self._graph_recorder = None
+        parameters = self._reducer_parameters
+        device = parameters[0].device
+
+        # A parameter is used if it got a gradient in any process
+        used = torch.tensor(recorder.used, dtype=torch.float, device=device)
+        self.process_group.allreduce([used]).wait()
+        used = used.tolist()
+
+        # All the processes bucket the parameters in the ready order of the
+        # process of rank 0, the parameters it didn't use last
+        order = recorder.order or recorder.last_order
+        seen = set(order)
+        order = order + [i for i in reversed(range(len(parameters))) if i not in seen]
+        order = torch.tensor(order, dtype=torch.long, device=device)
+        self.process_group.broadcast([order]).wait()
+        order = [i for i in order.tolist() if used[i] > 0]
+
+        bucket_indices = dist._compute_bucket_assignment_by_size(
+            [parameters[i] for i in order],
+            [1024 * 1024, self.bucket_bytes_cap],
+            [False] * len(order)) if order else []
+        state, hook = self._comm_hook or (self.process_group, allreduce_hook)
+        self._static_reducer = _CommHookReducer(
+            parameters,
+            [[order[i] for i in indices] for indices in bucket_indices],
+            state,
+            hook,
+            process_group=self.process_group,
+            unused=[i for i in range(len(parameters)) if used[i] == 0])
+
     def scatter(self, inputs, kwargs, device_ids):
         return scatter_kwargs(inputs, kwargs, device_ids, dim=self.dim)
 
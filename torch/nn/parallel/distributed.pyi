@@ -1,5 +1,5 @@
 from ..modules import Module
-from typing import Any, Optional, TypeVar
+from typing import Any, Callable, Optional, TypeVar
 from .common_types import _devices_t, _device_t
 
 T_co = TypeVar('T_co', covariant=True)
@@ -15,12 +15,16 @@ class DistributedDataParallel(Module[T_co]):
     check_reduction: bool = ...
     broadcast_bucket_size: float = ...
     bucket_bytes_cap: float = ...
+    static_graph: bool = ...
 
     # TODO type process_group once `distributed` module is stubbed
     def __init__(self, module: Module[T_co], device_ids: Optional[_devices_t] = ...,
                  output_device: Optional[_device_t] = ..., dim: int = ...,
                  broadcast_buffers: bool = ..., process_group: Optional[Any] = ..., bucket_cap_mb: float = ...,
-                 check_reduction: bool = ...) -> None: ...
+                 find_unused_parameters: bool = ..., check_reduction: bool = ...,
+                 static_graph: bool = ...) -> None: ...
+
+    def register_comm_hook(self, state: Any, hook: Callable[[Any, Any], Any]) -> None: ...
 
     def forward(self, *inputs: Any, **kwargs: Any) -> T_co: ...
 
@@ -0,0 +1,297 @@
+import time
+
+import torch
+from torch.utils.checkpoint import checkpoint as checkpoint_fn
+from ..modules import Module, ModuleList, Sequential
+
+_CHECKPOINT_MODES = ('always', 'except_last', 'never')
+
+
+def _parse_device(device):
+    # Returns (worker_name, device): a string that isn't a device is the name
+    # of an RPC worker, optionally followed by '/' and a device of the worker
+    if isinstance(device, str):
+        try:
+            return None, torch.device(device)
+        except RuntimeError:
+            worker, _, worker_device = device.partition('/')
+            return worker, torch.device(worker_device or 'cpu')
+    if isinstance(device, int):
+        return None, torch.device('cuda', device)
+    return None, torch.device(device)
+
+
+def _balance_by_size(module, partitions):
+    # Splits the layers of module into contiguous partitions with about the
+    # same number of parameters, counting one more per layer so that layers
+    # without parameters are spread as well
+    sizes = [1 + sum(p.numel() for p in layer.parameters()) for layer in module]
+    total = float(sum(sizes))
+    balance = []
+    start = cumulated = 0
+    for i, size in enumerate(sizes):
+        cumulated += size
+        remaining_layers = len(sizes) - i - 1
+        remaining_partitions = partitions - len(balance) - 1
+        if remaining_partitions == 0:
+            break
+        if (cumulated >= total * (len(balance) + 1) / partitions or
+                remaining_layers == remaining_partitions):
+            balance.append(i + 1 - start)
+            start = i + 1
+    balance.append(len(sizes) - start)
+    return balance
+
+
+def _run_partition(module, input, checkpoint):
+    if checkpoint and torch.is_grad_enabled():
+        if not input.requires_grad:
+            # checkpoint only computes gradients for inputs requiring them
+            input = input.detach().requires_grad_()
+        return checkpoint_fn(module, input)
+    return module(input)
+
+
+class _LocalStage(object):
+    is_local = True
+
+    def __init__(self, module, device):
+        self.device = device
+        self.module = module.to(device)
+
+    def run_async(self, input, checkpoint, measure):
+        start = time.time()
+        output = _run_partition(self.module, input.to(self.device, non_blocking=True), checkpoint)
+        if measure and self.device.type == 'cuda':
+            torch.cuda.synchronize(self.device)
+        return output, time.time() - start
+
+    def wait(self, handle):
+        return handle
+
+    def parameter_rrefs(self):
+        from torch.distributed import rpc
+        return [rpc.RRef(p) for p in self.module.parameters()]
+
+    def train(self, mode):
+        self.module.train(mode)
+
+
+class _RemoteStageModule(object):
+    # Holds a partition on its RPC worker
+    def __init__(self, module, device):
+        self.device = device
+        self.module = module.to(device)
+
+
+def _run_remote_stage(stage_rref, input, checkpoint):
+    stage = stage_rref.local_value()
+    start = time.time()
+    output = _run_partition(stage.module, input.to(stage.device), checkpoint)
+    # RPC only sends CPU tensors
+    output = output.cpu()
+    return output, time.time() - start
+
+
+def _remote_stage_parameter_rrefs(stage_rref):
+    from torch.distributed import rpc
+    return [rpc.RRef(p) for p in stage_rref.local_value().module.parameters()]
+
+
+def _remote_stage_train(stage_rref, mode):
+    stage_rref.local_value().module.train(mode)
+
+
+class _RemoteStage(object):
+    is_local = False
+
+    def __init__(self, module, worker, device):
+        from torch.distributed import rpc
+        self.worker = worker
+        self.rref = rpc.remote(worker, _RemoteStageModule, args=(module, device))
+
+    def run_async(self, input, checkpoint, measure):
+        from torch.distributed import rpc
+        return rpc.rpc_async(self.worker, _run_remote_stage, args=(self.rref, input.cpu(), checkpoint))
+
+    def wait(self, handle):
+        return handle.wait()
+
+    def parameter_rrefs(self):
+        from torch.distributed import rpc
+        return rpc.rpc_sync(self.worker, _remote_stage_parameter_rrefs, args=(self.rref,))
+
+    def train(self, mode):
+        from torch.distributed import rpc
+        rpc.rpc_sync(self.worker, _remote_stage_train, args=(self.rref, mode))
+
+
+class Pipe(Module):
+    r"""Implements pipeline parallelism for an :class:`~torch.nn.Sequential`
+    module, as described in `GPipe: Efficient Training of Giant Neural
+    Networks using Pipeline Parallelism`_.
+
+    The layers of :attr:`module` are split into consecutive partitions, one
+    per device of :attr:`devices`, and each mini-batch is split into
+    :attr:`chunks` micro-batches along its first dimension. The partitions
+    run the micro-batches with the fill-drain schedule of GPipe: at clock
+    cycle ``k``, partition ``j`` runs micro-batch ``k - j``, so that the
+    partitions work on different micro-batches at the same time. The outputs
+    of the micro-batches are concatenated into the output of the mini-batch,
+    and the backward pass flows back through the partitions.
+
+    With :attr:`checkpoint`, the activations of the partitions aren't kept
+    for the backward pass, but recomputed with
+    :func:`torch.utils.checkpoint.checkpoint`, except for the last
+    micro-batch with ``'except_last'``, whose backward pass starts right away.
+
+    A device is either a local device, e.g. ``'cuda:1'``, or the name of an
+    RPC worker, optionally followed by ``'/'`` and one of its devices, e.g.
+    ``'worker1/cuda:0'``, whose partition is sent to and runs on the worker.
+    The micro-batches of a clock cycle are sent to the remote partitions
+    before the local ones run, so that they run concurrently. Training
+    with remote partitions requires :mod:`torch.distributed.rpc` to be
+    initialized and the forward and backward passes to run in a
+    :mod:`distributed autograd <torch.distributed.autograd>` context. The
+    parameters of all the partitions can be optimized by a
+    :class:`~torch.distributed.optim.DistributedOptimizer` with
+    :meth:`parameter_rrefs`. Since the gradients of checkpointed partitions
+    don't reach the distributed autograd context, a pipeline with RPC
+    workers requires ``checkpoint='never'``.
+
+    If :attr:`measure` is ``True``, :attr:`bubble_stats` reports after each
+    forward pass the time each partition was busy, and the fraction of time
+    the partitions were idle (the "bubble" of the pipeline), to compare with
+    the ideal ``(n - 1) / (m + n - 1)`` of ``n`` partitions of equal cost and
+    ``m`` micro-batches. Since the local CUDA partitions are synchronized
+    after each micro-batch to time it, measuring slows them down.
+
+    .. note::
+        Modules computing statistics over the batch, e.g.
+        :class:`~torch.nn.BatchNorm2d`, compute them over each micro-batch.
+
+    Arguments:
+        module (Sequential): module to split into partitions
+        devices (list): devices of the partitions, local devices or names of
+            RPC workers
+        balance (list of int, optional): number of layers of each partition;
+            by default, the layers are split into partitions of about the
+            same number of parameters
+        chunks (int, optional): number of micro-batches (default: 1)
+        checkpoint (str, optional): when to checkpoint the partitions, one of
+            ``'always'``, ``'except_last'`` and ``'never'``
+            (default: ``'except_last'``); must be ``'never'`` with RPC workers
+        measure (bool, optional): whether to measure the bubble overhead
+            (default: ``False``)
+
+    Example::
+
+        >>> model = nn.Sequential(a, b, c, d)
+        >>> model = nn.parallel.Pipe(model, devices=['cuda:0', 'cuda:1'], balance=[1, 3], chunks=8)
+        >>> output = model(input)
+
+    .. _GPipe\: Efficient Training of Giant Neural Networks using Pipeline Parallelism:
+        https://arxiv.org/abs/1811.06965
+    """
+
+    def __init__(self, module, devices, balance=None, chunks=1, checkpoint='except_last', measure=False):
+        super(Pipe, self).__init__()
+        if not isinstance(module, Sequential):
+            raise TypeError("Pipe requires a Sequential module, but got {}".format(type(module).__name__))
+        if chunks < 1:
+            raise ValueError("Invalid chunks value: {}".format(chunks))
+        if checkpoint not in _CHECKPOINT_MODES:
+            raise ValueError("checkpoint must be one of {}, but got {!r}".format(_CHECKPOINT_MODES, checkpoint))
+        devices = list(devices)
+        if len(devices) == 0 or len(devices) > len(module):
+            raise ValueError("Pipe requires between 1 and {} devices for a module of {} layers, "
+                             "but got {}".format(len(module), len(module), len(devices)))
+        if balance is None:
+            balance = _balance_by_size(module, len(devices))
+        balance = list(balance)
+        if len(balance) != len(devices) or any(b < 1 for b in balance) or sum(balance) != len(module):
+            raise ValueError("balance must be {} positive numbers of layers summing to {}, but got {}".format(
+                len(devices), len(module), balance))
+
+        devices = [_parse_device(device) for device in devices]
+        if checkpoint != 'never' and any(worker is not None for worker, _ in devices):
+            # the backward pass of a checkpoint runs outside of the distributed
+            # autograd context, so that the gradients of its partition would
+            # be accumulated into .grad instead of the context
+            raise ValueError("Pipe with RPC workers requires checkpoint='never', but got {!r}".format(checkpoint))
+
+        self.chunks = chunks
+        self.checkpoint = checkpoint
+        self.measure = measure
+        self.balance = balance
+        self.bubble_stats = None
+
+        layers = list(module)
+        self.partitions = ModuleList()
+        self._stages = []
+        start = 0
+        for (worker, device), size in zip(devices, balance):
+            partition = Sequential(*layers[start:start + size])
+            start += size
+            if worker is None:
+                stage = _LocalStage(partition, device)
+                self.partitions.append(stage.module)
+            else:
+                stage = _RemoteStage(partition, worker, device)
+            self._stages.append(stage)
+
+    def parameter_rrefs(self):
+        r"""Returns :class:`~torch.distributed.rpc.RRef` s of the parameters
+        of all the partitions, e.g. for a
+        :class:`~torch.distributed.optim.DistributedOptimizer`."""
+        rrefs = []
+        for stage in self._stages:
+            rrefs.extend(stage.parameter_rrefs())
+        return rrefs
+
+    def train(self, mode=True):
+        super(Pipe, self).train(mode)
+        for stage in self._stages:
+            if not stage.is_local:
+                stage.train(mode)
+        return self
+
+    def _checkpoints(self, micro_batch, num_micro_batches):
+        if self.checkpoint == 'always':
+            return True
+        if self.checkpoint == 'except_last':
+            return micro_batch < num_micro_batches - 1
+        return False
+
+    def forward(self, input):
+        if not isinstance(input, torch.Tensor):
+            raise TypeError("Pipe expects a Tensor input, but got {}".format(type(input).__name__))
+        batches = list(input.chunk(self.chunks))
+        num_micro_batches, num_stages = len(batches), len(self._stages)
+        busy = [0.0] * num_stages
+        start = time.time()
+
+        # fill-drain schedule: micro-batch i runs on stage j at clock i + j
+        for clock in range(num_micro_batches + num_stages - 1):
+            tasks = [(i, clock - i) for i in range(max(0, clock - num_stages + 1),
+                                                   min(num_micro_batches, clock + 1))]
+            # the remote stages are started first, to run with the local ones
+            tasks.sort(key=lambda task: self._stages[task[1]].is_local)
+            handles = []
+            for i, j in tasks:
+                stage = self._stages[j]
+                checkpoint = self._checkpoints(i, num_micro_batches)
+                handles.append((i, j, stage.run_async(batches[i], checkpoint, self.measure)))
+            for i, j, handle in handles:
+                batches[i], duration = self._stages[j].wait(handle)
+                busy[j] += duration
+
+        if self.measure:
+            makespan = time.time() - start
+            self.bubble_stats = {
+                'makespan': makespan,
+                'busy': busy,
+                'bubble_overhead': 1 - sum(busy) / (num_stages * makespan) if makespan > 0 else 0.0,
+                'ideal_bubble_overhead': (num_stages - 1) / float(num_micro_batches + num_stages - 1),
+            }
+        return torch.cat(batches)
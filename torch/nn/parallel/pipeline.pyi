@@ -0,0 +1,22 @@
+from typing import Any, Dict, List, Optional, Sequence, Union
+from ..modules import Module, ModuleList, Sequential
+from ... import device, Tensor
+
+_pipe_device_t = Union[int, str, device]
+
+
+class Pipe(Module):
+    chunks: int = ...
+    checkpoint: str = ...
+    measure: bool = ...
+    balance: List[int] = ...
+    partitions: ModuleList = ...
+    bubble_stats: Optional[Dict[str, Any]] = ...
+
+    def __init__(self, module: Sequential, devices: Sequence[_pipe_device_t],
+                 balance: Optional[Sequence[int]] = ..., chunks: int = ..., checkpoint: str = ...,
+                 measure: bool = ...) -> None: ...
+
+    def parameter_rrefs(self) -> List[Any]: ...
+
+    def forward(self, input: Tensor) -> Tensor: ...
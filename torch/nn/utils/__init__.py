@@ -5,3 +5,5 @@ from .convert_parameters import parameters_to_vector, vector_to_parameters
 from .spectral_norm import spectral_norm, remove_spectral_norm
 from .fusion import fuse_conv_bn_eval, fuse_conv_bn_weights
 from .memory_format import convert_conv2d_weight_memory_format
+from .call_plan import freeze_call_plan, unfreeze_call_plan
+from .deferred_init import deferred_init, materialize_, is_deferred
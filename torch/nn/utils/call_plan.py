@@ -0,0 +1,133 @@
+import torch
+from ..modules.container import Sequential
+from ..modules.module import Module, _global_forward_pre_hooks, _global_forward_hooks, _global_backward_hooks
+
+
+class _CallPlan(object):
+    # Forward of a frozen Sequential, calling the forward of the modules it
+    # runs directly, nested Sequentials being flattened
+    def __init__(self, module, forwards):
+        self.module = module
+        self.forwards = forwards
+
+    def __call__(self, input):
+        if (_global_forward_pre_hooks or _global_forward_hooks or _global_backward_hooks or
+                torch._C._get_tracing_state()):
+            # go through the modules to run the global hooks or record their
+            # scopes
+            return type(self.module).forward(self.module, input)
+        for forward in self.forwards:
+            input = forward(input)
+        return input
+
+
+def _is_plain_sequential(module):
+    return (isinstance(module, Sequential) and type(module).forward is Sequential.forward and
+            type(module).__call__ is Module.__call__ and 'forward' not in module.__dict__)
+
+
+def _flat_forwards(module):
+    forwards = []
+    for child in module._modules.values():
+        if isinstance(child, torch.jit.ScriptModule) or type(child).__call__ is not Module.__call__:
+            # called as usual, their __call__ doing more than running forward
+            forwards.append(child)
+        elif _is_plain_sequential(child):
+            forwards.extend(_flat_forwards(child))
+        else:
+            forwards.append(child.forward)
+    return tuple(forwards)
+
+
+def _frozen_modules(module):
+    # the modules of the tree, script modules excluded as they manage their
+    # own attributes and calls
+    if isinstance(module, torch.jit.ScriptModule):
+        return
+    yield module
+    for child in module._modules.values():
+        if child is not None:
+            for m in _frozen_modules(child):
+                yield m
+
+
+def freeze_call_plan(module):
+    r"""Freezes a module tree to reduce the Python overhead of calling it.
+
+    Calling a module goes through :meth:`~torch.nn.Module.__call__`, and
+    accessing its parameters, buffers and submodules as attributes goes
+    through :meth:`~torch.nn.Module.__getattr__`, which looks them up in three
+    dictionaries. For deep models of small layers run on small inputs, this
+    overhead can exceed the compute. After freezing:
+
+    * the parameters, buffers and submodules of every module in the tree are
+      also stored as plain attributes, which Python finds directly;
+    * :class:`~torch.nn.Sequential` modules (that don't override ``forward``
+      or ``__call__``) call the ``forward`` of their modules directly, nested
+      :class:`~torch.nn.Sequential` modules being flattened into a single list
+      of calls. Modules overriding ``__call__`` are still called as usual.
+
+    Parameters and buffers can still be assigned, and the module moved or
+    cast. Changing the submodules, registering hooks or replacing the
+    ``forward`` of a module (e.g. with
+    :meth:`~torch.utils.checkpoint.CheckpointPlan.apply`) raises an error
+    until :func:`unfreeze_call_plan` is called. While global hooks (see
+    :func:`~torch.nn.modules.module.register_module_forward_hook`) are
+    registered, frozen :class:`~torch.nn.Sequential` modules call their
+    modules as usual.
+
+    Arguments:
+        module (Module): the root of the tree to freeze, which must not have
+            hooks
+
+    Returns:
+        The module
+
+    Example::
+
+        >>> model = nn.Sequential(nn.Linear(10, 10), nn.ReLU(), nn.Sequential(nn.Linear(10, 1)))
+        >>> torch.nn.utils.freeze_call_plan(model)
+        >>> output = model(input)  # calls the three forwards in turn
+    """
+    modules = list(_frozen_modules(module))
+    for m in modules:
+        if m._forward_pre_hooks or m._forward_hooks or m._backward_hooks:
+            raise ValueError("cannot freeze the calls of a {} with hooks".format(type(m).__name__))
+    for m in modules:
+        if '_frozen_slots' in m.__dict__:
+            continue
+        slots = []
+        for members in (m._modules, m._buffers, m._parameters):
+            for name, value in members.items():
+                if name not in m.__dict__:
+                    m.__dict__[name] = value
+                    slots.append(name)
+        m.__dict__['_frozen_slots'] = slots
+    for m in modules:
+        if _is_plain_sequential(m):
+            m.__dict__['forward'] = _CallPlan(m, _flat_forwards(m))
+    return module
+
+
+def unfreeze_call_plan(module):
+    r"""Reverts :func:`freeze_call_plan` on a module tree.
+
+    Arguments:
+        module (Module): the root of the frozen tree
+
+    Returns:
+        The module
+    """
+    for m in _frozen_modules(module):
+        _unfreeze_module(m)
+    return module
+
+
+def _unfreeze_module(m):
+    slots = m.__dict__.pop('_frozen_slots', None)
+    if slots is None:
+        return
+    for name in slots:
+        m.__dict__.pop(name, None)
+    if isinstance(m.__dict__.get('forward'), _CallPlan):
+        del m.__dict__['forward']
@@ -0,0 +1,10 @@
+from ..modules import Module
+from typing import TypeVar
+
+T_module = TypeVar('T_module', bound=Module)
+
+
+def freeze_call_plan(module: T_module) -> T_module: ...
+
+
+def unfreeze_call_plan(module: T_module) -> T_module: ...
@@ -1,6 +1,6 @@
 import warnings
 import torch
-from torch._six import inf
+from torch._utils import _total_norm, _scale_
 
 
 def clip_grad_norm_(parameters, max_norm, norm_type=2):
@@ -8,6 +8,8 @@ def clip_grad_norm_(parameters, max_norm, norm_type=2):
 
     The norm is computed over all gradients together, as if they were
     concatenated into a single vector. Gradients are modified in-place.
+    Gradients stored one after the other in the same buffer are reduced and
+    scaled with a single op.
 
     Arguments:
         parameters (Iterable[Tensor] or Tensor): an iterable of Tensors or a
@@ -18,20 +20,21 @@ def clip_grad_norm_(parameters, max_norm, norm_type=2):
 
     Returns:
         Total norm of the parameters (viewed as a single vector).
+
+    .. note::
+        :meth:`torch.optim.Optimizer.clip_grad_norm_` can defer the scaling of
+        the gradients to the update of the optimizer, and supports per param
+        group norms.
     """
     if isinstance(parameters, torch.Tensor):
         parameters = [parameters]
-    parameters = list(filter(lambda p: p.grad is not None, parameters))
+    grads = [p.grad.detach() for p in parameters if p.grad is not None]
     max_norm = float(max_norm)
     norm_type = float(norm_type)
-    if norm_type == inf:
-        total_norm = max(p.grad.detach().abs().max() for p in parameters)
-    else:
-        total_norm = torch.norm(torch.stack([torch.norm(p.grad.detach(), norm_type) for p in parameters]), norm_type)
+    total_norm = _total_norm(grads, norm_type)
     clip_coef = max_norm / (total_norm + 1e-6)
     if clip_coef < 1:
-        for p in parameters:
-            p.grad.detach().mul_(clip_coef)
+        _scale_(grads, clip_coef)
     return total_norm
 
 
@@ -0,0 +1,307 @@
+import sys
+import threading
+import types
+
+import torch
+from ..modules.module import Module
+from ..parameter import Parameter
+
+_RESET_METHODS = ('reset_parameters', '_reset_parameters')
+
+
+def is_deferred(tensor):
+    r"""Returns whether ``tensor`` is a placeholder created under
+    :class:`deferred_init`, e.g. a parameter which has not been materialized
+    yet."""
+    return getattr(tensor, '_deferred_init', False)
+
+
+def _has_reset(module_type):
+    return any(getattr(module_type, name, None) is not None for name in _RESET_METHODS)
+
+
+def _placeholder(param):
+    # A parameter of the same shape, dtype and device as param, all of whose
+    # elements are views of a single one
+    placeholder = Parameter(param.new_empty(1).expand(param.size()), param.requires_grad)
+    placeholder._deferred_init = True
+    return placeholder
+
+
+def _deferring():
+    # Whether the current thread is the one within deferred_init: the patched
+    # functions behave as usual in the other threads
+    return deferred_init._thread == threading.current_thread().ident
+
+
+def _constructing_deferred_module(frame):
+    # Whether frame runs the constructor of a module whose parameters are
+    # replaced by placeholders
+    if frame.f_code.co_name != '__init__':
+        return False
+    module = frame.f_locals.get('self')
+    return isinstance(module, Module) and _has_reset(type(module))
+
+
+def _deferred_size(args):
+    if len(args) == 1 and isinstance(args[0], (tuple, list, torch.Size)):
+        args = args[0]
+    if len(args) > 0 and all(isinstance(s, int) for s in args):
+        return args
+    return None
+
+
+def _deferred_factory(empty):
+    # torch.empty, returning a placeholder when called by the constructor of a
+    # module whose parameters are deferred
+    def deferred_empty(*args, **kwargs):
+        size = _deferred_size(args)
+        if (size is not None and kwargs.get('out') is None and _deferring() and
+                _constructing_deferred_module(sys._getframe(1))):
+            tensor = empty(1, **kwargs).expand(size)
+            tensor._deferred_init = True
+            return tensor
+        return empty(*args, **kwargs)
+    return deferred_empty
+
+
+def _deferred_tensor_new(cls, *args, **kwargs):
+    # torch.Tensor(*sizes), returning a placeholder when called by the
+    # constructor of a module whose parameters are deferred
+    if cls is torch.Tensor and not kwargs and _deferring() and _constructing_deferred_module(sys._getframe(1)):
+        size = _deferred_size(args)
+        if size is not None:
+            tensor = torch._C._TensorBase.__new__(cls, 1).expand(size)
+            tensor._deferred_init = True
+            return tensor
+    return torch._C._TensorBase.__new__(cls, *args, **kwargs)
+
+
+def _module_types():
+    types, stack = [], [Module]
+    while stack:
+        module_type = stack.pop()
+        types.append(module_type)
+        stack.extend(module_type.__subclasses__())
+    return types
+
+
+def _skip_if_deferred(reset):
+    def reset_unless_deferred(self, *args, **kwargs):
+        if any(is_deferred(p) for p in self.parameters()):
+            return None
+        return reset(self, *args, **kwargs)
+    return reset_unless_deferred
+
+
+class deferred_init(object):
+    r"""Context-manager constructing modules without allocating or
+    initializing their parameters.
+
+    Within this context, the parameters registered by modules that have a
+    ``reset_parameters`` (or ``_reset_parameters``) method, which includes
+    all the modules of :mod:`torch.nn` with parameters, are replaced by
+    placeholders. They have the shape, dtype and device of the parameter, but
+    are backed by a single element, and these methods are skipped for the
+    modules having such placeholders. The constructors of these modules get
+    placeholders from ``torch.Tensor(*sizes)`` and :func:`torch.empty` as
+    well, so that the parameters they create are not allocated either.
+    Constructing a model with billions of parameters is then almost free,
+    and its storage is allocated only once, when it is loaded:
+
+    * :meth:`~torch.nn.Module.load_state_dict` allocates the placeholders it
+      loads and copies the checkpoint into them;
+    * :func:`materialize_` allocates the placeholders on a given device,
+      optionally only the shard of the current rank, fills them from a state
+      dict, and initializes the others with ``reset_parameters``.
+
+    The placeholders can be moved or cast with the module, e.g. with
+    :meth:`~torch.nn.Module.to`, but can't be used for computations before
+    being materialized. The values assigned to the parameters when
+    constructing the module (e.g. the ``_weight`` argument of
+    :class:`~torch.nn.Embedding`) are discarded, and the ``reset_parameters``
+    methods of classes defined within the context are not skipped.
+
+    .. note::
+        Only the tensors created by ``torch.Tensor(*sizes)`` and
+        :func:`torch.empty` in the ``__init__`` of modules with a
+        ``reset_parameters`` method are placeholders; other factories, e.g.
+        :func:`torch.zeros`, allocate as usual. A placeholder registered as a
+        buffer is allocated, but one kept as a plain attribute is not, and
+        such placeholders can't be written in place, e.g. with
+        :meth:`~torch.Tensor.fill_`, in the constructor.
+
+    .. note::
+        The context patches process-wide functions, but only affects the
+        modules constructed by the thread that entered it. It is entered by
+        one thread at a time: other threads entering it wait until it exits.
+
+    Example::
+
+        >>> with torch.nn.utils.deferred_init():
+        >>>     model = nn.Sequential(nn.Embedding(10 ** 8, 128), nn.Linear(128, 10))
+        >>> model.load_state_dict(torch.load('checkpoint.pt'))
+    """
+    # Held by the thread within the context, which can enter it again
+    _lock = threading.RLock()
+    _thread = None
+    _depth = 0
+    _patched = []
+
+    def __enter__(self):
+        cls = deferred_init
+        cls._lock.acquire()
+        if cls._depth == 0:
+            register_parameter = Module.register_parameter
+
+            def deferred_register_parameter(module, name, param):
+                if (isinstance(param, Parameter) and param.dim() > 0 and not is_deferred(param) and
+                        _has_reset(type(module)) and _deferring()):
+                    param = _placeholder(param)
+                return register_parameter(module, name, param)
+
+            register_buffer = Module.register_buffer
+            empty = torch.empty
+
+            def deferred_register_buffer(module, name, tensor):
+                # buffers are not deferred: a placeholder returned by a factory
+                # is allocated when it is registered as a buffer
+                if tensor is not None and is_deferred(tensor):
+                    tensor = empty(tensor.size(), dtype=tensor.dtype, device=tensor.device)
+                return register_buffer(module, name, tensor)
+
+            cls._patched = [(Module, 'register_parameter', register_parameter),
+                            (Module, 'register_buffer', register_buffer),
+                            (torch, 'empty', empty),
+                            (torch.Tensor, '__new__', torch.Tensor.__dict__.get('__new__'))]
+            resets = []
+            for module_type in _module_types():
+                for name in _RESET_METHODS:
+                    reset = module_type.__dict__.get(name)
+                    if isinstance(reset, types.FunctionType):
+                        resets.append((module_type, name, reset))
+            for module_type, name, method in resets:
+                setattr(module_type, name, _skip_if_deferred(method))
+            cls._patched.extend(resets)
+            Module.register_parameter = deferred_register_parameter
+            Module.register_buffer = deferred_register_buffer
+            torch.empty = _deferred_factory(empty)
+            torch.Tensor.__new__ = staticmethod(_deferred_tensor_new)
+            cls._thread = threading.current_thread().ident
+        cls._depth += 1
+        return self
+
+    def __exit__(self, *args):
+        cls = deferred_init
+        cls._depth -= 1
+        if cls._depth == 0:
+            for obj, name, method in cls._patched:
+                if method is None:
+                    # torch.Tensor has no __new__ of its own
+                    delattr(obj, name)
+                else:
+                    setattr(obj, name, method)
+            cls._patched = []
+            cls._thread = None
+        cls._lock.release()
+        return False
+
+
+def _shard_range(size, rank, world_size):
+    rows = -(-size // world_size)
+    start = min(rank * rows, size)
+    return start, min(rows, size - start)
+
+
+def materialize_(module, state_dict=None, device=None, rank=None, world_size=None, shard=None):
+    r"""Allocates the placeholder parameters of ``module`` created under
+    :class:`deferred_init`, in place.
+
+    The parameters found in :attr:`state_dict` are copied from it, directly
+    into their new storage. The modules with other placeholders are
+    initialized by their ``reset_parameters`` method. If :attr:`rank`,
+    :attr:`world_size` and :attr:`shard` are given, each placeholder selected
+    by :attr:`shard`, with a first dimension of size ``n``, is only allocated
+    for the ``ceil(n / world_size)`` rows of this rank (fewer for the last
+    ranks), e.g. to shard an embedding table across processes, and only
+    these rows are read from :attr:`state_dict`. Such shards are initialized
+    by ``reset_parameters`` as if they were the whole parameter. The other
+    parameters are allocated whole.
+
+    Arguments:
+        module (Module): module whose placeholders are allocated
+        state_dict (dict, optional): state dict of :attr:`module` to read the
+            parameters from; buffers found in it are copied as well
+        device (torch.device, optional): device to allocate the parameters on,
+            defaults to the device of the placeholders
+        rank (int, optional): rank of the shard to allocate
+        world_size (int, optional): number of shards
+        shard (set or callable, optional): names of the parameters to shard,
+            as in :attr:`state_dict`, or a function returning whether to shard
+            the parameter of the name it is given
+
+    Returns:
+        The module
+
+    Example::
+
+        >>> with torch.nn.utils.deferred_init():
+        >>>     model = nn.Sequential(nn.Embedding(10 ** 9, 64), nn.Linear(64, 10))
+        >>> torch.nn.utils.materialize_(model, rank=dist.get_rank(), world_size=dist.get_world_size(),
+        >>>                             shard={'0.weight'})
+        >>> model[0].weight.shape  # (ceil(10 ** 9 / world_size), 64) on most ranks
+    """
+    if not (rank is None) == (world_size is None) == (shard is None):
+        raise ValueError("rank, world_size and shard must be given together")
+    placeholders = [(prefix + ('.' if prefix else '') + name, param)
+                    for prefix, m in module.named_modules()
+                    for name, param in m._parameters.items() if param is not None and is_deferred(param)]
+    if shard is not None and not callable(shard):
+        unknown = set(shard).difference(name for name, _ in placeholders)
+        if unknown:
+            raise ValueError("shard names parameters that are not placeholders of the module: {}".format(
+                ', '.join(sorted(unknown))))
+        shard = set(shard).__contains__
+    if state_dict is None:
+        state_dict = {}
+    missing = set()
+    loaded = []
+    with torch.no_grad():
+        for name, param in placeholders:
+            if not is_deferred(param):
+                # shared with a module materialized before
+                continue
+            size = list(param.size())
+            start, length = 0, size[0]
+            if shard is not None and shard(name):
+                start, length = _shard_range(size[0], rank, world_size)
+                size[0] = length
+            param.data = torch.empty(size, dtype=param.dtype,
+                                     device=param.device if device is None else device)
+            del param._deferred_init
+            if name in state_dict:
+                loaded.append((param, state_dict[name].narrow(0, start, length)))
+            else:
+                missing.add(param)
+
+        # Initialize the parameters missing from the state dict as when the
+        # modules are constructed, children before their parents
+        for m in reversed(list(module.modules())):
+            if not any(p in missing for p in m.parameters()):
+                continue
+            reset = next((getattr(m, name) for name in _RESET_METHODS if hasattr(m, name)), None)
+            if reset is not None:
+                reset()
+            elif any(p in missing for p in m._parameters.values()):
+                raise RuntimeError("{} has no reset_parameters to initialize the parameters missing "
+                                   "from the state dict".format(type(m).__name__))
+
+        # after the resets, which may initialize all the parameters
+        for param, value in loaded:
+            param.copy_(value)
+        for prefix, m in module.named_modules():
+            prefix = prefix + '.' if prefix else ''
+            for name, buf in m._buffers.items():
+                if buf is not None and prefix + name in state_dict:
+                    buf.copy_(state_dict[prefix + name])
+    return module
@@ -0,0 +1,19 @@
+from typing import Any, Callable, Dict, Optional, Set, TypeVar, Union
+from ..modules import Module
+from ... import Tensor, device
+
+T_module = TypeVar('T_module', bound=Module)
+
+
+def is_deferred(tensor: Tensor) -> bool: ...
+
+
+class deferred_init:
+    def __enter__(self) -> deferred_init: ...
+
+    def __exit__(self, *args: Any) -> bool: ...
+
+
+def materialize_(module: T_module, state_dict: Optional[Dict[str, Tensor]] = ..., device: Optional[device] = ...,
+                 rank: Optional[int] = ..., world_size: Optional[int] = ...,
+                 shard: Optional[Union[Set[str], Callable[[str], bool]]] = ...) -> T_module: ...
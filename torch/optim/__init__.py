@@ -8,26 +8,35 @@ future.
 from .adadelta import Adadelta
 from .adagrad import Adagrad
 from .adam import Adam
+from .adam8bit import Adam8bit
+from .adafactor import Adafactor
 from .adamw import AdamW
 from .sparse_adam import SparseAdam
+from .lazy_adam import LazyAdam
 from .adamax import Adamax
 from .asgd import ASGD
 from .sgd import SGD
 from .rprop import Rprop
 from .rmsprop import RMSprop
+from .rowwise_adagrad import RowWiseAdagrad
 from .optimizer import Optimizer
 from .lbfgs import LBFGS
 from . import lr_scheduler
+from . import swa_utils
 
 del adadelta
 del adagrad
 del adam
+del adam8bit
+del adafactor
 del adamw
 del sparse_adam
+del lazy_adam
 del adamax
 del asgd
 del sgd
 del rprop
 del rmsprop
+del rowwise_adagrad
 del optimizer
 del lbfgs
@@ -1,13 +1,18 @@
 from . import lr_scheduler as lr_scheduler
+from . import swa_utils as swa_utils
 from .adadelta import Adadelta
 from .adagrad import Adagrad
+from .adafactor import Adafactor
 from .adam import Adam as Adam
+from .adam8bit import Adam8bit
 from .adamax import Adamax
 from .adamw import AdamW as AdamW
 from .asgd import ASGD
+from .lazy_adam import LazyAdam
 from .lbfgs import LBFGS
 from .optimizer import Optimizer
 from .rmsprop import RMSprop
+from .rowwise_adagrad import RowWiseAdagrad
 from .rprop import Rprop
 from .sgd import SGD as SGD
 from .sparse_adam import SparseAdam
@@ -0,0 +1,348 @@
+r"""Helpers for the multi-tensor (``foreach=True``) implementations of the optimizers.
+
+The per-parameter implementations launch several small ops for every parameter
+of a group. The multi-tensor implementations instead keep the state of all the
+parameters of a group (per device and dtype) in a few flat buffers and run the
+update math on them as a handful of large ops. The per-parameter entries of
+``Optimizer.state`` are views into those buffers, so ``state_dict`` and
+``load_state_dict`` keep working with the usual per-parameter format.
+
+Besides the state, a :class:`FlatState` keeps a flat copy of the gradients,
+gathered with ``torch.cat(..., out=)`` into the same buffer at every step, and
+the flat scratch buffers of the update (see :meth:`FlatState.scratch`), each
+of the size of the parameters. After :meth:`Optimizer.flatten_parameters`, the
+gradients are used in place, and copied only to be scaled or decayed. Per
+element coefficients (see :meth:`FlatState.per_param`) are temporaries of the
+same size.
+
+The buffers span all the parameters of the group, whether they have a gradient
+or not, so that they are reused from one step to the next. The parameters
+without a gradient are *inactive* for the step: their state and their data are
+left untouched, as with the per-parameter implementations. Options that differ
+between parameters, e.g. a bias correction when the parameters were updated a
+different number of times, are expanded into per-element coefficients (see
+:meth:`FlatState.per_param`).
+
+:meth:`Optimizer.flatten_parameters` additionally packs the parameters and
+their gradients into flat buffers (see :class:`FlatParameters`), so that the
+gradients don't need to be gathered before the update and the parameters are
+updated with a single op.
+"""
+from collections import OrderedDict
+
+import torch
+from torch._utils import _unflatten_dense_tensors
+
+
+def group_by_device_and_dtype(tensors):
+    groups = OrderedDict()
+    for t in tensors:
+        groups.setdefault((t.device, t.dtype), []).append(t)
+    return groups
+
+
+def params_with_grad(group, name):
+    params = [p for p in group['params'] if p.grad is not None]
+    for p in params:
+        if p.grad.is_sparse:
+            raise RuntimeError('{} does not support sparse gradients with foreach=True'.format(name))
+    return params
+
+
+def _storage_aliases(flat, tensors):
+    r"""Like ``_unflatten_dense_tensors``, but returns plain tensors sharing the
+    storage of ``flat`` instead of autograd views of it. Gradients have to be
+    detachable in place (see ``zero_grad``), which is not allowed for views.
+    """
+    outputs = []
+    offset = flat.storage_offset()
+    for tensor in tensors:
+        outputs.append(flat.new_empty(0).set_(flat.storage(), offset, tensor.size()))
+        offset += tensor.numel()
+    return tuple(outputs)
+
+
+class FlatParameters(object):
+    r"""Flat buffers holding the data and the gradients of ``params``.
+
+    On construction, the ``.data`` and ``.grad`` of every parameter are replaced
+    by views into the buffers. Gradients of parameters that don't have one yet
+    are initialized with zeros. As long as the gradients are zeroed in place,
+    autograd accumulates them directly into the flat gradient buffer.
+    """
+    def __init__(self, params):
+        self.params = list(params)
+        with torch.no_grad():
+            self.data = torch.cat([p.reshape(-1) for p in self.params])
+            self.grad = torch.zeros_like(self.data)
+            self.data_views = _storage_aliases(self.data, self.params)
+            self.grad_views = _storage_aliases(self.grad, self.params)
+            for p, data, grad in zip(self.params, self.data_views, self.grad_views):
+                if p.grad is not None:
+                    if p.grad.is_sparse:
+                        raise RuntimeError('flat parameters do not support sparse gradients')
+                    grad.copy_(p.grad)
+                p.data = data
+                p.grad = grad
+
+    def adopt_grads(self, params):
+        r"""Makes the gradients of ``params`` views of the flat gradient buffer
+        again, after they were replaced, e.g. by a backward following
+        ``zero_grad(set_to_none=True)``. The new gradients are copied into the
+        buffer, and the parameters without a gradient get a zero one. This
+        keeps the buffers, but costs a copy of the gradients on top of their
+        allocation by the backward: zeroing the buffer in place is cheaper.
+
+        Returns False if ``params`` are not the packed parameters anymore, or
+        were moved, in which case the buffers must be rebuilt.
+        """
+        if len(params) != len(self.params):
+            return False
+        for p, q, data, grad in zip(params, self.params, self.data_views, self.grad_views):
+            if p is not q or p.data_ptr() != data.data_ptr():
+                return False
+            if p.grad is not None and p.grad.is_sparse:
+                return False
+        with torch.no_grad():
+            for p, grad in zip(self.params, self.grad_views):
+                if p.grad is None:
+                    grad.zero_()
+                elif p.grad.data_ptr() != grad.data_ptr():
+                    grad.copy_(p.grad)
+                else:
+                    continue
+                p.grad = grad
+        return True
+
+    def is_valid(self, params=None):
+        r"""Checks that the parameters in ``params`` (defaults to all the packed
+        parameters) still use the flat buffers for their data and gradients.
+
+        This is not the case anymore after a parameter has been moved, or after
+        its ``.data`` or ``.grad`` has been replaced.
+        """
+        if params is not None:
+            if len(params) != len(self.params):
+                return False
+            for p, q in zip(params, self.params):
+                if p is not q:
+                    return False
+        for p, data, grad in zip(self.params, self.data_views, self.grad_views):
+            if p.data_ptr() != data.data_ptr() or p.grad is None or p.grad.data_ptr() != grad.data_ptr():
+                return False
+        return True
+
+
+class FlatState(object):
+    r"""Flat buffers holding the optimizer state ``names`` of ``params``.
+
+    On construction, the current per-parameter state tensors are copied into
+    one contiguous buffer per name, and the entries of ``state`` are replaced
+    by views into it. The parts of the buffers of the parameters without state
+    yet are zeros, until :meth:`init_state` adds their entries. If
+    ``flat_parameters`` is given, its buffers are used for the data and the
+    gradients of ``params`` instead of gathering them.
+
+    :meth:`set_active` marks the parameters updated by the current step.
+    """
+    def __init__(self, params, state, names, flat_parameters=None):
+        self.params = list(params)
+        self.buffers = {}
+        self.views = {}
+        zero = self.params[0].new_zeros(1)
+        for name in names:
+            entries = [state.get(p, {}).get(name) for p in self.params]
+            flat = torch.cat([zero.expand(p.numel()) if entry is None else entry.reshape(-1)
+                              for p, entry in zip(self.params, entries)])
+            views = _unflatten_dense_tensors(flat, self.params)
+            for p, entry, view in zip(self.params, entries, views):
+                if entry is not None:
+                    state[p][name] = view
+            self.buffers[name] = flat
+            self.views[name] = views
+        self.flat_parameters = flat_parameters
+        if flat_parameters is not None:
+            self.grad, self.grad_views = flat_parameters.grad, flat_parameters.grad_views
+        else:
+            self.grad = self.params[0].new_empty(sum(p.numel() for p in self.params))
+            self.grad_views = _unflatten_dense_tensors(self.grad, self.params)
+        self._zero = zero
+        self._numels = None
+        self._scratch = []
+        self._decayed_grad = None
+        self.set_active([True] * len(self.params))
+
+    def is_valid(self, params, state):
+        r"""Checks that the buffers still back the state of exactly ``params``.
+
+        This is not the case anymore after ``load_state_dict`` or when a state
+        entry was replaced by hand.
+        """
+        if len(params) != len(self.params):
+            return False
+        for p, q in zip(params, self.params):
+            if p is not q:
+                return False
+        for name, views in self.views.items():
+            for p, view in zip(params, views):
+                entry = state.get(p, {}).get(name)
+                if entry is not None and entry is not view:
+                    return False
+        if self.flat_parameters is not None and not self.flat_parameters.is_valid():
+            return False
+        return True
+
+    def set_active(self, active):
+        r"""Sets which parameters are updated by the current step, one bool per
+        parameter. The state and the data of the other ones are left untouched
+        by the update."""
+        self.active = list(active)
+        self.inactive = [i for i, a in enumerate(self.active) if not a]
+
+    def init_state(self, state, **defaults):
+        r"""Adds the missing state entries of the active parameters: zeroed
+        views of the flat buffers, and the entries ``defaults``."""
+        for i, p in enumerate(self.params):
+            if not self.active[i]:
+                continue
+            param_state = state[p]
+            for name, views in self.views.items():
+                if name not in param_state:
+                    param_state[name] = views[i].zero_()
+            for key, value in defaults.items():
+                param_state.setdefault(key, value)
+
+    def advance_steps(self, state):
+        r"""Increments the ``'step'`` of the active parameters, and returns
+        their new steps."""
+        steps = []
+        for p, active in zip(self.params, self.active):
+            if active:
+                state[p]['step'] += 1
+                steps.append(state[p]['step'])
+        return steps
+
+    def per_param(self, values, inactive=None):
+        r"""Expands ``values``, one number per active parameter (or a single
+        number for all of them), into a flat buffer where each number is
+        repeated over the elements of its parameter.
+
+        The elements of the inactive parameters are ``inactive``, or don't
+        matter if it is ``None``. If all the elements are equal, the number is
+        returned instead, so that the update runs with scalar options as long
+        as the parameters are updated alike.
+        """
+        if not isinstance(values, (list, tuple)):
+            values = [values] * (len(self.params) - len(self.inactive))
+        distinct = set(values)
+        if inactive is not None and self.inactive:
+            distinct.add(inactive)
+        if len(distinct) == 1:
+            return distinct.pop()
+        if inactive is None:
+            inactive = values[0]
+        values = iter(values)
+        values = [next(values) if active else inactive for active in self.active]
+        if self._numels is None:
+            self._numels = torch.tensor([p.numel() for p in self.params], device=self.grad.device)
+        values = torch.tensor(values, dtype=self.grad.dtype, device=self.grad.device)
+        return values.repeat_interleave(self._numels)
+
+    def flat_grad(self, weight_decay=0, scale=None):
+        r"""Returns the flat gradient, times ``scale`` (a 0-dim tensor) if given,
+        plus ``weight_decay`` times the parameters if it is nonzero. The
+        gradient of the inactive parameters is zero. The ``.grad`` of the
+        parameters are left untouched."""
+        if self.flat_parameters is None:
+            grad = torch.cat([self._zero.expand(p.numel()) if p.grad is None else p.grad.reshape(-1)
+                              for p in self.params], out=self.grad)
+            if scale is not None:
+                grad.mul_(scale)
+            if weight_decay != 0:
+                grad.add_(self.flat_params(out=self.scratch()[0]), alpha=weight_decay)
+                self._zero_inactive(self.grad_views)
+            return grad
+        # the gradients of the inactive parameters were zeroed by adopt_grads
+        if weight_decay == 0 and scale is None:
+            return self.grad
+        if self._decayed_grad is None:
+            flat = torch.empty_like(self.grad)
+            self._decayed_grad = (flat, _unflatten_dense_tensors(flat, self.params))
+        if scale is None:
+            grad = torch.add(self.grad, self.flat_parameters.data, alpha=weight_decay, out=self._decayed_grad[0])
+        else:
+            grad = torch.mul(self.grad, scale, out=self._decayed_grad[0])
+            if weight_decay != 0:
+                grad.add_(self.flat_parameters.data, alpha=weight_decay)
+        if weight_decay != 0:
+            self._zero_inactive(self._decayed_grad[1])
+        return grad
+
+    def _zero_inactive(self, views):
+        for i in self.inactive:
+            views[i].zero_()
+
+    def flat_params(self, out):
+        if self.flat_parameters is not None:
+            return self.flat_parameters.data
+        return torch.cat([p.reshape(-1) for p in self.params], out=out)
+
+    def scratch(self, index=0):
+        r"""Returns a preallocated flat buffer and its per-parameter views."""
+        while len(self._scratch) <= index:
+            flat = torch.empty_like(self.grad)
+            self._scratch.append((flat, _unflatten_dense_tensors(flat, self.params)))
+        return self._scratch[index]
+
+    def views_of(self, flat):
+        r"""Returns the per-parameter views of a flat tensor, usually one of
+        the flat buffers."""
+        if flat is self.grad:
+            return self.grad_views
+        for name, buf in self.buffers.items():
+            if flat is buf:
+                return self.views[name]
+        for buf, views in self._scratch:
+            if flat is buf:
+                return views
+        if self._decayed_grad is not None and flat is self._decayed_grad[0]:
+            return self._decayed_grad[1]
+        if flat.dim() != 1 or flat.numel() != self.grad.numel():
+            raise ValueError("tensor is not a flat tensor of the parameters")
+        return _unflatten_dense_tensors(flat, self.params)
+
+    def update_params(self, op, *args, **kwargs):
+        r"""Applies the in-place method ``op`` to the active parameters.
+
+        Tensor arguments must be flat tensors of the parameters, usually flat
+        buffers of this object. The ``alpha`` or ``value`` of ``add_``,
+        ``addcmul_`` and ``addcdiv_`` may be a flat tensor as well (see
+        :meth:`per_param`), which is then overwritten by the whole term added
+        to the parameters, instead of allocating a buffer for it. With flat
+        parameters, ``op`` is applied once to the flat data buffer, otherwise
+        it is applied to each parameter with the matching views of the
+        arguments.
+        """
+        coef = kwargs.get('alpha', kwargs.get('value'))
+        if isinstance(coef, torch.Tensor):
+            if op == 'add_':
+                coef.mul_(args[0])
+            elif op == 'addcmul_':
+                coef.mul_(args[0]).mul_(args[1])
+            elif op == 'addcdiv_':
+                coef.mul_(args[0]).div_(args[1])
+            else:
+                raise ValueError("{} does not take a per-element coefficient".format(op))
+            op, args, kwargs = 'add_', (coef,), {}
+        if self.flat_parameters is not None:
+            data_views = self.flat_parameters.data_views
+            saved = [data_views[i].clone() for i in self.inactive]
+            getattr(self.flat_parameters.data, op)(*args, **kwargs)
+            for i, data in zip(self.inactive, saved):
+                data_views[i].copy_(data)
+            return
+        args = [self.views_of(arg) if isinstance(arg, torch.Tensor) else [arg] * len(self.params)
+                for arg in args]
+        for i, p in enumerate(self.params):
+            if self.active[i]:
+                getattr(p, op)(*[arg[i] for arg in args], **kwargs)
@@ -0,0 +1,23 @@
+import torch
+
+
+def present_rows(p, grad, name, skip_zero_rows=True):
+    r"""Returns the indices of the rows of ``p`` (along its first dimension)
+    present in ``grad`` and the matching rows of the gradient.
+
+    Sparse gradients are coalesced, so that the indices are unique. For dense
+    gradients, the rows that are entirely zero are skipped if
+    ``skip_zero_rows``, otherwise all rows are returned.
+    """
+    if p.dim() == 0:
+        raise RuntimeError('{} does not support scalar parameters'.format(name))
+    if grad.is_sparse:
+        if grad.sparse_dim() != 1:
+            raise RuntimeError('{} only supports sparse gradients with one sparse dimension, '
+                               'but got {}'.format(name, grad.sparse_dim()))
+        grad = grad.coalesce()  # the update is non-linear so indices must be unique
+        return grad._indices()[0], grad._values()
+    if skip_zero_rows:
+        indices = grad.reshape(grad.size(0), -1).ne(0).any(dim=1).nonzero().view(-1)
+        return indices, grad.index_select(0, indices)
+    return torch.arange(grad.size(0), device=grad.device), grad
@@ -1,6 +1,7 @@
 import torch
 
 from .optimizer import Optimizer
+from . import _multi_tensor
 
 
 class Adadelta(Optimizer):
@@ -18,11 +19,19 @@ class Adadelta(Optimizer):
         lr (float, optional): coefficient that scale delta before it is applied
             to the parameters (default: 1.0)
         weight_decay (float, optional): weight decay (L2 penalty) (default: 0)
+        foreach (bool, optional): whether to use the multi-tensor
+            implementation, which keeps the state of each param group in flat
+            buffers and updates all its parameters with a few large ops instead
+            of several small ops per parameter. Besides the state, it keeps a
+            flat copy of the gradients of each group, which
+            :meth:`flatten_parameters` avoids without weight decay, and two flat
+            buffers for the terms of the update, each of the size of the
+            parameters (default: False)
 
     __ https://arxiv.org/abs/1212.5701
     """
 
-    def __init__(self, params, lr=1.0, rho=0.9, eps=1e-6, weight_decay=0):
+    def __init__(self, params, lr=1.0, rho=0.9, eps=1e-6, weight_decay=0, foreach=False):
         if not 0.0 <= lr:
             raise ValueError("Invalid learning rate: {}".format(lr))
         if not 0.0 <= rho <= 1.0:
@@ -32,9 +41,40 @@ class Adadelta(Optimizer):
         if not 0.0 <= weight_decay:
             raise ValueError("Invalid weight_decay value: {}".format(weight_decay))
 
-        defaults = dict(lr=lr, rho=rho, eps=eps, weight_decay=weight_decay)
+        defaults = dict(lr=lr, rho=rho, eps=eps, weight_decay=weight_decay, foreach=foreach)
         super(Adadelta, self).__init__(params, defaults)
 
+    def __setstate__(self, state):
+        super(Adadelta, self).__setstate__(state)
+        for group in self.param_groups:
+            group.setdefault('foreach', False)
+
+    def _multi_tensor_step(self, group):
+        """Updates all the parameters of ``group`` at once."""
+        if len(_multi_tensor.params_with_grad(group, 'Adadelta')) == 0:
+            return True
+        names = ['square_avg', 'acc_delta']
+        rho, eps = group['rho'], group['eps']
+        grad_scale = self._take_grad_scale(group)
+        for device_params in _multi_tensor.group_by_device_and_dtype(group['params']).values():
+            flat = self._get_flat_state(group, device_params, names)
+            if len(flat.inactive) == len(device_params):
+                continue
+            flat.init_state(self.state, step=0)
+            flat.advance_steps(self.state)
+            decay = flat.per_param(rho, inactive=1)
+            grad = flat.flat_grad(group['weight_decay'], grad_scale)
+            std, _ = flat.scratch(0)
+            delta, _ = flat.scratch(1)
+
+            square_avg, acc_delta = flat.buffers['square_avg'], flat.buffers['acc_delta']
+            square_avg.mul_(decay).addcmul_(grad, grad, value=1 - rho)
+            torch.add(square_avg, eps, out=std).sqrt_()
+            torch.add(acc_delta, eps, out=delta).sqrt_().div_(std).mul_(grad)
+            flat.update_params('add_', delta, alpha=-group['lr'])
+            acc_delta.mul_(decay).addcmul_(delta, delta, value=1 - rho)
+        return True
+
     @torch.no_grad()
     def step(self, closure=None):
         """Performs a single optimization step.
@@ -49,6 +89,8 @@ class Adadelta(Optimizer):
                 loss = closure()
 
         for group in self.param_groups:
+            if group['foreach'] and self._foreach_step(group):
+                continue
             for p in group['params']:
                 if p.grad is None:
                     continue
@@ -0,0 +1,162 @@
+import math
+import torch
+from .optimizer import Optimizer
+
+
+class Adafactor(Optimizer):
+    r"""Implements Adafactor algorithm.
+
+    It has been proposed in `Adafactor: Adaptive Learning Rates with Sublinear
+    Memory Cost`_.
+
+    For parameters with two or more dimensions, the second moment of the
+    gradient is not stored elementwise as in :class:`Adam`. It is estimated
+    instead from exponential moving averages of its row and column means over
+    the last two dimensions, which needs :math:`O(n + m)` rather than
+    :math:`O(nm)` memory for a :math:`n \times m` matrix. Without ``beta1``, no
+    first moment is stored either.
+
+    Arguments:
+        params (iterable): iterable of parameters to optimize or dicts defining
+            parameter groups
+        lr (float, optional): external learning rate. Must be ``None`` when
+            ``relative_step`` is ``True`` (default: None)
+        eps (Tuple[float, float], optional): regularization constants for the
+            squared gradient and for the parameter scale, respectively
+            (default: (1e-30, 1e-3))
+        clip_threshold (float, optional): threshold on the root mean square of
+            the final update (default: 1.0)
+        decay_rate (float, optional): coefficient used to compute the running
+            average of the squared gradient, which uses
+            :math:`\hat{\beta}_{2t} = 1 - t^{\text{decay\_rate}}` at step
+            :math:`t` (default: -0.8)
+        beta1 (float, optional): coefficient used for computing the running
+            average of the update. No first moment is kept if ``None``
+            (default: None)
+        weight_decay (float, optional): weight decay, scaled by the learning
+            rate (default: 0)
+        scale_parameter (bool, optional): if ``True``, the learning rate is
+            scaled by the root mean square of the parameter (default: True)
+        relative_step (bool, optional): if ``True``, a time-dependent learning
+            rate is computed instead of using ``lr`` (default: True)
+        warmup_init (bool, optional): if ``True``, the time-dependent learning
+            rate is warmed up from zero (default: False)
+
+    .. _Adafactor\: Adaptive Learning Rates with Sublinear Memory Cost:
+        https://arxiv.org/abs/1804.04235
+    """
+
+    def __init__(self, params, lr=None, eps=(1e-30, 1e-3), clip_threshold=1.0,
+                 decay_rate=-0.8, beta1=None, weight_decay=0, scale_parameter=True,
+                 relative_step=True, warmup_init=False):
+        if lr is not None and relative_step:
+            raise ValueError("lr must be None when relative_step is True")
+        if lr is None and not relative_step:
+            raise ValueError("lr must be specified when relative_step is False")
+        if lr is not None and not 0.0 <= lr:
+            raise ValueError("Invalid learning rate: {}".format(lr))
+        if warmup_init and not relative_step:
+            raise ValueError("warmup_init requires relative_step=True")
+        if not 0.0 <= eps[0] or not 0.0 <= eps[1]:
+            raise ValueError("Invalid epsilon value: {}".format(eps))
+        if not 0.0 < clip_threshold:
+            raise ValueError("Invalid clip_threshold value: {}".format(clip_threshold))
+        if not decay_rate <= 0.0:
+            raise ValueError("Invalid decay_rate value: {}".format(decay_rate))
+        if beta1 is not None and not 0.0 <= beta1 < 1.0:
+            raise ValueError("Invalid beta1 value: {}".format(beta1))
+        if not 0.0 <= weight_decay:
+            raise ValueError("Invalid weight_decay value: {}".format(weight_decay))
+
+        defaults = dict(lr=lr, eps=eps, clip_threshold=clip_threshold, decay_rate=decay_rate,
+                        beta1=beta1, weight_decay=weight_decay, scale_parameter=scale_parameter,
+                        relative_step=relative_step, warmup_init=warmup_init)
+        super(Adafactor, self).__init__(params, defaults)
+
+    @staticmethod
+    def _rms(tensor):
+        return tensor.norm(2) / math.sqrt(tensor.numel())
+
+    @staticmethod
+    def _get_lr(group, state):
+        if group['relative_step']:
+            min_step = 1e-6 * state['step'] if group['warmup_init'] else 1e-2
+            lr = min(min_step, 1.0 / math.sqrt(state['step']))
+        else:
+            lr = group['lr']
+        if group['scale_parameter']:
+            lr *= max(group['eps'][1], state['RMS'])
+        return lr
+
+    @torch.no_grad()
+    def step(self, closure=None):
+        """Performs a single optimization step.
+
+        Arguments:
+            closure (callable, optional): A closure that reevaluates the model
+                and returns the loss.
+        """
+        loss = None
+        if closure is not None:
+            with torch.enable_grad():
+                loss = closure()
+
+        for group in self.param_groups:
+            for p in group['params']:
+                if p.grad is None:
+                    continue
+                grad = p.grad
+                if grad.is_sparse:
+                    raise RuntimeError('Adafactor does not support sparse gradients')
+
+                state = self.state[p]
+                factored = grad.dim() >= 2
+
+                # State initialization
+                if len(state) == 0:
+                    state['step'] = 0
+                    if factored:
+                        # Exponential moving averages of the row and column means
+                        # of the squared gradient
+                        state['exp_avg_sq_row'] = grad.new_zeros(grad.shape[:-1])
+                        state['exp_avg_sq_col'] = grad.new_zeros(grad.shape[:-2] + grad.shape[-1:])
+                    else:
+                        state['exp_avg_sq'] = torch.zeros_like(p, memory_format=torch.preserve_format)
+                    if group['beta1'] is not None:
+                        state['exp_avg'] = torch.zeros_like(p, memory_format=torch.preserve_format)
+
+                state['step'] += 1
+                state['RMS'] = self._rms(p).item()
+                lr = self._get_lr(group, state)
+                beta2t = 1.0 - math.pow(state['step'], group['decay_rate'])
+
+                update = grad.pow(2).add_(group['eps'][0])
+                if factored:
+                    exp_avg_sq_row, exp_avg_sq_col = state['exp_avg_sq_row'], state['exp_avg_sq_col']
+                    exp_avg_sq_row.mul_(beta2t).add_(update.mean(dim=-1), alpha=1 - beta2t)
+                    exp_avg_sq_col.mul_(beta2t).add_(update.mean(dim=-2), alpha=1 - beta2t)
+                    # Rank-1 approximation of the inverse square root of the
+                    # second moment from the row and column statistics
+                    row_factor = exp_avg_sq_row.div(exp_avg_sq_row.mean(dim=-1, keepdim=True)).rsqrt_()
+                    col_factor = exp_avg_sq_col.rsqrt()
+                    torch.mul(row_factor.unsqueeze(-1), col_factor.unsqueeze(-2), out=update)
+                    update.mul_(grad)
+                else:
+                    exp_avg_sq = state['exp_avg_sq']
+                    exp_avg_sq.mul_(beta2t).add_(update, alpha=1 - beta2t)
+                    torch.rsqrt(exp_avg_sq, out=update).mul_(grad)
+
+                update.div_((self._rms(update) / group['clip_threshold']).clamp_(min=1.0))
+                update.mul_(lr)
+
+                if group['beta1'] is not None:
+                    exp_avg = state['exp_avg']
+                    exp_avg.mul_(group['beta1']).add_(update, alpha=1 - group['beta1'])
+                    update = exp_avg
+
+                if group['weight_decay'] != 0:
+                    p.add_(p, alpha=-group['weight_decay'] * lr)
+
+                p.sub_(update)
+
+        return loss
@@ -0,0 +1,5 @@
+from typing import Tuple, Optional
+from .optimizer import _params_t, Optimizer
+
+class Adafactor(Optimizer):
+    def __init__(self, params: _params_t, lr: Optional[float]=..., eps: Tuple[float, float]=..., clip_threshold: float=..., decay_rate: float=..., beta1: Optional[float]=..., weight_decay: float=..., scale_parameter: bool=..., relative_step: bool=..., warmup_init: bool=...) -> None: ...
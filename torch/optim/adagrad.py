@@ -1,5 +1,6 @@
 import torch
 from .optimizer import Optimizer
+from . import _multi_tensor
 
 
 class Adagrad(Optimizer):
@@ -16,12 +17,21 @@ class Adagrad(Optimizer):
         weight_decay (float, optional): weight decay (L2 penalty) (default: 0)
         eps (float, optional): term added to the denominator to improve
             numerical stability (default: 1e-10)
+        foreach (bool, optional): whether to use the multi-tensor
+            implementation for dense gradients, which keeps the state of each
+            param group in flat buffers and updates all its parameters with a
+            few large ops instead of several small ops per parameter. Besides
+            the state, it keeps a flat copy of the gradients of each group,
+            which :meth:`flatten_parameters` avoids without weight decay, and a
+            flat buffer for the square roots of the sums, each of the size of
+            the parameters (default: False)
 
     .. _Adaptive Subgradient Methods for Online Learning and Stochastic
         Optimization: http://jmlr.org/papers/v12/duchi11a.html
     """
 
-    def __init__(self, params, lr=1e-2, lr_decay=0, weight_decay=0, initial_accumulator_value=0, eps=1e-10):
+    def __init__(self, params, lr=1e-2, lr_decay=0, weight_decay=0, initial_accumulator_value=0, eps=1e-10,
+                 foreach=False):
         if not 0.0 <= lr:
             raise ValueError("Invalid learning rate: {}".format(lr))
         if not 0.0 <= lr_decay:
@@ -34,7 +44,7 @@ class Adagrad(Optimizer):
             raise ValueError("Invalid epsilon value: {}".format(eps))
 
         defaults = dict(lr=lr, lr_decay=lr_decay, eps=eps, weight_decay=weight_decay,
-                        initial_accumulator_value=initial_accumulator_value)
+                        initial_accumulator_value=initial_accumulator_value, foreach=foreach)
         super(Adagrad, self).__init__(params, defaults)
 
         for group in self.param_groups:
@@ -43,12 +53,42 @@ class Adagrad(Optimizer):
                 state['step'] = 0
                 state['sum'] = torch.full_like(p, initial_accumulator_value, memory_format=torch.preserve_format)
 
+    def __setstate__(self, state):
+        super(Adagrad, self).__setstate__(state)
+        for group in self.param_groups:
+            group.setdefault('foreach', False)
+
     def share_memory(self):
         for group in self.param_groups:
             for p in group['params']:
                 state = self.state[p]
                 state['sum'].share_memory_()
 
+    def _multi_tensor_step(self, group):
+        """Updates all the parameters of ``group`` at once. Returns False if the
+        group has to be updated parameter by parameter instead."""
+        params = [p for p in group['params'] if p.grad is not None]
+        if len(params) == 0:
+            return True
+        if any(p.grad.is_sparse for p in params):
+            return False
+
+        grad_scale = self._take_grad_scale(group)
+        for device_params in _multi_tensor.group_by_device_and_dtype(group['params']).values():
+            flat = self._get_flat_state(group, device_params, ['sum'])
+            if len(flat.inactive) == len(device_params):
+                continue
+            # the parameters may have been updated a different number of times
+            steps = flat.advance_steps(self.state)
+            clr = flat.per_param([group['lr'] / (1 + (step - 1) * group['lr_decay']) for step in steps])
+
+            grad = flat.flat_grad(group['weight_decay'], grad_scale)
+            std, _ = flat.scratch()
+            flat.buffers['sum'].addcmul_(grad, grad, value=1)
+            torch.sqrt(flat.buffers['sum'], out=std).add_(group['eps'])
+            flat.update_params('addcdiv_', grad, std, value=-clr)
+        return True
+
     @torch.no_grad()
     def step(self, closure=None):
         """Performs a single optimization step.
@@ -63,6 +103,8 @@ class Adagrad(Optimizer):
                 loss = closure()
 
         for group in self.param_groups:
+            if group['foreach'] and self._foreach_step(group):
+                continue
             for p in group['params']:
                 if p.grad is None:
                     continue
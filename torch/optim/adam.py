@@ -1,6 +1,7 @@
 import math
 import torch
 from .optimizer import Optimizer
+from . import _multi_tensor
 
 
 class Adam(Optimizer):
@@ -20,6 +21,14 @@ class Adam(Optimizer):
         amsgrad (boolean, optional): whether to use the AMSGrad variant of this
             algorithm from the paper `On the Convergence of Adam and Beyond`_
             (default: False)
+        foreach (boolean, optional): whether to use the multi-tensor
+            implementation, which keeps the state of each param group in flat
+            buffers and updates all its parameters with a few large ops instead
+            of several small ops per parameter. Besides the state, it keeps a
+            flat copy of the gradients of each group, which
+            :meth:`flatten_parameters` avoids without weight decay, and a flat
+            buffer for the denominator of the update, each of the size of the
+            parameters (default: False)
 
     .. _Adam\: A Method for Stochastic Optimization:
         https://arxiv.org/abs/1412.6980
@@ -28,7 +37,7 @@ class Adam(Optimizer):
     """
 
     def __init__(self, params, lr=1e-3, betas=(0.9, 0.999), eps=1e-8,
-                 weight_decay=0, amsgrad=False):
+                 weight_decay=0, amsgrad=False, foreach=False):
         if not 0.0 <= lr:
             raise ValueError("Invalid learning rate: {}".format(lr))
         if not 0.0 <= eps:
@@ -40,13 +49,49 @@ class Adam(Optimizer):
         if not 0.0 <= weight_decay:
             raise ValueError("Invalid weight_decay value: {}".format(weight_decay))
         defaults = dict(lr=lr, betas=betas, eps=eps,
-                        weight_decay=weight_decay, amsgrad=amsgrad)
+                        weight_decay=weight_decay, amsgrad=amsgrad, foreach=foreach)
         super(Adam, self).__init__(params, defaults)
 
     def __setstate__(self, state):
         super(Adam, self).__setstate__(state)
         for group in self.param_groups:
             group.setdefault('amsgrad', False)
+            group.setdefault('foreach', False)
+
+    def _multi_tensor_step(self, group):
+        """Updates all the parameters of ``group`` at once."""
+        if len(_multi_tensor.params_with_grad(group, 'Adam')) == 0:
+            return True
+        amsgrad = group['amsgrad']
+        names = ['exp_avg', 'exp_avg_sq'] + (['max_exp_avg_sq'] if amsgrad else [])
+        beta1, beta2 = group['betas']
+        grad_scale = self._take_grad_scale(group)
+        for device_params in _multi_tensor.group_by_device_and_dtype(group['params']).values():
+            flat = self._get_flat_state(group, device_params, names)
+            if len(flat.inactive) == len(device_params):
+                continue
+            flat.init_state(self.state, step=0)
+            # the parameters may have been updated a different number of times
+            steps = flat.advance_steps(self.state)
+            sqrt_bias_correction2 = flat.per_param([math.sqrt(1 - beta2 ** step) for step in steps])
+            step_size = flat.per_param([group['lr'] / (1 - beta1 ** step) for step in steps])
+
+            grad = flat.flat_grad(group['weight_decay'], grad_scale)
+            denom, _ = flat.scratch()
+
+            exp_avg, exp_avg_sq = flat.buffers['exp_avg'], flat.buffers['exp_avg_sq']
+            exp_avg.mul_(flat.per_param(beta1, inactive=1)).add_(grad, alpha=1 - beta1)
+            exp_avg_sq.mul_(flat.per_param(beta2, inactive=1)).addcmul_(grad, grad, value=1 - beta2)
+            if amsgrad:
+                max_exp_avg_sq = flat.buffers['max_exp_avg_sq']
+                torch.max(max_exp_avg_sq, exp_avg_sq, out=max_exp_avg_sq)
+                torch.sqrt(max_exp_avg_sq, out=denom)
+            else:
+                torch.sqrt(exp_avg_sq, out=denom)
+            denom.div_(sqrt_bias_correction2).add_(group['eps'])
+
+            flat.update_params('addcdiv_', exp_avg, denom, value=-step_size)
+        return True
 
     @torch.no_grad()
     def step(self, closure=None):
@@ -62,6 +107,8 @@ class Adam(Optimizer):
                 loss = closure()
 
         for group in self.param_groups:
+            if group['foreach'] and self._foreach_step(group):
+                continue
             for p in group['params']:
                 if p.grad is None:
                     continue
@@ -0,0 +1,198 @@
+import math
+import torch
+from .optimizer import Optimizer
+
+# Maximum number of elements of a parameter updated at once by Adam8bit, which
+# bounds the memory of the dequantized moments and the temporaries of a step
+_CHUNK_SIZE = 2 ** 20
+
+
+def _quantize_blockwise(blocks, exponent, levels, dtype):
+    r"""Quantizes each row of ``blocks`` to ``dtype`` with its own scale.
+
+    The values are normalized by the maximum magnitude of their block, and the
+    ``exponent``-th root of the normalized magnitude is rounded to one of
+    ``levels`` steps. Compared to a linear code, this spends more of the codes
+    on small magnitudes, which dominate the optimizer state.
+    """
+    scale = blocks.abs().max(dim=1)[0]
+    codes = blocks.abs().div_(scale.clamp(min=torch.finfo(blocks.dtype).tiny).unsqueeze(1))
+    codes.pow_(1.0 / exponent).mul_(levels).round_()
+    if dtype.is_signed:
+        codes.mul_(blocks.sign())
+    return codes.to(dtype), scale
+
+
+def _dequantize_blockwise(codes, scale, exponent, levels):
+    values = codes.float()
+    signs = values.sign() if codes.dtype.is_signed else None
+    values.abs_().div_(levels).pow_(exponent).mul_(scale.float().unsqueeze(1))
+    if signs is not None:
+        values.mul_(signs)
+    return values
+
+
+class Adam8bit(Optimizer):
+    r"""Implements Adam algorithm with 8-bit optimizer state.
+
+    The algorithm has been proposed in `Adam: A Method for Stochastic Optimization`_.
+
+    The first and second moments are stored blockwise-quantized: each block of
+    ``block_size`` consecutive elements is kept as 8-bit codes together with a
+    single float scale, the maximum magnitude within the block. This takes
+    about a quarter of the memory of the float state of :class:`Adam`. The
+    moments are dequantized for the update, which is computed in float, and
+    quantized again afterwards, one chunk of blocks at a time, so that the
+    memory taken by the step doesn't grow with the size of the parameters.
+
+    The first moment uses signed codes with a square-root companding and the
+    second moment unsigned codes with a fourth-root companding, so that small
+    values relative to the block maximum are still represented.
+
+    Parameters with fewer than ``min_8bit_size`` elements keep float state,
+    since their state is small and a coarse quantization of e.g. biases or
+    normalization weights hurts the most.
+
+    Arguments:
+        params (iterable): iterable of parameters to optimize or dicts defining
+            parameter groups
+        lr (float, optional): learning rate (default: 1e-3)
+        betas (Tuple[float, float], optional): coefficients used for computing
+            running averages of gradient and its square (default: (0.9, 0.999))
+        eps (float, optional): term added to the denominator to improve
+            numerical stability (default: 1e-8)
+        weight_decay (float, optional): weight decay (L2 penalty) (default: 0)
+        block_size (int, optional): number of elements sharing a quantization
+            scale (default: 2048)
+        min_8bit_size (int, optional): minimum number of elements of a
+            parameter for its state to be quantized (default: 4096)
+
+    .. _Adam\: A Method for Stochastic Optimization:
+        https://arxiv.org/abs/1412.6980
+    """
+
+    def __init__(self, params, lr=1e-3, betas=(0.9, 0.999), eps=1e-8,
+                 weight_decay=0, block_size=2048, min_8bit_size=4096):
+        if not 0.0 <= lr:
+            raise ValueError("Invalid learning rate: {}".format(lr))
+        if not 0.0 <= eps:
+            raise ValueError("Invalid epsilon value: {}".format(eps))
+        if not 0.0 <= betas[0] < 1.0:
+            raise ValueError("Invalid beta parameter at index 0: {}".format(betas[0]))
+        if not 0.0 <= betas[1] < 1.0:
+            raise ValueError("Invalid beta parameter at index 1: {}".format(betas[1]))
+        if not 0.0 <= weight_decay:
+            raise ValueError("Invalid weight_decay value: {}".format(weight_decay))
+        if not 0 < block_size:
+            raise ValueError("Invalid block_size value: {}".format(block_size))
+        defaults = dict(lr=lr, betas=betas, eps=eps, weight_decay=weight_decay,
+                        block_size=block_size, min_8bit_size=min_8bit_size)
+        super(Adam8bit, self).__init__(params, defaults)
+
+    def _quantized_update(self, p, grad, state, group, bias_correction2, step_size):
+        # The moments are dequantized, updated and quantized again a chunk of
+        # blocks at a time, so that the float copies of the moments and the
+        # temporaries of the update take at most _CHUNK_SIZE elements each,
+        # whatever the size of the parameter.
+        beta1, beta2 = group['betas']
+        block_size = group['block_size']
+        blocks_per_chunk = max(1, _CHUNK_SIZE // block_size)
+        num_blocks = state['exp_avg_scale'].numel()
+        # The parameter is updated in place if it is contiguous, otherwise
+        # through a contiguous copy
+        data = p.view(-1) if p.is_contiguous() else p.reshape(-1)
+        grad = grad.reshape(-1)
+        for start in range(0, num_blocks, blocks_per_chunk):
+            end = min(start + blocks_per_chunk, num_blocks)
+            # The last block is padded with zeros past the last element
+            offset = start * block_size
+            length = min(end * block_size, p.numel()) - offset
+
+            exp_avg_blocks = _dequantize_blockwise(
+                state['exp_avg_int8'][start:end], state['exp_avg_scale'][start:end], 2, 127)
+            exp_avg_sq_blocks = _dequantize_blockwise(
+                state['exp_avg_sq_uint8'][start:end], state['exp_avg_sq_scale'][start:end], 4, 255)
+            exp_avg = exp_avg_blocks.view(-1).narrow(0, 0, length)
+            exp_avg_sq = exp_avg_sq_blocks.view(-1).narrow(0, 0, length)
+            chunk = data.narrow(0, offset, length)
+            chunk_grad = grad.narrow(0, offset, length)
+
+            if group['weight_decay'] != 0:
+                chunk_grad = chunk_grad.add(chunk, alpha=group['weight_decay'])
+
+            exp_avg.mul_(beta1).add_(chunk_grad, alpha=1 - beta1)
+            exp_avg_sq.mul_(beta2).addcmul_(chunk_grad, chunk_grad, value=1 - beta2)
+            denom = exp_avg_sq.sqrt().div_(math.sqrt(bias_correction2)).add_(group['eps'])
+
+            chunk.addcdiv_(exp_avg.to(p.dtype), denom.to(p.dtype), value=-step_size)
+
+            codes, scale = _quantize_blockwise(exp_avg_blocks, 2, 127, torch.int8)
+            state['exp_avg_int8'][start:end].copy_(codes)
+            state['exp_avg_scale'][start:end].copy_(scale)
+            codes, scale = _quantize_blockwise(exp_avg_sq_blocks, 4, 255, torch.uint8)
+            state['exp_avg_sq_uint8'][start:end].copy_(codes)
+            state['exp_avg_sq_scale'][start:end].copy_(scale)
+        if not p.is_contiguous():
+            p.copy_(data.view_as(p))
+
+    @torch.no_grad()
+    def step(self, closure=None):
+        """Performs a single optimization step.
+
+        Arguments:
+            closure (callable, optional): A closure that reevaluates the model
+                and returns the loss.
+        """
+        loss = None
+        if closure is not None:
+            with torch.enable_grad():
+                loss = closure()
+
+        for group in self.param_groups:
+            for p in group['params']:
+                if p.grad is None:
+                    continue
+                grad = p.grad
+                if grad.is_sparse:
+                    raise RuntimeError('Adam8bit does not support sparse gradients')
+
+                state = self.state[p]
+
+                # State initialization
+                if len(state) == 0:
+                    state['step'] = 0
+                    if p.numel() >= group['min_8bit_size']:
+                        num_blocks = (p.numel() + group['block_size'] - 1) // group['block_size']
+                        shape = (num_blocks, group['block_size'])
+                        state['exp_avg_int8'] = torch.zeros(shape, dtype=torch.int8, device=p.device)
+                        state['exp_avg_scale'] = torch.zeros(num_blocks, dtype=torch.float, device=p.device)
+                        state['exp_avg_sq_uint8'] = torch.zeros(shape, dtype=torch.uint8, device=p.device)
+                        state['exp_avg_sq_scale'] = torch.zeros(num_blocks, dtype=torch.float, device=p.device)
+                    else:
+                        state['exp_avg'] = torch.zeros_like(p, memory_format=torch.preserve_format)
+                        state['exp_avg_sq'] = torch.zeros_like(p, memory_format=torch.preserve_format)
+
+                beta1, beta2 = group['betas']
+
+                state['step'] += 1
+                bias_correction1 = 1 - beta1 ** state['step']
+                bias_correction2 = 1 - beta2 ** state['step']
+                step_size = group['lr'] / bias_correction1
+
+                if 'exp_avg_int8' in state:
+                    self._quantized_update(p, grad, state, group, bias_correction2, step_size)
+                    continue
+
+                exp_avg, exp_avg_sq = state['exp_avg'], state['exp_avg_sq']
+
+                if group['weight_decay'] != 0:
+                    grad = grad.add(p, alpha=group['weight_decay'])
+
+                # Decay the first and second moment running average coefficient
+                exp_avg.mul_(beta1).add_(grad, alpha=1 - beta1)
+                exp_avg_sq.mul_(beta2).addcmul_(grad, grad, value=1 - beta2)
+                denom = (exp_avg_sq.sqrt() / math.sqrt(bias_correction2)).add_(group['eps'])
+
+                p.addcdiv_(exp_avg, denom, value=-step_size)
+
+        return loss
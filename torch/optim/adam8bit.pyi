@@ -0,0 +1,5 @@
+from typing import Tuple
+from .optimizer import _params_t, Optimizer
+
+class Adam8bit(Optimizer):
+    def __init__(self, params: _params_t, lr: float=..., betas: Tuple[float, float]=..., eps: float=..., weight_decay: float=..., block_size: int=..., min_8bit_size: int=...) -> None: ...
@@ -1,5 +1,6 @@
 import torch
 from .optimizer import Optimizer
+from . import _multi_tensor
 
 
 class Adamax(Optimizer):
@@ -16,12 +17,20 @@ class Adamax(Optimizer):
         eps (float, optional): term added to the denominator to improve
             numerical stability (default: 1e-8)
         weight_decay (float, optional): weight decay (L2 penalty) (default: 0)
+        foreach (bool, optional): whether to use the multi-tensor
+            implementation, which keeps the state of each param group in flat
+            buffers and updates all its parameters with a few large ops instead
+            of several small ops per parameter. Besides the state, it keeps a
+            flat copy of the gradients of each group, which
+            :meth:`flatten_parameters` avoids without weight decay, and a flat
+            buffer for the norms of the gradients, each of the size of the
+            parameters (default: False)
 
     __ https://arxiv.org/abs/1412.6980
     """
 
     def __init__(self, params, lr=2e-3, betas=(0.9, 0.999), eps=1e-8,
-                 weight_decay=0):
+                 weight_decay=0, foreach=False):
         if not 0.0 <= lr:
             raise ValueError("Invalid learning rate: {}".format(lr))
         if not 0.0 <= eps:
@@ -33,9 +42,40 @@ class Adamax(Optimizer):
         if not 0.0 <= weight_decay:
             raise ValueError("Invalid weight_decay value: {}".format(weight_decay))
 
-        defaults = dict(lr=lr, betas=betas, eps=eps, weight_decay=weight_decay)
+        defaults = dict(lr=lr, betas=betas, eps=eps, weight_decay=weight_decay, foreach=foreach)
         super(Adamax, self).__init__(params, defaults)
 
+    def __setstate__(self, state):
+        super(Adamax, self).__setstate__(state)
+        for group in self.param_groups:
+            group.setdefault('foreach', False)
+
+    def _multi_tensor_step(self, group):
+        """Updates all the parameters of ``group`` at once."""
+        if len(_multi_tensor.params_with_grad(group, 'Adamax')) == 0:
+            return True
+        names = ['exp_avg', 'exp_inf']
+        beta1, beta2 = group['betas']
+        grad_scale = self._take_grad_scale(group)
+        for device_params in _multi_tensor.group_by_device_and_dtype(group['params']).values():
+            flat = self._get_flat_state(group, device_params, names)
+            if len(flat.inactive) == len(device_params):
+                continue
+            flat.init_state(self.state, step=0)
+            # the parameters may have been updated a different number of times
+            steps = flat.advance_steps(self.state)
+            clr = flat.per_param([group['lr'] / (1 - beta1 ** step) for step in steps])
+
+            grad = flat.flat_grad(group['weight_decay'], grad_scale)
+            norm, _ = flat.scratch()
+
+            exp_avg, exp_inf = flat.buffers['exp_avg'], flat.buffers['exp_inf']
+            exp_avg.mul_(flat.per_param(beta1, inactive=1)).add_(grad, alpha=1 - beta1)
+            torch.abs(grad, out=norm).add_(flat.per_param(group['eps'], inactive=0))
+            torch.max(exp_inf.mul_(flat.per_param(beta2, inactive=1)), norm, out=exp_inf)
+            flat.update_params('addcdiv_', exp_avg, exp_inf, value=-clr)
+        return True
+
     @torch.no_grad()
     def step(self, closure=None):
         """Performs a single optimization step.
@@ -50,6 +90,8 @@ class Adamax(Optimizer):
                 loss = closure()
 
         for group in self.param_groups:
+            if group['foreach'] and self._foreach_step(group):
+                continue
             for p in group['params']:
                 if p.grad is None:
                     continue
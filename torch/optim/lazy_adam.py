@@ -0,0 +1,110 @@
+import torch
+from .optimizer import Optimizer
+from . import _row_sparse
+
+
+class LazyAdam(Optimizer):
+    r"""Implements lazy version of Adam algorithm with per-row step counts.
+
+    Like :class:`SparseAdam`, only the rows (along the first dimension of the
+    parameter) present in the gradient get their moments updated and are
+    applied an update. In addition, every row keeps its own step count, which
+    is used for its bias correction, so rows that are rarely seen, e.g. the
+    embeddings of rare ids, are not under-corrected. The moments of the
+    present rows are gathered, updated and scattered back, so the cost of a
+    step scales with the number of unique indices of a sparse gradient rather
+    than with the size of the table.
+
+    Dense gradients are supported as well, in which case the rows whose
+    gradient is entirely zero are considered absent.
+
+    Arguments:
+        params (iterable): iterable of parameters to optimize or dicts defining
+            parameter groups
+        lr (float, optional): learning rate (default: 1e-3)
+        betas (Tuple[float, float], optional): coefficients used for computing
+            running averages of gradient and its square (default: (0.9, 0.999))
+        eps (float, optional): term added to the denominator to improve
+            numerical stability (default: 1e-8)
+        weight_decay (float, optional): weight decay (L2 penalty), applied to
+            the rows present in the gradient only (default: 0)
+
+    .. _Adam\: A Method for Stochastic Optimization:
+        https://arxiv.org/abs/1412.6980
+    """
+
+    def __init__(self, params, lr=1e-3, betas=(0.9, 0.999), eps=1e-8, weight_decay=0):
+        if not 0.0 <= lr:
+            raise ValueError("Invalid learning rate: {}".format(lr))
+        if not 0.0 <= eps:
+            raise ValueError("Invalid epsilon value: {}".format(eps))
+        if not 0.0 <= betas[0] < 1.0:
+            raise ValueError("Invalid beta parameter at index 0: {}".format(betas[0]))
+        if not 0.0 <= betas[1] < 1.0:
+            raise ValueError("Invalid beta parameter at index 1: {}".format(betas[1]))
+        if not 0.0 <= weight_decay:
+            raise ValueError("Invalid weight_decay value: {}".format(weight_decay))
+        defaults = dict(lr=lr, betas=betas, eps=eps, weight_decay=weight_decay)
+        super(LazyAdam, self).__init__(params, defaults)
+
+    @torch.no_grad()
+    def step(self, closure=None):
+        """Performs a single optimization step.
+
+        Arguments:
+            closure (callable, optional): A closure that reevaluates the model
+                and returns the loss.
+        """
+        loss = None
+        if closure is not None:
+            with torch.enable_grad():
+                loss = closure()
+
+        for group in self.param_groups:
+            for p in group['params']:
+                if p.grad is None:
+                    continue
+
+                indices, grad_rows = _row_sparse.present_rows(p, p.grad, 'LazyAdam')
+                state = self.state[p]
+
+                # State initialization
+                if len(state) == 0:
+                    state['step'] = 0
+                    # Number of updates of each row
+                    state['row_step'] = torch.zeros(p.size(0), dtype=torch.long, device=p.device)
+                    # Exponential moving average of gradient values
+                    state['exp_avg'] = torch.zeros_like(p, memory_format=torch.preserve_format)
+                    # Exponential moving average of squared gradient values
+                    state['exp_avg_sq'] = torch.zeros_like(p, memory_format=torch.preserve_format)
+
+                state['step'] += 1
+                if indices.numel() == 0:
+                    continue
+
+                row_step, exp_avg, exp_avg_sq = state['row_step'], state['exp_avg'], state['exp_avg_sq']
+                beta1, beta2 = group['betas']
+
+                if group['weight_decay'] != 0:
+                    grad_rows = grad_rows.add(p.index_select(0, indices), alpha=group['weight_decay'])
+
+                row_step.index_add_(0, indices, torch.ones_like(indices))
+                steps = row_step.index_select(0, indices).to(p.dtype)
+                row_shape = (-1,) + (1,) * (p.dim() - 1)
+                bias_correction1 = torch.pow(beta1, steps).neg_().add_(1).view(row_shape)
+                bias_correction2 = torch.pow(beta2, steps).neg_().add_(1).view(row_shape)
+
+                # Decay the first and second moment running average coefficient
+                # of the present rows only
+                exp_avg_rows = exp_avg.index_select(0, indices)
+                exp_avg_rows.mul_(beta1).add_(grad_rows, alpha=1 - beta1)
+                exp_avg.index_copy_(0, indices, exp_avg_rows)
+                exp_avg_sq_rows = exp_avg_sq.index_select(0, indices)
+                exp_avg_sq_rows.mul_(beta2).addcmul_(grad_rows, grad_rows, value=1 - beta2)
+                exp_avg_sq.index_copy_(0, indices, exp_avg_sq_rows)
+
+                denom = exp_avg_sq_rows.sqrt_().div_(bias_correction2.sqrt_()).add_(group['eps'])
+                update = exp_avg_rows.div_(bias_correction1).div_(denom).mul_(-group['lr'])
+                p.index_add_(0, indices, update)
+
+        return loss
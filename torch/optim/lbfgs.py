@@ -180,6 +180,42 @@ def _strong_wolfe(obj_func,
     return f_new, g_new, t, ls_func_evals
 
 
+def _two_loop_direction(flat_grad, old_dirs, old_stps, stps_dot_dirs, history_len, history_index, H_diag):
+    # Computes the L-BFGS direction -H * flat_grad with the two-loop recursion.
+    # The history is kept in ring buffers: old_dirs (y) and old_stps (s) hold
+    # one pair per row, history_index being the row of the next pair, and
+    # stps_dot_dirs[i, j] = s_i * y_j. The sequential dot products of the two
+    # loops are rewritten as two triangular solves on the (small) matrix of
+    # dot products of the history, so that each loop only needs two
+    # matrix-vector products with the whole history.
+    q = flat_grad.neg()
+    if history_len == 0:
+        return q.mul_(H_diag)
+    history_size = old_dirs.size(0)
+    dirs = old_dirs[:history_len]
+    stps = old_stps[:history_len]
+    # chronological order of the rows of the ring buffers
+    order = torch.arange(history_len, device=flat_grad.device).add_(
+        history_index - history_len).remainder_(history_size)
+    sy = stps_dot_dirs[:history_len, :history_len].index_select(0, order).index_select(1, order)
+
+    # first loop, from the newest pair to the oldest:
+    #   al_i = ro_i * s_i * (q - sum_{j > i} al_j * y_j), with ro_i = 1 / (s_i * y_i)
+    stps_q = torch.mv(stps, q).index_select(0, order)
+    al = torch.triangular_solve(stps_q.unsqueeze(1), sy.triu(), upper=True)[0].squeeze(1)
+    q.addmv_(dirs.t(), torch.empty_like(al).index_copy_(0, order, al), alpha=-1)
+
+    # multiply by initial Hessian
+    r = q.mul_(H_diag)
+
+    # second loop, from the oldest pair to the newest, with c_i = al_i - be_i:
+    #   be_i = ro_i * y_i * (r + sum_{j < i} c_j * s_j)
+    dirs_r = torch.mv(dirs, r).index_select(0, order)
+    rhs = sy.diagonal() * al - dirs_r
+    c = torch.triangular_solve(rhs.unsqueeze(1), sy.t().tril(), upper=False)[0].squeeze(1)
+    return r.addmv_(stps.t(), torch.empty_like(c).index_copy_(0, order, c))
+
+
 class LBFGS(Optimizer):
     """Implements L-BFGS algorithm, heavily inspired by `minFunc
     <https://www.cs.ubc.ca/~schmidtm/Software/minFunc.html>`.
@@ -194,8 +230,14 @@ class LBFGS(Optimizer):
 
     .. note::
         This is a very memory intensive optimizer (it requires additional
-        ``param_bytes * (history_size + 1)`` bytes). If it doesn't fit in memory
-        try reducing the history size, or use a different algorithm.
+        ``param_bytes * (2 * history_size + 1)`` bytes). If it doesn't fit in
+        memory try reducing the history size, or use a different algorithm.
+        The history is preallocated on its first update.
+
+    .. note::
+        :meth:`flatten_parameters` packs the parameters and their gradients
+        into flat buffers, which the optimizer then reads and updates directly
+        instead of gathering and scattering them at every function evaluation.
 
     Arguments:
         lr (float): learning rate (default: 1)
@@ -244,7 +286,26 @@ class LBFGS(Optimizer):
             self._numel_cache = reduce(lambda total, p: total + p.numel(), self._params, 0)
         return self._numel_cache
 
+    def flatten_parameters(self):
+        r"""Packs the parameters and their gradients into contiguous flat
+        buffers, see :meth:`Optimizer.flatten_parameters`. The parameters must
+        all have the same device and dtype, and dense gradients."""
+        if len(set((p.device, p.dtype) for p in self._params)) != 1:
+            raise ValueError("flatten_parameters() requires all the parameters of LBFGS "
+                             "to have the same device and dtype")
+        self._flatten_parameters = True
+        self._get_flat_parameters(self.param_groups[0], self._params)
+
+    def _flat(self):
+        if not self._flatten_parameters:
+            return None
+        return self._get_flat_parameters(self.param_groups[0], self._params)
+
     def _gather_flat_grad(self):
+        flat = self._flat()
+        if flat is not None:
+            # the buffer is overwritten by the next evaluation of the closure
+            return flat.grad
         views = []
         for p in self._params:
             if p.grad is None:
@@ -257,6 +318,10 @@ class LBFGS(Optimizer):
         return torch.cat(views, 0)
 
     def _add_grad(self, step_size, update):
+        flat = self._flat()
+        if flat is not None:
+            flat.data.add_(update, alpha=step_size)
+            return
         offset = 0
         for p in self._params:
             numel = p.numel()
@@ -266,9 +331,16 @@ class LBFGS(Optimizer):
         assert offset == self._numel()
 
     def _clone_param(self):
+        flat = self._flat()
+        if flat is not None:
+            return [flat.data.clone()]
         return [p.clone(memory_format=torch.contiguous_format) for p in self._params]
 
     def _set_param(self, params_data):
+        flat = self._flat()
+        if flat is not None:
+            flat.data.copy_(params_data[0])
+            return
         for p, pdata in zip(self._params, params_data):
             p.copy_(pdata)
 
@@ -276,9 +348,32 @@ class LBFGS(Optimizer):
         self._add_grad(t, d)
         loss = float(closure())
         flat_grad = self._gather_flat_grad()
+        if self._flatten_parameters:
+            # the line search keeps the gradients of several evaluations
+            flat_grad = flat_grad.clone()
         self._set_param(x)
         return loss, flat_grad
 
+    @staticmethod
+    def _history_from_lists(state, history_size):
+        # converts the history saved as lists of tensors by older versions
+        old_dirs = state['old_dirs'][-history_size:]
+        old_stps = state['old_stps'][-history_size:]
+        state.pop('ro', None)
+        state.pop('al', None)
+        state['history_len'] = len(old_dirs)
+        state['history_index'] = len(old_dirs) % history_size
+        if len(old_dirs) == 0:
+            state['old_dirs'] = state['old_stps'] = state['stps_dot_dirs'] = None
+            return
+        dirs = old_dirs[0].new_zeros(history_size, old_dirs[0].numel())
+        stps = old_stps[0].new_zeros(history_size, old_stps[0].numel())
+        dirs[:len(old_dirs)] = torch.stack(old_dirs)
+        stps[:len(old_stps)] = torch.stack(old_stps)
+        state['old_dirs'] = dirs
+        state['old_stps'] = stps
+        state['stps_dot_dirs'] = torch.mm(stps, dirs.t())
+
     @torch.no_grad()
     def step(self, closure):
         """Performs a single optimization step.
@@ -323,9 +418,13 @@ class LBFGS(Optimizer):
         # tensors cached in state (for tracing)
         d = state.get('d')
         t = state.get('t')
+        if isinstance(state.get('old_dirs'), list):
+            self._history_from_lists(state, history_size)
         old_dirs = state.get('old_dirs')
         old_stps = state.get('old_stps')
-        ro = state.get('ro')
+        stps_dot_dirs = state.get('stps_dot_dirs')
+        history_len = state.get('history_len', 0)
+        history_index = state.get('history_index', 0)
         H_diag = state.get('H_diag')
         prev_flat_grad = state.get('prev_flat_grad')
         prev_loss = state.get('prev_loss')
@@ -342,9 +441,8 @@ class LBFGS(Optimizer):
             ############################################################
             if state['n_iter'] == 1:
                 d = flat_grad.neg()
-                old_dirs = []
-                old_stps = []
-                ro = []
+                history_len = 0
+                history_index = 0
                 H_diag = 1
             else:
                 # do lbfgs update (update memory)
@@ -352,41 +450,31 @@ class LBFGS(Optimizer):
                 s = d.mul(t)
                 ys = y.dot(s)  # y*s
                 if ys > 1e-10:
-                    # updating memory
-                    if len(old_dirs) == history_size:
-                        # shift history by one (limited-memory)
-                        old_dirs.pop(0)
-                        old_stps.pop(0)
-                        ro.pop(0)
-
-                    # store new direction/step
-                    old_dirs.append(y)
-                    old_stps.append(s)
-                    ro.append(1. / ys)
+                    # updating memory, the oldest pair is overwritten once the
+                    # ring buffers are full (limited-memory)
+                    if old_dirs is None:
+                        old_dirs = flat_grad.new_empty(history_size, flat_grad.numel())
+                        old_stps = flat_grad.new_empty(history_size, flat_grad.numel())
+                        stps_dot_dirs = flat_grad.new_zeros(history_size, history_size)
+                    k = history_index
+                    history_len = min(history_len + 1, history_size)
+                    history_index = (k + 1) % history_size
+
+                    # store new direction/step and its dot products with the
+                    # rest of the history
+                    old_dirs[k].copy_(y)
+                    old_stps[k].copy_(s)
+                    stps_dot_dirs[k, :history_len] = torch.mv(old_dirs[:history_len], s)
+                    stps_dot_dirs[:history_len, k] = torch.mv(old_stps[:history_len], y)
+                    stps_dot_dirs[k, k] = ys
 
                     # update scale of initial Hessian approximation
                     H_diag = ys / y.dot(y)  # (y*y)
 
                 # compute the approximate (L-BFGS) inverse Hessian
                 # multiplied by the gradient
-                num_old = len(old_dirs)
-
-                if 'al' not in state:
-                    state['al'] = [None] * history_size
-                al = state['al']
-
-                # iteration in L-BFGS loop collapsed to use just one buffer
-                q = flat_grad.neg()
-                for i in range(num_old - 1, -1, -1):
-                    al[i] = old_stps[i].dot(q) * ro[i]
-                    q.add_(old_dirs[i], alpha=-al[i])
-
-                # multiply by initial Hessian
-                # r/d is the final direction
-                d = r = torch.mul(q, H_diag)
-                for i in range(num_old):
-                    be_i = old_dirs[i].dot(r) * ro[i]
-                    r.add_(old_stps[i], alpha=al[i] - be_i)
+                d = _two_loop_direction(flat_grad, old_dirs, old_stps, stps_dot_dirs,
+                                        history_len, history_index, H_diag)
 
             if prev_flat_grad is None:
                 prev_flat_grad = flat_grad.clone(memory_format=torch.contiguous_format)
@@ -467,7 +555,9 @@ class LBFGS(Optimizer):
         state['t'] = t
         state['old_dirs'] = old_dirs
         state['old_stps'] = old_stps
-        state['ro'] = ro
+        state['stps_dot_dirs'] = stps_dot_dirs
+        state['history_len'] = history_len
+        state['history_index'] = history_index
         state['H_diag'] = H_diag
         state['prev_flat_grad'] = prev_flat_grad
         state['prev_loss'] = prev_loss
@@ -7,6 +7,7 @@ import weakref
 from collections import Counter
 from bisect import bisect_right
 
+import torch
 from .optimizer import Optimizer
 
 
@@ -103,6 +104,24 @@ class _LRScheduler(object):
         # Compute learning rate using chainable form of the scheduler
         raise NotImplementedError
 
+    def _get_closed_form_lr_table(self, epochs):
+        # Compute the learning rates of all the groups at each of ``epochs``
+        # (a 1-D float64 tensor) using the closed form of the scheduler, as a
+        # tensor of shape (len(epochs), len(base_lrs)). Subclasses override it
+        # with a vectorized version where possible.
+        if not hasattr(self, '_get_closed_form_lr'):
+            raise ValueError("{} has no closed form, so its schedule cannot be "
+                             "precomputed".format(type(self).__name__))
+        last_epoch = self.last_epoch
+        rows = []
+        try:
+            for epoch in epochs.tolist():
+                self.last_epoch = int(epoch)
+                rows.append(self._get_closed_form_lr())
+        finally:
+            self.last_epoch = last_epoch
+        return torch.tensor(rows, dtype=torch.float64).view(len(rows), len(self.base_lrs))
+
     def step(self, epoch=None):
         # Raise a warning if old pattern is detected
         # https://github.com/pytorch/pytorch/issues/20124
@@ -234,6 +253,10 @@ class LambdaLR(_LRScheduler):
         return [base_lr * lmbda(self.last_epoch)
                 for lmbda, base_lr in zip(self.lr_lambdas, self.base_lrs)]
 
+    def _get_closed_form_lr(self):
+        return [base_lr * lmbda(self.last_epoch)
+                for lmbda, base_lr in zip(self.lr_lambdas, self.base_lrs)]
+
 
 class MultiplicativeLR(_LRScheduler):
     """Multiply the learning rate of each parameter group by the factor given
@@ -359,6 +382,10 @@ class StepLR(_LRScheduler):
         return [base_lr * self.gamma ** (self.last_epoch // self.step_size)
                 for base_lr in self.base_lrs]
 
+    def _get_closed_form_lr_table(self, epochs):
+        factors = torch.pow(self.gamma, epochs.div(self.step_size).floor_())
+        return factors.unsqueeze(1) * epochs.new_tensor(self.base_lrs)
+
 
 class MultiStepLR(_LRScheduler):
     """Decays the learning rate of each parameter group by gamma once the
@@ -405,6 +432,13 @@ class MultiStepLR(_LRScheduler):
         return [base_lr * self.gamma ** bisect_right(milestones, self.last_epoch)
                 for base_lr in self.base_lrs]
 
+    def _get_closed_form_lr_table(self, epochs):
+        milestones = epochs.new_tensor(sorted(self.milestones.elements()))
+        # Number of milestones reached at each epoch, i.e. bisect_right
+        num_decays = (epochs.unsqueeze(1) >= milestones).sum(dim=1).to(epochs.dtype)
+        factors = torch.pow(self.gamma, num_decays)
+        return factors.unsqueeze(1) * epochs.new_tensor(self.base_lrs)
+
 
 class ExponentialLR(_LRScheduler):
     """Decays the learning rate of each parameter group by gamma every epoch.
@@ -434,6 +468,10 @@ class ExponentialLR(_LRScheduler):
         return [base_lr * self.gamma ** self.last_epoch
                 for base_lr in self.base_lrs]
 
+    def _get_closed_form_lr_table(self, epochs):
+        factors = torch.pow(self.gamma, epochs)
+        return factors.unsqueeze(1) * epochs.new_tensor(self.base_lrs)
+
 
 class CosineAnnealingLR(_LRScheduler):
     r"""Set the learning rate of each parameter group using a cosine annealing
@@ -500,6 +538,11 @@ class CosineAnnealingLR(_LRScheduler):
                 (1 + math.cos(math.pi * self.last_epoch / self.T_max)) / 2
                 for base_lr in self.base_lrs]
 
+    def _get_closed_form_lr_table(self, epochs):
+        cosines = torch.cos(epochs * (math.pi / self.T_max)).add_(1).div_(2)
+        amplitudes = epochs.new_tensor(self.base_lrs).sub_(self.eta_min)
+        return (cosines.unsqueeze(1) * amplitudes).add_(self.eta_min)
+
 
 class ReduceLROnPlateau(object):
     """Reduce learning rate when a metric has stopped improving.
@@ -1234,3 +1277,115 @@ class OneCycleLR(_LRScheduler):
                     group['momentum'] = computed_momentum
 
         return lrs
+
+
+class LRScheduleTable(object):
+    r"""Precomputes the learning rates given by one or more schedulers into a
+    lookup table of shape ``(total_steps + 1, num_groups)``, so that stepping
+    the schedule only copies a row of the table.
+
+    The schedulers must wrap the same optimizer and have a closed form
+    (:class:`LambdaLR`, :class:`StepLR`, :class:`MultiStepLR`,
+    :class:`ExponentialLR` and :class:`CosineAnnealingLR`). They are composed
+    in closed form: the learning rate of a group is the one given by the first
+    scheduler, times the factor each of the following schedulers applies to the
+    initial lr, e.g. a :class:`LambdaLR` warmup chained with a
+    :class:`StepLR` decay. For multiplicative schedulers this matches stepping
+    them one after the other. The schedulers must not be stepped afterwards.
+
+    The learning rates of all the groups are kept in the :attr:`lrs` tensor.
+    If ``as_tensor`` is ``True``, the ``'lr'`` of every param group is replaced
+    by a 0-dim view of :attr:`lrs`, so a step updates all the groups with a
+    single copy, whatever their number. Otherwise, the values are written back
+    to the param groups as Python numbers.
+
+    Args:
+        schedulers (_LRScheduler or list): Scheduler(s) to precompute.
+        total_steps (int): Number of steps to precompute. The learning rates
+            of the last step are kept after it.
+        as_tensor (bool): If ``True``, the learning rates of the param groups
+            are views of :attr:`lrs`. Default: ``False``.
+
+    Example:
+        >>> warmup = LambdaLR(optimizer, lambda epoch: min(1., (epoch + 1) / 5))
+        >>> decay = StepLR(optimizer, step_size=30, gamma=0.1)
+        >>> schedule = LRScheduleTable([warmup, decay], total_steps=100)
+        >>> for epoch in range(100):
+        >>>     train(...)
+        >>>     validate(...)
+        >>>     schedule.step()
+    """
+
+    def __init__(self, schedulers, total_steps, as_tensor=False):
+        if isinstance(schedulers, _LRScheduler):
+            schedulers = [schedulers]
+        schedulers = list(schedulers)
+        if len(schedulers) == 0:
+            raise ValueError("Expected at least one scheduler")
+        optimizer = schedulers[0].optimizer
+        for scheduler in schedulers:
+            if not isinstance(scheduler, _LRScheduler):
+                raise TypeError('{} is not a learning rate scheduler'.format(
+                    type(scheduler).__name__))
+            if scheduler.optimizer is not optimizer:
+                raise ValueError("All the schedulers must wrap the same optimizer")
+        if total_steps < 0:
+            raise ValueError("Expected non-negative total_steps, but got {}".format(total_steps))
+
+        self.optimizer = optimizer
+        self.total_steps = total_steps
+        self.as_tensor = as_tensor
+        self.last_epoch = schedulers[0].last_epoch
+
+        epochs = torch.arange(total_steps + 1, dtype=torch.float64)
+        base_lrs = epochs.new_tensor(schedulers[0].base_lrs)
+        self.table = schedulers[0]._get_closed_form_lr_table(epochs)
+        for scheduler in schedulers[1:]:
+            factors = scheduler._get_closed_form_lr_table(epochs) / base_lrs
+            # Groups with a zero initial lr stay at the lr of the first scheduler
+            factors = torch.where(base_lrs != 0, factors, torch.ones_like(factors))
+            self.table.mul_(factors)
+
+        self.lrs = self.table[min(max(self.last_epoch, 0), total_steps)].clone()
+        self._set_group_lrs()
+
+    def _set_group_lrs(self):
+        if self.as_tensor:
+            for i, param_group in enumerate(self.optimizer.param_groups):
+                param_group['lr'] = self.lrs[i]
+        else:
+            for param_group, lr in zip(self.optimizer.param_groups, self.lrs.tolist()):
+                param_group['lr'] = lr
+
+    def state_dict(self):
+        """Returns the state of the schedule as a :class:`dict`.
+
+        It contains an entry for every variable in self.__dict__ which
+        is not the optimizer.
+        """
+        return {key: value for key, value in self.__dict__.items() if key != 'optimizer'}
+
+    def load_state_dict(self, state_dict):
+        """Loads the schedule state, and sets the learning rates of the param
+        groups accordingly. When ``as_tensor`` is ``True``, it must be called
+        after loading the state of the optimizer.
+
+        Arguments:
+            state_dict (dict): schedule state. Should be an object returned
+                from a call to :meth:`state_dict`.
+        """
+        self.__dict__.update(state_dict)
+        self.lrs = self.lrs.clone()
+        self._set_group_lrs()
+
+    def get_last_lr(self):
+        """ Return last learning rate of every group as a list.
+        """
+        return self.lrs.tolist()
+
+    def step(self):
+        self.last_epoch += 1
+        self.lrs.copy_(self.table[min(self.last_epoch, self.total_steps)])
+        if not self.as_tensor:
+            for param_group, lr in zip(self.optimizer.param_groups, self.lrs.tolist()):
+                param_group['lr'] = lr
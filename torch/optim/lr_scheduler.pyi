@@ -1,5 +1,6 @@
 from typing import Iterable, Any, Optional, Callable, Union, List
 from .optimizer import Optimizer
+from torch import Tensor
 
 class _LRScheduler:
     def __init__(self, optimizer: Optimizer, last_epoch: int=...) -> None: ...
@@ -37,3 +38,17 @@ class CyclicLR(_LRScheduler):
 class CosineAnnealingWarmRestarts(_LRScheduler):
     def __init__(self, optimizer: Optimizer, T_0: int=..., T_mult: int=..., eta_min: int=..., last_epoch: int=...) -> None: ...
     def step(self, epoch: Optional[int] = ...) -> None: ...
+
+class LRScheduleTable:
+    optimizer: Optimizer
+    total_steps: int
+    as_tensor: bool
+    last_epoch: int
+    table: Tensor
+    lrs: Tensor
+
+    def __init__(self, schedulers: Union[_LRScheduler, Iterable[_LRScheduler]], total_steps: int, as_tensor: bool=...) -> None: ...
+    def state_dict(self) -> dict: ...
+    def load_state_dict(self, state_dict: dict) -> None: ...
+    def get_last_lr(self) -> List[float]: ...
+    def step(self) -> None: ...
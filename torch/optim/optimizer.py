@@ -5,6 +5,9 @@ import torch
 from copy import deepcopy
 from itertools import chain
 
+from ._multi_tensor import FlatParameters, FlatState, group_by_device_and_dtype
+from torch._utils import _total_norm, _scale_
+
 
 class _RequiredParameter(object):
     """Singleton class representing a required parameter for an Optimizer."""
@@ -40,6 +43,10 @@ class Optimizer(object):
 
         self.state = defaultdict(dict)
         self.param_groups = []
+        self._flat_states = {}
+        self._flat_parameters = {}
+        self._flatten_parameters = False
+        self._grad_scales = {}
 
         param_groups = list(params)
         if len(param_groups) == 0:
@@ -59,6 +66,12 @@ class Optimizer(object):
 
     def __setstate__(self, state):
         self.__dict__.update(state)
+        # Flat buffers of the multi-tensor implementations are rebuilt lazily
+        # from the (possibly new) per-parameter state
+        self._flat_states = {}
+        self._flat_parameters = {}
+        self.__dict__.setdefault('_flatten_parameters', False)
+        self._grad_scales = {}
 
     def __repr__(self):
         format_string = self.__class__.__name__ + ' ('
@@ -125,8 +138,9 @@ class Optimizer(object):
             r"""Make a deep copy of value, casting all tensors to device of param."""
             if isinstance(value, torch.Tensor):
                 # Floating-point types are a bit special here. They are the only ones
-                # that are assumed to always match the type of params.
-                if param.is_floating_point():
+                # that are assumed to always match the type of params. Integer state,
+                # e.g. quantized moments, keeps its type.
+                if param.is_floating_point() and value.is_floating_point():
                     value = value.to(param.dtype)
                 value = value.to(param.device)
                 return value
@@ -156,13 +170,171 @@ class Optimizer(object):
             update_group(g, ng) for g, ng in zip(groups, saved_groups)]
         self.__setstate__({'state': state, 'param_groups': param_groups})
 
-    def zero_grad(self):
-        r"""Clears the gradients of all optimized :class:`torch.Tensor` s."""
+    def _get_flat_state(self, group, params, names):
+        r"""Returns the :class:`FlatState` backing state ``names`` of ``params``.
+
+        ``params`` are all the parameters of ``group`` living on one device
+        and having one dtype, whether they have a gradient or not, so that the
+        buffers are reused when the set of parameters with a gradient changes.
+        The parameters without a gradient are marked inactive for the step.
+        """
+        active = [p.grad is not None for p in params]
+        flat_parameters = self._get_flat_parameters(group, params) if self._flatten_parameters else None
+        key = (id(group), params[0].device, params[0].dtype, tuple(names))
+        flat_state = self._flat_states.get(key)
+        if (flat_state is None or flat_state.flat_parameters is not flat_parameters or
+                not flat_state.is_valid(params, self.state)):
+            flat_state = self._flat_states[key] = FlatState(params, self.state, names, flat_parameters)
+        flat_state.set_active(active)
+        return flat_state
+
+    def _get_flat_parameters(self, group, params):
+        # params are all the parameters of group on one device and of one
+        # dtype, with or without a gradient, as packed by flatten_parameters
+        key = (id(group), params[0].device, params[0].dtype)
+        flat_parameters = self._flat_parameters.get(key)
+        if flat_parameters is None or not flat_parameters.adopt_grads(params):
+            # the parameters were moved, or their .data replaced
+            flat_parameters = self._flat_parameters[key] = FlatParameters(params)
+        return flat_parameters
+
+    def flatten_parameters(self):
+        r"""Packs the parameters of each param group, their gradients and their
+        optimizer state into contiguous flat buffers (one per device and dtype).
+
+        The ``.data`` and ``.grad`` of the parameters, as well as the entries of
+        :attr:`state`, become views into those buffers, and the update of a
+        param group runs as a handful of large ops over them. The format of
+        :meth:`state_dict` is unchanged.
+
+        This requires the multi-tensor implementation of the optimizer, i.e.
+        ``foreach=True`` for all param groups, and dense gradients. After the
+        call, all the parameters have a gradient (zero for those that did not
+        have one before). Gradients zeroed in place (:meth:`zero_grad`) are
+        accumulated directly into the flat buffer. Gradients that were
+        replaced, e.g. after ``zero_grad(set_to_none=True)``, are copied back
+        into it by the next :meth:`step`, which skips the parameters left
+        without a gradient and gives them a zero one, keeping the buffers. The
+        buffers are rebuilt when the parameters were moved to another device
+        or their ``.data`` replaced.
+
+        .. note::
+            ``zero_grad(set_to_none=True)`` is counterproductive with flat
+            buffers: the next backward allocates new full-size gradients,
+            which :meth:`step` then copies into the flat buffer, so that both
+            copies of the gradients are alive at the peak, and the copy costs
+            more memory bandwidth than zeroing the buffer in place. Only use
+            it when the parameters without a gradient must not be updated.
+
+        .. note::
+            The state is packed lazily, when it is first created by
+            :meth:`step`.
+        """
+        for group in self.param_groups:
+            if not group.get('foreach', False):
+                raise ValueError("flatten_parameters() requires foreach=True for all param groups "
+                                 "of {}".format(self.__class__.__name__))
+        self._flatten_parameters = True
+        for group in self.param_groups:
+            for params in group_by_device_and_dtype(group['params']).values():
+                self._get_flat_parameters(group, params)
+
+    def clip_grad_norm_(self, max_norm, norm_type=2, per_group=False):
+        r"""Clips the gradient norm of the parameters of the optimizer.
+
+        Like :func:`torch.nn.utils.clip_grad_norm_`, the norm is computed over
+        all the gradients together, as if they were concatenated into a single
+        vector, or over the gradients of each param group separately if
+        ``per_group`` is ``True``. Gradients packed in flat buffers (see
+        :meth:`flatten_parameters`) are reduced with a single op.
+
+        For the param groups using the multi-tensor implementation
+        (``foreach=True``), the gradients are not modified: the clipping is
+        deferred to the next :meth:`step`, which scales the gradients as it
+        reads them for the update, saving a full pass over the gradients. The
+        gradients of the other param groups are scaled in-place. A deferred
+        clipping is dropped by :meth:`zero_grad`.
+
+        Arguments:
+            max_norm (float or int): max norm of the gradients
+            norm_type (float or int): type of the used p-norm. Can be ``'inf'``
+                for infinity norm.
+            per_group (bool, optional): whether to clip the gradients of each
+                param group by their own norm (default: False)
+
+        Returns:
+            Total norm of the gradients, or a list with the norm of the
+            gradients of each param group if ``per_group`` is ``True``.
+        """
+        max_norm = float(max_norm)
+        norm_type = float(norm_type)
+        group_grads = [[p.grad.detach() for p in group['params'] if p.grad is not None]
+                       for group in self.param_groups]
+        if per_group:
+            norms = [_total_norm(grads, norm_type) for grads in group_grads]
+        else:
+            total_norm = _total_norm([g for grads in group_grads for g in grads], norm_type)
+            norms = [total_norm] * len(self.param_groups)
+
+        self._grad_scales = {}
+        for group, grads, norm in zip(self.param_groups, group_grads, norms):
+            if len(grads) == 0:
+                continue
+            clip_coef = max_norm / (norm + 1e-6)
+            if group.get('foreach', False):
+                # keeps the scale on the device, without a synchronization
+                self._grad_scales[id(group)] = clip_coef.clamp(max=1.0)
+            elif clip_coef < 1:
+                _scale_(grads, clip_coef)
+        return norms if per_group else norms[0]
+
+    def _take_grad_scale(self, group):
+        r"""Returns the scale of the gradients of ``group`` deferred by
+        :meth:`clip_grad_norm_`, or ``None``, and clears it."""
+        return self._grad_scales.pop(id(group), None)
+
+    def _foreach_step(self, group):
+        r"""Updates ``group`` with the multi-tensor implementation of the
+        optimizer. Returns False if the group has to be updated parameter by
+        parameter instead, in which case a deferred clipping is applied to
+        the gradients first."""
+        if self._multi_tensor_step(group):
+            return True
+        grad_scale = self._take_grad_scale(group)
+        if grad_scale is not None:
+            _scale_([p.grad.detach() for p in group['params'] if p.grad is not None], grad_scale)
+        return False
+
+    def zero_grad(self, set_to_none=False):
+        r"""Clears the gradients of all optimized :class:`torch.Tensor` s.
+
+        Arguments:
+            set_to_none (bool): instead of zeroing the gradients, set them to
+                ``None``. The next backward then stores the gradients it
+                computes into freshly allocated tensors, skipping both the
+                write of zeros and the read of the old gradient when
+                accumulating. Parameters that don't get a gradient are
+                skipped by :meth:`step` instead of being updated with a zero
+                gradient. After :meth:`flatten_parameters`, this is slower
+                and takes more memory than zeroing the flat gradient buffers
+                in place: the next :meth:`step` copies the freshly allocated
+                gradients back into them. Default: ``False``.
+        """
+        self._grad_scales = {}
+        zeroed = set()
+        if not set_to_none:
+            for flat_parameters in self._flat_parameters.values():
+                if flat_parameters.is_valid():
+                    flat_parameters.grad.zero_()
+                    zeroed.update(id(p) for p in flat_parameters.params)
         for group in self.param_groups:
             for p in group['params']:
-                if p.grad is not None:
-                    p.grad.detach_()
-                    p.grad.zero_()
+                if p.grad is not None and id(p) not in zeroed:
+                    if set_to_none:
+                        p.grad = None
+                    else:
+                        p.grad.detach_()
+                        p.grad.zero_()
 
     def step(self, closure):
         r"""Performs a single optimization step (parameter update).
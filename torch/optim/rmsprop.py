@@ -1,5 +1,6 @@
 import torch
 from .optimizer import Optimizer
+from . import _multi_tensor
 
 
 class RMSprop(Optimizer):
@@ -28,10 +29,19 @@ class RMSprop(Optimizer):
         centered (bool, optional) : if ``True``, compute the centered RMSProp,
             the gradient is normalized by an estimation of its variance
         weight_decay (float, optional): weight decay (L2 penalty) (default: 0)
+        foreach (bool, optional): whether to use the multi-tensor
+            implementation, which keeps the state of each param group in flat
+            buffers and updates all its parameters with a few large ops instead
+            of several small ops per parameter. Besides the state, it keeps a
+            flat copy of the gradients of each group, which
+            :meth:`flatten_parameters` avoids without weight decay, and a flat
+            buffer for the denominator of the update, each of the size of the
+            parameters (default: False)
 
     """
 
-    def __init__(self, params, lr=1e-2, alpha=0.99, eps=1e-8, weight_decay=0, momentum=0, centered=False):
+    def __init__(self, params, lr=1e-2, alpha=0.99, eps=1e-8, weight_decay=0, momentum=0, centered=False,
+                 foreach=False):
         if not 0.0 <= lr:
             raise ValueError("Invalid learning rate: {}".format(lr))
         if not 0.0 <= eps:
@@ -43,7 +53,8 @@ class RMSprop(Optimizer):
         if not 0.0 <= alpha:
             raise ValueError("Invalid alpha value: {}".format(alpha))
 
-        defaults = dict(lr=lr, momentum=momentum, alpha=alpha, eps=eps, centered=centered, weight_decay=weight_decay)
+        defaults = dict(lr=lr, momentum=momentum, alpha=alpha, eps=eps, centered=centered, weight_decay=weight_decay,
+                        foreach=foreach)
         super(RMSprop, self).__init__(params, defaults)
 
     def __setstate__(self, state):
@@ -51,6 +62,46 @@ class RMSprop(Optimizer):
         for group in self.param_groups:
             group.setdefault('momentum', 0)
             group.setdefault('centered', False)
+            group.setdefault('foreach', False)
+
+    def _multi_tensor_step(self, group):
+        """Updates all the parameters of ``group`` at once."""
+        if len(_multi_tensor.params_with_grad(group, 'RMSprop')) == 0:
+            return True
+        names = ['square_avg']
+        if group['momentum'] > 0:
+            names.append('momentum_buffer')
+        if group['centered']:
+            names.append('grad_avg')
+        alpha = group['alpha']
+        grad_scale = self._take_grad_scale(group)
+        for device_params in _multi_tensor.group_by_device_and_dtype(group['params']).values():
+            flat = self._get_flat_state(group, device_params, names)
+            if len(flat.inactive) == len(device_params):
+                continue
+            flat.init_state(self.state, step=0)
+            flat.advance_steps(self.state)
+            decay = flat.per_param(alpha, inactive=1)
+            grad = flat.flat_grad(group['weight_decay'], grad_scale)
+            avg, _ = flat.scratch()
+
+            square_avg = flat.buffers['square_avg']
+            square_avg.mul_(decay).addcmul_(grad, grad, value=1 - alpha)
+            if group['centered']:
+                grad_avg = flat.buffers['grad_avg']
+                grad_avg.mul_(decay).add_(grad, alpha=1 - alpha)
+                torch.addcmul(square_avg, grad_avg, grad_avg, value=-1, out=avg).sqrt_()
+            else:
+                torch.sqrt(square_avg, out=avg)
+            avg.add_(group['eps'])
+
+            if group['momentum'] > 0:
+                buf = flat.buffers['momentum_buffer']
+                buf.mul_(flat.per_param(group['momentum'], inactive=1)).addcdiv_(grad, avg)
+                flat.update_params('add_', buf, alpha=-group['lr'])
+            else:
+                flat.update_params('addcdiv_', grad, avg, value=-group['lr'])
+        return True
 
     @torch.no_grad()
     def step(self, closure=None):
@@ -66,6 +117,8 @@ class RMSprop(Optimizer):
                 loss = closure()
 
         for group in self.param_groups:
+            if group['foreach'] and self._foreach_step(group):
+                continue
             for p in group['params']:
                 if p.grad is None:
                     continue
@@ -91,18 +144,18 @@ class RMSprop(Optimizer):
                 if group['weight_decay'] != 0:
                     grad = grad.add(p, alpha=group['weight_decay'])
 
-                square_avg.mul_(alpha).addcmul_(grad, grad, value=1 - alpha)
+                square_avg.mul_(decay).addcmul_(grad, grad, value=1 - alpha)
 
                 if group['centered']:
                     grad_avg = state['grad_avg']
-                    grad_avg.mul_(alpha).add_(grad, alpha=1 - alpha)
+                    grad_avg.mul_(decay).add_(grad, alpha=1 - alpha)
                     avg = square_avg.addcmul(grad_avg, grad_avg, value=-1).sqrt_().add_(group['eps'])
                 else:
                     avg = square_avg.sqrt().add_(group['eps'])
 
                 if group['momentum'] > 0:
                     buf = state['momentum_buffer']
-                    buf.mul_(group['momentum']).addcdiv_(grad, avg)
+                    buf.mul_(flat.per_param(group['momentum'], inactive=1)).addcdiv_(grad, avg)
                     p.add_(buf, alpha=-group['lr'])
                 else:
                     p.addcdiv_(grad, avg, value=-group['lr'])
@@ -0,0 +1,88 @@
+import torch
+from .optimizer import Optimizer
+from . import _row_sparse
+
+
+class RowWiseAdagrad(Optimizer):
+    r"""Implements row-wise Adagrad algorithm.
+
+    A variant of :class:`Adagrad` for embedding tables that keeps a single
+    accumulator per row (along the first dimension of the parameter), the sum
+    of the mean squared gradient of the row, instead of one per element. Only
+    the rows present in the gradient are read and updated, so the cost of a
+    step scales with the number of unique indices of a sparse gradient rather
+    than with the size of the table. Dense gradients are supported as well.
+
+    Arguments:
+        params (iterable): iterable of parameters to optimize or dicts defining
+            parameter groups
+        lr (float, optional): learning rate (default: 1e-2)
+        weight_decay (float, optional): weight decay (L2 penalty), applied to
+            the rows present in the gradient only (default: 0)
+        initial_accumulator_value (float, optional): initial value of the row
+            accumulators (default: 0)
+        eps (float, optional): term added to the denominator to improve
+            numerical stability (default: 1e-10)
+    """
+
+    def __init__(self, params, lr=1e-2, weight_decay=0, initial_accumulator_value=0, eps=1e-10):
+        if not 0.0 <= lr:
+            raise ValueError("Invalid learning rate: {}".format(lr))
+        if not 0.0 <= weight_decay:
+            raise ValueError("Invalid weight_decay value: {}".format(weight_decay))
+        if not 0.0 <= initial_accumulator_value:
+            raise ValueError("Invalid initial_accumulator_value value: {}".format(initial_accumulator_value))
+        if not 0.0 <= eps:
+            raise ValueError("Invalid epsilon value: {}".format(eps))
+
+        defaults = dict(lr=lr, eps=eps, weight_decay=weight_decay,
+                        initial_accumulator_value=initial_accumulator_value)
+        super(RowWiseAdagrad, self).__init__(params, defaults)
+
+        for group in self.param_groups:
+            for p in group['params']:
+                if p.dim() == 0:
+                    raise ValueError("RowWiseAdagrad does not support scalar parameters")
+                state = self.state[p]
+                state['step'] = 0
+                state['sum'] = p.new_full((p.size(0),), initial_accumulator_value)
+
+    def share_memory(self):
+        for group in self.param_groups:
+            for p in group['params']:
+                state = self.state[p]
+                state['sum'].share_memory_()
+
+    @torch.no_grad()
+    def step(self, closure=None):
+        """Performs a single optimization step.
+
+        Arguments:
+            closure (callable, optional): A closure that reevaluates the model
+                and returns the loss.
+        """
+        loss = None
+        if closure is not None:
+            with torch.enable_grad():
+                loss = closure()
+
+        for group in self.param_groups:
+            for p in group['params']:
+                if p.grad is None:
+                    continue
+                state = self.state[p]
+                state['step'] += 1
+
+                indices, grad_rows = _row_sparse.present_rows(p, p.grad, 'RowWiseAdagrad', skip_zero_rows=False)
+                if indices.numel() == 0:
+                    continue
+                if group['weight_decay'] != 0:
+                    grad_rows = grad_rows.add(p.index_select(0, indices), alpha=group['weight_decay'])
+
+                row_shape = (-1,) + (1,) * (p.dim() - 1)
+                sq_mean = grad_rows.pow(2).reshape(indices.numel(), -1).mean(dim=1)
+                state['sum'].index_add_(0, indices, sq_mean)
+                std = state['sum'].index_select(0, indices).sqrt_().add_(group['eps'])
+                p.index_add_(0, indices, grad_rows.div(std.view(row_shape)).mul_(-group['lr']))
+
+        return loss
@@ -0,0 +1,4 @@
+from .optimizer import _params_t, Optimizer
+
+class RowWiseAdagrad(Optimizer):
+    def __init__(self, params: _params_t, lr: float=..., weight_decay: float=..., initial_accumulator_value: float=..., eps: float=...) -> None: ...
@@ -1,5 +1,6 @@
 import torch
 from .optimizer import Optimizer, required
+from . import _multi_tensor
 
 
 class SGD(Optimizer):
@@ -16,6 +17,14 @@ class SGD(Optimizer):
         weight_decay (float, optional): weight decay (L2 penalty) (default: 0)
         dampening (float, optional): dampening for momentum (default: 0)
         nesterov (bool, optional): enables Nesterov momentum (default: False)
+        foreach (bool, optional): whether to use the multi-tensor
+            implementation, which keeps the momentum buffers of each param
+            group in a flat buffer and updates all its parameters with a few
+            large ops instead of several small ops per parameter. It also keeps
+            a flat copy of the gradients of each group, which
+            :meth:`flatten_parameters` avoids without weight decay, and with
+            weight decay or Nesterov momentum a flat scratch buffer, each of
+            the size of the parameters (default: False)
 
     Example:
         >>> optimizer = torch.optim.SGD(model.parameters(), lr=0.1, momentum=0.9)
@@ -53,7 +62,7 @@ class SGD(Optimizer):
     """
 
     def __init__(self, params, lr=required, momentum=0, dampening=0,
-                 weight_decay=0, nesterov=False):
+                 weight_decay=0, nesterov=False, foreach=False):
         if lr is not required and lr < 0.0:
             raise ValueError("Invalid learning rate: {}".format(lr))
         if momentum < 0.0:
@@ -62,7 +71,7 @@ class SGD(Optimizer):
             raise ValueError("Invalid weight_decay value: {}".format(weight_decay))
 
         defaults = dict(lr=lr, momentum=momentum, dampening=dampening,
-                        weight_decay=weight_decay, nesterov=nesterov)
+                        weight_decay=weight_decay, nesterov=nesterov, foreach=foreach)
         if nesterov and (momentum <= 0 or dampening != 0):
             raise ValueError("Nesterov momentum requires a momentum and zero dampening")
         super(SGD, self).__init__(params, defaults)
@@ -71,6 +80,44 @@ class SGD(Optimizer):
         super(SGD, self).__setstate__(state)
         for group in self.param_groups:
             group.setdefault('nesterov', False)
+            group.setdefault('foreach', False)
+
+    def _multi_tensor_step(self, group):
+        """Updates all the parameters of ``group`` at once."""
+        if len(_multi_tensor.params_with_grad(group, 'SGD')) == 0:
+            return True
+        weight_decay = group['weight_decay']
+        momentum = group['momentum']
+        dampening = group['dampening']
+        nesterov = group['nesterov']
+        names = ['momentum_buffer'] if momentum != 0 else []
+
+        grad_scale = self._take_grad_scale(group)
+        for device_params in _multi_tensor.group_by_device_and_dtype(group['params']).values():
+            flat = self._get_flat_state(group, device_params, names)
+            if len(flat.inactive) == len(device_params):
+                continue
+            d_p = flat.flat_grad(weight_decay, grad_scale)
+            if momentum != 0:
+                # the buffer of a parameter is initialized with its first
+                # gradient, i.e. added to a zeroed buffer without dampening
+                first = [1 if 'momentum_buffer' not in self.state[p] else 1 - dampening
+                         for p, active in zip(device_params, flat.active) if active]
+                flat.init_state(self.state)
+                buf = flat.buffers['momentum_buffer']
+                buf.mul_(flat.per_param(momentum, inactive=1))
+                alpha = flat.per_param(first)
+                if isinstance(alpha, torch.Tensor):
+                    buf.addcmul_(d_p, alpha)
+                else:
+                    buf.add_(d_p, alpha=alpha)
+                if nesterov:
+                    d_p = torch.add(d_p, buf, alpha=momentum, out=flat.scratch(0)[0])
+                else:
+                    d_p = buf
+
+            flat.update_params('add_', d_p, alpha=-group['lr'])
+        return True
 
     @torch.no_grad()
     def step(self, closure=None):
@@ -86,6 +133,8 @@ class SGD(Optimizer):
                 loss = closure()
 
         for group in self.param_groups:
+            if group['foreach'] and self._foreach_step(group):
+                continue
             weight_decay = group['weight_decay']
             momentum = group['momentum']
             dampening = group['dampening']
@@ -0,0 +1,261 @@
+from collections import OrderedDict
+from copy import deepcopy
+import itertools
+
+import torch
+from torch.nn import Module
+from torch._utils import _merge_adjacent_tensors
+from ._multi_tensor import _storage_aliases
+
+
+class AveragedModel(Module):
+    r"""Implements averaged model for Stochastic Weight Averaging (SWA) and
+    exponential moving averages (EMA) of the weights.
+
+    Stochastic Weight Averaging was proposed in `Averaging Weights Leads to
+    Wider Optima and Better Generalization`_.
+
+    AveragedModel class creates a copy of the provided module :attr:`model`
+    on the device :attr:`device` and allows to compute running averages of
+    the parameters of the :attr:`model`. The averaged parameters are packed in
+    contiguous flat buffers (one per device and dtype), which are updated with
+    a single op per buffer instead of several small ops per parameter. When
+    the parameters of :attr:`model` are themselves packed in a flat buffer,
+    e.g. by :meth:`~torch.optim.Optimizer.flatten_parameters`, they are read
+    directly from it.
+
+    By default, the equally weighted average of the parameters is computed
+    (SWA). If :attr:`decay` is given, an exponential moving average is
+    computed instead: :math:`W^{EMA} \leftarrow decay \cdot W^{EMA} + (1 -
+    decay) \cdot W`. Any other average can be computed with :attr:`avg_fn`.
+
+    The floating point buffers of the model (e.g. the running statistics of
+    batch normalization layers) are copied from :attr:`model` at every update,
+    or averaged like the parameters if :attr:`average_buffers` is ``True``.
+    The other buffers are always copied. For SWA, the statistics of the batch
+    normalization layers are usually recomputed at the end of training with
+    :func:`update_bn` instead.
+
+    Arguments:
+        model (torch.nn.Module): model to use with SWA or EMA
+        device (torch.device, optional): if provided, the averaged model will be
+            stored on the :attr:`device`
+        avg_fn (function, optional): the averaging function used to update the
+            parameters; the function must take the current value of the flat
+            buffer of the averaged parameters, the matching flat buffer of the
+            parameters of :attr:`model` and the number of models already
+            averaged, and return the new averaged value; if None, equally
+            weighted average or EMA is used (default: None)
+        decay (float, optional): decay of the exponential moving average;
+            if None, equally weighted average is used (default: None)
+        update_every (int, optional): only update the averages on every
+            :attr:`update_every`-th call to :meth:`update_parameters`
+            (default: 1)
+        average_buffers (bool, optional): whether to average the floating
+            point buffers like the parameters instead of copying them
+            (default: False)
+
+    Example:
+        >>> loader, optimizer, model, loss_fn = ...
+        >>> ema_model = torch.optim.swa_utils.AveragedModel(model, decay=0.999, update_every=4)
+        >>> for input, target in loader:
+        >>>     optimizer.zero_grad()
+        >>>     loss_fn(model(input), target).backward()
+        >>>     optimizer.step()
+        >>>     ema_model.update_parameters(model)
+        >>> # Evaluate the averaged model directly...
+        >>> preds = ema_model(test_input)
+        >>> # ...or swap the averaged weights into the model without copying
+        >>> ema_model.swap_parameters(model)
+        >>> evaluate(model)
+        >>> ema_model.swap_parameters(model)
+
+    .. _Averaging Weights Leads to Wider Optima and Better Generalization:
+        https://arxiv.org/abs/1803.05407
+    """
+    def __init__(self, model, device=None, avg_fn=None, decay=None, update_every=1, average_buffers=False):
+        super(AveragedModel, self).__init__()
+        if decay is not None and not 0.0 <= decay <= 1.0:
+            raise ValueError("Invalid decay value: {}".format(decay))
+        if update_every < 1:
+            raise ValueError("Invalid update_every value: {}".format(update_every))
+        if avg_fn is not None and decay is not None:
+            raise ValueError("Only one of avg_fn and decay can be given")
+        self.module = deepcopy(model)
+        if device is not None:
+            self.module = self.module.to(device)
+        self.register_buffer('n_averaged', torch.tensor(0, dtype=torch.long, device=device))
+        self.avg_fn = avg_fn
+        self.decay = decay
+        self.update_every = update_every
+        self.average_buffers = average_buffers
+        self._num_calls = 0
+        self._swapped = False
+        self._flat_buffers = []
+        self._scratch = {}
+        self._flatten()
+
+    def forward(self, *args, **kwargs):
+        return self.module(*args, **kwargs)
+
+    def _averaged_tensors(self, module):
+        tensors = list(module.parameters())
+        if self.average_buffers:
+            tensors += [b for b in module.buffers() if b.is_floating_point()]
+        return tensors
+
+    def _copied_buffers(self, module):
+        if self.average_buffers:
+            return [b for b in module.buffers() if not b.is_floating_point()]
+        return list(module.buffers())
+
+    def _flatten(self):
+        # Packs the averaged tensors into one flat buffer per device and dtype
+        tensors = self._averaged_tensors(self.module)
+        groups = OrderedDict()
+        for i, t in enumerate(tensors):
+            groups.setdefault((t.device, t.dtype), []).append(i)
+        self._flat_buffers = []
+        self._scratch = {}
+        with torch.no_grad():
+            for indices in groups.values():
+                group = [tensors[i] for i in indices]
+                flat = torch.cat([t.reshape(-1) for t in group])
+                for t, view in zip(group, _storage_aliases(flat, group)):
+                    t.data = view
+                self._flat_buffers.append((indices, flat))
+
+    def _is_flat(self, tensors):
+        for indices, flat in self._flat_buffers:
+            offset = 0
+            for i in indices:
+                t = tensors[i]
+                if t.data_ptr() != flat.data_ptr() + offset * flat.element_size():
+                    return False
+                offset += t.numel()
+        return True
+
+    def _gather(self, tensors, flat, key):
+        # Returns the tensors of the model as a single flat tensor, without a
+        # copy if they already are laid out one after the other
+        tensors = [t.detach() for t in tensors]
+        merged = _merge_adjacent_tensors(tensors)
+        if len(merged) == 1 and merged[0].numel() == flat.numel():
+            src = merged[0]
+        else:
+            scratch = self._scratch.get(key)
+            if scratch is None or scratch.numel() != flat.numel() or scratch.dtype != tensors[0].dtype:
+                scratch = self._scratch[key] = tensors[0].new_empty(flat.numel())
+            src = torch.cat([t.reshape(-1) for t in tensors], out=scratch)
+        return src.to(device=flat.device, dtype=flat.dtype)
+
+    def update_parameters(self, model):
+        r"""Updates the averages with the parameters (and buffers) of ``model``,
+        if this is the :attr:`update_every`-th call since the last update."""
+        if self._swapped:
+            raise RuntimeError("The parameters of the averaged model are swapped with the parameters "
+                               "of a model, call swap_parameters() again before updating them")
+        self._num_calls += 1
+        if self._num_calls % self.update_every != 0:
+            return
+        averaged = self._averaged_tensors(self.module)
+        model_tensors = self._averaged_tensors(model)
+        if len(averaged) != len(model_tensors):
+            raise ValueError("model does not have the same parameters as the averaged model")
+        if not self._is_flat(averaged):
+            # e.g. the averaged model was moved or loaded with new tensors
+            self._flatten()
+
+        n_averaged = int(self.n_averaged)
+        with torch.no_grad():
+            for key, (indices, flat) in enumerate(self._flat_buffers):
+                src = self._gather([model_tensors[i] for i in indices], flat, key)
+                if n_averaged == 0:
+                    flat.copy_(src)
+                elif self.avg_fn is not None:
+                    flat.copy_(self.avg_fn(flat, src, self.n_averaged.to(flat.device)))
+                elif self.decay is not None:
+                    flat.lerp_(src, 1 - self.decay)
+                else:
+                    flat.lerp_(src, 1. / (n_averaged + 1))
+            for b_avg, b in zip(self._copied_buffers(self.module), self._copied_buffers(model)):
+                b_avg.copy_(b)
+        self.n_averaged += 1
+
+    def swap_parameters(self, model):
+        r"""Swaps the parameters and buffers of ``model`` with the averaged ones.
+
+        Only the underlying tensors are exchanged, nothing is copied: after the
+        call, ``model`` uses the averaged weights (e.g. for evaluation) and this
+        averaged model holds the weights of ``model``. Call it again with the
+        same model to swap them back before training ``model`` further or
+        updating the averages.
+        """
+        ours = list(itertools.chain(self.module.parameters(), self.module.buffers()))
+        theirs = list(itertools.chain(model.parameters(), model.buffers()))
+        if len(ours) != len(theirs):
+            raise ValueError("model does not have the same parameters as the averaged model")
+        for a, m in zip(ours, theirs):
+            if a.size() != m.size():
+                raise ValueError("model does not have the same parameters as the averaged model")
+        for a, m in zip(ours, theirs):
+            data = a.data
+            a.data = m.data
+            m.data = data
+        self._swapped = not self._swapped
+
+
+@torch.no_grad()
+def update_bn(loader, model, device=None):
+    r"""Updates BatchNorm running_mean, running_var buffers in the model.
+
+    It performs one pass over data in `loader` to estimate the activation
+    statistics for BatchNorm layers in the model.
+
+    Arguments:
+        loader (torch.utils.data.DataLoader): dataset loader to compute the
+            activation statistics on. Each data batch should be either a
+            tensor, or a list/tuple whose first element is a tensor
+            containing data.
+        model (torch.nn.Module): model for which we seek to update BatchNorm
+            statistics.
+        device (torch.device, optional): If set, data will be transferred to
+            :attr:`device` before being passed into :attr:`model`.
+
+    Example:
+        >>> loader, model = ...
+        >>> torch.optim.swa_utils.update_bn(loader, model)
+
+    .. note::
+        The `update_bn` utility assumes that each data batch in :attr:`loader`
+        is either a tensor or a list or tuple of tensors; in the latter case it
+        is assumed that :meth:`model.forward()` should be called on the first
+        element of the list or tuple corresponding to the data batch.
+    """
+    momenta = {}
+    for module in model.modules():
+        if isinstance(module, torch.nn.modules.batchnorm._BatchNorm):
+            module.running_mean = torch.zeros_like(module.running_mean)
+            module.running_var = torch.ones_like(module.running_var)
+            momenta[module] = module.momentum
+
+    if not momenta:
+        return
+
+    was_training = model.training
+    model.train()
+    for module in momenta.keys():
+        # cumulative moving average over the batches
+        module.momentum = None
+        module.num_batches_tracked *= 0
+
+    for input in loader:
+        if isinstance(input, (list, tuple)):
+            input = input[0]
+        if device is not None:
+            input = input.to(device)
+        model(input)
+
+    for bn_module in momenta.keys():
+        bn_module.momentum = momenta[bn_module]
+    model.train(was_training)
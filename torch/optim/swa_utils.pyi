@@ -0,0 +1,19 @@
+from typing import Any, Callable, Iterable, Optional, Union
+from .. import device, Tensor
+from ..nn.modules import Module
+
+_device_t = Union[device, str, int, None]
+
+class AveragedModel(Module):
+    module: Module
+    n_averaged: Tensor
+    decay: Optional[float]
+    update_every: int
+    average_buffers: bool
+
+    def __init__(self, model: Module, device: _device_t=..., avg_fn: Optional[Callable[[Tensor, Tensor, Tensor], Tensor]]=..., decay: Optional[float]=..., update_every: int=..., average_buffers: bool=...) -> None: ...
+    def forward(self, *args: Any, **kwargs: Any) -> Any: ...
+    def update_parameters(self, model: Module) -> None: ...
+    def swap_parameters(self, model: Module) -> None: ...
+
+def update_bn(loader: Iterable[Any], model: Module, device: _device_t=...) -> None: ...
@@ -8,6 +8,7 @@ import torch.distributed.autograd as dist_autograd
 import torch.distributed.rpc as rpc
 from torch import optim
 from torch.distributed.optim import DistributedOptimizer
+from torch.distributed.optim.optimizer import _LocalOptimizer
 from torch.testing._internal.dist_utils import dist_init
 from torch.testing._internal.distributed.rpc.rpc_agent_test_fixture import (
     RpcAgentTestFixture,
@@ -143,12 +144,21 @@ class DistOptimizerTest(RpcAgentTestFixture):
             )
 
     @dist_init()
-    def test_dist_optim(self):
+    def test_dist_optim_requires_lr(self):
+        # like optim.SGD, the TorchScript local optimizers require lr
+        owner = "worker%d" % ((self.rank + 1) % self.world_size)
+        remote_module = rpc.remote(owner, MyModule)
+        remote_param = remote_method(MyModule.get_w, remote_module)
+
+        with self.assertRaisesRegex(Exception, "lr"):
+            DistributedOptimizer(optim.SGD, [remote_param])
+
+    def _test_dist_optim_base(self, optim_cls, *args, **kwargs):
         # local version
         module1 = MyModule()
         module2 = MyModule()
         params = [module1.get_w(), module2.get_w()]
-        local_optim = optim.SGD(params, lr=0.05)
+        local_optim = optim_cls(params, *args, **kwargs)
 
         old_w1 = module1.w.clone().detach()
         old_w2 = module2.w.clone().detach()
@@ -180,7 +190,7 @@ class DistOptimizerTest(RpcAgentTestFixture):
         self.assertEqual(old_w2, remote_param2.to_here())
 
         dist_optim = DistributedOptimizer(
-            optim.SGD, [remote_param1, remote_param2], lr=0.05
+            optim_cls, [remote_param1, remote_param2], *args, **kwargs
         )
 
         with dist_autograd.context() as context_id:
@@ -203,3 +213,67 @@ class DistOptimizerTest(RpcAgentTestFixture):
             # ensure local equals remote
             self.assertEqual(new_w1, module1.get_w())
             self.assertEqual(new_w2, module2.get_w())
+
+    @dist_init()
+    def test_dist_optim(self):
+        self._test_dist_optim_base(optim.SGD, lr=0.05)
+        self._test_dist_optim_base(optim.SGD, lr=0.05, momentum=0.9, weight_decay=0.01)
+        self._test_dist_optim_base(optim.Adam, lr=0.05, amsgrad=True)
+        # no TorchScript counterpart
+        self._test_dist_optim_base(optim.Adagrad, lr=0.05)
+
+    @dist_init()
+    def test_dist_optim_step_async(self):
+        owner = "worker%d" % ((self.rank + 1) % self.world_size)
+        remote_module = rpc.remote(owner, MyModule)
+        remote_param = remote_method(MyModule.get_w, remote_module)
+        old_w = remote_param.to_here()
+        dist_optim = DistributedOptimizer(optim.SGD, [remote_param], lr=0.05)
+        with dist_autograd.context() as context_id:
+            t = torch.rand((3, 3), requires_grad=True)
+            output = rpc_async_method(MyModule.forward, remote_module, t)
+            dist_autograd.backward(context_id, [output.wait().sum()])
+            futs = dist_optim.step_async(context_id)
+            self.assertEqual(len(futs), 1)
+            for fut in futs:
+                fut.wait()
+        self.assertNotEqual(old_w, remote_param.to_here())
+
+    @dist_init()
+    def test_dist_optim_skips_params_without_grad(self):
+        owner = "worker%d" % ((self.rank + 1) % self.world_size)
+        remote_module1 = rpc.remote(owner, MyModule)
+        remote_module2 = rpc.remote(owner, MyModule)
+        remote_param1 = remote_method(MyModule.get_w, remote_module1)
+        remote_param2 = remote_method(MyModule.get_w, remote_module2)
+        old_w2 = remote_param2.to_here()
+        for optim_cls in (optim.SGD, optim.Adagrad):
+            dist_optim = DistributedOptimizer(optim_cls, [remote_param1, remote_param2], lr=0.05)
+            for _ in range(2):
+                with dist_autograd.context() as context_id:
+                    # only the first module takes part in the backward pass
+                    t = torch.rand((3, 3), requires_grad=True)
+                    output = rpc_async_method(MyModule.forward, remote_module1, t)
+                    dist_autograd.backward(context_id, [output.wait().sum()])
+                    dist_optim.step(context_id)
+            self.assertEqual(old_w2, remote_param2.to_here())
+
+    @dist_init()
+    def test_local_optimizer_locks(self):
+        w1 = torch.rand((3, 3), requires_grad=True)
+        w2 = torch.rand((3, 3), requires_grad=True)
+        optim1 = _LocalOptimizer(optim.SGD, [rpc.RRef(w1)], lr=0.05)
+        optim2 = _LocalOptimizer(optim.SGD, [rpc.RRef(w2)], lr=0.05)
+        optim3 = _LocalOptimizer(optim.SGD, [rpc.RRef(w1), rpc.RRef(w2)], lr=0.05)
+        # optimizers of disjoint parameters don't share a lock
+        self.assertTrue(set(optim1._locks).isdisjoint(optim2._locks))
+        self.assertEqual(set(optim3._locks), set(optim1._locks) | set(optim2._locks))
+        self.assertEqual(optim1.is_script, torch.jit._enabled)
+        self.assertFalse(_LocalOptimizer(FailingOptimizer, [rpc.RRef(w1)]).is_script)
+
+        # the locks are dropped with the last optimizer of their parameter
+        del optim1, optim3
+        self.assertNotIn(id(w1), _LocalOptimizer._param_locks)
+        self.assertIn(id(w2), _LocalOptimizer._param_locks)
+        del optim2
+        self.assertNotIn(id(w2), _LocalOptimizer._param_locks)
@@ -0,0 +1,79 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import copy
+import unittest
+
+import torch
+import torch.distributed.autograd as dist_autograd
+from torch import nn, optim
+from torch.distributed.optim import DistributedOptimizer
+from torch.nn.parallel import Pipe
+from torch.testing._internal.dist_utils import dist_init
+from torch.testing._internal.distributed.rpc.rpc_agent_test_fixture import (
+    RpcAgentTestFixture,
+)
+
+
+@unittest.skipIf(
+    not torch._six.PY3, "Pytorch distributed autograd does not support python2"
+)
+class PipeTest(RpcAgentTestFixture):
+    @dist_init()
+    def test_pipe_over_rpc(self):
+        # The process of rank 0 drives the pipeline, whose last partitions
+        # run on the other workers
+        if self.rank != 0:
+            return
+
+        torch.manual_seed(0)
+        model = nn.Sequential(nn.Linear(4, 8), nn.ReLU(), nn.Linear(8, 8), nn.Tanh(), nn.Linear(8, 2))
+        input = torch.randn(8, 4)
+        output = model(input)
+        output.sum().backward()
+
+        devices = ['cpu'] + ['worker%d' % rank for rank in range(1, self.world_size)]
+        pipe = Pipe(copy.deepcopy(model), devices=devices, balance=[2, 1, 1, 1], chunks=4,
+                    checkpoint='never', measure=True)
+        self.assertEqual(len(pipe.partitions), 1)
+        parameter_rrefs = pipe.parameter_rrefs()
+        self.assertEqual(len(parameter_rrefs), len(list(model.parameters())))
+
+        with dist_autograd.context() as context_id:
+            pipe_input = input.clone().requires_grad_()
+            pipe_output = pipe(pipe_input)
+            self.assertEqual(pipe_output, output)
+            dist_autograd.backward(context_id, [pipe_output.sum()])
+
+            # the gradients of the local partition flow back from the workers
+            grads = dist_autograd.get_gradients(context_id)
+            local_params = list(pipe.partitions[0].parameters())
+            for p, pipe_p in zip(model[0].parameters(), local_params):
+                self.assertEqual(p.grad, grads[pipe_p])
+
+            dist_optim = DistributedOptimizer(optim.SGD, parameter_rrefs, lr=0.1)
+            dist_optim.step(context_id)
+
+        for p, pipe_p in zip(model[0].parameters(), local_params):
+            self.assertEqual(p - 0.1 * p.grad, pipe_p)
+
+        stats = pipe.bubble_stats
+        self.assertEqual(len(stats['busy']), 4)
+        self.assertTrue(all(busy > 0 for busy in stats['busy']))
+        self.assertEqual(stats['ideal_bubble_overhead'], 3. / 7)
+        self.assertTrue(0 <= stats['bubble_overhead'] <= 1)
+
+    @dist_init()
+    def test_pipe_over_rpc_checkpoint(self):
+        # the gradients of checkpointed partitions wouldn't reach the
+        # distributed autograd context
+        if self.rank != 0:
+            return
+
+        model = nn.Sequential(nn.Linear(4, 8), nn.ReLU(), nn.Linear(8, 2))
+        devices = ['cpu', 'worker1']
+        with self.assertRaisesRegex(ValueError, "requires checkpoint='never'"):
+            Pipe(copy.deepcopy(model), devices=devices, chunks=2)
+        with self.assertRaisesRegex(ValueError, "requires checkpoint='never'"):
+            Pipe(copy.deepcopy(model), devices=devices, chunks=2, checkpoint='always')
+        pipe = Pipe(copy.deepcopy(model), devices=devices, chunks=2, checkpoint='never')
+        self.assertEqual(pipe.checkpoint, 'never')
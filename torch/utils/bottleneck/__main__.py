@@ -3,6 +3,9 @@ import cProfile
 import pstats
 import sys
 import os
+import threading
+import time
+from collections import Counter
 
 import torch
 from torch.autograd import profiler
@@ -148,6 +151,178 @@ def print_autograd_prof_summary(prof, mode, sortby='cpu_time', topk=15):
     print(autograd_prof_summary.format(**result))
 
 
+# Name of the range marking the start of the sampling in the autograd
+# profiler, which lines up the samples with the op events
+_SAMPLING_START = 'bottleneck::sampling_start'
+
+
+class StackSampler(object):
+    """Statistical profiler that periodically samples the Python stack of a thread.
+
+    A background thread wakes up every ``interval`` seconds and records the
+    stack of the target thread. Unlike cProfile, the profiled code is not
+    instrumented, so its overhead does not grow with the number of Python calls.
+
+    :meth:`add_op_frames` merges the samples with the op events of the
+    autograd profiler: the ops running on the sampled thread when a sample
+    was taken become the innermost frames of its stack.
+    """
+    def __init__(self, interval=0.005, thread_id=None):
+        self.interval = interval
+        self.thread_id = threading.current_thread().ident if thread_id is None else thread_id
+        self.stacks = Counter()
+        # (time.perf_counter(), stack) of each sample, in order
+        self.samples = []
+        self.num_samples = 0
+        self.num_op_samples = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='bottleneck-sampler')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                # Frames of bottleneck itself are not interesting to users
+                if code.co_filename != __file__:
+                    stack.append('{} ({}:{})'.format(
+                        code.co_name, os.path.basename(code.co_filename), code.co_firstlineno))
+                frame = frame.f_back
+            stack.reverse()
+            self.samples.append((time.perf_counter(), tuple(stack)))
+            self.stacks[tuple(stack)] += 1
+            self.num_samples += 1
+
+    def add_op_frames(self, function_events, sampling_start):
+        """Appends to the stack of each sample the nested ops (and
+        ``record_function`` ranges) that were running on the sampled thread.
+
+        ``function_events`` are the events of an autograd profiler that
+        recorded a :data:`_SAMPLING_START` range on the sampled thread at the
+        ``time.perf_counter()`` time ``sampling_start``. Ops run by other
+        threads, e.g. by the autograd engine during backward, aren't
+        attributed: their samples end in the Python call waiting for them.
+        """
+        markers = [e for e in function_events if e.name == _SAMPLING_START]
+        if not markers:
+            return
+        marker = markers[0]
+        offset_us = marker.cpu_interval.start - sampling_start * 1e6
+        # Events on a thread are nested, the outer ones first
+        events = sorted([e for e in function_events if e.thread == marker.thread and e is not marker],
+                        key=lambda e: (e.cpu_interval.start, -e.cpu_interval.end))
+        stacks = Counter()
+        num_op_samples = 0
+        running = []
+        i = 0
+        for sample_time, stack in self.samples:
+            time_us = sample_time * 1e6 + offset_us
+            while i < len(events) and events[i].cpu_interval.start <= time_us:
+                while running and running[-1].cpu_interval.end <= events[i].cpu_interval.start:
+                    running.pop()
+                running.append(events[i])
+                i += 1
+            while running and running[-1].cpu_interval.end <= time_us:
+                running.pop()
+            if running:
+                num_op_samples += 1
+            stacks[stack + tuple(e.name for e in running)] += 1
+        self.stacks = stacks
+        self.num_op_samples = num_op_samples
+
+    def folded_stacks(self):
+        """Returns the samples in the folded format understood by flamegraph.pl."""
+        return ['{} {}'.format(';'.join(stack), count)
+                for stack, count in self.stacks.most_common() if stack]
+
+    def function_counts(self):
+        """Returns (self, inclusive) sample counts per function."""
+        self_counts = Counter()
+        inclusive_counts = Counter()
+        for stack, count in self.stacks.items():
+            if not stack:
+                continue
+            self_counts[stack[-1]] += count
+            for function in set(stack):
+                inclusive_counts[function] += count
+        return self_counts, inclusive_counts
+
+
+def run_sampling_prof(code, globs, interval):
+    print('Running your script with the sampling profiler and the autograd profiler...')
+    sampler = StackSampler(interval)
+    start = time.time()
+    with profiler.profile(use_cuda=torch.cuda.is_available()) as autograd_prof:
+        with profiler.record_function(_SAMPLING_START):
+            sampling_start = time.perf_counter()
+        sampler.start()
+        try:
+            exec(code, globs, None)
+        finally:
+            sampler.stop()
+    wall_time_s = time.time() - start
+    sampler.add_op_frames(autograd_prof.function_events, sampling_start)
+    return sampler, autograd_prof, wall_time_s
+
+
+sampling_prof_summary = """
+--------------------------------------------------------------------------------
+  sampling profiler output
+--------------------------------------------------------------------------------
+        {num_samples} samples taken every {interval_ms:.1f}ms, wall time {wall_time}
+        {op_share} of the samples were taken inside PyTorch ops
+        top {topk} functions and ops by self samples:
+{functions}
+
+        top {topk} stacks (folded format):
+{stacks}
+""".strip()
+
+
+def print_sampling_summary(sampler, wall_time_s, topk=15, folded_output=None):
+    self_counts, inclusive_counts = sampler.function_counts()
+    total = max(sampler.num_samples, 1)
+    name_width = max([len(name) for name in self_counts] + [len('Function')]) + 4
+    row_format = '{: <' + str(name_width) + '}  {: <15}  {: <15}'
+    functions = [row_format.format('Function', 'Self %', 'Total %'),
+                 row_format.format('-' * name_width, '-' * 15, '-' * 15)]
+    for name, count in self_counts.most_common(topk):
+        functions.append(row_format.format(
+            name,
+            '{:.2f}%'.format(100.0 * count / total),
+            '{:.2f}%'.format(100.0 * inclusive_counts[name] / total)))
+
+    folded = sampler.folded_stacks()
+    if folded_output is not None:
+        with open(folded_output, 'w') as f:
+            f.write('\n'.join(folded) + '\n')
+
+    result = {
+        'num_samples': sampler.num_samples,
+        'interval_ms': sampler.interval * 1000.0,
+        'wall_time': profiler.format_time(wall_time_s * 1e6),
+        'op_share': '{:.2f}%'.format(100.0 * sampler.num_op_samples / total),
+        'topk': topk,
+        'functions': '\n'.join(functions),
+        'stacks': '\n'.join(folded[:topk]),
+    }
+    print(sampling_prof_summary.format(**result))
+    if folded_output is not None:
+        print('Folded stacks written to {}'.format(folded_output))
+
+
 descript = """
 `bottleneck` is a tool that can be used as an initial step for debugging
 bottlenecks in your program.
@@ -156,6 +331,13 @@ It summarizes runs of your script with the Python profiler and PyTorch\'s
 autograd profiler. Because your script will be profiled, please ensure that it
 exits in a finite amount of time.
 
+With `--mode sampling`, the script runs only once: a background thread samples
+the Python stack periodically while the autograd profiler records PyTorch ops,
+which has a much lower overhead than cProfile on Python-heavy code. The ops
+running when a stack was sampled are added as its innermost frames, so that
+the time of the ops is attributed to the Python code calling them. Ops run by
+the autograd engine during backward are attributed to the backward call.
+
 For more complicated uses of the profilers, please see
 https://docs.python.org/3/library/profile.html and
 https://pytorch.org/docs/master/autograd.html#profiler for more information.
@@ -164,6 +346,14 @@ https://pytorch.org/docs/master/autograd.html#profiler for more information.
 
 def parse_args():
     parser = argparse.ArgumentParser(description=descript)
+    parser.add_argument('--mode', type=str, choices=['cprofile', 'sampling'], default='cprofile',
+                        help='Profile the Python code with cProfile (runs the script twice) '
+                        'or with a sampling profiler (runs the script once).')
+    parser.add_argument('--sampling-interval', type=float, default=5.0,
+                        help='Interval between stack samples in milliseconds (sampling mode only).')
+    parser.add_argument('--folded-output', type=str, default=None,
+                        help='Write the sampled stacks in folded format, e.g. for flamegraph.pl, '
+                        'to this file (sampling mode only).')
     parser.add_argument('scriptfile', type=str,
                         help='Path to the script to be run. '
                         'Usually run with `python path/to/script`.')
@@ -206,6 +396,16 @@ def main():
 
     if torch.cuda.is_available():
         torch.cuda.init()
+
+    if args.mode == 'sampling':
+        sampler, autograd_prof, wall_time_s = run_sampling_prof(
+            code, globs, args.sampling_interval / 1000.0)
+        print(env_summary)
+        print_sampling_summary(sampler, wall_time_s, autograd_prof_topk, args.folded_output)
+        mode = 'CUDA' if torch.cuda.is_available() else 'CPU'
+        print_autograd_prof_summary(autograd_prof, mode, autograd_prof_sortby, autograd_prof_topk)
+        return
+
     cprofile_prof = run_cprofile(code, globs)
     autograd_prof_cpu, autograd_prof_cuda = run_autograd_prof(code, globs)
 
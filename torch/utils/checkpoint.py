@@ -1,7 +1,19 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
+import concurrent.futures
+import functools
+import os
+import tempfile
+import threading
+import time
+import zlib
 import torch
 import warnings
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 def detach_variable(inputs):
     if isinstance(inputs, tuple):
@@ -69,7 +81,12 @@ class CheckpointFunction(torch.autograd.Function):
             if torch.cuda._initialized:
                 ctx.had_cuda_in_fwd = True
                 ctx.fwd_gpu_devices, ctx.fwd_gpu_states = get_device_states(*args)
-        ctx.save_for_backward(*args)
+        if _offload_contexts:
+            ctx.offload = _offload_contexts[-1]
+            ctx.offload_index = ctx.offload._pack(args)
+        else:
+            ctx.offload = None
+            ctx.save_for_backward(*args)
         with torch.no_grad():
             outputs = run_function(*args)
         return outputs
@@ -78,7 +95,10 @@ class CheckpointFunction(torch.autograd.Function):
     def backward(ctx, *args):
         if not torch.autograd._is_checkpoint_valid():
             raise RuntimeError("Checkpointing is not compatible with .grad(), please use .backward() if possible")
-        inputs = ctx.saved_tensors
+        if ctx.offload is not None:
+            inputs = ctx.offload._unpack(ctx.offload_index)
+        else:
+            inputs = ctx.saved_tensors
         # Stash the surrounding rng state, and mimic the state that was
         # present at this time during forward.  Restore the surrounding state
         # when we're done.
@@ -218,3 +238,653 @@ def checkpoint_sequential(functions, segments, input, **kwargs):
         input = checkpoint(run_function(start, end, functions), input,
                            preserve_rng_state=preserve)
     return run_function(end + 1, len(functions) - 1, functions)(input)
+
+
+# Stack of the offload_checkpoints contexts entered, the innermost one packs
+# the inputs saved by CheckpointFunction
+_offload_contexts = []
+
+
+class offload_checkpoints(object):
+    r"""Context-manager that offloads the inputs saved by the checkpointed
+    parts of a model out of the working memory until backward.
+
+    :func:`checkpoint` and :func:`checkpoint_sequential` save the inputs of
+    each checkpointed part for backward. Within this context, instead of
+    keeping them on their device, they are packed to host memory or disk, and
+    brought back in the reverse order during backward, while the parts that
+    follow are recomputed. Their transfer back is started :attr:`prefetch`
+    parts ahead of their use, so that it overlaps with the backward of the
+    parts in between. With :func:`checkpoint_sequential`, only one segment of
+    activations is then kept on the device at a time.
+
+    The inputs can be packed to:
+
+    * ``'pinned'``: page-locked host buffers, copied from and to CUDA
+      devices asynchronously on a side stream. CPU tensors are kept as they
+      are.
+    * ``'compressed'``: host buffers compressed with zlib (lossless), which
+      requires NumPy. Tensors whose dtype NumPy does not support are stored
+      uncompressed. Decompression happens in a background thread.
+    * ``'mmap'``: a spill file per tensor in :attr:`spill_dir`, mapped in
+      memory, so that the operating system can write the pages out to disk
+      under memory pressure. Reading them back happens in a background
+      thread. The files are removed once read.
+    * ``'auto'`` (default): ``'pinned'`` for CUDA tensors and ``'mmap'`` for
+      CPU tensors.
+
+    Inputs that are leaves requiring grad, e.g. parameters, are kept as they
+    are, since they are referenced by the model anyway. The inputs are
+    copied when packed, so unlike with plain checkpointing, modifying them in
+    place after the forward pass isn't detected.
+
+    Args:
+        storage (str, optional): where to pack the inputs, one of ``'auto'``,
+            ``'pinned'``, ``'compressed'`` or ``'mmap'`` (default: ``'auto'``)
+        prefetch (int, optional): number of packed parts transferred back
+            ahead of the one used by backward (default: 2)
+        spill_dir (str, optional): directory of the spill files, defaults to
+            the temporary directory of :mod:`tempfile`
+        compress_level (int, optional): zlib compression level of
+            ``'compressed'`` (default: 1)
+
+    Attributes:
+        bytes_offloaded (int): bytes of the tensors packed
+        bytes_stored (int): bytes used to store them, after compression
+        bytes_prefetched (int): bytes of the tensors brought back
+        num_offloaded (int): number of tensors packed
+
+    Example:
+        >>> with torch.utils.checkpoint.offload_checkpoints(prefetch=1) as offload:
+        >>>     output = checkpoint_sequential(model, 8, input)
+        >>> output.sum().backward()
+        >>> print(offload.bytes_offloaded, offload.bytes_prefetched)
+    """
+
+    def __init__(self, storage='auto', prefetch=2, spill_dir=None, compress_level=1):
+        # packed parts, in the order of the forward pass, read by __del__ even
+        # if the arguments are invalid
+        self._packed = []
+        # parts being brought back, by index
+        self._fetching = {}
+        # the checkpoints of DataParallel replicas are packed and brought
+        # back from several threads
+        self._lock = threading.RLock()
+        if storage not in ('auto', 'pinned', 'compressed', 'mmap'):
+            raise ValueError("Invalid storage: {}".format(storage))
+        if prefetch < 0:
+            raise ValueError("Invalid prefetch value: {}".format(prefetch))
+        if storage == 'compressed' and numpy is None:
+            raise RuntimeError("offload_checkpoints(storage='compressed') requires NumPy")
+        self.storage = storage
+        self.prefetch = prefetch
+        self.spill_dir = spill_dir
+        self.compress_level = compress_level
+        self.bytes_offloaded = 0
+        self.bytes_stored = 0
+        self.bytes_prefetched = 0
+        self.num_offloaded = 0
+        self._executor = None
+        self._streams = {}
+
+    def __enter__(self):
+        _offload_contexts.append(self)
+        return self
+
+    def __exit__(self, *args):
+        _offload_contexts.remove(self)
+        return False
+
+    def __del__(self):
+        # remove the spill files of the parts that backward didn't go through
+        for packed in self._packed:
+            for p in packed or ():
+                if p[0] == 'mmap' and os.path.exists(p[2]):
+                    os.remove(p[2])
+
+    def _stream(self, device):
+        with self._lock:
+            if device not in self._streams:
+                self._streams[device] = torch.cuda.Stream(device)
+            return self._streams[device]
+
+    def _submit(self, fn, *args):
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+            return self._executor.submit(fn, *args)
+
+    def _count(self, tensor, stored):
+        with self._lock:
+            self.bytes_offloaded += _nbytes(tensor)
+            self.bytes_stored += stored
+            self.num_offloaded += 1
+
+    def _pack_tensor(self, tensor):
+        storage = self.storage
+        if storage == 'auto':
+            storage = 'pinned' if tensor.is_cuda else 'mmap'
+        if storage == 'pinned' and not tensor.is_cuda:
+            return ('keep', tensor)
+
+        tensor = tensor.detach()
+        if storage == 'pinned':
+            stream = self._stream(tensor.device)
+            stream.wait_stream(torch.cuda.current_stream(tensor.device))
+            with torch.cuda.stream(stream):
+                host = torch.empty(tensor.size(), dtype=tensor.dtype, pin_memory=True)
+                host.copy_(tensor, non_blocking=True)
+            # the memory of tensor must not be reused before the copy is done
+            tensor.record_stream(stream)
+            self._count(tensor, _nbytes(host))
+            return ('pinned', host, tensor.device)
+
+        cpu = tensor.to('cpu').contiguous()
+        if storage == 'compressed':
+            try:
+                array = cpu.numpy()
+            except TypeError:
+                # dtype not supported by NumPy
+                cpu = cpu.clone() if cpu.data_ptr() == tensor.data_ptr() else cpu
+                self._count(tensor, _nbytes(cpu))
+                return ('host', cpu, tensor.device)
+            data = zlib.compress(array.tobytes(), self.compress_level)
+            self._count(tensor, len(data))
+            return ('compressed', data, array.dtype, tensor.size(), tensor.device)
+
+        fd, path = tempfile.mkstemp(prefix='offload-', dir=self.spill_dir)
+        os.close(fd)
+        spilled = torch.from_file(path, shared=True, size=cpu.numel(), dtype=cpu.dtype)
+        spilled.copy_(cpu.view(-1))
+        self._count(tensor, _nbytes(spilled))
+        return ('mmap', spilled.view(tensor.size()), path, tensor.device)
+
+    def _fetch_tensor(self, packed):
+        # Starts bringing back a packed tensor, returns a function waiting for
+        # it and returning it
+        kind = packed[0]
+        if kind == 'keep':
+            return lambda: packed[1]
+        if kind == 'pinned':
+            host, device = packed[1], packed[2]
+            stream = self._stream(device)
+            with torch.cuda.stream(stream):
+                tensor = host.to(device, non_blocking=True)
+            event = stream.record_event()
+
+            def wait():
+                current = torch.cuda.current_stream(device)
+                current.wait_event(event)
+                tensor.record_stream(current)
+                return tensor
+            return wait
+        if kind == 'host':
+            return lambda: packed[1].to(packed[2])
+        if kind == 'compressed':
+            data, dtype, size = packed[1], packed[2], packed[3]
+            future = self._submit(
+                lambda: torch.from_numpy(numpy.frombuffer(zlib.decompress(data), dtype=dtype).copy()).view(size))
+        else:
+            spilled, path = packed[1], packed[2]
+
+            def read():
+                tensor = spilled.clone()
+                os.remove(path)
+                return tensor
+            future = self._submit(read)
+        device = packed[-1]
+        return lambda: future.result().to(device)
+
+    def _pack(self, args):
+        packed = []
+        for arg in args:
+            if not isinstance(arg, torch.Tensor):
+                packed.append(('arg', arg))
+            elif arg.is_leaf and arg.requires_grad:
+                packed.append(('keep', arg))
+            else:
+                packed.append(self._pack_tensor(arg) + (arg.requires_grad,))
+        with self._lock:
+            self._packed.append(packed)
+            return len(self._packed) - 1
+
+    def _start_fetch(self, index):
+        packed = self._packed[index]
+        if packed is None or index in self._fetching:
+            return
+        waits = []
+        for p in packed:
+            if p[0] in ('arg', 'keep'):
+                waits.append((None, p[1]))
+            else:
+                waits.append((p[-1], self._fetch_tensor(p[:-1])))
+        self._fetching[index] = waits
+        self._packed[index] = None
+
+    def _unpack(self, index):
+        with self._lock:
+            # the parts saved before this one are needed next
+            for i in range(index, max(index - self.prefetch, 0) - 1, -1):
+                self._start_fetch(i)
+            if index not in self._fetching:
+                raise RuntimeError("Trying to backward through the offloaded inputs of a checkpoint a second "
+                                   "time, they are brought back only once")
+            waits = self._fetching.pop(index)
+        args = []
+        for requires_grad, wait in waits:
+            if requires_grad is None:
+                args.append(wait)
+                continue
+            tensor = wait()
+            with self._lock:
+                self.bytes_prefetched += _nbytes(tensor)
+            args.append(tensor.requires_grad_(requires_grad))
+        with self._lock:
+            if not self._fetching and all(p is None for p in self._packed) and self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+        return tuple(args)
+
+
+def _tensors_of(value):
+    if isinstance(value, torch.Tensor):
+        return [value]
+    if isinstance(value, (list, tuple)):
+        return [t for v in value for t in _tensors_of(v)]
+    if isinstance(value, dict):
+        return [t for v in value.values() for t in _tensors_of(v)]
+    return []
+
+
+def _nbytes(tensor):
+    return tensor.numel() * tensor.element_size()
+
+
+def _default_checkpoint_candidates(model):
+    # The children of the model, with the containers (which are usually not
+    # called as a whole) replaced by their own children
+    candidates = []
+    stack = list(reversed(list(model.named_children())))
+    while stack:
+        name, module = stack.pop()
+        if isinstance(module, (torch.nn.Sequential, torch.nn.ModuleList, torch.nn.ModuleDict)):
+            stack.extend(reversed([(name + '.' + child_name, child)
+                                   for child_name, child in module.named_children()]))
+        else:
+            candidates.append(name)
+    return candidates or ['']
+
+
+class _ActivationProfiler(object):
+    # Records, for each candidate module, the bytes of the activations it
+    # keeps for backward, estimated as the bytes of the outputs requiring grad
+    # of the leaf modules it runs, the bytes of its tensor inputs and its
+    # forward time. Activations produced outside the candidates are recorded
+    # under the None key.
+    def __init__(self, model, candidates):
+        self.activation_bytes = {None: 0}
+        self.input_bytes = {}
+        self.forward_time = {}
+        self.recompute_bytes = 0
+        self._current = [None]
+        self._seen = set()
+        self._sync = False
+        self._handles = []
+        modules = dict(model.named_modules())
+        for module in modules.values():
+            if next(module.children(), None) is None:
+                self._handles.append(module.register_forward_hook(self._count_outputs))
+        for name in candidates:
+            if name not in modules:
+                raise ValueError("{} is not a submodule of the model".format(name))
+            module = modules[name]
+            self.activation_bytes[name] = 0
+            self.input_bytes[name] = 0
+            self.forward_time[name] = 0.
+            self._handles.append(module.register_forward_pre_hook(self._pre_hook(name)))
+            self._handles.append(module.register_forward_hook(self._hook(name)))
+
+    def _time(self):
+        if self._sync:
+            torch.cuda.synchronize()
+        return time.perf_counter()
+
+    def _count_outputs(self, module, input, output):
+        for t in _tensors_of(output):
+            if t.requires_grad and torch.is_grad_enabled():
+                key = t.storage().data_ptr()
+                if key not in self._seen:
+                    self._seen.add(key)
+                    self.activation_bytes[self._current[-1]] += _nbytes(t)
+
+    def _pre_hook(self, name):
+        def hook(module, input):
+            inputs = _tensors_of(input)
+            self._sync = any(t.is_cuda for t in inputs)
+            self.input_bytes[name] += sum(_nbytes(t) for t in inputs)
+            self._current.append(name)
+            self._start = self._time()
+        return hook
+
+    def _hook(self, name):
+        def hook(module, input, output):
+            self.forward_time[name] += self._time() - self._start
+            self._current.pop()
+        return hook
+
+    def remove(self):
+        for handle in self._handles:
+            handle.remove()
+
+
+class CheckpointPlan(object):
+    r"""A plan of the modules of a model to checkpoint, as returned by
+    :func:`plan_checkpoints`.
+
+    Attributes:
+        candidates (list of str): names of the modules considered
+        checkpointed (list of str): names of the modules to checkpoint
+        activation_bytes (dict): bytes of the activations kept for backward
+            by each candidate when it is not checkpointed, the activations
+            kept outside of the candidates are under the ``None`` key
+        input_bytes (dict): bytes of the inputs of each candidate, which are
+            kept for backward when it is checkpointed
+        forward_time (dict): forward time of each candidate in seconds, which
+            is spent again in backward when it is checkpointed
+        memory_budget (int): the budget of activation memory in bytes
+        baseline_peak_bytes (int): predicted peak activation memory without
+            checkpointing
+        predicted_peak_bytes (int): predicted peak activation memory with the
+            plan
+        recompute_time (float): predicted time spent recomputing the
+            checkpointed modules in seconds
+        achieved_peak_bytes (int): peak activation memory measured by
+            :meth:`measure`, or ``None``
+        achieved_device_peak_bytes (int): for CUDA models, the peak memory
+            allocated on the device during the forward and backward passes run
+            by :meth:`measure` (which includes the gradients), or ``None``
+    """
+
+    def __init__(self, candidates, checkpointed, activation_bytes, input_bytes, forward_time, memory_budget):
+        self.candidates = list(candidates)
+        self.checkpointed = list(checkpointed)
+        self.activation_bytes = activation_bytes
+        self.input_bytes = input_bytes
+        self.forward_time = forward_time
+        self.memory_budget = memory_budget
+        self.baseline_peak_bytes = _predicted_peak(activation_bytes, input_bytes, [])
+        self.predicted_peak_bytes = _predicted_peak(activation_bytes, input_bytes, checkpointed)
+        self.recompute_time = sum(forward_time[name] for name in checkpointed)
+        self.achieved_peak_bytes = None
+        self.achieved_device_peak_bytes = None
+        self._applied = []
+
+    def apply(self, model, preserve_rng_state=True):
+        r"""Checkpoints the planned modules of ``model``, which must have the
+        same structure as the profiled model.
+
+        The forward of each planned module is replaced by one running it with
+        :func:`checkpoint`. Calls with keyword arguments or non-tensor
+        arguments, without grad mode, or with no input requiring grad (whose
+        parameters would then get no gradients) are run normally.
+        """
+        self.remove()
+        modules = dict(model.named_modules())
+        for name in self.checkpointed:
+            module = modules[name]
+            had_forward = 'forward' in module.__dict__
+            module.forward = _checkpointed_forward(module.forward, preserve_rng_state)
+            self._applied.append((module, had_forward, module.forward.__wrapped__))
+        return model
+
+    def remove(self):
+        r"""Restores the forward of the modules checkpointed by :meth:`apply`."""
+        for module, had_forward, forward in self._applied:
+            if had_forward:
+                module.forward = forward
+            else:
+                del module.forward
+        self._applied = []
+
+    def measure(self, model, *inputs):
+        r"""Runs a forward and backward pass of ``model`` on ``inputs`` with
+        the plan applied, and sets :attr:`achieved_peak_bytes`, the bytes of
+        activations actually kept for backward plus the largest activations
+        recomputed during backward, measured in the same way as for
+        the prediction. For CUDA models, also sets
+        :attr:`achieved_device_peak_bytes` from the caching allocator.
+
+        The gradients of the parameters of ``model`` are accumulated into,
+        and its buffers (e.g. batch norm statistics) updated.
+        """
+        applied = len(self._applied) > 0
+        if not applied:
+            self.apply(model)
+        profiler = _ActivationProfiler(model, self.candidates)
+        _recompute_profilers.append(profiler)
+        device = next((t.device for t in _tensors_of(inputs) if t.is_cuda), None)
+        try:
+            if device is not None:
+                torch.cuda.synchronize(device)
+                torch.cuda.reset_peak_memory_stats(device)
+                start_bytes = torch.cuda.memory_allocated(device)
+            with torch.enable_grad():
+                outputs = [t for t in _tensors_of(model(*inputs)) if t.requires_grad]
+                # as in the prediction, the outputs of the checkpointed
+                # modules themselves are not counted
+                forward_bytes = sum(b for name, b in profiler.activation_bytes.items()
+                                    if name not in self.checkpointed)
+                forward_bytes += sum(profiler.input_bytes[name] for name in self.checkpointed)
+                torch.autograd.backward([t.sum() for t in outputs])
+            if device is not None:
+                torch.cuda.synchronize(device)
+                self.achieved_device_peak_bytes = torch.cuda.max_memory_allocated(device) - start_bytes
+        finally:
+            _recompute_profilers.remove(profiler)
+            profiler.remove()
+            if not applied:
+                self.remove()
+        self.achieved_peak_bytes = forward_bytes + profiler.recompute_bytes
+        return self.achieved_peak_bytes
+
+    def report(self):
+        r"""Returns a human readable summary of the plan."""
+        lines = ['checkpointed modules: {}'.format(', '.join(self.checkpointed) or 'none'),
+                 'peak activation memory without checkpointing: {:.2f} MB'.format(self.baseline_peak_bytes / 2 ** 20),
+                 'predicted peak activation memory: {:.2f} MB (budget: {:.2f} MB)'.format(
+                     self.predicted_peak_bytes / 2 ** 20, self.memory_budget / 2 ** 20),
+                 'predicted recompute time: {:.3f} ms'.format(self.recompute_time * 1e3)]
+        if self.achieved_peak_bytes is not None:
+            lines.append('achieved peak activation memory: {:.2f} MB'.format(self.achieved_peak_bytes / 2 ** 20))
+        if self.achieved_device_peak_bytes is not None:
+            lines.append('achieved peak device memory: {:.2f} MB'.format(self.achieved_device_peak_bytes / 2 ** 20))
+        return '\n'.join(lines)
+
+
+# Profilers of CheckpointPlan.measure, which record the largest activations
+# recomputed by the checkpointed modules during backward
+_recompute_profilers = []
+
+
+def _checkpointed_forward(forward, preserve_rng_state):
+    def run_function(*args):
+        if not torch.is_grad_enabled():
+            return forward(*args)
+        # recomputation during backward
+        counted = []
+        for profiler in _recompute_profilers:
+            # the recomputed activations may reuse the memory of freed ones
+            profiler._seen.clear()
+            counted.append((profiler, sum(profiler.activation_bytes.values())))
+        outputs = forward(*args)
+        for profiler, before in counted:
+            recomputed = sum(profiler.activation_bytes.values()) - before
+            if recomputed == 0:
+                # a leaf module, whose forward hooks are not run here
+                recomputed = sum(_nbytes(t) for t in _tensors_of(outputs) if t.requires_grad)
+            profiler.recompute_bytes = max(profiler.recompute_bytes, recomputed)
+        return outputs
+
+    @functools.wraps(forward)
+    def checkpointed_forward(*args, **kwargs):
+        if (kwargs or not torch.is_grad_enabled() or
+                not all(isinstance(arg, torch.Tensor) for arg in args) or
+                not any(arg.requires_grad for arg in args)):
+            return forward(*args, **kwargs)
+        return checkpoint(run_function, *args, preserve_rng_state=preserve_rng_state)
+    checkpointed_forward.__wrapped__ = forward
+    return checkpointed_forward
+
+
+def _predicted_peak(activation_bytes, input_bytes, checkpointed):
+    # Activations kept for backward, plus the largest activations recomputed
+    # at once during backward
+    checkpointed = set(checkpointed)
+    kept = sum(b for name, b in activation_bytes.items() if name not in checkpointed)
+    kept += sum(input_bytes[name] for name in checkpointed)
+    return kept + max([activation_bytes[name] for name in checkpointed] or [0])
+
+
+def _min_cost_cover(savings, costs, needed):
+    # 0/1 knapsack: picks a subset of the items whose savings sum to at least
+    # ``needed`` with the smallest total cost. Returns the indices of the
+    # items, or None if it is not possible.
+    if needed <= 0:
+        return []
+    if sum(savings) < needed:
+        return None
+    inf_cost = float('inf')
+    # best[u] is the smallest cost to save at least u units
+    best = torch.full((needed + 1,), inf_cost, dtype=torch.float64)
+    best[0] = 0
+    positions = torch.arange(needed + 1)
+    taken = []
+    for saving, cost in zip(savings, costs):
+        with_item = best[(positions - saving).clamp_(min=0)] + cost
+        take = with_item < best
+        best = torch.where(take, with_item, best)
+        taken.append(take)
+    if best[needed] == inf_cost:
+        return None
+    chosen = []
+    u = needed
+    for i in range(len(savings) - 1, -1, -1):
+        if taken[i][u]:
+            chosen.append(i)
+            u = max(u - savings[i], 0)
+    return chosen[::-1]
+
+
+def plan_checkpoints(model, inputs, memory_budget, candidates=None, resolution=1024):
+    r"""Profiles a forward pass of ``model`` and plans which of its modules
+    to checkpoint to fit the activations in ``memory_budget`` with the least
+    recomputation.
+
+    Unlike :func:`checkpoint_sequential`, which splits a sequential model in
+    segments with the same number of modules, the plan accounts for the
+    memory kept for backward and the compute time of each module: the
+    activation bytes, input bytes and forward time of each candidate module
+    are measured on one forward pass, and the set of modules to checkpoint is
+    chosen to minimize the recomputation time subject to the predicted peak
+    activation memory being within budget. The peak is modeled as the
+    activations kept by the modules that are not checkpointed, plus the
+    inputs kept by the checkpointed ones, plus the largest activations
+    recomputed at once during backward. The problem is solved exactly, up to
+    a discretization of the memory in ``resolution`` units, with a knapsack
+    dynamic program for each possible largest recomputed module.
+
+    Activations are estimated as the bytes of the outputs requiring grad of
+    the leaf modules, counting each storage once. Activations kept by
+    operations outside of modules are not seen.
+
+    Arguments:
+        model (torch.nn.Module): the model to profile. Its buffers (e.g.
+            batch norm statistics) and the RNG state are restored after the
+            profiling pass.
+        inputs (Tensor or tuple): inputs of the model for the profiling pass,
+            which should be representative of training.
+        memory_budget (int): budget of activation memory in bytes.
+        candidates (list of str, optional): names of the modules that may be
+            checkpointed, as given by :meth:`~torch.nn.Module.named_modules`.
+            They must not contain one another. Defaults to the children of the
+            model, the containers (:class:`~torch.nn.Sequential`,
+            :class:`~torch.nn.ModuleList`, :class:`~torch.nn.ModuleDict`)
+            being replaced by their children, recursively.
+        resolution (int, optional): number of units the memory is discretized
+            in (default: 1024)
+
+    Returns:
+        A :class:`CheckpointPlan`. If the budget can't be met, the plan with
+        the smallest predicted peak that is found is returned, with a warning.
+
+    Example:
+        >>> plan = torch.utils.checkpoint.plan_checkpoints(model, input, memory_budget=2 * 2 ** 30)
+        >>> plan.apply(model)
+        >>> plan.measure(model, input)
+        >>> print(plan.report())
+    """
+    if isinstance(inputs, torch.Tensor):
+        inputs = (inputs,)
+    if candidates is None:
+        candidates = _default_checkpoint_candidates(model)
+    candidates = list(candidates)
+    for a in candidates:
+        for b in candidates:
+            if a != b and (a == '' or b.startswith(a + '.')):
+                raise ValueError("Checkpoint candidates must not contain one another, "
+                                 "but {} contains {}".format(a or 'the model', b))
+
+    buffers = [b.clone() for b in model.buffers()]
+    devices = list(set(t.get_device() for t in _tensors_of(inputs) if t.is_cuda))
+    profiler = _ActivationProfiler(model, candidates)
+    try:
+        with torch.random.fork_rng(devices=devices), torch.enable_grad():
+            model(*inputs)
+    finally:
+        profiler.remove()
+        with torch.no_grad():
+            for b, saved in zip(model.buffers(), buffers):
+                b.copy_(saved)
+
+    # modules which were not called can't be checkpointed
+    called = [name for name in candidates if profiler.activation_bytes[name] > 0]
+    activation_bytes = profiler.activation_bytes
+    input_bytes = profiler.input_bytes
+    forward_time = profiler.forward_time
+
+    total = _predicted_peak(activation_bytes, input_bytes, [])
+    unit = max(1, -(-total // resolution))
+
+    def units(nbytes, round_up):
+        return -(-nbytes // unit) if round_up else nbytes // unit
+
+    best_plan, best_key = [], (total > memory_budget, total, 0.)
+    if total > memory_budget:
+        # For each choice of the largest recomputed module k, checkpoint k and
+        # a subset of the smaller modules saving enough memory
+        by_size = sorted(called, key=lambda name: activation_bytes[name])
+        for i, largest in enumerate(by_size):
+            others = [name for name in by_size[:i]
+                      if activation_bytes[name] > input_bytes[name]]
+            saving_largest = activation_bytes[largest] - input_bytes[largest]
+            needed = total + activation_bytes[largest] - saving_largest - memory_budget
+            chosen = _min_cost_cover(
+                # rounded down so that the plan is within budget
+                [units(activation_bytes[name] - input_bytes[name], False) for name in others],
+                [forward_time[name] for name in others],
+                units(needed, True))
+            if chosen is None:
+                # save as much as possible
+                chosen = range(len(others))
+            plan = [largest] + [others[j] for j in chosen]
+            peak = _predicted_peak(activation_bytes, input_bytes, plan)
+            key = (peak > memory_budget, peak if peak > memory_budget else 0,
+                   sum(forward_time[name] for name in plan))
+            if key < best_key:
+                best_plan, best_key = plan, key
+        if best_key[0]:
+            warnings.warn("No checkpointing plan fits the activations in the memory budget, "
+                          "the plan with the smallest peak is used")
+    order = dict((name, i) for i, name in enumerate(candidates))
+    best_plan = sorted(best_plan, key=lambda name: order[name])
+    return CheckpointPlan(candidates, best_plan, activation_bytes, input_bytes, forward_time, memory_budget)
@@ -0,0 +1,451 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import functools
+import time
+from collections import OrderedDict
+
+import torch
+from torch.autograd.profiler import format_time, format_time_share
+
+# Prefix of the names of the profiler ranges of the modules, which keeps them
+# apart from the events of the ops, e.g. of a submodule named "relu"
+_RANGE_PREFIX = 'module::'
+
+
+class _BackwardMarker(torch.autograd.Function):
+    """Identity function that calls ``callback`` when gradients flow through it.
+
+    It is inserted around the inputs and outputs of a module so that the
+    profiler learns when the backward of that module starts (gradients reach
+    its outputs) and ends (gradients leave through its inputs).
+    """
+    @staticmethod
+    def forward(ctx, callback, *args):
+        ctx.callback = callback
+        return args
+
+    @staticmethod
+    def backward(ctx, *grads):
+        ctx.callback()
+        return (None,) + grads
+
+
+class ModuleStats(object):
+    """Latency accumulated over all calls of a single module (or module type).
+
+    All times are reported in microseconds, the same unit used by
+    :mod:`torch.autograd.profiler`.
+    """
+    def __init__(self, name, module_type, depth=0):
+        self.name = name
+        self.module_type = module_type
+        self.depth = depth
+        self.count = 0
+        self.instances = 1
+        self.forward_time_total = 0.0
+        self.self_forward_time_total = 0.0
+        self.backward_time_total = 0.0
+        self.backward_count = 0
+        self.flops = 0
+        self.self_flops = 0
+        self.bytes_moved = 0
+
+    @property
+    def forward_time(self):
+        return 0.0 if self.count == 0 else self.forward_time_total / self.count
+
+    @property
+    def backward_time(self):
+        return 0.0 if self.backward_count == 0 else self.backward_time_total / self.backward_count
+
+    @property
+    def time_total(self):
+        return self.forward_time_total + self.backward_time_total
+
+    @property
+    def gflops_per_second(self):
+        # flops / us == MFLOP/s
+        return 0.0 if self.forward_time_total == 0 else self.flops / (1e3 * self.forward_time_total)
+
+    def add(self, other):
+        self.count += other.count
+        self.forward_time_total += other.forward_time_total
+        self.self_forward_time_total += other.self_forward_time_total
+        self.backward_time_total += other.backward_time_total
+        self.backward_count += other.backward_count
+        self.flops += other.flops
+        self.self_flops += other.self_flops
+        self.bytes_moved += other.bytes_moved
+        return self
+
+    def __repr__(self):
+        return (
+            '<ModuleStats name={} type={} count={} forward_time={} '
+            'backward_time={}>'.format(
+                self.name,
+                self.module_type,
+                self.count,
+                format_time(self.forward_time),
+                format_time(self.backward_time),
+            )
+        )
+
+
+class _ModuleCall(object):
+    __slots__ = ['stats', 'parent', 'children', 'start', 'children_time',
+                 'handle', 'backward_start', 'backward_end']
+
+    def __init__(self, stats, parent, start):
+        self.stats = stats
+        self.parent = parent
+        self.children = []
+        self.start = start
+        self.children_time = 0.0
+        self.handle = None
+        self.backward_start = None
+        self.backward_end = None
+
+    def effective_backward_end(self):
+        end = self.backward_end
+        for child in self.children:
+            child_end = child.effective_backward_end()
+            if child_end is not None and (end is None or child_end > end):
+                end = child_end
+        return end
+
+
+def _now_us():
+    return time.perf_counter() * 1e6
+
+
+def _map_tensors(obj, fn):
+    """Applies ``fn`` to the tuple of tensors found at the top level of ``obj``.
+
+    Only a bare tensor or a flat tuple / list of values is inspected; anything
+    else is returned unchanged.
+    """
+    if isinstance(obj, torch.Tensor):
+        return fn((obj,))[0]
+    if isinstance(obj, (tuple, list)):
+        idx = [i for i, v in enumerate(obj) if isinstance(v, torch.Tensor)]
+        if not idx:
+            return obj
+        new = fn(tuple(obj[i] for i in idx))
+        out = list(obj)
+        for i, v in zip(idx, new):
+            out[i] = v
+        return type(obj)(out) if isinstance(obj, list) else tuple(out)
+    return obj
+
+
+class profile_modules(object):
+    r"""Context manager that records a per-submodule latency and FLOP breakdown of a model.
+
+    Every submodule of ``model`` gets a forward pre-hook and a forward hook
+    that time its ``forward`` and, optionally, open a
+    :class:`~torch.autograd.profiler.record_function` range named after the
+    module, prefixed with ``module::`` (e.g. ``module::encoder.0``), so that
+    the module hierarchy also shows up in traces collected with
+    :class:`torch.autograd.profiler.profile`.
+
+    When ``record_backward`` is set, the inputs and outputs of every module are
+    wrapped into an identity autograd function so that the time between the
+    gradient reaching the outputs of a module and leaving through its inputs
+    (or, for modules whose inputs do not require grad, the gradients of its
+    parameters being computed) is attributed to that module's backward.
+
+    Arguments:
+        model (torch.nn.Module): the model to instrument.
+        enabled (bool, optional): Setting this to False makes this context manager a no-op.
+            Default: ``True``.
+        record_backward (bool, optional): also time the backward of every module.
+            Default: ``True``.
+        use_record_function (bool, optional): emit a profiler range for the
+            forward of every module. Default: ``True``.
+        record_flops (bool, optional): run :class:`torch.autograd.profiler.profile`
+            with ``record_shapes=True`` while the context is active and attribute
+            the FLOPs and bytes estimated for every op (see
+            :func:`torch.autograd.profiler.register_op_cost`) to the modules whose
+            forward ran it. Requires ``use_record_function``, and cannot be
+            combined with another active autograd profiler. Default: ``False``.
+
+    .. warning:
+        Module hooks only see tensors passed positionally or returned at the
+        top level of ``forward`` (a tensor or a tuple / list of tensors). The
+        backward of modules taking or returning nested structures is not timed.
+
+    Example:
+        >>> model = torch.nn.Sequential(torch.nn.Linear(10, 10), torch.nn.ReLU())
+        >>> with torch.utils.module_profiler.profile_modules(model) as prof:
+        >>>     model(torch.randn(4, 10, requires_grad=True)).sum().backward()
+        >>> print(prof.table())
+        >>> print(prof.table(group_by_type=True, sort_by="time_total"))
+    """
+    def __init__(self, model, enabled=True, record_backward=True, use_record_function=True,
+                 record_flops=False):
+        if record_flops and not use_record_function:
+            raise ValueError("record_flops requires use_record_function=True")
+        self.model = model
+        self.enabled = enabled
+        self.record_backward = record_backward
+        self.use_record_function = use_record_function
+        self.record_flops = record_flops
+        self._autograd_profile = None
+        self.stats = OrderedDict()
+        self.entered = False
+        self._handles = []
+        self._stack = []
+        self._pending = []
+        self._last_call = {}
+        self._flush_queued = False
+
+    def __enter__(self):
+        if not self.enabled:
+            return self
+        if self.entered:
+            raise RuntimeError("module profiler is not reentrant")
+        self.entered = True
+        for name, module in self.model.named_modules():
+            stats = ModuleStats(name or type(module).__name__, type(module).__name__,
+                                depth=name.count('.') + 1 if name else 0)
+            self.stats[name] = stats
+            self._handles.append(module.register_forward_pre_hook(
+                functools.partial(self._pre_hook, stats)))
+            self._handles.append(module.register_forward_hook(
+                functools.partial(self._post_hook, stats)))
+            if self.record_backward:
+                for param in module.parameters(recurse=False):
+                    if param.requires_grad:
+                        self._handles.append(param.register_hook(
+                            functools.partial(self._param_grad_hook, module)))
+        if self.record_flops:
+            self._autograd_profile = torch.autograd.profiler.profile(record_shapes=True)
+            self._autograd_profile.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if not self.enabled:
+            return False
+        for handle in self._handles:
+            handle.remove()
+        self._handles = []
+        while self._stack:
+            call = self._stack.pop()
+            if call.handle is not None:
+                torch.ops.profiler._record_function_exit(call.handle)
+        self._pending = []
+        self._last_call = {}
+        self.entered = False
+        if self._autograd_profile is not None:
+            self._autograd_profile.__exit__(exc_type, exc_val, exc_tb)
+            self._attribute_flops(self._autograd_profile.function_events)
+            self._autograd_profile = None
+        return False
+
+    def _pre_hook(self, stats, module, input):
+        parent = self._stack[-1] if self._stack else None
+        call = _ModuleCall(stats, parent, _now_us())
+        if self.use_record_function:
+            call.handle = torch.ops.profiler._record_function_enter(_RANGE_PREFIX + stats.name)
+        self._stack.append(call)
+        if self.record_backward and torch.is_grad_enabled():
+            if parent is not None:
+                parent.children.append(call)
+            self._last_call[module] = call
+
+            def on_input_grad():
+                call.backward_end = _now_us()
+
+            return _map_tensors(input, lambda ts: self._mark(ts, on_input_grad))
+
+    def _post_hook(self, stats, module, input, output):
+        call = self._stack.pop()
+        assert call.stats is stats, "module profiler hooks were called out of order"
+        if call.handle is not None:
+            torch.ops.profiler._record_function_exit(call.handle)
+        elapsed = _now_us() - call.start
+        stats.count += 1
+        stats.forward_time_total += elapsed
+        stats.self_forward_time_total += elapsed - call.children_time
+        if call.parent is not None:
+            call.parent.children_time += elapsed
+        if not (self.record_backward and torch.is_grad_enabled()):
+            return None
+
+        def on_output_grad():
+            if call.backward_start is None:
+                call.backward_start = _now_us()
+            if not self._flush_queued:
+                self._flush_queued = True
+                torch.autograd.Variable._execution_engine.queue_callback(self._flush_backward)
+
+        new_output = _map_tensors(output, lambda ts: self._mark(ts, on_output_grad))
+        if new_output is not output:
+            self._pending.append(call)
+        return new_output
+
+    def _mark(self, tensors, callback):
+        idx = [i for i, t in enumerate(tensors) if t.requires_grad]
+        if not idx:
+            return tensors
+        marked = _BackwardMarker.apply(callback, *[tensors[i] for i in idx])
+        out = list(tensors)
+        for i, t in zip(idx, marked):
+            out[i] = t
+        return tuple(out)
+
+    def _param_grad_hook(self, module, grad):
+        call = self._last_call.get(module)
+        if call is not None:
+            call.backward_end = _now_us()
+
+    def _flush_backward(self):
+        self._flush_queued = False
+        remaining = []
+        for call in self._pending:
+            if call.backward_start is None:
+                remaining.append(call)
+                continue
+            end = call.effective_backward_end()
+            if end is None:
+                end = _now_us()
+            call.stats.backward_time_total += max(end - call.backward_start, 0.0)
+            call.stats.backward_count += 1
+        self._pending = remaining
+        self._last_call = {}
+
+    def _attribute_flops(self, events):
+        events.populate_cpu_children()
+        by_range_name = {_RANGE_PREFIX + stats.name: stats for stats in self.stats.values()}
+        parents = {}
+        for evt in events:
+            for child in evt.cpu_children:
+                parents[child.id] = evt
+        for evt in events:
+            if evt.name in by_range_name or (evt.flops == 0 and evt.bytes_moved == 0):
+                continue
+            enclosing = []
+            parent = parents.get(evt.id)
+            while parent is not None:
+                if parent.name in by_range_name:
+                    enclosing.append(by_range_name[parent.name])
+                elif parent.flops > 0 or parent.bytes_moved > 0:
+                    # already accounted for by the op that called this one
+                    enclosing = []
+                    break
+                parent = parents.get(parent.id)
+            for i, stats in enumerate(enclosing):
+                stats.flops += evt.flops
+                stats.bytes_moved += evt.bytes_moved
+                if i == 0:
+                    stats.self_flops += evt.flops
+
+    def _check_finish(self):
+        if self.entered:
+            raise RuntimeError("can't report module statistics while the profiler is running")
+
+    def key_averages(self, group_by_type=False):
+        """Returns the collected :class:`ModuleStats`.
+
+        Arguments:
+            group_by_type (bool, optional): aggregate the statistics of all
+                instances of a module class into a single entry instead of
+                reporting one entry per submodule. Default: ``False``.
+        """
+        self._check_finish()
+        called = [stats for stats in self.stats.values() if stats.count > 0]
+        if not group_by_type:
+            return called
+        by_type = OrderedDict()
+        for stats in called:
+            if stats.module_type not in by_type:
+                by_type[stats.module_type] = ModuleStats(stats.module_type, stats.module_type)
+                by_type[stats.module_type].instances = 0
+            by_type[stats.module_type].add(stats).instances += 1
+        return list(by_type.values())
+
+    def table(self, group_by_type=False, sort_by=None, row_limit=100, max_depth=None):
+        """Prints the collected statistics as a nicely formatted table.
+
+        Arguments:
+            group_by_type (bool, optional): see :meth:`key_averages`.
+            sort_by (str, optional): Attribute used to sort entries. By default
+                entries follow the module hierarchy. Valid keys include:
+                ``forward_time_total``, ``self_forward_time_total``,
+                ``backward_time_total``, ``time_total``, ``count``, ``flops``.
+            max_depth (int, optional): hide submodules nested deeper than
+                ``max_depth`` below the root. Ignored with ``group_by_type``.
+
+        Returns:
+            A string containing the table.
+        """
+        entries = self.key_averages(group_by_type)
+        # Top-level modules that ran account for the whole profiled time.
+        called = self.key_averages()
+        top_depth = min([stats.depth for stats in called] or [0])
+        time_total = sum([stats.time_total for stats in called if stats.depth == top_depth])
+        if max_depth is not None and not group_by_type:
+            entries = [stats for stats in entries if stats.depth <= max_depth]
+        if sort_by is not None:
+            entries = sorted(entries, key=lambda stats: getattr(stats, sort_by), reverse=True)
+        return build_module_table(entries, time_total, hierarchical=not group_by_type and sort_by is None,
+                                  row_limit=row_limit)
+
+
+def build_module_table(entries, time_total, hierarchical=True, row_limit=100):
+    """Prints a summary of a list of :class:`ModuleStats`."""
+    if len(entries) == 0:
+        return ""
+
+    def display_name(stats):
+        return ('  ' * stats.depth if hierarchical else '') + stats.name
+
+    headers = [
+        'Name',
+        'Type',
+        'Instances',
+        'Calls',
+        'Forward total',
+        'Self forward',
+        'Forward avg',
+        'Backward total',
+        'Backward avg',
+        'Total %',
+    ]
+    has_flops = any([stats.flops > 0 for stats in entries])
+    if has_flops:
+        headers.extend([
+            'Forward GFLOPs',
+            'Self GFLOPs',
+            'GFLOP/s',
+        ])
+    name_column_width = max([len(display_name(stats)) for stats in entries]) + 4
+    type_column_width = max([len(stats.module_type) for stats in entries]) + 4
+    DEFAULT_COLUMN_WIDTH = 15
+    widths = [name_column_width, type_column_width] + [DEFAULT_COLUMN_WIDTH] * (len(headers) - 2)
+    row_format = ''.join('{: <' + str(w) + '}  ' for w in widths)
+    header_sep = ''.join('-' * w + '  ' for w in widths)
+
+    result = [header_sep, row_format.format(*headers), header_sep]
+    for stats in entries[:row_limit]:
+        row_values = [
+            display_name(stats),
+            stats.module_type,
+            stats.instances,
+            stats.count,
+            format_time(stats.forward_time_total),
+            format_time(stats.self_forward_time_total),
+            format_time(stats.forward_time),
+            format_time(stats.backward_time_total),
+            format_time(stats.backward_time),
+            format_time_share(stats.time_total, time_total),
+        ]
+        if has_flops:
+            row_values.extend([
+                '{:.3f}'.format(stats.flops / 1e9),
+                '{:.3f}'.format(stats.self_flops / 1e9),
+                '{:.2f}'.format(stats.gflops_per_second),
+            ])
+        result.append(row_format.format(*row_values))
+    result.append(header_sep)
+    return '\n'.join(result) + '\n'
@@ -1,7 +1,20 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import json
+
 import torch._C
 
+
+def _percentile(sorted_values, q):
+    """Linear interpolation between closest ranks, ``q`` in [0, 100]."""
+    if not sorted_values:
+        return float('nan')
+    rank = (len(sorted_values) - 1) * q / 100.0
+    lo = int(rank)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (rank - lo)
+
+
 def format_time(time_us=None, time_ms=None, time_s=None):
     '''Defines how to format time'''
     assert sum([time_us is not None, time_ms is not None, time_s is not None]) == 1
@@ -28,6 +41,7 @@ class ExecutionStats(object):
     def __init__(self, c_stats, benchmark_config):
         self._c_stats = c_stats
         self.benchmark_config = benchmark_config
+        self._sorted_latencies_ms = None
 
     @property
     def latency_avg_ms(self):
@@ -37,6 +51,69 @@ class ExecutionStats(object):
     def num_iters(self):
         return self._c_stats.num_iters
 
+    @property
+    def thread_latencies_ms(self):
+        '''
+        Returns a list with the latency of every measured request, one list per
+        calling thread
+        '''
+        return self._c_stats.thread_latencies_ms
+
+    @property
+    def latencies_ms(self):
+        '''
+        Returns latencies of all measured requests across calling threads sorted
+        in ascending order
+        '''
+        if self._sorted_latencies_ms is None:
+            self._sorted_latencies_ms = sorted(
+                latency for thread in self.thread_latencies_ms for latency in thread)
+        return self._sorted_latencies_ms
+
+    def latency_percentile_ms(self, q, thread_id=None):
+        '''
+        Returns the q-th percentile (0 <= q <= 100) of request latency, either
+        across all calling threads or for the calling thread thread_id only
+        '''
+        if thread_id is None:
+            return _percentile(self.latencies_ms, q)
+        return _percentile(sorted(self.thread_latencies_ms[thread_id]), q)
+
+    @property
+    def latency_p50_ms(self):
+        return self.latency_percentile_ms(50)
+
+    @property
+    def latency_p90_ms(self):
+        return self.latency_percentile_ms(90)
+
+    @property
+    def latency_p95_ms(self):
+        return self.latency_percentile_ms(95)
+
+    @property
+    def latency_p99_ms(self):
+        return self.latency_percentile_ms(99)
+
+    def latency_histogram(self, num_buckets=20, thread_id=None):
+        '''
+        Returns a list of (bucket_start_ms, bucket_end_ms, count) tuples with
+        num_buckets equally sized buckets spanning the observed latencies,
+        either across all calling threads or for the calling thread thread_id
+        '''
+        if thread_id is None:
+            latencies = self.latencies_ms
+        else:
+            latencies = self.thread_latencies_ms[thread_id]
+        if not latencies:
+            return []
+        lo, hi = min(latencies), max(latencies)
+        width = (hi - lo) / num_buckets or 1.0
+        counts = [0] * num_buckets
+        for latency in latencies:
+            counts[min(int((latency - lo) / width), num_buckets - 1)] += 1
+        return [(lo + i * width, lo + (i + 1) * width, count) for i, count in enumerate(counts)]
+
     @property
     def iters_per_second(self):
         '''
@@ -46,19 +123,92 @@ class ExecutionStats(object):
 
     @property
     def total_time_seconds(self):
-        return self.num_iters * (
-            self.latency_avg_ms / 1000.0) / self.benchmark_config.num_calling_threads
+        return self._c_stats.total_time_ms / 1000.0
 
+    def to_dict(self):
+        '''
+        Returns the benchmark configuration and a summary of the results as a
+        JSON serializable dictionary
+        '''
+        return {
+            'num_calling_threads': self.benchmark_config.num_calling_threads,
+            'num_warmup_iters': self.benchmark_config.num_warmup_iters,
+            'target_qps': self.benchmark_config.target_qps or None,
+            'num_iters': self.num_iters,
+            'total_time_seconds': self.total_time_seconds,
+            'iters_per_second': self.iters_per_second,
+            'latency_avg_ms': self.latency_avg_ms,
+            'latency_p50_ms': self.latency_p50_ms,
+            'latency_p90_ms': self.latency_p90_ms,
+            'latency_p95_ms': self.latency_p95_ms,
+            'latency_p99_ms': self.latency_p99_ms,
+            'latency_max_ms': self.latencies_ms[-1] if self.latencies_ms else None,
+        }
 
     def __str__(self):
         return '\n'.join([
             "Average latency per example: " + format_time(time_ms=self.latency_avg_ms),
+            "Latency p50 / p90 / p99: {} / {} / {}".format(
+                format_time(time_ms=self.latency_p50_ms),
+                format_time(time_ms=self.latency_p90_ms),
+                format_time(time_ms=self.latency_p99_ms)),
             "Total number of iterations: {}".format(self.num_iters),
             "Total number of iterations per second (across all threads): {:.2f}".format(self.iters_per_second),
             "Total time: " + format_time(time_s=self.total_time_seconds)
         ])
 
 
+class BenchmarkReport(object):
+    '''
+    Results of ThroughputBenchmark.sweep(): one entry per combination of
+    calling threads and intra-op threads that was benchmarked.
+    '''
+    def __init__(self):
+        self.entries = []
+
+    def add(self, num_intra_op_threads, stats):
+        self.entries.append((num_intra_op_threads, stats))
+
+    def best(self, metric='latency_p99_ms', maximize=False):
+        '''
+        Returns the (num_intra_op_threads, ExecutionStats) entry with the best
+        value of metric, which is any ExecutionStats attribute, e.g.
+        latency_p99_ms or iters_per_second (with maximize=True)
+        '''
+        key = lambda entry: getattr(entry[1], metric)
+        return max(self.entries, key=key) if maximize else min(self.entries, key=key)
+
+    def to_dict(self):
+        results = []
+        for num_intra_op_threads, stats in self.entries:
+            result = stats.to_dict()
+            result['num_intra_op_threads'] = num_intra_op_threads
+            results.append(result)
+        return {'results': results}
+
+    def to_json(self, path=None):
+        '''
+        Returns the report as a JSON string, also writing it to path if given
+        '''
+        report = json.dumps(self.to_dict(), indent=2, sort_keys=True)
+        if path is not None:
+            with open(path, 'w') as f:
+                f.write(report)
+        return report
+
+    def __str__(self):
+        lines = []
+        for num_intra_op_threads, stats in self.entries:
+            lines.append("calling threads: {}, intra-op threads: {}, iters/s: {:.2f}, "
+                         "p50: {}, p99: {}".format(
+                             stats.benchmark_config.num_calling_threads,
+                             num_intra_op_threads,
+                             stats.iters_per_second,
+                             format_time(time_ms=stats.latency_p50_ms),
+                             format_time(time_ms=stats.latency_p99_ms)))
+        return '\n'.join(lines)
+
+
 class ThroughputBenchmark(object):
     '''
     This class is a wrapper around a c++ component throughput_benchmark::ThroughputBenchmark
@@ -117,7 +267,8 @@ class ThroughputBenchmark(object):
         '''
         self._benchmark.add_input(*args, **kwargs)
 
-    def benchmark(self, num_calling_threads=1, num_warmup_iters=10, num_iters=100):
+    def benchmark(self, num_calling_threads=1, num_warmup_iters=10, num_iters=100,
+                  target_qps=None):
         '''
         Args:
             num_warmup_iters (int): Warmup iters are used to make sure we run a module
@@ -132,14 +283,58 @@ class ThroughputBenchmark(object):
                 iterations might be slightly larger. Which is reported as
                 stats.num_iters where stats is the result of this function
 
-        This function returns BenchmarkExecutionStats object which is defined via pybind11.
-        It currently has two fields:
-            - num_iters - number of actual iterations the benchmark have made
-            - avg_latency_ms - average time it took to infer on one input example in milliseconds
+            target_qps (float, optional): When set, requests are issued open-loop
+                at this rate across all the calling threads, which then act as a
+                pool of servers, and latency includes the time a request waited
+                for a free thread. By default every thread issues the next
+                request as soon as the previous one finished (closed loop).
+
+        This function returns an ExecutionStats object wrapping
+        BenchmarkExecutionStats which is defined via pybind11. Besides
+        num_iters and latency_avg_ms, it exposes the latency of every request
+        per calling thread and percentiles / histograms computed from them.
         '''
         config = torch._C.BenchmarkConfig()
         config.num_calling_threads = num_calling_threads
         config.num_warmup_iters = num_warmup_iters
         config.num_iters = num_iters
+        if target_qps is not None:
+            if target_qps <= 0:
+                raise ValueError("target_qps should be positive, got {}".format(target_qps))
+            config.target_qps = target_qps
         c_stats = self._benchmark.benchmark(config)
         return ExecutionStats(c_stats, config)
+
+    def sweep(self, num_calling_threads=(1, 2, 4), num_intra_op_threads=None,
+              num_warmup_iters=10, num_iters=100, target_qps=None):
+        '''
+        Runs benchmark() for every combination of num_calling_threads and
+        num_intra_op_threads (the number of threads used by intra-op
+        parallelism, see torch.set_num_threads) and returns a BenchmarkReport.
+        By default the intra-op thread count is left as is. The intra-op thread
+        count is restored once the sweep is done.
+
+        Example::
+
+            >>> report = bench.sweep(num_calling_threads=[1, 2, 4],
+                                     num_intra_op_threads=[1, 2, 4])
+            >>> num_intra_op_threads, stats = report.best('latency_p99_ms')
+            >>> report.to_json('report.json')
+        '''
+        report = BenchmarkReport()
+        initial_num_threads = torch.get_num_threads()
+        if num_intra_op_threads is None:
+            num_intra_op_threads = [initial_num_threads]
+        try:
+            for intra_op_threads in num_intra_op_threads:
+                torch.set_num_threads(intra_op_threads)
+                for calling_threads in num_calling_threads:
+                    stats = self.benchmark(
+                        num_calling_threads=calling_threads,
+                        num_warmup_iters=num_warmup_iters,
+                        num_iters=num_iters,
+                        target_qps=target_qps)
+                    report.add(intra_op_threads, stats)
+        finally:
+            torch.set_num_threads(initial_num_threads)
+        return report